@@ -0,0 +1,6 @@
+"""
+Benchmarks de extremo a extremo del servidor API y la CLI
+Se ejecutan contra el servidor simulado de Blackbox
+(``blackbox_hybrid_tool.utils.mock_server``), así que no necesitan red ni
+API key. Uso: ``python -m benchmarks.run --help``.
+"""
@@ -0,0 +1,235 @@
+"""
+Utilidades comunes de los benchmarks: estadísticas, servidor API en
+subproceso y comparación de resultados contra una línea base guardada
+"""
+
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Métricas donde más es mejor; el resto (tiempos) cuanto menor, mejor
+HIGHER_IS_BETTER = ("rps", "throughput")
+# Contadores y tamaños describen la carga, no el rendimiento
+NOT_COMPARED = {"count", "errors", "entries", "files", "hunks", "bytes"}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Percentil por rango más cercano (``q`` en [0, 1])"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(q * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Resumen de una serie de latencias en segundos"""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "p50": percentile(samples, 0.50),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+    }
+
+
+def timed(fn: Callable[[], Any], repeat: int = 3) -> Dict[str, float]:
+    """Ejecuta ``fn`` ``repeat`` veces y resume los tiempos"""
+    samples = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """``{"chat": {"c4": {"p95": 0.1}}}`` -> ``{"chat.c4.p95": 0.1}``"""
+    flat: Dict[str, float] = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.10
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Diferencias por métrica respecto a la línea base
+
+    Una métrica es regresión si empeora más de ``threshold`` (fracción)
+    en su dirección: tiempos que suben o rendimientos (``*_rps``) que
+    bajan.
+    """
+    now = flatten(current.get("results", current))
+    before = flatten(baseline.get("results", baseline))
+    report: Dict[str, List[Dict[str, Any]]] = {
+        "regressions": [],
+        "improvements": [],
+        "unchanged": [],
+        "missing": sorted(set(before) - set(now)),
+    }
+    for metric in sorted(set(now) & set(before)):
+        if metric.rsplit(".", 1)[-1] in NOT_COMPARED:
+            continue
+        old, new = before[metric], now[metric]
+        if old == 0:
+            continue
+        change = (new - old) / old
+        higher = any(metric.endswith(s) for s in HIGHER_IS_BETTER)
+        worse = -change if higher else change
+        entry = {"metric": metric, "baseline": old, "current": new, "change": change}
+        if worse > threshold:
+            report["regressions"].append(entry)
+        elif worse < -threshold:
+            report["improvements"].append(entry)
+        else:
+            report["unchanged"].append(entry)
+    return report
+
+
+def environment() -> Dict[str, Any]:
+    """Contexto de la ejecución para interpretar los números"""
+    import platform
+
+    commit = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit or None,
+        "timestamp": int(time.time()),
+    }
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(data: Dict[str, Any], path: str) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ApiServer:
+    """``uvicorn main:app`` en un subproceso apuntando al servidor simulado
+
+    El limitador de entrada se desactiva (``CHISPART_INBOUND_RATE_LIMIT=0``)
+    para medir el servidor y no la política de admisión.
+    """
+
+    def __init__(self, upstream: str, workdir: Path, env: Optional[dict] = None):
+        self.port = _free_port()
+        self.workdir = Path(workdir)
+        self.config_file = self.workdir / "models.json"
+        self.config_file.write_text(
+            json.dumps(
+                {
+                    "default_model": "blackbox",
+                    "models": {
+                        "blackbox": {
+                            "api_key": "bench",
+                            "model": "mock/gpt",
+                            "enabled": True,
+                        }
+                    },
+                }
+            ),
+            encoding="utf-8",
+        )
+        self.env = {
+            **os.environ,
+            "BLACKBOX_API_BASE": upstream,
+            "CONFIG_FILE": str(self.config_file),
+            "WRITE_ROOT": str(self.workdir),
+            "AUTO_SNAPSHOT": "false",
+            "CHISPART_INBOUND_RATE_LIMIT": "0",
+            **(env or {}),
+        }
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 30.0) -> "ApiServer":
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "main:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(self.port),
+                "--log-level",
+                "warning",
+            ],
+            cwd=PROJECT_ROOT,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError("El servidor API terminó al arrancar")
+            try:
+                if httpx.get(self.base_url + "/health", timeout=1).status_code < 500:
+                    return self
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        self.stop()
+        raise TimeoutError(f"El servidor API no arrancó en {self.base_url}")
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+
+    def __enter__(self) -> "ApiServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,123 @@
+"""
+CLI de los benchmarks
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --suite chat --suite files --quick
+    python -m benchmarks.run --baseline bench.json --threshold 0.15
+    python -m benchmarks.run --compare nuevo.json --baseline bench.json
+
+Con ``--baseline`` el proceso sale con código 1 si alguna métrica empeora
+más que ``--threshold``.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.harness import compare, environment, load, save
+from benchmarks.suites import QUICK, SUITES, BenchContext, BenchSizes
+
+
+def run_suites(
+    names: List[str],
+    sizes: Optional[BenchSizes] = None,
+    workdir: Optional[Path] = None,
+    mock_latency: str = "fixed:0.02",
+) -> Dict[str, Any]:
+    """Ejecuta las suites indicadas y devuelve el documento de resultados"""
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="chispart-bench-") as tmp:
+        ctx = BenchContext(
+            Path(workdir or tmp), sizes or BenchSizes(), mock_latency=mock_latency
+        )
+        try:
+            for name in names:
+                started = time.perf_counter()
+                print(f"• {name}...", file=sys.stderr, flush=True)
+                results[name] = SUITES[name](ctx)
+                print(
+                    f"  {time.perf_counter() - started:.1f}s",
+                    file=sys.stderr,
+                    flush=True,
+                )
+        finally:
+            ctx.close()
+    return {"environment": environment(), "results": results}
+
+
+def format_report(report: Dict[str, List[Any]], threshold: float) -> str:
+    lines = [f"Comparación con la línea base (umbral {threshold:.0%})"]
+    for title, key in (("Regresiones", "regressions"), ("Mejoras", "improvements")):
+        lines.append(f"{title}: {len(report[key])}")
+        for entry in report[key]:
+            lines.append(
+                f"  {entry['metric']}: {entry['baseline']:.4g} -> "
+                f"{entry['current']:.4g} ({entry['change']:+.1%})"
+            )
+    lines.append(f"Sin cambios: {len(report['unchanged'])}")
+    if report["missing"]:
+        lines.append(f"Ausentes: {len(report['missing'])}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del servidor API y la CLI")
+    parser.add_argument(
+        "--suite",
+        action="append",
+        choices=sorted(SUITES),
+        help="Suite a ejecutar (repetible; por defecto todas)",
+    )
+    parser.add_argument("--output", "-o", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="Resultados guardados para comparar")
+    parser.add_argument(
+        "--compare",
+        metavar="RESULTS",
+        help="Comparar un archivo de resultados con --baseline sin ejecutar nada",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Empeoramiento relativo tolerado (0.10 = 10%%)",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Cargas reducidas (humo/CI)"
+    )
+    parser.add_argument(
+        "--mock-latency",
+        default="fixed:0.02",
+        help="Perfil de latencia del upstream simulado (p.ej. lognormal:0.2:0.1)",
+    )
+    parser.add_argument("--workdir", help="Directorio para los árboles generados")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        if not args.baseline:
+            parser.error("--compare requiere --baseline")
+        current = load(args.compare)
+    else:
+        current = run_suites(
+            args.suite or list(SUITES),
+            QUICK if args.quick else BenchSizes(),
+            Path(args.workdir) if args.workdir else None,
+            args.mock_latency,
+        )
+        if args.output:
+            save(current, args.output)
+        else:
+            print(json.dumps(current, indent=2, sort_keys=True))
+
+    if args.baseline:
+        report = compare(current, load(args.baseline), args.threshold)
+        print(format_report(report, args.threshold), file=sys.stderr)
+        return 1 if report["regressions"] else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+Suites de benchmarks
+Cada suite recibe un ``BenchContext`` y devuelve un dict de métricas
+(segundos salvo ``*_rps``). Los tamaños por defecto son los de una
+ejecución completa; ``QUICK`` los reduce para CI y pruebas.
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.harness import PROJECT_ROOT, ApiServer, summarize, timed
+
+
+@dataclass
+class BenchSizes:
+    """Carga de cada suite"""
+
+    chat_concurrency: Tuple[int, ...] = (1, 4, 16, 64)
+    chat_requests: int = 400
+    files_entries: Tuple[int, ...] = (10_000, 100_000)
+    files_repeat: int = 5
+    patch_files: int = 100
+    patch_lines: int = 2_000
+    patch_every: int = 10
+    patch_repeat: int = 4
+    snapshot_repeat: int = 3
+    cli_repeat: int = 5
+
+
+QUICK = BenchSizes(
+    chat_concurrency=(1, 4),
+    chat_requests=20,
+    files_entries=(200,),
+    files_repeat=2,
+    patch_files=3,
+    patch_lines=100,
+    patch_repeat=2,
+    snapshot_repeat=1,
+    cli_repeat=1,
+)
+
+
+@dataclass
+class BenchContext:
+    """Estado compartido: servidor API, servidor simulado y directorio de trabajo"""
+
+    workdir: Path
+    sizes: BenchSizes = field(default_factory=BenchSizes)
+    mock_latency: str = "fixed:0.02"
+    _mock: Any = None
+    _api: Optional[ApiServer] = None
+
+    def api(self) -> ApiServer:
+        """Arranca (una vez) el servidor simulado y ``main:app``"""
+        if self._api is None:
+            from blackbox_hybrid_tool.utils.mock_server import (
+                LatencyProfile,
+                MockBlackboxServer,
+                MockConfig,
+            )
+
+            config = MockConfig(latency=LatencyProfile.parse(self.mock_latency))
+            self._mock = MockBlackboxServer(config).spawn()
+            self._api = ApiServer(self._mock.base_url, self.workdir).start()
+        return self._api
+
+    def close(self) -> None:
+        if self._api is not None:
+            self._api.stop()
+            self._api = None
+        if self._mock is not None:
+            self._mock.stop()
+            self._mock = None
+
+
+async def _drive(
+    url: str, payloads: List[Dict[str, Any]], concurrency: int
+) -> Tuple[List[float], int, float]:
+    """Envía ``payloads`` con ``concurrency`` workers; (latencias, errores, total)"""
+    pending = list(reversed(payloads))
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+
+        async def worker() -> None:
+            nonlocal errors
+            while pending:
+                payload = pending.pop()
+                started = time.perf_counter()
+                try:
+                    r = await client.post(url, json=payload)
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - started
+
+
+def bench_chat(ctx: BenchContext) -> Dict[str, Any]:
+    """Rendimiento y p50/p95/p99 de POST /chat a concurrencia creciente"""
+    url = ctx.api().base_url + "/chat"
+    asyncio.run(_drive(url, [{"prompt": "calentamiento"}] * 4, 2))
+    results: Dict[str, Any] = {}
+    for concurrency in ctx.sizes.chat_concurrency:
+        # Prompts únicos: sin aciertos de caché ni solicitudes coalescidas
+        payloads = [
+            {"prompt": f"bench c{concurrency} #{i}"}
+            for i in range(ctx.sizes.chat_requests)
+        ]
+        latencies, errors, elapsed = asyncio.run(_drive(url, payloads, concurrency))
+        results[f"c{concurrency}"] = {
+            **summarize(latencies),
+            "errors": errors,
+            "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        }
+    return results
+
+
+def _make_flat_tree(root: Path, entries: int) -> None:
+    # Una entrada de cada 50 es un directorio, como en un repo real
+    if root.is_dir() and sum(1 for _ in root.iterdir()) == entries:
+        return
+    root.mkdir(parents=True, exist_ok=True)
+    for i in range(entries):
+        path = root / f"entry_{i:06d}"
+        if i % 50 == 0:
+            path.mkdir(exist_ok=True)
+        else:
+            path.write_bytes(b"x" * (i % 64))
+
+
+def bench_files(ctx: BenchContext) -> Dict[str, Any]:
+    """GET /files sobre directorios de 10k y 100k entradas"""
+    api = ctx.api()
+    results: Dict[str, Any] = {}
+    with httpx.Client(base_url=api.base_url, timeout=120.0) as client:
+        for entries in ctx.sizes.files_entries:
+            name = f"tree_{entries}"
+            _make_flat_tree(api.workdir / name, entries)
+            listed: List[int] = []
+
+            def list_tree() -> None:
+                # Recorre todas las páginas para comparar con el listado completo
+                params = {"path": name, "limit": 10000}
+                count = 0
+                while True:
+                    r = client.get("/files", params=params)
+                    r.raise_for_status()
+                    body = r.json()
+                    count += len(body["files"])
+                    if not body.get("next_cursor"):
+                        break
+                    params["cursor"] = body["next_cursor"]
+                listed.append(count)
+
+            results[name] = {
+                **timed(list_tree, ctx.sizes.files_repeat),
+                "entries": listed[-1],
+            }
+    return results
+
+
+def make_diff(files: int, lines: int, every: int, reverse: bool = False) -> str:
+    """Diff unificado que cambia una de cada ``every`` líneas de cada archivo"""
+    old, new = ("v2", "v1") if reverse else ("v1", "v2")
+    out: List[str] = []
+    for f in range(files):
+        name = f"src/module_{f:04d}.py"
+        # Como ``git diff``: la cabecera ``diff`` cierra los hunks del anterior
+        out += [f"diff --git a/{name} b/{name}", f"--- a/{name}", f"+++ b/{name}"]
+        for line in range(1, lines + 1, every):
+            out.append(f"@@ -{line},1 +{line},1 @@")
+            out.append(f"-value_{line} = '{old}'")
+            out.append(f"+value_{line} = '{new}'")
+    return "\n".join(out) + "\n"
+
+
+def _make_patch_tree(root: Path, files: int, lines: int) -> None:
+    src = root / "src"
+    src.mkdir(parents=True, exist_ok=True)
+    for f in range(files):
+        body = "\n".join(f"value_{line} = 'v1'" for line in range(1, lines + 1))
+        (src / f"module_{f:04d}.py").write_text(body + "\n", encoding="utf-8")
+
+
+def bench_patch(ctx: BenchContext) -> Dict[str, Any]:
+    """POST /patch/apply con un diff grande, alternando aplicar y revertir"""
+    api = ctx.api()
+    sizes = ctx.sizes
+    # La raíz viaja relativa a WRITE_ROOT (el directorio de trabajo del servidor)
+    root = api.workdir / "patch_tree"
+    _make_patch_tree(root, sizes.patch_files, sizes.patch_lines)
+    diffs = [
+        make_diff(sizes.patch_files, sizes.patch_lines, sizes.patch_every, reverse)
+        for reverse in (False, True)
+    ]
+    state = {"n": 0}
+
+    with httpx.Client(base_url=api.base_url, timeout=120.0) as client:
+
+        def apply() -> None:
+            diff = diffs[state["n"] % 2]
+            state["n"] += 1
+            r = client.post("/patch/apply", json={"patch": diff, "root": root.name})
+            r.raise_for_status()
+            if r.json()["result"]["errors"]:
+                raise RuntimeError(r.json()["result"]["errors"][0])
+
+        # Número par de aplicaciones: el árbol vuelve a su estado inicial
+        repeat = sizes.patch_repeat + sizes.patch_repeat % 2
+        stats = timed(apply, repeat)
+    return {
+        "large_diff": {
+            **stats,
+            "files": sizes.patch_files,
+            "hunks": diffs[0].count("\n@@ "),
+            "bytes": len(diffs[0].encode("utf-8")),
+        }
+    }
+
+
+def bench_snapshot(ctx: BenchContext) -> Dict[str, Any]:
+    """``make_snapshot`` del propio repositorio (tar.gz en memoria)"""
+    from blackbox_hybrid_tool.utils.self_repo import make_snapshot
+
+    meta: Dict[str, Any] = {}
+
+    def snapshot() -> None:
+        meta.update(make_snapshot(PROJECT_ROOT)["meta"])
+
+    stats = timed(snapshot, ctx.sizes.snapshot_repeat)
+    return {"repo": {**stats, "files": meta["file_count"], "bytes": meta["size"]}}
+
+
+# "--help" queda fuera mientras el parser falle al construirse (subparser
+# gh-status duplicado): se mediría el tiempo de un error
+CLI_COMMANDS = {
+    "import": [sys.executable, "-c", "import blackbox_hybrid_tool.cli.main"],
+}
+
+
+def bench_cli(ctx: BenchContext) -> Dict[str, Any]:
+    """Arranque en frío de la CLI en un intérprete nuevo
+
+    Un código de salida distinto de cero hace fallar la suite.
+    """
+    results: Dict[str, Any] = {}
+    for name, command in CLI_COMMANDS.items():
+
+        def run() -> None:
+            proc = subprocess.run(
+                command,
+                cwd=PROJECT_ROOT,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            if proc.returncode:
+                raise RuntimeError(
+                    f"{' '.join(command[1:])} salió con {proc.returncode}: "
+                    f"{proc.stderr.strip()[-500:]}"
+                )
+
+        results[name] = timed(run, ctx.sizes.cli_repeat)
+    return results
+
+
+SUITES: Dict[str, Callable[[BenchContext], Dict[str, Any]]] = {
+    "chat": bench_chat,
+    "files": bench_files,
+    "patch": bench_patch,
+    "snapshot": bench_snapshot,
+    "cli": bench_cli,
+}
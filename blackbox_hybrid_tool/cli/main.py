@@ -11,13 +11,18 @@ import json
 from pathlib import Path
 from typing import Optional
 
-# Añadir el directorio raíz al path para importar módulos
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from core.ai_client import AIOrchestrator
-from core.test_generator import TestGeneratorClass, CoverageAnalyzer
-from utils.patcher import apply_unified_diff, parse_unified_diff
-from utils.self_repo import (
+# Añadir la raíz del proyecto al path: el paquete se importa entero (sus
+# módulos usan imports relativos) aunque se ejecute este archivo directamente
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.core.router import ModelRouter
+from blackbox_hybrid_tool.core.test_generator import (
+    TestGeneratorClass,
+    CoverageAnalyzer,
+)
+from blackbox_hybrid_tool.utils.patcher import apply_unified_diff, parse_unified_diff
+from blackbox_hybrid_tool.utils.self_repo import (
     embed_snapshot,
     extract_snapshot,
     analyze_dependencies,
@@ -26,9 +31,11 @@ from utils.self_repo import (
     replace_tree,
     make_snapshot,
 )
-from utils.github_client import GitHubClient
-from utils.web import WebFetcher, WebSearch
-from utils.ssh import run_ssh_command, sync_files, deploy_remote
+from blackbox_hybrid_tool.utils.github_client import GitHubClient
+from blackbox_hybrid_tool.utils.web import WebFetcher, WebSearch
+from blackbox_hybrid_tool.utils.ssh import run_ssh_command, sync_files, deploy_remote
+from blackbox_hybrid_tool.utils.session_log import FSYNC_POLICIES, SessionLog
+from blackbox_hybrid_tool.exceptions import BlackboxAPIError
 
 # Helper function for JSON serialization
 def json_dumps(obj):
@@ -114,6 +121,16 @@ Ejemplos de uso:
         ai_parser = subparsers.add_parser("ai-query", help="Realiza consultas a la IA")
         ai_parser.add_argument("query", help="Consulta para la IA")
         ai_parser.add_argument("-m", "--model", help="Modelo AI a usar (opcional)")
+        ai_parser.add_argument(
+            "--temperature",
+            type=float,
+            help="Temperatura (por defecto la del modelo; 0 con --cache)",
+        )
+        ai_parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Reutilizar respuestas idénticas previas (temperatura baja)",
+        )
 
         # Comando para desarrollo asistido por IA
         aidx = subparsers.add_parser(
@@ -152,6 +169,11 @@ Ejemplos de uso:
         )
         aidx.add_argument("--max-tokens", type=int, default=2048)
         aidx.add_argument("--temperature", type=float, default=0.3)
+        aidx.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="No reutilizar parches generados previamente para la misma consulta",
+        )
 
         # Comando para chat interactivo (REPL)
         repl_parser = subparsers.add_parser(
@@ -170,6 +192,24 @@ Ejemplos de uso:
             "--transcript",
             help="Ruta de archivo para guardar un log de la sesión (texto)",
         )
+        repl_parser.add_argument(
+            "--resume-tail",
+            dest="resume_tail",
+            type=int,
+            help="Al reanudar una sesión, cargar solo los últimos N mensajes",
+        )
+        repl_parser.add_argument(
+            "--fsync",
+            choices=FSYNC_POLICIES,
+            default="turn",
+            help="Cuándo forzar a disco el log de sesión (por defecto: turn)",
+        )
+        repl_parser.add_argument(
+            "--no-stream",
+            dest="no_stream",
+            action="store_true",
+            help="Esperar la respuesta completa en lugar de mostrar tokens al llegar",
+        )
 
         # Comando para chat interactivo por categorías
         media_parser = subparsers.add_parser(
@@ -433,8 +473,19 @@ Ejemplos de uso:
         try:
             print(f"🤖 Consultando {args.model or 'modelo por defecto'}...")
 
+            cache = getattr(args, "cache", False)
+            temperature = getattr(args, "temperature", None)
+            if cache and temperature is None:
+                # La caché solo guarda respuestas de temperatura baja
+                # (cache.max_temperature); la del cliente por defecto es 0.7
+                temperature = 0.0
+            extra = {} if temperature is None else {"temperature": temperature}
             response = self.ai_orchestrator.generate_response(
-                args.query, model_type=args.model, debug=getattr(args, "debug", False)
+                args.query,
+                model_type=args.model,
+                debug=getattr(args, "debug", False),
+                cache=cache,
+                **extra,
             )
 
             print("\n📝 Respuesta:")
@@ -485,56 +536,18 @@ Ejemplos de uso:
         if default_model and default_model not in avail_list:
             avail_list.append(default_model)
 
-        # 4) Heurísticas por estrategia con preferencias ordenadas
-        prefs_map = {
-            "fast": [
-                "flash",
-                "mini",
-                "gpt-4o-mini",
-                "o3-mini",
-            ],
-            "reasoning": [
-                "claude-3.7",
-                "claude-3.5",
-                "claude",
-                "o3",
-                "o1",
-                "deepseek-r1",
-                "reasoning",
-            ],
-            "code": [
-                "o1",
-                "gpt-4o",
-                "gpt-4.1",
-                "mixtral",
-                "llama-3.1",
-                "qwen3",
-            ],
-            "auto": [],
-        }
-
         if strategy == "auto":
             # Prefiere el modelo por defecto configurado (ya optimizado por el orquestador)
             return default_model
 
-        prefs = prefs_map.get(strategy, [])
-        # Normaliza y puntúa candidatos según primera coincidencia en prefs
-        def score(model_id: str) -> tuple:
-            mid = model_id.lower()
-            for i, key in enumerate(prefs):
-                if key.lower() in mid:
-                    return (0, i)  # preferidos
-            # secundario: tokens clave genéricos
-            generic = ["flash", "mini", "pro", "latest"]
-            for j, k in enumerate(generic):
-                if k in mid:
-                    return (1, j)
-            # fallback: lo que sea
-            return (2, len(mid))
-
+        # 4) Router por latencia/coste con la política de la estrategia
         if avail_list:
-            best = sorted(avail_list, key=score)[0]
-            return best
+            router = getattr(self.ai_orchestrator, "router", None)
+            if not isinstance(router, ModelRouter):
+                router = ModelRouter.from_models_config(cfg)
+            chosen = router.choose(avail_list, strategy=strategy).model
+            if chosen:
+                return chosen
 
         # 5) Fallback final: None (que la orquestación use el modelo por defecto)
         return None
@@ -624,6 +637,7 @@ Ejemplos de uso:
                 max_tokens=args.max_tokens,
                 temperature=args.temperature,
                 debug=getattr(args, "debug", False),
+                cache=not getattr(args, "no_cache", False),
             )
 
             out_dir = Path(args.out_dir)
@@ -654,6 +668,7 @@ Ejemplos de uso:
     def run_repl(self, args):
         """Chat interactivo con contexto y cambio de modelo en vivo"""
         debug = getattr(args, "debug", False)
+        stream = not getattr(args, "no_stream", False)
         history = []  # lista de mensajes estilo chat.completions
         current_model = args.model  # identificador Blackbox opcional
         if not current_model:
@@ -666,57 +681,104 @@ Ejemplos de uso:
             except Exception:
                 current_model = None
 
-        # Persistencia de sesión
+        # Persistencia de sesión: JSONL de solo anexado (un registro por mensaje)
         session_name = args.session
+        resume_tail = getattr(args, "resume_tail", None)
+        fsync_policy = getattr(args, "fsync", None) or "turn"
         transcript_path = (
             Path(args.transcript).expanduser() if args.transcript else None
         )
+        transcript_file = None
         sessions_dir = Path.home() / ".blackbox_hybrid_tool" / "sessions"
         session_file = None
-        if session_name:
+        session_log = None
+
+        def open_session(name: str, prefer_saved_model: bool) -> None:
+            nonlocal session_file, session_log, history, current_model
             sessions_dir.mkdir(parents=True, exist_ok=True)
-            session_file = sessions_dir / f"{session_name}.json"
-            if session_file.exists():
+            session_file = sessions_dir / f"{name}.jsonl"
+            existed = (
+                session_file.exists() or session_file.with_suffix(".json").exists()
+            )
+            try:
+                session_log, state = SessionLog.open(
+                    session_file, tail=resume_tail, fsync=fsync_policy
+                )
+            except Exception as e:
+                print(f"⚠️  No se pudo cargar la sesión: {e}")
+                session_log = None
+                return
+            history = state.messages
+            if state.model and prefer_saved_model:
+                current_model = state.model
+            elif current_model != state.model:
+                session_log.set_model(current_model)
+            if existed:
+                partial = ""
+                if state.truncated:
+                    partial = f" (últimos {len(history)} mensajes)"
+                print(f"📂 Sesión cargada: {session_file}{partial}")
+            else:
+                print(f"🆕 Nueva sesión: {session_file}")
+
+        def record(message: dict) -> None:
+            # Historial en memoria + una línea en el log de sesión (O(1))
+            history.append(message)
+            if session_log:
                 try:
-                    import json
-
-                    data = json.loads(session_file.read_text(encoding="utf-8"))
-                    history = data.get("messages", [])
-                    # Si el archivo tiene modelo guardado y no se pasó por CLI, úsalo
-                    if not current_model and data.get("model"):
-                        current_model = data["model"]
-                    print(f"📂 Sesión cargada: {session_file}")
+                    session_log.append(message)
                 except Exception as e:
-                    print(f"⚠️  No se pudo cargar la sesión: {e}")
+                    print(f"⚠️  Error guardando sesión: {e}")
 
-        def save_session():
-            if not session_file:
+        def end_turn() -> None:
+            if not session_log:
                 return
             try:
-                import json, datetime
-
-                payload = {
-                    "model": current_model,
-                    "messages": history,
-                    "updated_at": datetime.datetime.utcnow().isoformat() + "Z",
-                }
-                session_file.write_text(
-                    json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8"
-                )
+                session_log.commit()
+                session_log.maybe_compact()
+            except Exception as e:
+                print(f"⚠️  Error guardando sesión: {e}")
+
+        def save_session(close: bool = False) -> None:
+            if not session_log:
+                return
+            try:
+                session_log.compact()
+                if close:
+                    session_log.close()
                 print(f"💾 Sesión guardada: {session_file}")
             except Exception as e:
                 print(f"⚠️  Error guardando sesión: {e}")
 
         def append_transcript(role: str, content: str):
+            nonlocal transcript_file
             if not transcript_path:
                 return
             try:
-                transcript_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(transcript_path, "a", encoding="utf-8") as f:
-                    f.write(f"{role}: {content}\n")
+                if transcript_file is None:
+                    transcript_path.parent.mkdir(parents=True, exist_ok=True)
+                    transcript_file = open(transcript_path, "a", encoding="utf-8")
+                transcript_file.write(f"{role}: {content}\n")
+                transcript_file.flush()
             except Exception as e:
                 print(f"⚠️  Error escribiendo transcript: {e}")
 
+        def close_transcript() -> None:
+            nonlocal transcript_file
+            if transcript_file is not None:
+                transcript_file.close()
+                transcript_file = None
+
+        def finish() -> int:
+            print("👋 Fin de la sesión.")
+            save_session(close=True)
+            close_transcript()
+            return 0
+
+        if session_name:
+            # El modelo guardado manda salvo que se pase --model
+            open_session(session_name, prefer_saved_model=not args.model)
+
         print("💬 REPL de Blackbox. Comandos: /model <id>, /reset, /exit, /help")
         print(
             "🛠️  Herramientas disponibles para el asistente: write-file, web-search, web-fetch, self-apply-patch"
@@ -731,9 +793,13 @@ Ejemplos de uso:
         if transcript_path:
             print(f"➡️  Transcript: {transcript_path}")
 
+        # Marca del prompt de herramientas: los TOOL_RESULT también son "system"
+        tool_prompt_marker = "Tienes acceso a herramientas."
+
         def tool_system_prompt() -> str:
             return (
-                "Tienes acceso a herramientas. Cuando necesites usarlas, responde únicamente con un objeto JSON sin texto adicional, "
+                tool_prompt_marker
+                + " Cuando necesites usarlas, responde únicamente con un objeto JSON sin texto adicional, "
                 'con la forma: {"tool": "<name>", "args": { ... }}. NO incluyas markdown ni explicaciones.\n'
                 "Herramientas:\n"
                 "- write-file: args={path:str, content:str, overwrite:bool?} -> crea/sobrescribe archivo.\n"
@@ -839,16 +905,48 @@ Ejemplos de uso:
                 ]
             )
 
-        # Inserta mensaje system inicial con descripción de herramientas
-        history.append({"role": "system", "content": tool_system_prompt()})
+        def context_messages():
+            # El historial completo se guarda; al modelo va solo lo que cabe
+            window = self.ai_orchestrator.fit_context(history, model=current_model)
+            if debug and window.dropped:
+                print(
+                    f"✂️  Contexto: {window.dropped} mensajes antiguos fuera "
+                    f"({window.original_tokens} -> {window.tokens}/{window.budget} tokens)"
+                )
+            return window.messages
+
+        def stream_reply(prompt: str) -> str:
+            # Imprime los tokens a medida que llegan y devuelve el texto completo
+            parts = []
+            print("AI> ", end="", flush=True)
+            for delta in self.ai_orchestrator.stream_response(
+                prompt=prompt,
+                model_type=current_model,
+                messages=context_messages(),
+                debug=debug,
+            ):
+                parts.append(delta)
+                print(delta, end="", flush=True)
+            print()
+            return "".join(parts)
+
+        def ensure_system_prompt() -> None:
+            # Mensaje system con las herramientas; se regenera, no se guarda
+            first = history[0] if history else {}
+            if not (
+                first.get("role") == "system"
+                and str(first.get("content", "")).startswith(tool_prompt_marker)
+            ):
+                history.insert(0, {"role": "system", "content": tool_system_prompt()})
+
+        ensure_system_prompt()
 
         while True:
             try:
                 user = input("You> ").strip()
             except (EOFError, KeyboardInterrupt):
-                print("\n👋 Fin de la sesión.")
-                save_session()
-                return 0
+                print()
+                return finish()
 
             if not user:
                 continue
@@ -857,11 +955,12 @@ Ejemplos de uso:
                 cmd, *rest = user[1:].split(maxsplit=1)
                 arg = rest[0] if rest else ""
                 if cmd in ("exit", "quit"):  # salir
-                    print("👋 Fin de la sesión.")
-                    save_session()
-                    return 0
+                    return finish()
                 elif cmd == "reset":
                     history.clear()
+                    if session_log:
+                        session_log.reset()
+                    ensure_system_prompt()
                     print("🔄 Contexto limpiado.")
                     continue
                 elif cmd == "model":
@@ -869,6 +968,8 @@ Ejemplos de uso:
                         print("Uso: /model <blackbox_identifier>")
                     else:
                         current_model = arg
+                        if session_log:
+                            session_log.set_model(current_model)
                         print(f"✅ Modelo actualizado: {current_model}")
                     continue
                 elif cmd == "save":
@@ -878,30 +979,18 @@ Ejemplos de uso:
                     if not arg:
                         print("Uso: /session <nombre>")
                         continue
-                    # Guardar sesión actual y cambiar
-                    save_session()
+                    # Cerrar la sesión actual y cambiar
+                    save_session(close=True)
                     session_name = arg
-                    sessions_dir.mkdir(parents=True, exist_ok=True)
-                    session_file = sessions_dir / f"{session_name}.json"
                     history = []
-                    if session_file.exists():
-                        try:
-                            import json
-
-                            data = json.loads(session_file.read_text(encoding="utf-8"))
-                            history = data.get("messages", [])
-                            if data.get("model"):
-                                current_model = data["model"]
-                            print(f"📂 Sesión cambiada y cargada: {session_file}")
-                        except Exception as e:
-                            print(f"⚠️  No se pudo cargar la sesión: {e}")
-                    else:
-                        print(f"🆕 Nueva sesión: {session_file}")
+                    open_session(session_name, prefer_saved_model=True)
+                    ensure_system_prompt()
                     continue
                 elif cmd == "transcript":
                     if not arg:
                         print("Uso: /transcript <ruta>")
                         continue
+                    close_transcript()
                     transcript_path = Path(arg).expanduser()
                     print(f"📝 Transcript activado en: {transcript_path}")
                     continue
@@ -927,7 +1016,7 @@ Ejemplos de uso:
                         print("🔧 Resultado:")
                         print(json_dumps(result))
                         # Inyectar al historial como evidencia
-                        history.append(
+                        record(
                             {
                                 "role": "system",
                                 "content": f"TOOL_RESULT {tname}: {json_dumps(result)}",
@@ -946,44 +1035,56 @@ Ejemplos de uso:
                     continue
 
             # Añadir mensaje del usuario al historial
-            history.append({"role": "user", "content": user})
+            record({"role": "user", "content": user})
             append_transcript("You", user)
 
             # Generar respuesta (usa historial y modelo actual si se definió)
             # Bucle de herramienta: permite que el asistente invoque herramientas antes de la respuesta final
             tool_steps = 0
             reply = None
-            while True:
-                reply = self.ai_orchestrator.generate_response(
-                    prompt=user,  # por compatibilidad
-                    model_type=current_model,
-                    messages=history,
-                    debug=debug,
-                )
-                tool_call = parse_tool_call(reply or "")
-                if tool_call and tool_steps < 5:
-                    result = exec_tool_call(tool_call)
-                    # Registrar rastro visible y en historial
-                    print(f"🔧 Tool {tool_call.get('tool')} -> {result.get('status')}")
-                    history.append({"role": "assistant", "content": reply})
-                    history.append(
-                        {
-                            "role": "system",
-                            "content": f"TOOL_RESULT {tool_call.get('tool')}: {json_dumps(result)}",
-                        }
-                    )
-                    tool_steps += 1
-                    continue
-                break
+            try:
+                while True:
+                    if stream:
+                        reply = stream_reply(user)
+                    else:
+                        reply = self.ai_orchestrator.generate_response(
+                            prompt=user,  # por compatibilidad
+                            model_type=current_model,
+                            messages=context_messages(),
+                            debug=debug,
+                        )
+                    tool_call = parse_tool_call(reply or "")
+                    if tool_call and tool_steps < 5:
+                        result = exec_tool_call(tool_call)
+                        # Registrar rastro visible y en historial
+                        print(
+                            f"🔧 Tool {tool_call.get('tool')} -> {result.get('status')}"
+                        )
+                        record({"role": "assistant", "content": reply})
+                        record(
+                            {
+                                "role": "system",
+                                "content": f"TOOL_RESULT {tool_call.get('tool')}: {json_dumps(result)}",
+                            }
+                        )
+                        tool_steps += 1
+                        continue
+                    break
+            except BlackboxAPIError as e:
+                # El error no forma parte de la conversación: no va al historial
+                print(f"\n❌ {e}")
+                append_transcript("AI", f"[error] {e}")
+                continue
 
-            # Añadir respuesta de asistente al historial si no es error crudo
-            if reply and not reply.startswith("Error en la API de Blackbox:"):
-                history.append({"role": "assistant", "content": reply})
+            # Añadir respuesta de asistente al historial
+            if reply:
+                record({"role": "assistant", "content": reply})
 
-            print("AI>", reply or "<respuesta vacía>")
+            if not stream:
+                print("AI>", reply or "<respuesta vacía>")
             append_transcript("AI", reply or "")
-            # Guardado oportunista tras cada turno si hay sesión
-            save_session()
+            # Fin de turno: fsync según política y compactación amortizada
+            end_turn()
         return 0
 
     def run_self_snapshot(self, args):
@@ -1045,7 +1146,7 @@ Ejemplos de uso:
             if args.use_embedded:
                 extract_snapshot(workdir)
             else:
-                from utils.self_repo import make_snapshot
+                from blackbox_hybrid_tool.utils.self_repo import make_snapshot
 
                 snap = make_snapshot(Path(".").resolve())
                 import tarfile, io
@@ -3,16 +3,49 @@ Pydantic-based configuration management for Chispart AI - Blackbox Hybrid Tool.
 """
 
 from pydantic_settings import BaseSettings
-from pydantic import Field
-from typing import Optional
+from pydantic import AliasChoices, Field
+from typing import Any, Optional
+
+
+def env_field(default: Any, env: str, name: str) -> Any:
+    """Campo leído de ``env`` (o del nombre del campo, como hasta ahora).
+
+    pydantic-settings v2 ignora ``Field(env=...)``; el alias es lo que
+    hace efectivas las variables ``CHISPART_*``.
+    """
+    return Field(default, validation_alias=AliasChoices(env, name))
 
 
 class AppSettings(BaseSettings):
-    environment: str = Field("development", env="CHISPART_ENV")
-    jwt_secret_key: str = Field("supersecretkey", env="CHISPART_JWT_SECRET")
-    rate_limit_requests: int = Field(100, env="CHISPART_RATE_LIMIT")
-    redis_url: Optional[str] = Field(None, env="CHISPART_REDIS_URL")
-    models_config_path: str = Field("config/models.json", env="CHISPART_MODELS_CONFIG")
+    environment: str = env_field("development", "CHISPART_ENV", "environment")
+    jwt_secret_key: str = env_field(
+        "supersecretkey", "CHISPART_JWT_SECRET", "jwt_secret_key"
+    )
+    rate_limit_requests: int = env_field(
+        100, "CHISPART_RATE_LIMIT", "rate_limit_requests"
+    )
+    # Límite entrante del servidor, independiente del rpm saliente de arriba
+    inbound_rate_limit_requests: int = env_field(
+        100, "CHISPART_INBOUND_RATE_LIMIT", "inbound_rate_limit_requests"
+    )
+    rate_limit_window: float = env_field(
+        60.0, "CHISPART_RATE_LIMIT_WINDOW", "rate_limit_window"
+    )
+    rate_limit_concurrency: int = env_field(
+        10, "CHISPART_RATE_LIMIT_CONCURRENCY", "rate_limit_concurrency"
+    )
+    redis_url: Optional[str] = env_field(None, "CHISPART_REDIS_URL", "redis_url")
+    models_config_path: str = env_field(
+        "config/models.json", "CHISPART_MODELS_CONFIG", "models_config_path"
+    )
+    trace_enabled: bool = env_field(True, "CHISPART_TRACE", "trace_enabled")
+    trace_sample_rate: float = env_field(
+        0.0, "CHISPART_TRACE_SAMPLE_RATE", "trace_sample_rate"
+    )
+    trace_exporter: str = env_field("log", "CHISPART_TRACE_EXPORTER", "trace_exporter")
+    trace_file: str = env_field(
+        "logs/traces.otlp.jsonl", "CHISPART_TRACE_FILE", "trace_file"
+    )
 
     class Config:
         env_file = ".env"
@@ -5,13 +5,95 @@ con selección dinámica del modelo (por ejemplo, cambiar entre
 "blackboxai/anthropic/claude-3.7-sonnet" y "blackboxai/openai/o1").
 """
 
+import asyncio
+import hashlib
 import json
 import csv
+import logging
 import os
+import threading
+import time
+import httpx
 import requests
-from typing import Dict, Any, Optional, Union
+from contextlib import AsyncExitStack
+from typing import (
+    Dict,
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 from abc import ABC, abstractmethod
 
+from ..exceptions import (
+    BlackboxAPIError,
+    BlackboxCircuitOpenError,
+    BlackboxRateLimitError,
+    BlackboxTimeoutError,
+)
+from ..utils.aio import to_thread
+from ..utils.metrics import observe_upstream, record_usage
+from ..utils.tracing import CLIENT, inject, tracer
+from .batch import (
+    BatchInput,
+    BatchResult,
+    ProgressCallback,
+    Routed,
+    aiter_batch,
+    run_batch,
+)
+from .circuit_breaker import OPEN, BreakerConfig, BreakerRegistry
+from .context import ContextConfig, ContextManager, ContextWindow
+from .hedging import HedgeConfig, Hedger
+from .http_pool import ConnectionPool, PoolConfig
+from .rate_limit import (
+    RateLimitConfig,
+    RateLimiter,
+    default_requests_per_minute,
+    estimate_tokens,
+)
+from .response_cache import CacheConfig, ResponseCache, cache_key
+from .router import (
+    MODEL_PREFERENCES,
+    ModelRouter,
+    heuristic_rank,
+    profiles_from_config,
+)
+from .singleflight import SingleFlight
+from .retry import RetryBudget, RetryPolicy, RetryState, RetryStats, parse_retry_after
+from .streaming import aiter_sse_deltas, iter_sse_deltas
+
+logger = logging.getLogger(__name__)
+
+# Valores de model_type que delegan la elección del modelo en el router
+ROUTING_STRATEGIES = ("auto", "fast", "reasoning", "code")
+
+
+def model_section(
+    model_config: Dict[str, Any], model_name: Optional[str], section: str
+) -> Dict[str, Any]:
+    """Sección de configuración de Blackbox con overrides por modelo
+
+    ``models.blackbox.<section>`` aporta los valores por defecto y
+    ``models.blackbox.model_overrides.<modelo>.<section>`` los ajusta.
+    """
+    merged = dict(model_config.get(section) or {})
+    overrides = model_config.get("model_overrides") or {}
+    merged.update((overrides.get(model_name) or {}).get(section) or {})
+    return merged
+
+
+def response_text(result: Union[str, Dict[str, Any], None]) -> str:
+    """Texto de una respuesta de ``generate_response`` (str o dict)"""
+    if isinstance(result, dict):
+        return str(result.get("content") or "")
+    return "" if result is None else str(result)
+
 
 class AIClient(ABC):
     """Clase base abstracta para clientes AI"""
@@ -25,20 +107,111 @@ class AIClient(ABC):
         """Genera respuesta del modelo AI"""
         pass
 
+    async def agenerate_response(
+        self, prompt: str, **kwargs
+    ) -> Union[str, Dict[str, Any]]:
+        """Genera respuesta sin bloquear el event loop
+
+        Por defecto delega la versión síncrona a un hilo; los clientes con
+        transporte asíncrono nativo la sobreescriben.
+        """
+        return await to_thread(self.generate_response, prompt, **kwargs)
+
+    def stream_response(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Genera la respuesta en fragmentos de texto
+
+        Por defecto entrega la respuesta completa como un único fragmento.
+        """
+        text = response_text(self.generate_response(prompt, **kwargs))
+        if text:
+            yield text
+
+    async def astream_response(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Versión asíncrona de :meth:`stream_response`"""
+        text = response_text(await self.agenerate_response(prompt, **kwargs))
+        if text:
+            yield text
+
+    def request_payload(self, prompt: str, **kwargs) -> Optional[Dict[str, Any]]:
+        """Payload que se enviaría al proveedor; ``None`` si no es cacheable"""
+        return None
+
+    def close(self) -> None:
+        """Libera recursos del cliente (conexiones, sesiones)"""
+        pass
+
+    async def aclose(self) -> None:
+        """Versión asíncrona de :meth:`close`"""
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
 
 class BlackboxClient(AIClient):
     """Cliente específico para Blackbox API"""
 
-    def __init__(self, api_key: str, model_config: Dict[str, Any]):
+    def __init__(
+        self,
+        api_key: str,
+        model_config: Dict[str, Any],
+        pool: Optional[ConnectionPool] = None,
+    ):
         super().__init__(api_key, model_config)
         # Permitir sobreescribir el endpoint vía configuración
         self.base_url = model_config.get(
             "base_url", "https://api.blackbox.ai/chat/completions"
         )
+        # Pool compartido (p.ej. el del orquestador) o uno propio
+        self._owns_pool = pool is None
+        self.pool = pool or ConnectionPool(
+            PoolConfig.from_dict(model_config.get("pool"))
+        )
+        self.retry_budget = RetryBudget.from_dict(
+            (model_config.get("retry") or {}).get("budget")
+        )
+        self.retry_stats = RetryStats()
+        self._retry_policies: Dict[str, RetryPolicy] = {}
+        # Límites por API key (rate_limit.per_key) y por modelo (rate_limit)
+        key_limits = RateLimitConfig.from_dict(
+            (model_config.get("rate_limit") or {}).get("per_key")
+        )
+        if key_limits.requests_per_minute is None:
+            key_limits.requests_per_minute = default_requests_per_minute()
+        self.limiter = RateLimiter(
+            key_limits,
+            lambda model: RateLimitConfig.from_dict(
+                self.model_settings(model, "rate_limit")
+            ),
+            key_id=hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8],
+        )
 
-    def generate_response(self, prompt: str, **kwargs) -> Union[str, Dict[str, Any]]:
-        """Genera respuesta usando Blackbox API"""
-        debug = bool(kwargs.get("debug", False))
+    def close(self) -> None:
+        """Cierra el pool sólo si este cliente es su dueño"""
+        if self._owns_pool:
+            self.pool.close()
+
+    async def aclose(self) -> None:
+        if self._owns_pool:
+            await self.pool.aclose()
+
+    def model_settings(self, model_name: str, section: str) -> Dict[str, Any]:
+        """Sección de configuración con overrides por modelo (ver model_section)"""
+        return model_section(self.model_config, model_name, section)
+
+    def retry_policy(self, model_name: str) -> RetryPolicy:
+        """Política de reintentos efectiva para ``model_name``"""
+        policy = self._retry_policies.get(model_name)
+        if policy is None:
+            policy = RetryPolicy.from_dict(self.model_settings(model_name, "retry"))
+            self._retry_policies[model_name] = policy
+        return policy
+
+    def _build_request(self, prompt: str, kwargs: Dict[str, Any]):
+        """Construye headers y payload de chat/completions"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "x-api-key": self.api_key,
@@ -74,57 +247,345 @@ class BlackboxClient(AIClient):
         if tool_choice:
             data["tool_choice"] = tool_choice
 
+        return headers, data
+
+    def request_payload(self, prompt: str, **kwargs) -> Optional[Dict[str, Any]]:
+        """Payload de chat/completions tal como se enviaría (clave de caché)"""
+        return self._build_request(prompt, kwargs)[1]
+
+    def _debug_request(self, headers: Dict[str, str], data: Dict[str, Any]) -> None:
+        def _mask(val: Optional[str]) -> str:
+            if not val:
+                return ""
+            s = str(val)
+            return ("*" * max(0, len(s) - 4)) + s[-4:]
+
+        dbg_headers = dict(headers)
+        if "Authorization" in dbg_headers:
+            dbg_headers["Authorization"] = "Bearer " + _mask(self.api_key)
+        if "x-api-key" in dbg_headers:
+            dbg_headers["x-api-key"] = _mask(self.api_key)
+
+        print("[DEBUG] Blackbox POST:", self.base_url)
+        print("[DEBUG] Headers:", json.dumps(dbg_headers, ensure_ascii=False))
+        print("[DEBUG] Payload:", json.dumps(data, ensure_ascii=False))
+
+    @staticmethod
+    def _debug_response(response: Any, result: Any) -> None:
         try:
-            if debug:
-
-                def _mask(val: Optional[str]) -> str:
-                    if not val:
-                        return ""
-                    s = str(val)
-                    return ("*" * max(0, len(s) - 4)) + s[-4:]
-
-                dbg_headers = dict(headers)
-                if "Authorization" in dbg_headers:
-                    dbg_headers["Authorization"] = "Bearer " + _mask(self.api_key)
-                if "x-api-key" in dbg_headers:
-                    dbg_headers["x-api-key"] = _mask(self.api_key)
-
-                print("[DEBUG] Blackbox POST:", self.base_url)
-                print("[DEBUG] Headers:", json.dumps(dbg_headers, ensure_ascii=False))
-                print("[DEBUG] Payload:", json.dumps(data, ensure_ascii=False))
-
-            response = requests.post(self.base_url, headers=headers, json=data)
-            response.raise_for_status()
-
-            result = response.json()
-            if debug:
-                try:
-                    print("[DEBUG] Status:", response.status_code)
-                    print("[DEBUG] Response:", json.dumps(result, ensure_ascii=False))
-                except Exception:
-                    print("[DEBUG] Raw Response:", response.text)
-            # Extraer la respuesta completa del mensaje
-            message = result.get("choices", [{}])[0].get("message", {})
-
-            # Si hay tool calls, devolverlos junto con el contenido
-            if "tool_calls" in message:
-                return {
-                    "content": message.get("content", ""),
-                    "tool_calls": message["tool_calls"],
-                }
-
-            # Respuesta normal sin tool calls
-            return message.get("content", "")
-
-        except requests.RequestException as e:
-            # Incluir detalles de respuesta si están disponibles para facilitar el diagnóstico
+            print("[DEBUG] Status:", response.status_code)
+            print("[DEBUG] Response:", json.dumps(result, ensure_ascii=False))
+        except Exception:
+            print("[DEBUG] Raw Response:", response.text)
+
+    @staticmethod
+    def _parse_result(result: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+        # Extraer la respuesta completa del mensaje
+        message = result.get("choices", [{}])[0].get("message", {})
+
+        # Si hay tool calls, devolverlos junto con el contenido
+        if "tool_calls" in message:
+            return {
+                "content": message.get("content", ""),
+                "tool_calls": message["tool_calls"],
+            }
+
+        # Respuesta normal sin tool calls
+        return message.get("content", "")
+
+    @staticmethod
+    def _status_error(model_name: str, status: int, detail: str) -> BlackboxAPIError:
+        return BlackboxAPIError(
+            f"Error en la API de Blackbox: HTTP {status} ({model_name})",
+            status_code=status,
+            detail=detail,
+            model=model_name,
+        )
+
+    @staticmethod
+    def _classify_requests_error(
+        model_name: str, exc: requests.RequestException, policy: RetryPolicy
+    ):
+        """Convierte una excepción de requests en (error tipado, reintentable)"""
+        message = f"Error en la API de Blackbox: {exc}"
+        if isinstance(exc, requests.ConnectTimeout):
+            return BlackboxTimeoutError(message, model=model_name), True
+        if isinstance(exc, requests.ConnectionError):
+            # La solicitud no llegó a procesarse: seguro reintentar
+            return BlackboxAPIError(message, model=model_name), True
+        if isinstance(exc, requests.Timeout):
+            return BlackboxTimeoutError(message, model=model_name), (
+                policy.retry_read_timeouts
+            )
+        detail = ""
+        response = getattr(exc, "response", None)
+        if response is not None:
+            detail = getattr(response, "text", "") or ""
+        return BlackboxAPIError(message, detail=detail, model=model_name), False
+
+    @staticmethod
+    def _classify_httpx_error(
+        model_name: str, exc: httpx.HTTPError, policy: RetryPolicy
+    ):
+        """Convierte una excepción de httpx en (error tipado, reintentable)"""
+        message = f"Error en la API de Blackbox: {exc!r}"
+        if isinstance(exc, (httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return BlackboxTimeoutError(message, model=model_name), True
+        if isinstance(exc, httpx.ConnectError):
+            return BlackboxAPIError(message, model=model_name), True
+        if isinstance(exc, httpx.TimeoutException):
+            return BlackboxTimeoutError(message, model=model_name), (
+                policy.retry_read_timeouts
+            )
+        return BlackboxAPIError(message, model=model_name), False
+
+    def _new_retry_state(self, model_name: str) -> RetryState:
+        return RetryState(
+            self.retry_policy(model_name), self.retry_budget, self.retry_stats
+        )
+
+    @staticmethod
+    def _attempt_done(
+        model_name: str,
+        attempt: int,
+        started: float,
+        started_ns: int,
+        error: Optional[BlackboxAPIError] = None,
+    ) -> None:
+        """Métricas y span de un intento HTTP contra el upstream"""
+        observe_upstream(model_name, time.perf_counter() - started, error)
+        tracer.record(
+            "upstream.attempt",
+            started_ns,
+            time.time_ns(),
+            model=model_name,
+            attempt=attempt,
+            outcome=type(error).__name__ if error else "ok",
+        )
+
+    def _post(self, headers, data, debug: bool, stream: bool = False):
+        """POST síncrono con reintentos; devuelve la respuesta 2xx/3xx"""
+        model_name = data["model"]
+        state = self._new_retry_state(model_name)
+        policy = state.policy
+        while True:
+            state.start()
+            retry_after = None
+            started, started_ns = time.perf_counter(), time.time_ns()
             try:
-                detail = response.text  # type: ignore[name-defined]
-            except Exception:
-                detail = ""
-            if debug and detail:
-                print("[DEBUG] Error Detail:", detail)
-            return f"Error en la API de Blackbox: {str(e)}{(' | Detalle: ' + detail) if detail else ''}"
+                response = self.pool.post(
+                    self.base_url,
+                    headers=headers,
+                    json=data,
+                    timeout=policy.timeout,
+                    stream=stream,
+                )
+                response.raise_for_status()
+            except requests.HTTPError as e:
+                failed = e.response if e.response is not None else response
+                status = failed.status_code
+                detail = failed.text
+                failed.close()
+                if debug and detail:
+                    print("[DEBUG] Error Detail:", detail)
+                error = self._status_error(model_name, status, detail)
+                error.__cause__ = e
+                retryable = policy.is_retryable_status(status)
+                retry_after = parse_retry_after(failed.headers.get("Retry-After"))
+            except requests.RequestException as e:
+                error, retryable = self._classify_requests_error(model_name, e, policy)
+                error.__cause__ = e
+            else:
+                self._attempt_done(model_name, state.attempt, started, started_ns)
+                state.success(getattr(response, "status_code", None))
+                return response
+
+            self._attempt_done(model_name, state.attempt, started, started_ns, error)
+            delay = state.failure(error, retryable, retry_after)
+            if delay is None:
+                raise error
+            logger.warning(
+                f"Reintentando {model_name} (intento {state.attempt}) "
+                f"en {delay:.2f}s: {error}"
+            )
+            time.sleep(delay)
+
+    async def _apost_attempts(self, headers, data, debug: bool, send):
+        """Bucle de reintentos asíncrono; ``send`` abre la respuesta"""
+        model_name = data["model"]
+        state = self._new_retry_state(model_name)
+        policy = state.policy
+        timeout = httpx.Timeout(policy.read_timeout, connect=policy.connect_timeout)
+        while True:
+            state.start()
+            retry_after = None
+            started, started_ns = time.perf_counter(), time.time_ns()
+            try:
+                response = await send(timeout)
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                failed = e.response
+                detail = (await failed.aread()).decode("utf-8", "replace")
+                await failed.aclose()
+                if debug and detail:
+                    print("[DEBUG] Error Detail:", detail)
+                error = self._status_error(model_name, failed.status_code, detail)
+                error.__cause__ = e
+                retryable = policy.is_retryable_status(failed.status_code)
+                retry_after = parse_retry_after(failed.headers.get("Retry-After"))
+            except httpx.HTTPError as e:
+                error, retryable = self._classify_httpx_error(model_name, e, policy)
+                error.__cause__ = e
+            else:
+                self._attempt_done(model_name, state.attempt, started, started_ns)
+                state.success(response.status_code)
+                return response
+
+            self._attempt_done(model_name, state.attempt, started, started_ns, error)
+            delay = state.failure(error, retryable, retry_after)
+            if delay is None:
+                raise error
+            logger.warning(
+                f"Reintentando {model_name} (intento {state.attempt}) "
+                f"en {delay:.2f}s: {error}"
+            )
+            await asyncio.sleep(delay)
+
+    def generate_response(self, prompt: str, **kwargs) -> Union[str, Dict[str, Any]]:
+        """Genera respuesta usando Blackbox API
+
+        Lanza :class:`BlackboxAPIError` si la llamada falla tras los reintentos.
+        """
+        debug = bool(kwargs.get("debug", False))
+        headers, data = self._build_request(prompt, kwargs)
+        if debug:
+            self._debug_request(headers, data)
+
+        with tracer.span("blackbox.completion", CLIENT, model=data["model"]):
+            inject(headers)
+            queued = time.time_ns()
+            with self.limiter.acquire(data["model"], estimate_tokens(data)):
+                tracer.record("ratelimit.wait", queued, time.time_ns())
+                response = self._post(headers, data, debug)
+            try:
+                result = response.json()
+            except ValueError as e:
+                raise BlackboxAPIError(
+                    f"Error en la API de Blackbox: respuesta no es JSON ({e})",
+                    status_code=response.status_code,
+                    detail=response.text[:500],
+                    model=data["model"],
+                ) from e
+        if debug:
+            self._debug_response(response, result)
+        record_usage(data["model"], result.get("usage"))
+        return self._parse_result(result)
+
+    async def agenerate_response(
+        self, prompt: str, **kwargs
+    ) -> Union[str, Dict[str, Any]]:
+        """Versión asíncrona de :meth:`generate_response` sobre httpx"""
+        debug = bool(kwargs.get("debug", False))
+        headers, data = self._build_request(prompt, kwargs)
+        if debug:
+            self._debug_request(headers, data)
+
+        async def send(timeout):
+            return await self.pool.apost(
+                self.base_url, headers=headers, json=data, timeout=timeout
+            )
+
+        with tracer.span("blackbox.completion", CLIENT, model=data["model"]):
+            inject(headers)
+            queued = time.time_ns()
+            async with self.limiter.aacquire(data["model"], estimate_tokens(data)):
+                tracer.record("ratelimit.wait", queued, time.time_ns())
+                response = await self._apost_attempts(headers, data, debug, send)
+            try:
+                result = response.json()
+            except ValueError as e:
+                raise BlackboxAPIError(
+                    f"Error en la API de Blackbox: respuesta no es JSON ({e})",
+                    status_code=response.status_code,
+                    detail=response.text[:500],
+                    model=data["model"],
+                ) from e
+        if debug:
+            self._debug_response(response, result)
+        record_usage(data["model"], result.get("usage"))
+        return self._parse_result(result)
+
+    def _stream_request(self, prompt: str, kwargs: Dict[str, Any]):
+        headers, data = self._build_request(prompt, kwargs)
+        data["stream"] = True
+        headers["Accept"] = "text/event-stream"
+        return inject(headers), data
+
+    def stream_response(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Genera la respuesta en fragmentos a medida que llegan (SSE)
+
+        Sólo se entrega texto; para tool calls usar :meth:`generate_response`.
+        Los reintentos cubren el establecimiento del stream, no un corte a
+        mitad de respuesta.
+        """
+        debug = bool(kwargs.get("debug", False))
+        headers, data = self._stream_request(prompt, kwargs)
+        if debug:
+            self._debug_request(headers, data)
+
+        # La plaza de concurrencia se mantiene mientras dura el stream
+        with self.limiter.acquire(data["model"], estimate_tokens(data)):
+            response = self._post(headers, data, debug, stream=True)
+            try:
+                if "application/json" in response.headers.get("content-type", ""):
+                    # El upstream ignoró stream=true: un único fragmento
+                    text = response_text(self._parse_result(response.json()))
+                    if text:
+                        yield text
+                    return
+                yield from iter_sse_deltas(response.iter_lines())
+            except requests.RequestException as e:
+                error, _ = self._classify_requests_error(
+                    data["model"], e, self.retry_policy(data["model"])
+                )
+                raise error from e
+            finally:
+                response.close()
+
+    async def astream_response(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Versión asíncrona de :meth:`stream_response` sobre httpx"""
+        debug = bool(kwargs.get("debug", False))
+        headers, data = self._stream_request(prompt, kwargs)
+        if debug:
+            self._debug_request(headers, data)
+
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(
+                self.limiter.aacquire(data["model"], estimate_tokens(data))
+            )
+
+            async def send(timeout):
+                return await stack.enter_async_context(
+                    self.pool.astream(
+                        self.base_url, headers=headers, json=data, timeout=timeout
+                    )
+                )
+
+            response = await self._apost_attempts(headers, data, debug, send)
+            try:
+                if "application/json" in response.headers.get("content-type", ""):
+                    await response.aread()
+                    text = response_text(self._parse_result(response.json()))
+                    if text:
+                        yield text
+                    return
+                async for text in aiter_sse_deltas(response.aiter_lines()):
+                    yield text
+            except httpx.HTTPError as e:
+                error, _ = self._classify_httpx_error(
+                    data["model"], e, self.retry_policy(data["model"])
+                )
+                raise error from e
 
 
 class AIModelFactory:
@@ -132,11 +593,14 @@ class AIModelFactory:
 
     @staticmethod
     def create_client(
-        model_type: str, api_key: str, model_config: Dict[str, Any]
+        model_type: str,
+        api_key: str,
+        model_config: Dict[str, Any],
+        pool: Optional[ConnectionPool] = None,
     ) -> AIClient:
         """Crea instancia del cliente AI apropiado"""
         # Únicamente Blackbox: devolvemos siempre el cliente de Blackbox
-        return BlackboxClient(api_key, model_config)
+        return BlackboxClient(api_key, model_config, pool=pool)
 
 
 class AIOrchestrator:
@@ -166,6 +630,39 @@ class AIOrchestrator:
                     "blackbox_hybrid_tool", "config", "models.json"
                 )
         self.models_config = self._load_config()
+        # Circuit breaker por modelo (models.blackbox.breaker + model_overrides)
+        self.breakers = BreakerRegistry(
+            lambda model: BreakerConfig.from_dict(
+                model_section(
+                    self.models_config.get("models", {}).get("blackbox", {}),
+                    model,
+                    "breaker",
+                )
+            )
+        )
+        # Router por latencia/coste (models.blackbox.router + available_models)
+        self.router = ModelRouter.from_models_config(
+            self.models_config,
+            is_available=lambda model: self.breakers.get(model).state != OPEN,
+        )
+        # Presupuesto de contexto (models.blackbox.context + available_models)
+        self.context = ContextManager(
+            ContextConfig.from_dict(
+                self.models_config.get("models", {}).get("blackbox", {}).get("context")
+            ),
+            lambda model: self.router.profile(model).context,
+        )
+        # Duplicados tardíos en el camino asíncrono (models.blackbox.hedge)
+        self.hedger = Hedger(
+            lambda model: HedgeConfig.from_dict(
+                model_section(
+                    self.models_config.get("models", {}).get("blackbox", {}),
+                    model,
+                    "hedge",
+                )
+            ),
+            self.router.latencies,
+        )
         # Configurar el mejor modelo disponible al iniciar
         try:
             self._ensure_best_model()
@@ -173,6 +670,25 @@ class AIOrchestrator:
             # No bloquear si algo falla al seleccionar mejor modelo
             pass
         self.clients = {}
+        # Pool de conexiones compartido por todos los clientes cacheados
+        self.pool = ConnectionPool(
+            PoolConfig.from_dict(
+                self.models_config.get("models", {}).get("blackbox", {}).get("pool")
+            )
+        )
+        # Caché de respuestas deterministas (opt-in por solicitud)
+        self.cache = ResponseCache(
+            CacheConfig.from_dict(
+                self.models_config.get("models", {}).get("blackbox", {}).get("cache")
+            )
+        )
+        # Coalescencia de llamadas idénticas en vuelo (models.blackbox.coalesce)
+        self.coalesce = bool(
+            self.models_config.get("models", {})
+            .get("blackbox", {})
+            .get("coalesce", True)
+        )
+        self.singleflight = SingleFlight()
 
     def _load_config(self) -> Dict[str, Any]:
         """Carga configuración de modelos desde archivo JSON"""
@@ -190,6 +706,10 @@ class AIOrchestrator:
                 env_key = os.getenv("BLACKBOX_API_KEY")
                 if env_key:
                     bk["api_key"] = env_key
+                # Raíz alternativa de la API (p.ej. el servidor simulado local)
+                env_base = os.getenv("BLACKBOX_API_BASE")
+                if env_base:
+                    bk["base_url"] = env_base.rstrip("/") + "/chat/completions"
                 # Si falta api_key, intentar también variable heredada genérica
                 if not bk.get("api_key"):
                     generic = os.getenv("API_KEY")
@@ -208,18 +728,32 @@ class AIOrchestrator:
                 },
             }
 
-    def _ensure_best_model(self) -> None:
-        """Selecciona y fija el mejor modelo disponible en la config de Blackbox.
+    @staticmethod
+    def _is_gemini(model_id: str) -> bool:
+        s = str(model_id).lower()
+        return "gemini" in s or "/google/gemini" in s
 
-        - Filtra modelos relacionados con Gemini.
-        - Elige por heurística el identificador con mayor preferencia.
-        - Actualiza models.blackbox.model si encuentra uno adecuado.
-        """
-        cfg = self.models_config or {}
-        models = cfg.get("models", {})
-        bb = models.get("blackbox", {})
+    @staticmethod
+    def _model_score(model_id: str) -> tuple:
+        """Clave de orden por preferencia heurística (menor es mejor)"""
+        return heuristic_rank(model_id)
+
+    def fit_context(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> ContextWindow:
+        """Historial recortado al contexto de ``model`` (por defecto, el actual)"""
+        if model in (None, "blackbox"):
+            model = (
+                self.models_config.get("models", {}).get("blackbox", {}).get("model")
+            )
+        return self.context.fit(messages, model=model, max_tokens=max_tokens)
 
-        # Lista de candidatos desde available_models y, si existe, el actual
+    def _candidate_models(self) -> List[str]:
+        """Modelos de available_models más el actual, sin Gemini"""
+        cfg = self.models_config or {}
         avail = []
         try:
             avail = [
@@ -231,55 +765,32 @@ class AIOrchestrator:
             avail = []
 
         # Agregar el actual si no está
-        current = bb.get("model")
+        current = cfg.get("models", {}).get("blackbox", {}).get("model")
         if current and current not in avail:
             avail.append(current)
 
         # Filtrar gemini por completo
-        def _is_gemini(mid: str) -> bool:
-            s = str(mid).lower()
-            return "gemini" in s or "/google/gemini" in s
+        return [m for m in avail if m and not self._is_gemini(m)]
 
-        avail = [m for m in avail if m and not _is_gemini(m)]
+    def _ensure_best_model(self) -> None:
+        """Selecciona y fija el mejor modelo disponible en la config de Blackbox.
+
+        - Filtra modelos relacionados con Gemini.
+        - Elige con la política por defecto del router (costes del CSV y,
+          sin estadísticas todavía, preferencia heurística).
+        - Actualiza models.blackbox.model si encuentra uno adecuado.
+        """
+        cfg = self.models_config or {}
+        models = cfg.get("models", {})
+        bb = models.get("blackbox", {})
 
+        avail = self._candidate_models()
         if not avail:
             return  # no hay candidatos
 
-        # Preferencias por calidad/caso de uso (sin gemini)
-        prefs = [
-            # razonamiento de alta calidad
-            "o3",
-            "o1",
-            "claude-3.7",
-            "claude-3.5",
-            "deepseek-r1",
-            # código/generalistas potentes
-            "gpt-4o",
-            "gpt-4.1",
-            "mixtral",
-            "llama-3.1",
-            "llama-3",
-            "qwen3",
-            "qwen-3",
-            "qwen2.5",
-            # rápidos/compactos
-            "flash",
-            "mini",
-            "sonar",
-        ]
-
-        def score(model_id: str) -> tuple:
-            mid = model_id.lower()
-            for i, key in enumerate(prefs):
-                if key.lower() in mid:
-                    return (0, i)
-            generic = ["latest", "pro"]
-            for j, k in enumerate(generic):
-                if k in mid:
-                    return (1, j)
-            return (2, len(mid))
-
-        best = sorted(avail, key=score)[0]
+        best = self.router.choose(avail).model
+        if not best:
+            return
         # Fijar modelo en config en memoria
         bb["model"] = best
         models["blackbox"] = bb
@@ -307,26 +818,502 @@ class AIOrchestrator:
                 )
 
             self.clients[key] = AIModelFactory.create_client(
-                "blackbox", api_key, model_config
+                "blackbox", api_key, model_config, pool=self.pool
             )
 
         return self.clients[key]
 
-    def generate_response(
-        self, prompt: str, model_type: Optional[str] = None, **kwargs
-    ) -> Union[str, Dict[str, Any]]:
-        """Genera respuesta usando el modelo especificado"""
+    def _resolve_client(
+        self, model_type: Optional[str], kwargs: Dict[str, Any], prompt: str = ""
+    ):
+        """Devuelve el cliente y los kwargs a usar para ``model_type``
+
+        Sin modelo explícito (``None``, ``"blackbox"`` o una estrategia como
+        ``"fast"``) el router elige el modelo de la solicitud; ``strategy``
+        en kwargs fija la estrategia.
+        """
+        kwargs = dict(kwargs)
+        strategy = kwargs.pop("strategy", None)
         # Permite override de modelo pasando un identificador de Blackbox en model_type
-        override_model: Optional[str] = None
         if model_type and "/" in model_type:
-            override_model = model_type
-            client = self.get_client("blackbox")
-        else:
-            client = self.get_client(model_type)
+            return self.get_client("blackbox"), dict(kwargs, model=model_type)
+        if model_type in ROUTING_STRATEGIES:
+            if model_type != "auto":
+                strategy = strategy or model_type
+            model_type = None
+        if model_type in (None, "blackbox") and not kwargs.get("model"):
+            routed = self.route(prompt, strategy, kwargs)
+            if routed:
+                kwargs["model"] = routed
+        return self.get_client(model_type), kwargs
+
+    def route(
+        self,
+        prompt: str = "",
+        strategy: Optional[str] = None,
+        kwargs: Optional[Dict[str, Any]] = None,
+    ) -> Optional[str]:
+        """Modelo elegido por el router para una solicitud (``None`` = por defecto)"""
+        cfg = self.router.config
+        if not (cfg.enabled and cfg.per_request):
+            return None
+        kwargs = kwargs or {}
+        messages = kwargs.get("messages") or [{"role": "user", "content": prompt}]
+        decision = self.router.choose(
+            self._candidate_models(),
+            strategy=strategy,
+            input_tokens=estimate_tokens({"messages": messages}),
+            output_tokens=kwargs.get("max_tokens"),
+        )
+        return decision.model
+
+    def fallback_chain(self, model: str) -> List[str]:
+        """Modelos a intentar para ``model``, en orden (``models.blackbox.fallback``)
+
+        Con ``tiers`` y ``chain`` (p.ej. reasoning → code → fast) se sigue la
+        cadena desde el tier que contiene al modelo; sin tiers se usan los
+        modelos de available_models ordenados por preferencia. Un modelo
+        fuera de los tiers (o de available_models), como un id de imagen o
+        uno elegido a mano, no cambia de modelo salvo con ``out_of_tier``.
+        """
+        cfg = self.models_config.get("models", {}).get("blackbox", {})
+        fallback = cfg.get("fallback") or {}
+        chain = [model]
+        if fallback.get("enabled", True):
+            out_of_tier = bool(fallback.get("out_of_tier", False))
+            tiers = fallback.get("tiers") or {}
+            if tiers:
+                order = fallback.get("chain") or list(tiers)
+                start = next(
+                    (i for i, t in enumerate(order) if model in (tiers.get(t) or [])),
+                    0 if out_of_tier else len(order),
+                )
+                for tier in order[start:]:
+                    chain.extend(tiers.get(tier) or [])
+            elif fallback.get("auto", True):
+                candidates = self._candidate_models()
+                if model in candidates or out_of_tier:
+                    chain.extend(sorted(candidates, key=self._model_score))
+        unique = list(dict.fromkeys(chain))
+        return unique[: max(1, int(fallback.get("max_models", 3)))]
+
+    @staticmethod
+    def _is_upstream_failure(error: BlackboxAPIError) -> bool:
+        """Errores que indican un modelo degradado (no un error del cliente)"""
+        if isinstance(error, (BlackboxRateLimitError, BlackboxCircuitOpenError)):
+            return False
+        status = error.status_code
+        return status is None or status == 429 or status >= 500
+
+    def _circuit_open_error(
+        self, model: str, skipped: List[str]
+    ) -> BlackboxCircuitOpenError:
+        retry_after = min(self.breakers.get(m).retry_after() for m in skipped)
+        return BlackboxCircuitOpenError(
+            f"Circuito abierto para {', '.join(skipped)}",
+            retry_after=retry_after,
+            model=model,
+        )
+
+    def _generate_with_fallback(
+        self, client: AIClient, prompt: str, kwargs: Dict[str, Any], model: str
+    ) -> Tuple[Union[str, Dict[str, Any]], str]:
+        """Llama al primer modelo sano de la cadena, pasando al siguiente si falla
+
+        Devuelve la respuesta y el modelo que la generó.
+        """
+        last_error: Optional[BlackboxAPIError] = None
+        skipped: List[str] = []
+        for candidate in self.fallback_chain(model):
+            breaker = self.breakers.get(candidate)
+            if not breaker.allow():
+                skipped.append(candidate)
+                continue
+            if candidate != model:
+                logger.warning(f"Fallback de {model} a {candidate}")
+            started = time.monotonic()
+            try:
+                result = client.generate_response(
+                    prompt, **dict(kwargs, model=candidate)
+                )
+            except BlackboxAPIError as e:
+                upstream = self._is_upstream_failure(e)
+                latency = time.monotonic() - started
+                breaker.record(False if upstream else None, latency, str(e))
+                if not upstream:
+                    raise
+                self.router.record(candidate, latency, False)
+                last_error = e
+                continue
+            except BaseException:
+                breaker.record(None, 0.0)
+                raise
+            latency = time.monotonic() - started
+            breaker.record(True, latency)
+            self.router.record(
+                candidate, latency, True, len(response_text(result)) // 4
+            )
+            return result, candidate
+        if last_error is not None:
+            raise last_error
+        raise self._circuit_open_error(model, skipped)
+
+    async def _agenerate_with_fallback(
+        self, client: AIClient, prompt: str, kwargs: Dict[str, Any], model: str
+    ) -> Tuple[Union[str, Dict[str, Any]], str]:
+        """Versión asíncrona de :meth:`_generate_with_fallback`"""
+        last_error: Optional[BlackboxAPIError] = None
+        skipped: List[str] = []
+        for candidate in self.fallback_chain(model):
+            breaker = self.breakers.get(candidate)
+            if not breaker.allow():
+                skipped.append(candidate)
+                continue
+            if candidate != model:
+                logger.warning(f"Fallback de {model} a {candidate}")
+            started = time.monotonic()
+
+            def call(name: str):
+                return client.agenerate_response(prompt, **dict(kwargs, model=name))
+
+            try:
+                result, used, leg_latency = await self.hedger.run(
+                    candidate, call, self._hedge_target(candidate)
+                )
+            except BlackboxAPIError as e:
+                upstream = self._is_upstream_failure(e)
+                latency = time.monotonic() - started
+                breaker.record(False if upstream else None, latency, str(e))
+                if not upstream:
+                    raise
+                self.router.record(candidate, latency, False)
+                last_error = e
+                continue
+            except BaseException:
+                breaker.record(None, 0.0)
+                raise
+            breaker.record(True, time.monotonic() - started)
+            self.router.record(used, leg_latency, True, len(response_text(result)) // 4)
+            return result, used
+        if last_error is not None:
+            raise last_error
+        raise self._circuit_open_error(model, skipped)
+
+    def _hedge_target(self, model: str) -> str:
+        """Modelo del duplicado: el mismo o el siguiente sano de la cadena"""
+        if self.hedger.config_for(model).target != "secondary":
+            return model
+        for candidate in self.fallback_chain(model)[1:]:
+            if self.breakers.get(candidate).state != OPEN:
+                return candidate
+        return model
+
+    def _request_key(
+        self, client: AIClient, prompt: str, kwargs: Dict[str, Any]
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Clave canónica de la llamada y su payload (``None`` si no aplica)"""
+        build = getattr(client, "request_payload", None)
+        payload = build(prompt, **kwargs) if build else None
+        if payload is None:
+            return None, None
+        return cache_key(payload), payload
+
+    def generate_response(
+        self,
+        prompt: str,
+        model_type: Optional[str] = None,
+        cache: Optional[bool] = None,
+        on_model: Optional[Callable[[str], None]] = None,
+        **kwargs,
+    ) -> Union[str, Dict[str, Any]]:
+        """Genera respuesta usando el modelo especificado
+
+        ``cache=True`` reutiliza respuestas idénticas previas (ver
+        ``models.blackbox.cache``); ``None`` aplica el valor por defecto.
+        Las llamadas idénticas simultáneas comparten una sola solicitud.
+        ``on_model`` recibe el modelo que respondió (tras router y fallback).
+        """
+        with tracer.span("orchestrator.generate", model_type=model_type or "auto"):
+            result, model = self._generate(prompt, model_type, cache, kwargs)
+        if on_model is not None and model:
+            on_model(model)
+        return result
+
+    def _generate(
+        self,
+        prompt: str,
+        model_type: Optional[str],
+        cache: Optional[bool],
+        kwargs: Dict[str, Any],
+    ) -> Tuple[Union[str, Dict[str, Any]], str]:
+        started = time.time_ns()
+        client, call_kwargs = self._resolve_client(model_type, kwargs, prompt)
+        key, payload = self._request_key(client, prompt, call_kwargs)
+        model = (payload or {}).get("model", "")
+        tracer.record("model.select", started, time.time_ns(), model=model)
+        cacheable = key is not None and self.cache.should_cache(payload, cache)
+        if cacheable:
+            started = time.time_ns()
+            cached = self.cache.get(key)
+            tracer.record(
+                "cache.lookup", started, time.time_ns(), hit=cached is not None
+            )
+            if cached is not None:
+                return cached, model
+
+        def call():
+            if payload is None:
+                result = client.generate_response(prompt, **call_kwargs)
+                used = model
+            else:
+                result, used = self._generate_with_fallback(
+                    client, prompt, call_kwargs, payload["model"]
+                )
+            if cacheable and result:
+                self.cache.set(key, result)
+            return result, used
+
+        if key is None or not self.coalesce:
+            return call()
+        return self.singleflight.do(key, call)
+
+    async def agenerate_response(
+        self,
+        prompt: str,
+        model_type: Optional[str] = None,
+        cache: Optional[bool] = None,
+        on_model: Optional[Callable[[str], None]] = None,
+        **kwargs,
+    ) -> Union[str, Dict[str, Any]]:
+        """Versión asíncrona de :meth:`generate_response` para el servidor"""
+        with tracer.span("orchestrator.generate", model_type=model_type or "auto"):
+            result, model = await self._agenerate(prompt, model_type, cache, kwargs)
+        if on_model is not None and model:
+            on_model(model)
+        return result
+
+    async def _agenerate(
+        self,
+        prompt: str,
+        model_type: Optional[str],
+        cache: Optional[bool],
+        kwargs: Dict[str, Any],
+    ) -> Tuple[Union[str, Dict[str, Any]], str]:
+        started = time.time_ns()
+        client, call_kwargs = self._resolve_client(model_type, kwargs, prompt)
+        key, payload = self._request_key(client, prompt, call_kwargs)
+        model = (payload or {}).get("model", "")
+        tracer.record("model.select", started, time.time_ns(), model=model)
+        cacheable = key is not None and self.cache.should_cache(payload, cache)
+        if cacheable:
+            started = time.time_ns()
+            # El nivel SQLite hace E/S de disco: fuera del event loop
+            if self.cache.has_disk:
+                cached = await to_thread(self.cache.get, key)
+            else:
+                cached = self.cache.get(key)
+            tracer.record(
+                "cache.lookup", started, time.time_ns(), hit=cached is not None
+            )
+            if cached is not None:
+                return cached, model
+
+        async def call():
+            if payload is None:
+                result = await client.agenerate_response(prompt, **call_kwargs)
+                used = model
+            else:
+                result, used = await self._agenerate_with_fallback(
+                    client, prompt, call_kwargs, payload["model"]
+                )
+            if cacheable and result:
+                if self.cache.has_disk:
+                    await to_thread(self.cache.set, key, result)
+                else:
+                    self.cache.set(key, result)
+            return result, used
+
+        if key is None or not self.coalesce:
+            return await call()
+        return await self.singleflight.ado(key, call)
+
+    def generate_batch(
+        self,
+        requests: Iterable[BatchInput],
+        concurrency: int = 4,
+        on_progress: Optional[ProgressCallback] = None,
+        cancel: Optional[threading.Event] = None,
+        **defaults,
+    ) -> List[BatchResult]:
+        """Varias completions a la vez con como mucho ``concurrency`` en vuelo
+
+        Cada solicitud es un prompt o un dict con ``prompt``, ``id`` y kwargs
+        de :meth:`generate_response` (``defaults`` se aplica a todas). Los
+        resultados conservan el orden de entrada, con el error por elemento
+        y el modelo que respondió.
+        """
+
+        def call(request: Dict[str, Any]):
+            kwargs = dict(defaults, **request)
+            used: List[str] = []
+            value = self.generate_response(
+                kwargs.pop("prompt"), on_model=used.append, **kwargs
+            )
+            return Routed(value, used[0] if used else None)
+
+        return run_batch(call, requests, concurrency, on_progress, cancel)
+
+    async def agenerate_batch(
+        self,
+        requests: Iterable[BatchInput],
+        concurrency: int = 8,
+        on_progress: Optional[ProgressCallback] = None,
+        cancel: Any = None,
+        **defaults,
+    ) -> List[BatchResult]:
+        """Versión asíncrona de :meth:`generate_batch`"""
+        results = [
+            r
+            async for r in self.aiter_batch(
+                requests, concurrency, on_progress, cancel, **defaults
+            )
+        ]
+        return sorted(results, key=lambda r: r.index)
+
+    def aiter_batch(
+        self,
+        requests: Iterable[BatchInput],
+        concurrency: int = 8,
+        on_progress: Optional[ProgressCallback] = None,
+        cancel: Any = None,
+        **defaults,
+    ) -> AsyncIterator[BatchResult]:
+        """Resultados del lote a medida que terminan (``POST /chat/batch``)"""
+
+        async def call(request: Dict[str, Any]):
+            kwargs = dict(defaults, **request)
+            used: List[str] = []
+            value = await self.agenerate_response(
+                kwargs.pop("prompt"), on_model=used.append, **kwargs
+            )
+            return Routed(value, used[0] if used else None)
+
+        return aiter_batch(call, requests, concurrency, on_progress, cancel)
+
+    def _resolve_stream(
+        self,
+        prompt: str,
+        model_type: Optional[str],
+        on_model: Optional[Callable[[str], None]],
+        kwargs: Dict[str, Any],
+    ):
+        client, call_kwargs = self._resolve_client(model_type, kwargs, prompt)
+        if on_model is not None:
+            # El stream no cambia de modelo: el del payload es el que responde
+            _, payload = self._request_key(client, prompt, call_kwargs)
+            model = (payload or {}).get("model") or call_kwargs.get("model")
+            if model:
+                on_model(model)
+        return client, call_kwargs
+
+    def stream_response(
+        self,
+        prompt: str,
+        model_type: Optional[str] = None,
+        on_model: Optional[Callable[[str], None]] = None,
+        **kwargs,
+    ) -> Iterator[str]:
+        """Fragmentos de la respuesta a medida que llegan (REPL)
+
+        ``on_model`` recibe el modelo elegido antes del primer fragmento.
+        """
+        client, call_kwargs = self._resolve_stream(prompt, model_type, on_model, kwargs)
+        return client.stream_response(prompt, **call_kwargs)
+
+    def astream_response(
+        self,
+        prompt: str,
+        model_type: Optional[str] = None,
+        on_model: Optional[Callable[[str], None]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Fragmentos de la respuesta sin bloquear el event loop (servidor)"""
+        client, call_kwargs = self._resolve_stream(prompt, model_type, on_model, kwargs)
+        return client.astream_response(prompt, **call_kwargs)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Estadísticas del pool de conexiones compartido"""
+        return self.pool.stats()
+
+    def retry_stats(self) -> Dict[str, Any]:
+        """Métricas de intentos/reintentos por cliente cacheado"""
+        return {
+            key: client.retry_stats.snapshot()
+            for key, client in self.clients.items()
+            if isinstance(client, BlackboxClient)
+        }
+
+    def hedge_stats(self) -> Dict[str, Any]:
+        """Duplicados lanzados/ganados y latencia de cola ahorrada"""
+        return self.hedger.stats.snapshot()
+
+    def router_stats(self) -> Dict[str, Any]:
+        """Estadísticas por modelo y últimas decisiones del router"""
+        return self.router.stats()
+
+    def breaker_stats(self) -> Dict[str, Any]:
+        """Estado del circuit breaker de cada modelo usado"""
+        return self.breakers.snapshot()
+
+    def reset_breakers(self, model: Optional[str] = None) -> int:
+        """Cierra manualmente el breaker de ``model`` (o de todos)"""
+        return self.breakers.reset(model)
+
+    def rate_limit_stats(self) -> Dict[str, Any]:
+        """Colas y esperas del limitador local por cliente cacheado"""
+        return {
+            key: client.limiter.stats()
+            for key, client in self.clients.items()
+            if isinstance(client, BlackboxClient)
+        }
+
+    def coalesce_stats(self) -> Dict[str, Any]:
+        """Llamadas al upstream frente a solicitudes coalescidas"""
+        return dict(self.singleflight.stats(), enabled=self.coalesce)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Aciertos/fallos y ocupación de la caché de respuestas"""
+        return self.cache.stats()
+
+    def close(self) -> None:
+        """Cierra clientes cacheados, el pool compartido y la caché"""
+        for client in list(self.clients.values()):
+            try:
+                client.close()
+            except Exception:
+                pass
+        self.clients = {}
+        self.pool.close()
+        self.cache.close()
+        self.router.close()
+
+    async def aclose(self) -> None:
+        """Cierra clientes y pool desde el event loop (lifespan de FastAPI)"""
+        for client in list(self.clients.values()):
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+        self.clients = {}
+        await self.pool.aclose()
+        self.cache.close()
+        self.router.close()
+
+    def __enter__(self):
+        return self
 
-        if override_model:
-            return client.generate_response(prompt, model=override_model, **kwargs)
-        return client.generate_response(prompt, **kwargs)
+    def __exit__(self, *exc) -> None:
+        self.close()
 
     def switch_model(self, model_type: str):
         """Cambia el modelo por defecto"""
@@ -369,6 +1356,7 @@ class AIOrchestrator:
             if rows:
                 self.models_config["available_models"] = rows
                 self._save_config()
+                self.router.update_profiles(profiles_from_config(self.models_config))
             return len(rows)
         except Exception:
             return 0
@@ -0,0 +1,222 @@
+"""
+Ejecución de completions en lote con concurrencia acotada
+Cada elemento es un prompt (str) o un dict con ``prompt``, ``id``
+opcional y los kwargs de ``generate_response``. Los resultados conservan
+el orden de entrada y llevan el error de cada elemento en lugar de
+abortar el lote; un ``Event`` (threading o asyncio) cancela los elementos
+que aún no han empezado.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+BatchInput = Union[str, Dict[str, Any]]
+ProgressCallback = Callable[[int, int, "BatchResult"], None]
+
+CANCELLED = "cancelled"
+
+
+@dataclass
+class BatchResult:
+    """Resultado de un elemento del lote"""
+
+    index: int
+    id: Any = None
+    ok: bool = False
+    result: Any = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    latency: float = 0.0
+    model: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class Routed:
+    """Valor de ``fn`` junto con el modelo que lo generó"""
+
+    value: Any
+    model: Optional[str] = None
+
+
+def normalize(
+    item: BatchInput, require_prompt: bool = True
+) -> Tuple[Any, Dict[str, Any]]:
+    """``(id, kwargs)`` de un elemento
+
+    ``kwargs`` incluye ``prompt`` salvo con ``require_prompt=False`` (lotes
+    que no son completions, p.ej. un trabajo por función a testear).
+    """
+    if isinstance(item, str):
+        return None, {"prompt": item}
+    if not isinstance(item, dict):
+        raise ValueError("Cada elemento debe ser un prompt o un dict")
+    if require_prompt and not isinstance(item.get("prompt"), str):
+        raise ValueError("Cada elemento necesita un 'prompt' de texto")
+    request = dict(item)
+    return request.pop("id", None), request
+
+
+def _failure(index: int, item_id: Any, error: BaseException, started: float):
+    # BlackboxAPIError aporta el status del upstream (429, 502, ...)
+    return BatchResult(
+        index=index,
+        id=item_id,
+        error=str(error) or type(error).__name__,
+        status_code=getattr(error, "status_code", None),
+        latency=time.monotonic() - started,
+    )
+
+
+def _success(index: int, item_id: Any, value: Any, started: float) -> BatchResult:
+    model = None
+    if isinstance(value, Routed):
+        value, model = value.value, value.model
+    return BatchResult(
+        index=index,
+        id=item_id,
+        ok=True,
+        result=value,
+        latency=time.monotonic() - started,
+        model=model,
+    )
+
+
+def _cancelled(index: int, item: BatchInput) -> BatchResult:
+    item_id = item.get("id") if isinstance(item, dict) else None
+    return BatchResult(index=index, id=item_id, error=CANCELLED)
+
+
+def _run_one(
+    fn: Callable[[Dict[str, Any]], Any],
+    index: int,
+    item: BatchInput,
+    cancel: Optional[threading.Event],
+    require_prompt: bool = True,
+) -> BatchResult:
+    if cancel is not None and cancel.is_set():
+        return _cancelled(index, item)
+    started = time.monotonic()
+    item_id = None
+    try:
+        item_id, request = normalize(item, require_prompt)
+        result = fn(request)
+    except Exception as e:
+        return _failure(index, item_id, e, started)
+    return _success(index, item_id, result, started)
+
+
+def run_batch(
+    fn: Callable[[Dict[str, Any]], Any],
+    items: Iterable[BatchInput],
+    concurrency: int = 4,
+    on_progress: Optional[ProgressCallback] = None,
+    cancel: Optional[threading.Event] = None,
+    require_prompt: bool = True,
+) -> List[BatchResult]:
+    """Ejecuta ``fn(request)`` por elemento en un pool de hilos
+
+    Con Ctrl+C (o ``cancel``) los elementos pendientes se marcan como
+    cancelados; los que ya están en vuelo terminan normalmente.
+    ``require_prompt=False`` admite dicts sin ``prompt``.
+    """
+    items = list(items)
+    total = len(items)
+    results: List[Optional[BatchResult]] = [None] * total
+    if not total:
+        return []
+    stop = cancel if cancel is not None else threading.Event()
+    workers = max(1, min(int(concurrency), total))
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        futures = [
+            pool.submit(_run_one, fn, i, item, stop, require_prompt)
+            for i, item in enumerate(items)
+        ]
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.index] = result
+                done += 1
+                if on_progress is not None:
+                    on_progress(done, total, result)
+        except KeyboardInterrupt:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            raise
+    return [r for r in results if r is not None]
+
+
+async def aiter_batch(
+    fn: Callable[[Dict[str, Any]], Awaitable[Any]],
+    items: Iterable[BatchInput],
+    concurrency: int = 8,
+    on_progress: Optional[ProgressCallback] = None,
+    cancel: Any = None,
+    require_prompt: bool = True,
+) -> AsyncIterator[BatchResult]:
+    """Resultados en orden de finalización (cada uno con su ``index``)
+
+    Usa ``concurrency`` workers; cerrar el iterador (p.ej. el cliente se
+    desconecta) cancela las llamadas en vuelo.
+    """
+    items = list(items)
+    total = len(items)
+    if not total:
+        return
+    queue: "asyncio.Queue[Tuple[int, BatchInput]]" = asyncio.Queue()
+    for entry in enumerate(items):
+        queue.put_nowait(entry)
+    results: "asyncio.Queue[BatchResult]" = asyncio.Queue()
+
+    async def worker() -> None:
+        while True:
+            try:
+                index, item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if cancel is not None and cancel.is_set():
+                await results.put(_cancelled(index, item))
+                continue
+            started = time.monotonic()
+            item_id = None
+            try:
+                item_id, request = normalize(item, require_prompt)
+                value = await fn(request)
+            except Exception as e:
+                await results.put(_failure(index, item_id, e, started))
+                continue
+            await results.put(_success(index, item_id, value, started))
+
+    workers = [
+        asyncio.ensure_future(worker())
+        for _ in range(max(1, min(int(concurrency), total)))
+    ]
+    try:
+        for done in range(1, total + 1):
+            result = await results.get()
+            if on_progress is not None:
+                on_progress(done, total, result)
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
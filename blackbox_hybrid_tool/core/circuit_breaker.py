@@ -0,0 +1,213 @@
+"""
+Circuit breaker por modelo
+Cuando un modelo acumula errores o respuestas demasiado lentas en la
+ventana reciente, el breaker se abre y las solicitudes pasan directamente
+al siguiente modelo de la cadena de fallback en lugar de esperar a que
+fallen. Tras ``open_seconds`` se deja pasar una llamada de prueba
+(half-open) que decide si se vuelve a cerrar.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass
+class BreakerConfig:
+    """Umbrales del breaker (sección ``breaker`` en models.json)"""
+
+    enabled: bool = True
+    window: float = 60.0
+    # Llamadas mínimas en la ventana antes de evaluar las tasas
+    min_calls: int = 5
+    error_rate: float = 0.5
+    # Una llamada correcta más lenta que esto cuenta como lenta
+    slow_call_seconds: float = 60.0
+    slow_call_rate: float = 0.8
+    open_seconds: float = 30.0
+    half_open_max_calls: int = 1
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "BreakerConfig":
+        """Construye la configuración ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+class CircuitBreaker:
+    """Breaker closed/open/half-open basado en tasa de error y latencia"""
+
+    def __init__(self, name: str, config: Optional[BreakerConfig] = None):
+        self.name = name
+        self.config = config or BreakerConfig()
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        # (instante, ok, lenta)
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._transitions = 0
+        self._rejected = 0
+        self._last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.config.open_seconds:
+            self._set_state(HALF_OPEN)
+            self._trials = 0
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            self._state = state
+            self._transitions += 1
+
+    def retry_after(self) -> float:
+        """Segundos hasta la próxima llamada de prueba (0 si no está abierto)"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            elapsed = time.monotonic() - self._opened_at
+            return max(0.0, self.config.open_seconds - elapsed)
+
+    def allow(self) -> bool:
+        """Reserva una llamada; en half-open sólo pasan las de prueba"""
+        if not self.config.enabled:
+            return True
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == CLOSED:
+                return True
+            if (
+                self._state == HALF_OPEN
+                and self._trials < self.config.half_open_max_calls
+            ):
+                self._trials += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record(self, ok: Optional[bool], latency: float, error: str = "") -> None:
+        """Registra el resultado de una llamada admitida
+
+        ``ok=None`` indica un resultado neutro (p.ej. error del cliente):
+        libera la plaza de prueba sin afectar a las tasas.
+        """
+        if not self.config.enabled:
+            return
+        now = time.monotonic()
+        cfg = self.config
+        with self._lock:
+            if ok is None:
+                if self._state == HALF_OPEN:
+                    self._trials = max(0, self._trials - 1)
+                return
+            slow = bool(ok) and latency > cfg.slow_call_seconds
+            if not ok:
+                self._last_error = error or None
+            if self._state == HALF_OPEN:
+                if ok and not slow:
+                    self._set_state(CLOSED)
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+            self._calls.append((now, bool(ok), slow))
+            while self._calls and now - self._calls[0][0] > cfg.window:
+                self._calls.popleft()
+            if self._state == CLOSED and self._should_open():
+                self._open(now)
+
+    def _should_open(self) -> bool:
+        total = len(self._calls)
+        if total < self.config.min_calls:
+            return False
+        errors = sum(1 for _, ok, _ in self._calls if not ok)
+        slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+        return (
+            errors / total >= self.config.error_rate
+            or slow / total >= self.config.slow_call_rate
+        )
+
+    def _open(self, now: float) -> None:
+        self._set_state(OPEN)
+        self._opened_at = now
+        self._trials = 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._set_state(CLOSED)
+            self._calls.clear()
+            self._trials = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            total = len(self._calls)
+            errors = sum(1 for _, ok, _ in self._calls if not ok)
+            slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+            return {
+                "state": self._state,
+                "calls": total,
+                "error_rate": round(errors / total, 4) if total else 0.0,
+                "slow_rate": round(slow / total, 4) if total else 0.0,
+                "rejected": self._rejected,
+                "transitions": self._transitions,
+                "retry_after": (
+                    round(
+                        max(0.0, self.config.open_seconds - (now - self._opened_at)), 2
+                    )
+                    if self._state == OPEN
+                    else 0.0
+                ),
+                "last_error": self._last_error,
+                "config": asdict(self.config),
+            }
+
+
+class BreakerRegistry:
+    """Un breaker por modelo, creado bajo demanda con su configuración"""
+
+    def __init__(self, config: Callable[[str], BreakerConfig]):
+        self._config = config
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(
+                    model, self._config(model)
+                )
+            return breaker
+
+    def reset(self, model: Optional[str] = None) -> int:
+        """Cierra el breaker de ``model`` (o todos); devuelve cuántos"""
+        with self._lock:
+            targets = (
+                list(self._breakers.values())
+                if model is None
+                else [b for m, b in self._breakers.items() if m == model]
+            )
+        for breaker in targets:
+            breaker.reset()
+        return len(targets)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {model: b.snapshot() for model, b in breakers.items()}
@@ -0,0 +1,191 @@
+"""
+Ventana de contexto con presupuesto de tokens
+Recorta un historial estilo chat.completions para que quepa en el
+contexto del modelo (columna ``context`` de ``available_models``): los
+mensajes ``system`` iniciales quedan fijados, se conserva una ventana deslizante de
+los turnos más recientes y los más antiguos se resumen (extractivo, sin
+llamar a la API) o se descartan. El conteo de tokens es una estimación
+local rápida; no requiere tokenizador.
+"""
+
+import re
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, List, Optional
+
+Message = Dict[str, Any]
+
+# Palabras, números o signos sueltos; aproxima a los tokenizadores BPE
+_PIECES = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+# Coste fijo de cada mensaje (rol y separadores del formato de chat)
+MESSAGE_OVERHEAD = 4
+
+
+def count_tokens(text: str) -> int:
+    """Estimación de tokens de un texto
+
+    Cada palabra cuenta uno más un token por cada 6 caracteres adicionales
+    (las palabras largas se parten); cada signo cuenta uno. Para textos
+    muy largos se usa directamente ~4 caracteres por token.
+    """
+    if not text:
+        return 0
+    if len(text) > 200_000:
+        return len(text) // 4
+    return sum(1 + (len(piece) - 1) // 6 for piece in _PIECES.findall(text))
+
+
+def message_tokens(message: Message) -> int:
+    content = message.get("content")
+    if not isinstance(content, str):
+        content = "" if content is None else str(content)
+    return MESSAGE_OVERHEAD + count_tokens(content)
+
+
+@dataclass
+class ContextConfig:
+    """Presupuesto de contexto (sección ``context`` en models.json)"""
+
+    enabled: bool = True
+    # Fracción del contexto del modelo que puede ocupar la entrada
+    target_ratio: float = 0.75
+    # Contexto supuesto para modelos sin dato en available_models
+    default_context: int = 8192
+    # Tokens de salida reservados si la solicitud no fija max_tokens
+    default_output_tokens: int = 1024
+    # Mensajes recientes (no system) que se intentan conservar siempre
+    min_recent: int = 2
+    # Resumir los turnos descartados en un mensaje system
+    summarize: bool = True
+    summary_max_tokens: int = 256
+    # Caracteres de cada turno que entran en el resumen
+    summary_line_chars: int = 160
+    # Mensajes de historial que se leen como máximo antes de recortar
+    max_messages: int = 200
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ContextConfig":
+        """Construye la configuración ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+@dataclass
+class ContextWindow:
+    """Resultado de ajustar un historial al presupuesto"""
+
+    messages: List[Message]
+    tokens: int
+    budget: int
+    dropped: int = 0
+    summarized: bool = False
+    # True si ni lo fijado más el último turno caben en el presupuesto
+    over_budget: bool = False
+    # Tokens del historial completo antes de recortar
+    original_tokens: int = 0
+
+
+class ContextManager:
+    """Ajusta historiales al contexto de cada modelo
+
+    ``context_of(model)`` devuelve el contexto en tokens (o ``None``);
+    ``summarizer(messages, max_tokens)`` permite sustituir el resumen
+    extractivo por otro (p.ej. uno generado por un modelo).
+    """
+
+    def __init__(
+        self,
+        config: Optional[ContextConfig] = None,
+        context_of: Optional[Callable[[str], Optional[int]]] = None,
+        summarizer: Optional[Callable[[List[Message], int], str]] = None,
+    ):
+        self.config = config or ContextConfig()
+        self.context_of = context_of or (lambda model: None)
+        self.summarizer = summarizer or self._extractive_summary
+
+    def context_size(self, model: Optional[str]) -> int:
+        size = self.context_of(model) if model else None
+        return int(size) if size else self.config.default_context
+
+    def budget(self, model: Optional[str], max_tokens: Optional[int] = None) -> int:
+        """Tokens de entrada permitidos para ``model``"""
+        context = self.context_size(model)
+        output = int(max_tokens or self.config.default_output_tokens)
+        return max(0, min(int(context * self.config.target_ratio), context - output))
+
+    def _extractive_summary(self, messages: List[Message], max_tokens: int) -> str:
+        width = self.config.summary_line_chars
+        lines = [f"Resumen de {len(messages)} mensajes anteriores:"]
+        used = count_tokens(lines[0])
+        # Del más reciente al más antiguo: si no cabe todo, sobrevive lo último
+        picked: List[str] = []
+        for message in reversed(messages):
+            text = " ".join(str(message.get("content") or "").split())
+            if len(text) > width:
+                text = text[: width - 3] + "..."
+            line = f"- {message.get('role', 'user')}: {text}"
+            cost = count_tokens(line)
+            if used + cost > max_tokens:
+                break
+            picked.append(line)
+            used += cost
+        return "\n".join(lines + picked[::-1])
+
+    def fit(
+        self,
+        messages: List[Message],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        budget: Optional[int] = None,
+    ) -> ContextWindow:
+        """Historial recortado para ``model`` (no modifica ``messages``)"""
+        cfg = self.config
+        if budget is None:
+            budget = self.budget(model, max_tokens)
+        costs = [message_tokens(m) for m in messages]
+        total = sum(costs)
+        if not cfg.enabled or total <= budget:
+            return ContextWindow(list(messages), total, budget, original_tokens=total)
+
+        # Fijados: los system iniciales (instrucciones); los posteriores,
+        # como resultados de herramientas, cuentan como turnos
+        head = 0
+        while head < len(messages) and messages[head].get("role") == "system":
+            head += 1
+        turns = list(range(head, len(messages)))
+        used = sum(costs[:head])
+        summary_reserve = cfg.summary_max_tokens if cfg.summarize else 0
+
+        # Ventana deslizante: del turno más reciente hacia atrás
+        kept: List[int] = []
+        for n, i in enumerate(reversed(turns)):
+            must = n < max(1, cfg.min_recent)
+            if not must and used + costs[i] + summary_reserve > budget:
+                break
+            if must and n > 0 and used + costs[i] > budget:
+                break
+            kept.append(i)
+            used += costs[i]
+        kept_set = set(kept)
+        dropped = [messages[i] for i in turns if i not in kept_set]
+
+        summary: Optional[Message] = None
+        room = min(cfg.summary_max_tokens, budget - used - MESSAGE_OVERHEAD)
+        if dropped and cfg.summarize and room > 0:
+            summary = {"role": "system", "content": self.summarizer(dropped, room)}
+            used += message_tokens(summary)
+
+        window = list(messages[:head])
+        if summary is not None:
+            window.append(summary)
+        window.extend(messages[i] for i in turns if i in kept_set)
+        return ContextWindow(
+            window,
+            used,
+            budget,
+            dropped=len(dropped),
+            summarized=summary is not None,
+            over_budget=used > budget,
+            original_tokens=total,
+        )
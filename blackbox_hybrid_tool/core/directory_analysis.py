@@ -0,0 +1,385 @@
+"""
+Análisis de directorios para ``ChatRequest.analyze_directory``
+Canalización perezosa por etapas (generadores): recorrido con poda de
+directorios ignorados -> clasificación por tipo -> resumen por archivo
+(estructura Python con ``CodeAnalyzer``) -> ranking por relevancia al
+prompt -> empaquetado de los mejores bajo un presupuesto de tokens. Los
+resúmenes se cachean por (ruta, mtime, tamaño): reanalizar un repositorio
+grande solo procesa lo que cambió.
+"""
+
+import heapq
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .context import count_tokens
+from .test_generator import CodeAnalyzer
+
+IGNORED_DIRS = (
+    ".git",
+    ".hg",
+    ".svn",
+    "node_modules",
+    "__pycache__",
+    ".venv",
+    "venv",
+    "env",
+    ".tox",
+    ".nox",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    ".idea",
+    ".vscode",
+    "dist",
+    "build",
+    "htmlcov",
+    ".eggs",
+)
+
+# Extensión -> tipo; lo no listado se trata como binario y se omite
+KINDS = {
+    ".py": "python",
+    ".pyi": "python",
+    **dict.fromkeys(
+        (".js", ".jsx", ".ts", ".tsx", ".go", ".java", ".rs", ".c", ".h", ".cpp")
+        + (".hpp", ".cs", ".rb", ".php", ".sh", ".sql", ".html", ".css", ".vue"),
+        "code",
+    ),
+    **dict.fromkeys(
+        (".json", ".yaml", ".yml", ".toml", ".ini", ".cfg", ".env", ".conf"),
+        "config",
+    ),
+    **dict.fromkeys((".md", ".rst", ".txt"), "docs"),
+    **dict.fromkeys((".csv", ".tsv", ".jsonl"), "data"),
+}
+_SPECIAL_NAMES = {
+    "Dockerfile": "config",
+    "Makefile": "config",
+    "LICENSE": "docs",
+    "requirements.txt": "config",
+}
+# Peso base de cada tipo en el ranking (a igualdad de coincidencias)
+_KIND_PRIOR = {"python": 1.0, "code": 0.8, "config": 0.5, "docs": 0.6, "data": 0.1}
+
+_TERMS = re.compile(r"[A-Za-z0-9]+")
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def terms(text: str) -> List[str]:
+    """Términos en minúsculas; parte snake_case, kebab-case y CamelCase"""
+    out = []
+    for word in _TERMS.findall(_CAMEL.sub(" ", text)):
+        word = word.lower()
+        if len(word) > 2:
+            out.append(word)
+    return out
+
+
+@dataclass
+class AnalysisConfig:
+    """Parámetros del análisis (sección ``analysis`` en models.json)"""
+
+    # Archivos que se recorren como máximo
+    max_files: int = 5000
+    # Archivos mayores no se resumen (solo cuentan en las estadísticas)
+    max_file_bytes: int = 512 * 1024
+    # Archivos que entran en el ranking final
+    top_k: int = 20
+    # Tokens del contexto empaquetado si la ventana del modelo lo permite
+    token_budget: int = 3000
+    # Caracteres de cada archivo que se citan en el contexto
+    excerpt_chars: int = 600
+    # Resúmenes cacheados (LRU)
+    cache_entries: int = 20000
+    ignore_dirs: Tuple[str, ...] = IGNORED_DIRS
+    include_hidden: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "AnalysisConfig":
+        """Construye la configuración ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        values = {k: v for k, v in data.items() if k in known}
+        if "ignore_dirs" in values:
+            values["ignore_dirs"] = tuple(values["ignore_dirs"])
+        return cls(**values)
+
+
+@dataclass
+class FileRef:
+    path: str  # relativa a la raíz, con "/"
+    abs_path: str
+    size: int
+    mtime_ns: int
+    kind: str = "other"
+
+
+@dataclass
+class FileSummary:
+    """Resumen cacheable de un archivo"""
+
+    path: str
+    kind: str
+    size: int
+    lines: int = 0
+    classes: List[str] = field(default_factory=list)
+    functions: List[str] = field(default_factory=list)
+    imports: List[str] = field(default_factory=list)
+    excerpt: str = ""
+    # Términos indexados para el ranking (ruta, símbolos, extracto)
+    path_terms: Tuple[str, ...] = ()
+    symbol_terms: Tuple[str, ...] = ()
+    text_terms: Tuple[str, ...] = ()
+    error: Optional[str] = None
+
+
+@dataclass
+class AnalysisResult:
+    root: str
+    context: str
+    tokens: int
+    budget: int
+    files_seen: int = 0
+    files_summarized: int = 0
+    files_included: List[str] = field(default_factory=list)
+    by_kind: Dict[str, int] = field(default_factory=dict)
+    skipped: int = 0
+    truncated: bool = False
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "root": self.root,
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "files_seen": self.files_seen,
+            "files_summarized": self.files_summarized,
+            "files_included": self.files_included,
+            "by_kind": self.by_kind,
+            "skipped": self.skipped,
+            "truncated": self.truncated,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+def walk_tree(root: str, config: AnalysisConfig) -> Iterator[FileRef]:
+    """Archivos bajo ``root`` (scandir iterativo, sin entrar en ignorados)"""
+    ignored = set(config.ignore_dirs)
+    stack = [root]
+    seen = 0
+    while stack:
+        directory = stack.pop()
+        try:
+            it = os.scandir(directory)
+        except OSError:
+            continue
+        with it:
+            subdirs = []
+            for entry in it:
+                name = entry.name
+                if name.startswith(".") and not config.include_hidden:
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if name not in ignored:
+                            subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                rel = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                yield FileRef(rel, entry.path, st.st_size, st.st_mtime_ns)
+                seen += 1
+                if seen >= config.max_files:
+                    return
+        # Orden estable: los subdirectorios se visitan alfabéticamente
+        stack.extend(sorted(subdirs, reverse=True))
+
+
+def classify(refs: Iterable[FileRef]) -> Iterator[FileRef]:
+    for ref in refs:
+        name = ref.path.rsplit("/", 1)[-1]
+        ref.kind = _SPECIAL_NAMES.get(name) or KINDS.get(
+            os.path.splitext(name)[1].lower(), "other"
+        )
+        yield ref
+
+
+def summarize_file(ref: FileRef, config: AnalysisConfig) -> FileSummary:
+    """Resumen de un archivo de texto (estructura si es Python)"""
+    summary = FileSummary(ref.path, ref.kind, ref.size)
+    if ref.kind == "python":
+        info = CodeAnalyzer.analyze_python_file(ref.abs_path)
+        content = info.get("content", "")
+        summary.error = info.get("error")
+        summary.classes = [c["name"] for c in info.get("classes", [])]
+        summary.functions = [f["name"] for f in info.get("functions", [])]
+        summary.imports = sorted(set(info.get("imports", [])))[:30]
+    else:
+        try:
+            with open(ref.abs_path, "r", encoding="utf-8", errors="replace") as fh:
+                content = fh.read(config.excerpt_chars * 4)
+        except OSError as e:
+            content, summary.error = "", str(e)
+    summary.lines = content.count("\n") + (1 if content else 0)
+    summary.excerpt = content[: config.excerpt_chars].strip()
+    summary.path_terms = tuple(terms(ref.path))
+    summary.symbol_terms = tuple(terms(" ".join(summary.classes + summary.functions)))
+    summary.text_terms = tuple(set(terms(summary.excerpt)))
+    return summary
+
+
+def score(summary: FileSummary, query: Counter) -> float:
+    """Relevancia al prompt: ruta > símbolos > texto, más el peso del tipo"""
+    if not query:
+        return _KIND_PRIOR.get(summary.kind, 0.0)
+    hits = 0.0
+    for term, weight in ((summary.path_terms, 3.0), (summary.symbol_terms, 2.0)):
+        hits += weight * sum(query[t] for t in set(term) if t in query)
+    hits += sum(query[t] for t in summary.text_terms if t in query)
+    # Entradas y documentación de la raíz ayudan a orientarse
+    depth = summary.path.count("/")
+    entry = (
+        0.5
+        if summary.path.rsplit("/", 1)[-1]
+        .lower()
+        .startswith(("readme", "main", "__init__", "app", "setup", "pyproject"))
+        else 0.0
+    )
+    return hits + _KIND_PRIOR.get(summary.kind, 0.0) + entry - 0.1 * depth
+
+
+def render(summary: FileSummary) -> str:
+    head = f"### {summary.path} ({summary.kind}, {summary.lines} líneas)"
+    parts = [head]
+    if summary.classes:
+        parts.append("clases: " + ", ".join(summary.classes[:20]))
+    if summary.functions:
+        parts.append("funciones: " + ", ".join(summary.functions[:30]))
+    if summary.imports:
+        parts.append("imports: " + ", ".join(summary.imports[:15]))
+    if summary.error:
+        parts.append(f"error: {summary.error}")
+    elif summary.excerpt:
+        parts.append("```\n" + summary.excerpt + "\n```")
+    return "\n".join(parts)
+
+
+class SummaryCache:
+    """LRU de resúmenes con validación por (mtime, tamaño)"""
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Tuple[int, int, FileSummary]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ref: FileRef) -> Optional[FileSummary]:
+        with self._lock:
+            item = self._items.get(ref.abs_path)
+            if item is None or item[:2] != (ref.mtime_ns, ref.size):
+                self.misses += 1
+                return None
+            self._items.move_to_end(ref.abs_path)
+            self.hits += 1
+            return item[2]
+
+    def put(self, ref: FileRef, summary: FileSummary) -> None:
+        with self._lock:
+            self._items[ref.abs_path] = (ref.mtime_ns, ref.size, summary)
+            self._items.move_to_end(ref.abs_path)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class DirectoryAnalyzer:
+    """Construye el contexto de un directorio para un prompt"""
+
+    def __init__(self, config: Optional[AnalysisConfig] = None):
+        self.config = config or AnalysisConfig()
+        self.cache = SummaryCache(self.config.cache_entries)
+
+    def summaries(
+        self, refs: Iterable[FileRef], result: AnalysisResult
+    ) -> Iterator[FileSummary]:
+        for ref in refs:
+            result.files_seen += 1
+            result.by_kind[ref.kind] = result.by_kind.get(ref.kind, 0) + 1
+            if ref.kind == "other" or ref.size > self.config.max_file_bytes:
+                result.skipped += 1
+                continue
+            cached = self.cache.get(ref)
+            if cached is not None:
+                result.cache_hits += 1
+                yield cached
+                continue
+            result.cache_misses += 1
+            summary = summarize_file(ref, self.config)
+            self.cache.put(ref, summary)
+            yield summary
+
+    def analyze(
+        self, root: str, prompt: str = "", budget: Optional[int] = None
+    ) -> AnalysisResult:
+        cfg = self.config
+        budget = cfg.token_budget if budget is None else budget
+        result = AnalysisResult(root=root, context="", tokens=0, budget=budget)
+        query = Counter(terms(prompt))
+        refs = classify(walk_tree(root, cfg))
+        scored = ((score(s, query), s.path, s) for s in self.summaries(refs, result))
+        # Solo los top_k viven a la vez: la canalización no acumula el árbol
+        top = heapq.nlargest(cfg.top_k, scored, key=lambda item: item[0])
+        result.files_summarized = result.cache_hits + result.cache_misses
+        if result.files_seen >= cfg.max_files:
+            result.truncated = True
+
+        kinds = ", ".join(f"{k}: {n}" for k, n in sorted(result.by_kind.items()))
+        header = (
+            f"Análisis del directorio {os.path.basename(root) or root}: "
+            f"{result.files_seen} archivos ({kinds})"
+            + (" [recorrido truncado]" if result.truncated else "")
+            + f". Los {len(top)} más relevantes para la consulta:"
+        )
+        if count_tokens(header) > budget:
+            header = f"Directorio {os.path.basename(root) or root}:"
+        blocks = [header] if count_tokens(header) <= budget else []
+        used = count_tokens(header) if blocks else 0
+        for _, path, summary in top:
+            block = render(summary)
+            cost = count_tokens(block)
+            if used + cost > budget:
+                # Sin sitio para el bloque completo: al menos la cabecera
+                head = block.split("\n", 1)[0]
+                if used + count_tokens(head) > budget:
+                    continue
+                block, cost = head, count_tokens(head)
+            blocks.append(block)
+            used += cost
+            result.files_included.append(path)
+        # Sin archivos empaquetados no hay contexto que enviar
+        if not result.files_included:
+            blocks, used = [], 0
+        result.context = "\n\n".join(blocks)
+        result.tokens = used
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_summaries": len(self.cache),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+        }
@@ -0,0 +1,238 @@
+"""
+Solicitudes con cobertura (hedging) para recortar la latencia de cola
+Si una llamada asíncrona no ha terminado tras el percentil configurado de
+la latencia reciente del modelo, se lanza un duplicado contra el mismo
+modelo o el siguiente de la cadena de fallback; gana la primera respuesta
+y la otra se cancela. Un presupuesto limita los duplicados a una fracción
+de las solicitudes (p.ej. 5%).
+"""
+
+import asyncio
+import contextlib
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .retry import RetryBudget
+
+
+@dataclass
+class HedgeConfig:
+    """Parámetros de hedging (sección ``hedge`` en models.json)"""
+
+    enabled: bool = False
+    # Percentil de la latencia reciente tras el que se lanza el duplicado
+    percentile: float = 0.95
+    # Muestras mínimas del modelo antes de cubrir (sin datos no hay retraso fiable)
+    min_samples: int = 20
+    min_delay: float = 0.5
+    max_delay: float = 60.0
+    # "same" repite contra el mismo modelo; "secondary" usa el siguiente de la cadena
+    target: str = "same"
+    # Fracción máxima de solicitudes extra y ventana del presupuesto
+    budget_ratio: float = 0.05
+    budget_window: float = 60.0
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "HedgeConfig":
+        """Construye la configuración ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+class HedgeBudget(RetryBudget):
+    """Presupuesto estricto: nunca más de ``ratio`` duplicados por solicitud
+
+    A diferencia de los reintentos no hay mínimo garantizado: con poco
+    tráfico no se cubre nada hasta acumular solicitudes suficientes.
+    """
+
+    def __init__(self, ratio: float = 0.05, window: float = 60.0):
+        super().__init__(ratio=ratio, min_retries=0, window=window)
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if len(self._retries) + 1 > self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre valores ya ordenados"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def estimate_saved(latencies: List[float], elapsed: float) -> float:
+    """Latencia que habría quedado por esperar si el duplicado no hubiese ganado
+
+    Media de las latencias recientes mayores que ``elapsed`` (la original
+    seguía en curso) menos ``elapsed``; 0 si ninguna llegó tan lejos.
+    """
+    tail = [lat for lat in latencies if lat > elapsed]
+    if not tail:
+        return 0.0
+    return sum(tail) / len(tail) - elapsed
+
+
+class HedgeStats:
+    """Contadores de hedging y latencias de extremo a extremo"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.budget_denied = 0
+        self.no_estimate = 0
+        self.saved_seconds = 0.0
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    def count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def observe(self, latency: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self._latencies.append(latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            data = {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "primary_wins": self.primary_wins,
+                "budget_denied": self.budget_denied,
+                "no_estimate": self.no_estimate,
+                "saved_seconds": round(self.saved_seconds, 4),
+            }
+        data["hedge_ratio"] = (
+            round(data["hedged"] / data["requests"], 4) if data["requests"] else 0.0
+        )
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = percentile(latencies, q)
+            data[name] = round(value, 4) if value is not None else None
+        return data
+
+
+class Hedger:
+    """Ejecuta llamadas asíncronas con un duplicado tardío opcional"""
+
+    def __init__(
+        self,
+        config: Callable[[str], HedgeConfig],
+        latencies: Callable[[str], List[float]],
+        budget: Optional[RetryBudget] = None,
+    ):
+        self._config = config
+        self._latencies = latencies
+        defaults = config("")
+        self.budget = budget or HedgeBudget(
+            defaults.budget_ratio, defaults.budget_window
+        )
+        self.stats = HedgeStats()
+
+    def config_for(self, model: str) -> HedgeConfig:
+        return self._config(model)
+
+    def delay_for(self, model: str) -> Optional[float]:
+        """Retraso antes del duplicado (``None`` si no hay datos suficientes)"""
+        cfg = self._config(model)
+        latencies = self._latencies(model)
+        if len(latencies) < cfg.min_samples:
+            return None
+        value = percentile(latencies, cfg.percentile)
+        return min(cfg.max_delay, max(cfg.min_delay, value))
+
+    async def run(
+        self,
+        model: str,
+        call: Callable[[str], Awaitable[Any]],
+        hedge_model: Optional[str] = None,
+    ) -> Tuple[Any, str, float]:
+        """``(resultado, modelo ganador, latencia de esa llamada)``"""
+        started = time.monotonic()
+        if not self._config(model).enabled:
+            result = await call(model)
+            return result, model, time.monotonic() - started
+        self.budget.record_request()
+        delay = self.delay_for(model)
+        if delay is None:
+            self.stats.count("no_estimate")
+            result = await call(model)
+            latency = time.monotonic() - started
+            self.stats.observe(latency)
+            return result, model, latency
+
+        primary = asyncio.ensure_future(call(model))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done and not self.budget.try_acquire():
+                self.stats.count("budget_denied")
+                done, _ = await asyncio.wait({primary})
+        except BaseException:
+            await _cancel(primary)
+            raise
+        if done:
+            result = primary.result()
+            latency = time.monotonic() - started
+            self.stats.observe(latency)
+            return result, model, latency
+
+        hedge_model = hedge_model or model
+        self.stats.count("hedged")
+        hedge_started = time.monotonic()
+        hedge = asyncio.ensure_future(call(hedge_model))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in (t for t in (primary, hedge) if t in done):
+                    if task.exception() is not None:
+                        continue
+                    elapsed = time.monotonic() - started
+                    self.stats.observe(elapsed)
+                    if task is hedge:
+                        self.stats.count("hedge_wins")
+                        self.stats.count(
+                            "saved_seconds",
+                            estimate_saved(self._latencies(model), elapsed),
+                        )
+                        return (
+                            task.result(),
+                            hedge_model,
+                            elapsed - (hedge_started - started),
+                        )
+                    self.stats.count("primary_wins")
+                    return task.result(), model, elapsed
+            # Ambas fallaron: se propaga el error de la original
+            raise primary.exception()
+        finally:
+            for task in (primary, hedge):
+                await _cancel(task)
+
+
+async def _cancel(task: "asyncio.Future[Any]") -> None:
+    """Cancela ``task`` (si sigue en curso) y espera a que libere recursos"""
+    if task.done():
+        if not task.cancelled():
+            task.exception()  # marcar la excepción como recuperada
+        return
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError, Exception):
+        await task
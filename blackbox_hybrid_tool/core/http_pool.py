@@ -0,0 +1,236 @@
+"""
+Pool de conexiones HTTP para los clientes de Blackbox
+Mantiene una sesión keep-alive reutilizable para no pagar un handshake
+TCP+TLS en cada solicitud al endpoint de chat. La ruta síncrona usa
+requests; la asíncrona comparte un httpx.AsyncClient por event loop.
+"""
+
+import asyncio
+import importlib.util
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict, fields
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def _h2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class PoolConfig:
+    """Parámetros del pool (sección ``pool`` de ``models.blackbox`` en models.json)"""
+
+    pool_connections: int = 10  # hosts distintos con pool propio
+    pool_maxsize: int = 20  # conexiones máximas por host
+    pool_block: bool = False  # esperar conexión libre en lugar de abrir una extra
+    keep_alive: bool = True
+    keepalive_expiry: float = 30.0
+    # Conexiones simultáneas totales del cliente asíncrono
+    max_connections: int = 200
+    # requests/urllib3 sólo habla HTTP/1.1; el cliente asíncrono usa HTTP/2
+    # cuando el paquete h2 está instalado.
+    http2: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "PoolConfig":
+        """Construye la configuración ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+class ConnectionPool:
+    """Sesión HTTP compartida con pool de conexiones y estadísticas de uso"""
+
+    def __init__(
+        self,
+        config: Optional[PoolConfig] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.config = config or PoolConfig()
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._adapter: Optional[HTTPAdapter] = None
+        self._async_transport = async_transport
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_in_flight = 0
+        self._async_peak = 0
+        self._requests = 0
+        self._errors = 0
+        self._closed = False
+
+    @property
+    def session(self) -> requests.Session:
+        """Sesión perezosa: se crea en el primer uso"""
+        with self._lock:
+            if self._session is None:
+                if self._closed:
+                    raise RuntimeError("El pool de conexiones está cerrado")
+                self._session = self._build_session()
+            return self._session
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        self._adapter = HTTPAdapter(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+            pool_block=self.config.pool_block,
+        )
+        session.mount("https://", self._adapter)
+        session.mount("http://", self._adapter)
+        if not self.config.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST reutilizando conexiones del pool"""
+        session = self.session
+        with self._lock:
+            self._requests += 1
+        try:
+            return session.post(url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def async_client(self) -> httpx.AsyncClient:
+        """Cliente asíncrono compartido del event loop actual
+
+        httpx liga sus conexiones al loop donde se crean, así que se
+        reconstruye si cambia el loop (p.ej. entre ``asyncio.run``).
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El pool de conexiones está cerrado")
+            client = self._async_client
+            if client is None or client.is_closed or self._async_loop is not loop:
+                client = self._build_async_client()
+                self._async_client = client
+                self._async_loop = loop
+            return client
+
+    def _build_async_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.config.max_connections,
+            max_keepalive_connections=(
+                self.config.pool_maxsize if self.config.keep_alive else 0
+            ),
+            keepalive_expiry=self.config.keepalive_expiry,
+        )
+        return httpx.AsyncClient(
+            limits=limits,
+            http2=bool(self.config.http2 and _h2_available()),
+            timeout=httpx.Timeout(None),
+            transport=self._async_transport,
+        )
+
+    async def apost(self, url: str, **kwargs) -> httpx.Response:
+        """POST asíncrono reutilizando conexiones del cliente compartido"""
+        client = self.async_client()
+        with self._lock:
+            self._requests += 1
+            self._async_in_flight += 1
+            self._async_peak = max(self._async_peak, self._async_in_flight)
+        try:
+            return await client.post(url, **kwargs)
+        except httpx.HTTPError:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._async_in_flight -= 1
+
+    @asynccontextmanager
+    async def astream(self, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """POST asíncrono con cuerpo en streaming (``async with``)"""
+        client = self.async_client()
+        with self._lock:
+            self._requests += 1
+            self._async_in_flight += 1
+            self._async_peak = max(self._async_peak, self._async_in_flight)
+        try:
+            async with client.stream("POST", url, **kwargs) as response:
+                yield response
+        except httpx.HTTPError:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._async_in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del pool para monitoreo"""
+        hosts = []
+        adapter = self._adapter
+        if adapter is not None:
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                try:
+                    pool = pools[key]
+                except KeyError:
+                    continue
+                idle = sum(1 for c in list(pool.pool.queue) if c is not None)
+                hosts.append(
+                    {
+                        "host": pool.host,
+                        "port": pool.port,
+                        "connections_opened": pool.num_connections,
+                        "requests": pool.num_requests,
+                        "idle": idle,
+                    }
+                )
+        with self._lock:
+            return {
+                "config": asdict(self.config),
+                "requests": self._requests,
+                "errors": self._errors,
+                "connections_opened": sum(h["connections_opened"] for h in hosts),
+                "hosts": hosts,
+                "async": {
+                    "active": self._async_client is not None
+                    and not self._async_client.is_closed,
+                    "http2": bool(self.config.http2 and _h2_available()),
+                    "in_flight": self._async_in_flight,
+                    "peak_in_flight": self._async_peak,
+                },
+                "closed": self._closed,
+            }
+
+    def close(self) -> None:
+        """Cierra las conexiones síncronas y marca el pool como cerrado
+
+        El cliente asíncrono sólo puede cerrarse desde su loop; usar
+        :meth:`aclose` en contextos async.
+        """
+        with self._lock:
+            session, self._session = self._session, None
+            self._adapter = None
+            self._closed = True
+        if session is not None:
+            session.close()
+
+    async def aclose(self) -> None:
+        """Cierra el cliente asíncrono y la sesión síncrona"""
+        with self._lock:
+            client, self._async_client = self._async_client, None
+            self._async_loop = None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+        self.close()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,405 @@
+"""
+Limitador de tasa del lado del cliente para Blackbox
+Token buckets de solicitudes/minuto y tokens/minuto por API key y por
+modelo, más un límite de concurrencia con cola FIFO. Las llamadas esperan
+su turno hasta ``max_queue_wait`` en lugar de salir en ráfaga y volver
+como 429 del upstream.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass, fields
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
+
+from ..exceptions import BlackboxRateLimitError
+
+
+@dataclass
+class RateLimitConfig:
+    """Límites de un ámbito (sección ``rate_limit`` en models.json)
+
+    ``None`` desactiva el límite correspondiente.
+    """
+
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    # Capacidad de ráfaga de cada bucket, en segundos de tasa
+    burst_seconds: float = 60.0
+    # Tiempo máximo en cola antes de rechazar la llamada localmente
+    max_queue_wait: float = 30.0
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "RateLimitConfig":
+        """Construye la configuración ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+    @property
+    def active(self) -> bool:
+        return bool(
+            self.requests_per_minute or self.tokens_per_minute or self.max_concurrency
+        )
+
+
+def default_requests_per_minute() -> Optional[float]:
+    """``AppSettings.rate_limit_requests`` (CHISPART_RATE_LIMIT) si está disponible"""
+    try:
+        from ..config.settings import settings
+    except ImportError:
+        return None
+    value = getattr(settings, "rate_limit_requests", None)
+    return float(value) if value else None
+
+
+def estimate_tokens(payload: Dict[str, Any]) -> int:
+    """Tokens aproximados de una solicitud (~4 caracteres por token + max_tokens)"""
+    chars = 0
+    for message in payload.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else message
+        if isinstance(content, str):
+            chars += len(content)
+        elif content is not None:
+            chars += len(json.dumps(content, ensure_ascii=False))
+    return chars // 4 + int(payload.get("max_tokens") or 0)
+
+
+class TokenBucket:
+    """Bucket de recarga continua
+
+    Una solicitud mayor que la capacidad se admite con el bucket lleno y lo
+    deja en negativo, de modo que las siguientes esperan la deuda.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = float(per_minute) / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Segundos hasta poder consumir ``amount`` (0 si ya es posible)"""
+        self._refill(now)
+        need = min(amount, self.capacity)
+        if self.level >= need:
+            return 0.0
+        return (need - self.level) / self.rate
+
+    def consume(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= amount
+
+
+class _Waiter:
+    __slots__ = ("granted", "notify")
+
+    def __init__(self, notify: Callable[[], None]):
+        self.granted = False
+        self.notify = notify
+
+
+class ConcurrencyGate:
+    """Semáforo FIFO compartido por hilos y corrutinas
+
+    Al liberar una plaza se entrega directamente al primero de la cola, así
+    que una llegada nueva no adelanta a quien ya estaba esperando.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+        self._waiters: Deque[_Waiter] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _enter(self, notify: Callable[[], None]) -> Optional[_Waiter]:
+        """``None`` si hay plaza libre; si no, el waiter encolado"""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return None
+            waiter = _Waiter(notify)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Saca al waiter de la cola; True si ya se le había asignado plaza"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def acquire(self, timeout: float) -> bool:
+        event = threading.Event()
+        waiter = self._enter(event.set)
+        if waiter is None or event.wait(timeout):
+            return True
+        return self._abandon(waiter)
+
+    async def aacquire(self, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def notify() -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+
+        waiter = self._enter(notify)
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._abandon(waiter)
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.notify()
+            else:
+                self.active -= 1
+
+
+class _Scope:
+    """Buckets, concurrencia y métricas de un ámbito (API key o modelo)"""
+
+    def __init__(self, name: str, config: RateLimitConfig):
+        self.name = name
+        self.config = config
+        self.requests = (
+            TokenBucket(config.requests_per_minute, config.burst_seconds)
+            if config.requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket(config.tokens_per_minute, config.burst_seconds)
+            if config.tokens_per_minute
+            else None
+        )
+        self.gate = (
+            ConcurrencyGate(config.max_concurrency) if config.max_concurrency else None
+        )
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def consume(self, tokens: int, now: float) -> None:
+        if self.requests is not None:
+            self.requests.consume(1, now)
+        if self.tokens is not None and tokens:
+            self.tokens.consume(tokens, now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "config": asdict(self.config),
+            "queue_depth": self.queued,
+            "max_queue_depth": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait": (
+                round(self.wait_total / self.admitted, 4) if self.admitted else 0.0
+            ),
+            "max_wait": round(self.wait_max, 4),
+            "in_flight": self.gate.active if self.gate else None,
+            "requests_available": (
+                round(self.requests.level, 2) if self.requests else None
+            ),
+            "tokens_available": round(self.tokens.level, 2) if self.tokens else None,
+        }
+
+
+class RateLimiter:
+    """Limitadores por API key y por modelo con cola y espera máxima
+
+    Cada llamada consume de todos los ámbitos aplicables a la vez (la API
+    key y el modelo) y ocupa una plaza de concurrencia en cada uno mientras
+    dura. Si no puede entrar antes de ``max_queue_wait`` se lanza
+    :class:`BlackboxRateLimitError` sin llegar al upstream.
+    """
+
+    def __init__(
+        self,
+        key_config: RateLimitConfig,
+        model_config: Callable[[str], RateLimitConfig],
+        key_id: str = "default",
+    ):
+        self._lock = threading.Lock()
+        self._key = _Scope(f"key:{key_id}", key_config)
+        self._model_config = model_config
+        self._models: Dict[str, _Scope] = {}
+
+    def _scopes(self, model: str) -> List[_Scope]:
+        with self._lock:
+            scope = self._models.get(model)
+            if scope is None:
+                scope = self._models[model] = _Scope(model, self._model_config(model))
+        return [s for s in (self._key, scope) if s.config.active]
+
+    def _reserve(self, scopes: List[_Scope], tokens: int) -> float:
+        """Consume de todos los buckets si es posible; si no, la espera necesaria"""
+        now = time.monotonic()
+        with self._lock:
+            wait = max(s.wait_time(tokens, now) for s in scopes)
+            if wait == 0:
+                for s in scopes:
+                    s.consume(tokens, now)
+            return wait
+
+    def _queue(self, scopes: List[_Scope], delta: int) -> None:
+        with self._lock:
+            for s in scopes:
+                s.queued += delta
+                s.max_queued = max(s.max_queued, s.queued)
+
+    def _admit(self, scopes: List[_Scope], waited: float) -> None:
+        with self._lock:
+            for s in scopes:
+                s.admitted += 1
+                s.wait_total += waited
+                s.wait_max = max(s.wait_max, waited)
+
+    def _reject(
+        self, scopes: List[_Scope], model: str, retry_after: Optional[float]
+    ) -> BlackboxRateLimitError:
+        with self._lock:
+            for s in scopes:
+                s.rejected += 1
+        max_wait = min(s.config.max_queue_wait for s in scopes)
+        return BlackboxRateLimitError(
+            f"Límite de tasa local para {model}: sin turno en {max_wait:.1f}s",
+            retry_after=retry_after,
+            model=model,
+        )
+
+    def _bucket_wait(
+        self, scopes: List[_Scope], model: str, tokens: int, deadline: float
+    ) -> float:
+        """0 si ya se consumió; si no, cuánto dormir (o rechaza si no llega)"""
+        wait = self._reserve(scopes, tokens)
+        if wait and time.monotonic() + wait > deadline:
+            raise self._reject(scopes, model, wait)
+        return wait
+
+    @contextmanager
+    def acquire(self, model: str, tokens: int = 0) -> Iterator[None]:
+        """Turno síncrono para una llamada a ``model`` de ~``tokens`` tokens"""
+        scopes = self._scopes(model)
+        if not scopes:
+            yield
+            return
+        start = time.monotonic()
+        deadline = start + min(s.config.max_queue_wait for s in scopes)
+        held: List[ConcurrencyGate] = []
+        self._queue(scopes, 1)
+        try:
+            while True:
+                wait = self._bucket_wait(scopes, model, tokens, deadline)
+                if not wait:
+                    break
+                time.sleep(wait)
+            for s in scopes:
+                if s.gate is None:
+                    continue
+                if not s.gate.acquire(max(0.0, deadline - time.monotonic())):
+                    raise self._reject(scopes, model, None)
+                held.append(s.gate)
+            self._admit(scopes, time.monotonic() - start)
+        except BaseException:
+            for gate in held:
+                gate.release()
+            raise
+        finally:
+            self._queue(scopes, -1)
+        try:
+            yield
+        finally:
+            for gate in held:
+                gate.release()
+
+    @asynccontextmanager
+    async def aacquire(self, model: str, tokens: int = 0) -> AsyncIterator[None]:
+        """Versión asíncrona de :meth:`acquire` (no bloquea el event loop)"""
+        scopes = self._scopes(model)
+        if not scopes:
+            yield
+            return
+        start = time.monotonic()
+        deadline = start + min(s.config.max_queue_wait for s in scopes)
+        held: List[ConcurrencyGate] = []
+        self._queue(scopes, 1)
+        try:
+            while True:
+                wait = self._bucket_wait(scopes, model, tokens, deadline)
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+            for s in scopes:
+                if s.gate is None:
+                    continue
+                if not await s.gate.aacquire(max(0.0, deadline - time.monotonic())):
+                    raise self._reject(scopes, model, None)
+                held.append(s.gate)
+            self._admit(scopes, time.monotonic() - start)
+        except BaseException:
+            for gate in held:
+                gate.release()
+            raise
+        finally:
+            self._queue(scopes, -1)
+        try:
+            yield
+        finally:
+            for gate in held:
+                gate.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidad de cola, tiempos de espera y ocupación por ámbito"""
+        with self._lock:
+            return {
+                "key": self._key.snapshot(),
+                "models": {
+                    name: scope.snapshot()
+                    for name, scope in self._models.items()
+                    if scope.config.active
+                },
+            }
@@ -0,0 +1,274 @@
+"""
+Caché de respuestas para completions deterministas
+La clave es un hash SHA-256 del payload canónico (modelo, mensajes, tools,
+max_tokens, temperatura). Hay un nivel en memoria (LRU acotado por bytes)
+y un nivel opcional en disco (SQLite) que sobrevive entre procesos, útil
+para la generación de tests y ``ai-dev`` que repiten las mismas consultas.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional, Tuple
+
+# Campos del payload que determinan la respuesta
+KEY_FIELDS = ("model", "messages", "tools", "tool_choice", "max_tokens", "temperature")
+
+
+@dataclass
+class CacheConfig:
+    """Parámetros de la caché (sección ``cache`` de ``models.blackbox``)"""
+
+    enabled: bool = True
+    # Si es False, sólo se cachea cuando la llamada pasa ``cache=True``
+    default: bool = False
+    # Por encima de esta temperatura la respuesta no es reproducible
+    max_temperature: float = 0.3
+    ttl: float = 3600.0
+    max_entries: int = 1024
+    max_bytes: int = 16 * 1024 * 1024
+    # Nivel en disco (SQLite); desactivado si no hay ruta
+    disk_path: Optional[str] = None
+    disk_max_bytes: int = 256 * 1024 * 1024
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "CacheConfig":
+        """Construye la configuración ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """Hash canónico de los campos relevantes de un payload de chat"""
+    relevant = {k: payload.get(k) for k in KEY_FIELDS if payload.get(k) is not None}
+    canonical = json.dumps(
+        relevant, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    """Nivel persistente en SQLite con expiración y desalojo por bytes"""
+
+    def __init__(self, path: str, max_bytes: int):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed "
+            "ON responses (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, now: float) -> Tuple[Optional[str], Optional[float], bool]:
+        """Devuelve ``(valor, expires_at, expirado)``"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None, None, False
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None, None, True
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row[0], row[1], False
+
+    def set(self, key: str, value: str, size: int, expires_at: float) -> int:
+        """Guarda la entrada y devuelve cuántas se desalojaron"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, expires_at, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            evicted = 0
+            total = self._total_bytes()
+            while total > self.max_bytes:
+                row = self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+                total -= row[1]
+                evicted += 1
+            self._conn.commit()
+            return evicted
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {"entries": count, "bytes": self._total_bytes()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Caché de dos niveles (memoria LRU + SQLite opcional) con TTL"""
+
+    def __init__(self, config: Optional[CacheConfig] = None):
+        self.config = config or CacheConfig()
+        self._lock = threading.Lock()
+        # key -> (valor serializado, bytes, expira_en)
+        self._memory: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: Optional[_DiskTier] = None
+        if self.config.enabled and self.config.disk_path:
+            self._disk = _DiskTier(self.config.disk_path, self.config.disk_max_bytes)
+        self._counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    @property
+    def has_disk(self) -> bool:
+        return self._disk is not None
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def should_cache(self, payload: Dict[str, Any], requested: Optional[bool]) -> bool:
+        """Decide si una llamada participa en la caché
+
+        ``requested`` es la opción por solicitud (``cache=True/False``);
+        ``None`` aplica ``config.default``. Con temperatura por encima de
+        ``max_temperature`` se omite siempre y se cuenta como ``bypassed``.
+        """
+        if not self.config.enabled:
+            return False
+        wanted = self.config.default if requested is None else bool(requested)
+        if not wanted:
+            return False
+        temperature = payload.get("temperature")
+        if temperature is not None and temperature > self.config.max_temperature:
+            self._count("bypassed")
+            return False
+        return True
+
+    def get(self, key: str) -> Optional[Any]:
+        """Busca en memoria y luego en disco; ``None`` si no hay entrada válida"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._memory.move_to_end(key)
+                    self._counters["hits"] += 1
+                    self._counters["memory_hits"] += 1
+                    return json.loads(entry[0])
+                self._drop(key)
+                self._counters["expired"] += 1
+        if self._disk is not None:
+            raw, expires_at, expired = self._disk.get(key, now)
+            if expired:
+                self._count("expired")
+            if raw is not None:
+                with self._lock:
+                    self._counters["hits"] += 1
+                    self._counters["disk_hits"] += 1
+                    # Promover al nivel en memoria conservando la caducidad del disco
+                    self._put_memory(key, raw, len(raw.encode("utf-8")), expires_at)
+                return json.loads(raw)
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Guarda una respuesta serializable en JSON en ambos niveles"""
+        raw = json.dumps(value, ensure_ascii=False)
+        size = len(raw.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._counters["stores"] += 1
+            self._put_memory(key, raw, size, now + self.config.ttl)
+        if self._disk is not None:
+            evicted = self._disk.set(key, raw, size, now + self.config.ttl)
+            if evicted:
+                self._count("evictions", evicted)
+
+    def _put_memory(self, key: str, raw: str, size: int, expires_at: float) -> None:
+        """Inserta en el LRU y desaloja por número de entradas y bytes"""
+        if size > self.config.max_bytes:
+            return
+        self._drop(key)
+        self._memory[key] = (raw, size, expires_at)
+        self._memory_bytes += size
+        while self._memory and (
+            len(self._memory) > self.config.max_entries
+            or self._memory_bytes > self.config.max_bytes
+        ):
+            _, (_, old_size, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= old_size
+            self._counters["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos/fallos y ocupación de cada nivel"""
+        with self._lock:
+            data: Dict[str, Any] = dict(self._counters)
+            lookups = data["hits"] + data["misses"]
+            data["hit_ratio"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+            data["enabled"] = self.config.enabled
+            data["memory"] = {
+                "entries": len(self._memory),
+                "bytes": self._memory_bytes,
+                "max_entries": self.config.max_entries,
+                "max_bytes": self.config.max_bytes,
+            }
+        data["disk"] = self._disk.stats() if self._disk is not None else None
+        return data
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
@@ -0,0 +1,232 @@
+"""
+Política de reintentos para las llamadas a Blackbox
+Timeouts de conexión/lectura, backoff exponencial acotado con jitter,
+soporte de ``Retry-After`` y un presupuesto global de reintentos para no
+amplificar una caída del upstream.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..exceptions import BlackboxAPIError
+
+
+@dataclass
+class RetryPolicy:
+    """Parámetros de reintento (sección ``retry`` en models.json)
+
+    Sólo se reintentan fallos en los que el upstream no procesó la
+    solicitud: errores de conexión y los códigos de ``retry_statuses``.
+    Un timeout de lectura puede significar que la completion ya se cobró,
+    así que sólo se reintenta si ``retry_read_timeouts`` está activo.
+    """
+
+    max_attempts: int = 3
+    connect_timeout: float = 5.0
+    read_timeout: float = 120.0
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    jitter: bool = True
+    retry_statuses: Tuple[int, ...] = (429, 502, 503, 504)
+    retry_read_timeouts: bool = False
+    respect_retry_after: bool = True
+    max_retry_after: float = 30.0
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "RetryPolicy":
+        """Construye la política ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        values = {k: v for k, v in data.items() if k in known}
+        if "retry_statuses" in values:
+            values["retry_statuses"] = tuple(int(s) for s in values["retry_statuses"])
+        return cls(**values)
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """Timeout ``(connect, read)`` en el formato de requests"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def is_retryable_status(self, status: int) -> bool:
+        return status in self.retry_statuses
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Espera antes del intento ``attempt + 1`` (full jitter)"""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling) if self.jitter else ceiling
+        if retry_after is not None and self.respect_retry_after:
+            delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Segundos indicados por ``Retry-After`` (entero o fecha HTTP)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    """Limita los reintentos a una fracción de las solicitudes recientes
+
+    En una ventana deslizante de ``window`` segundos se permiten
+    ``max(min_retries, ratio * solicitudes)`` reintentos; así un upstream
+    caído no recibe ``max_attempts`` veces el tráfico normal.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "RetryBudget":
+        data = data if isinstance(data, dict) else {}
+        return cls(
+            ratio=float(data.get("ratio", 0.2)),
+            min_retries=int(data.get("min_retries", 10)),
+            window=float(data.get("window", 10.0)),
+        )
+
+    def _trim(self, now: float) -> None:
+        for q in (self._requests, self._retries):
+            while q and now - q[0] > self.window:
+                q.popleft()
+
+    def record_request(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """Consume un reintento si el presupuesto lo permite"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            allowed = max(self.min_retries, self.ratio * len(self._requests))
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+@dataclass
+class AttemptRecord:
+    """Resultado de un intento individual"""
+
+    attempt: int
+    elapsed: float
+    status: Optional[int] = None
+    error: Optional[str] = None
+    delay: Optional[float] = None
+
+
+@dataclass
+class RetryStats:
+    """Métricas acumuladas de intentos por cliente"""
+
+    requests: int = 0
+    attempts: int = 0
+    retries: int = 0
+    successes: int = 0
+    failures: int = 0
+    budget_exhausted: int = 0
+    by_status: Dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, attempts: List[AttemptRecord], ok: bool, budget_hit: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.attempts += len(attempts)
+            self.retries += max(0, len(attempts) - 1)
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+            if budget_hit:
+                self.budget_exhausted += 1
+            for a in attempts:
+                key = str(a.status) if a.status is not None else (a.error or "error")
+                self.by_status[key] = self.by_status.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {f.name: getattr(self, f.name) for f in fields(self)}
+            data.pop("_lock")
+            data["by_status"] = dict(self.by_status)
+        return data
+
+
+class RetryState:
+    """Contabilidad de una llamada con reintentos
+
+    Independiente del transporte: el cliente síncrono y el asíncrono
+    registran cada intento aquí y duermen el tiempo que devuelve
+    :meth:`failure` (``None`` significa rendirse y lanzar el error).
+    """
+
+    def __init__(self, policy: RetryPolicy, budget: RetryBudget, stats: RetryStats):
+        self.policy = policy
+        self.budget = budget
+        self.stats = stats
+        self.attempts: List[AttemptRecord] = []
+        self._started = 0.0
+        budget.record_request()
+
+    @property
+    def attempt(self) -> int:
+        return len(self.attempts) + 1
+
+    def start(self) -> None:
+        self._started = time.monotonic()
+
+    def success(self, status: int) -> None:
+        self.attempts.append(
+            AttemptRecord(self.attempt, time.monotonic() - self._started, status)
+        )
+        self.stats.record(self.attempts, ok=True, budget_hit=False)
+
+    def failure(
+        self,
+        error: BlackboxAPIError,
+        retryable: bool,
+        retry_after: Optional[float] = None,
+    ) -> Optional[float]:
+        record = AttemptRecord(
+            self.attempt,
+            time.monotonic() - self._started,
+            error.status_code,
+            None if error.status_code else type(error.__cause__ or error).__name__,
+        )
+        self.attempts.append(record)
+        budget_hit = False
+        if retryable and record.attempt < self.policy.max_attempts:
+            if self.budget.try_acquire():
+                record.delay = self.policy.backoff(record.attempt, retry_after)
+                return record.delay
+            budget_hit = True
+        error.attempts = self.attempts
+        self.stats.record(self.attempts, ok=False, budget_hit=budget_hit)
+        return None
@@ -0,0 +1,516 @@
+"""
+Router de modelos por latencia y coste
+Combina estadísticas móviles por modelo (p50/p95, tasa de error,
+throughput) con el contexto y los costes $/M tokens importados desde el
+CSV de modelos (``available_models``) para elegir un modelo por solicitud
+según una política:
+
+- ``cheapest``: el más barato que cumple el SLA de p95
+- ``fastest``: el de menor p50 observado
+- ``quality``: el de mayor calidad heurística dentro del presupuesto
+
+Cada decisión queda registrada (log en debug, búfer en memoria y,
+opcionalmente, un archivo JSONL escrito desde un hilo aparte) para poder
+auditarla.
+"""
+
+import json
+import logging
+import math
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("cheapest", "fastest", "quality")
+
+# Preferencias por calidad/caso de uso (sin gemini), de mayor a menor
+MODEL_PREFERENCES = [
+    # razonamiento de alta calidad
+    "o3",
+    "o1",
+    "claude-3.7",
+    "claude-3.5",
+    "deepseek-r1",
+    # código/generalistas potentes
+    "gpt-4o",
+    "gpt-4.1",
+    "mixtral",
+    "llama-3.1",
+    "llama-3",
+    "qwen3",
+    "qwen-3",
+    "qwen2.5",
+    # rápidos/compactos
+    "flash",
+    "mini",
+    "sonar",
+]
+
+# Prior de calidad por estrategia (sólo ordena; los datos medidos mandan)
+STRATEGY_HINTS: Dict[str, List[str]] = {
+    "auto": MODEL_PREFERENCES,
+    "fast": ["flash", "mini", "gpt-4o-mini", "o3-mini"],
+    "reasoning": [
+        "claude-3.7",
+        "claude-3.5",
+        "claude",
+        "o3",
+        "o1",
+        "deepseek-r1",
+        "reasoning",
+    ],
+    "code": ["o1", "gpt-4o", "gpt-4.1", "mixtral", "llama-3.1", "qwen3"],
+}
+
+STRATEGY_GENERIC: Dict[str, List[str]] = {
+    "auto": ["latest", "pro"],
+    "fast": ["flash", "mini", "pro", "latest"],
+}
+
+
+def heuristic_rank(model_id: str, strategy: str = "auto") -> tuple:
+    """Clave de orden por preferencia heurística (menor es mejor)"""
+    mid = str(model_id).lower()
+    for i, key in enumerate(STRATEGY_HINTS.get(strategy, MODEL_PREFERENCES)):
+        if key.lower() in mid:
+            return (0, i)
+    generic = STRATEGY_GENERIC.get(strategy, STRATEGY_GENERIC["fast"])
+    for j, key in enumerate(generic):
+        if key in mid:
+            return (1, j)
+    return (2, len(mid))
+
+
+def parse_cost(value: Any) -> Optional[float]:
+    """``"$5.00"``/``"5,00"``/``5`` -> 5.0 ($/M tokens); ``None`` si no hay dato"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace("$", "").replace(",", ".")
+    try:
+        return float(text) if text else None
+    except ValueError:
+        return None
+
+
+def parse_context(value: Any) -> Optional[int]:
+    """``"128k"``/``"1M"``/``"200000"`` -> tokens de contexto"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().lower().replace(",", "").replace("tokens", "")
+    factor = 1
+    if text.endswith("k"):
+        factor, text = 1_000, text[:-1]
+    elif text.endswith("m"):
+        factor, text = 1_000_000, text[:-1]
+    try:
+        return int(float(text) * factor) if text else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class RouterConfig:
+    """Política de enrutado (sección ``router`` en models.json)"""
+
+    enabled: bool = True
+    # Elegir modelo en cada solicitud sin modelo explícito
+    per_request: bool = True
+    policy: str = "quality"
+    # Política por estrategia (auto/fast/reasoning/code)
+    strategies: Dict[str, str] = field(
+        default_factory=lambda: {
+            "fast": "fastest",
+            "reasoning": "quality",
+            "code": "quality",
+        }
+    )
+    # SLA de latencia p95 (segundos) para ``cheapest``; None = sin SLA
+    sla_p95: Optional[float] = None
+    # Coste máximo estimado por solicitud (USD) para ``quality``; None = sin tope
+    max_cost: Optional[float] = None
+    # Modelos con más errores que esto quedan fuera (con datos suficientes)
+    max_error_rate: float = 0.5
+    # Muestras mínimas antes de confiar en las estadísticas de un modelo
+    min_samples: int = 5
+    window: int = 200
+    window_seconds: float = 900.0
+    # Tokens de salida supuestos si la solicitud no fija max_tokens
+    default_output_tokens: int = 512
+    decision_log_size: int = 200
+    # Archivo JSONL de auditoría de decisiones (opcional)
+    log_path: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "RouterConfig":
+        """Construye la configuración ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+    def policy_for(self, strategy: Optional[str]) -> str:
+        policy = self.strategies.get(strategy or "auto") or self.policy
+        return policy if policy in POLICIES else "quality"
+
+
+@dataclass
+class ModelProfile:
+    """Datos estáticos de un modelo (CSV de available_models)"""
+
+    model: str
+    context: Optional[int] = None
+    input_cost: Optional[float] = None
+    output_cost: Optional[float] = None
+
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any]) -> "ModelProfile":
+        return cls(
+            model=entry.get("model", ""),
+            context=parse_context(entry.get("context")),
+            input_cost=parse_cost(entry.get("input_cost")),
+            output_cost=parse_cost(entry.get("output_cost")),
+        )
+
+    def estimate_cost(self, input_tokens: int, output_tokens: int) -> Optional[float]:
+        """Coste estimado en USD de una solicitud (``None`` sin datos)"""
+        if self.input_cost is None and self.output_cost is None:
+            return None
+        return (
+            input_tokens * (self.input_cost or 0.0)
+            + output_tokens * (self.output_cost or 0.0)
+        ) / 1_000_000
+
+
+class _JsonlWriter:
+    """Añade líneas a un archivo JSONL desde un hilo propio
+
+    ``write`` sólo encola, así que registrar una decisión no hace E/S de
+    disco en el hilo (o event loop) que enruta; el hilo escribe en bloque
+    lo que se haya acumulado.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, line: str) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="router-log", daemon=True
+                )
+                self._thread.start()
+        self._queue.put(line)
+
+    def _run(self) -> None:
+        while True:
+            lines = [self._queue.get()]
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in lines
+            pending = [line for line in lines if line is not None]
+            try:
+                if pending:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write("".join(pending))
+            except OSError as e:
+                logger.warning(f"No se pudo escribir el log del router: {e}")
+            finally:
+                for _ in lines:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self) -> None:
+        """Espera a que las líneas encoladas estén en disco"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+class ModelStats:
+    """Ventana móvil de latencia, errores y throughput de un modelo"""
+
+    def __init__(self, window: int = 200, window_seconds: float = 900.0):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        # (instante, latencia, ok, tokens de salida)
+        self._samples: Deque[Tuple[float, float, bool, int]] = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool, tokens: int = 0) -> None:
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, ok, tokens))
+
+    def _recent(self) -> List[Tuple[float, float, bool, int]]:
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def latencies(self) -> List[float]:
+        """Latencias de las llamadas correctas de la ventana, ordenadas"""
+        return sorted(lat for _, lat, ok, _ in self._recent() if ok)
+
+    def snapshot(self) -> Dict[str, Any]:
+        samples = self._recent()
+        latencies = sorted(lat for _, lat, ok, _ in samples if ok)
+        errors = sum(1 for _, _, ok, _ in samples if not ok)
+        tokens = sum(t for _, _, ok, t in samples if ok)
+        busy = sum(latencies)
+        span = samples[-1][0] - samples[0][0] if len(samples) > 1 else 0.0
+        return {
+            "samples": len(samples),
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "tokens_per_second": round(tokens / busy, 2) if busy else None,
+            "requests_per_minute": (
+                round(len(samples) * 60.0 / span, 2) if span > 0 else None
+            ),
+        }
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre valores ya ordenados"""
+    if not values:
+        return None
+    index = max(0, math.ceil(q * len(values)) - 1)
+    return round(values[index], 4)
+
+
+@dataclass
+class RoutingDecision:
+    """Registro auditable de una elección de modelo"""
+
+    timestamp: float
+    policy: str
+    strategy: str
+    model: Optional[str]
+    reason: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    candidates: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class ModelRouter:
+    """Elige el modelo de cada solicitud según la política configurada"""
+
+    def __init__(
+        self,
+        config: Optional[RouterConfig] = None,
+        profiles: Iterable[ModelProfile] = (),
+        is_available: Optional[Callable[[str], bool]] = None,
+    ):
+        self.config = config or RouterConfig()
+        self.is_available = is_available
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, ModelProfile] = {}
+        self._stats: Dict[str, ModelStats] = {}
+        self._decisions: Deque[RoutingDecision] = deque(
+            maxlen=max(1, self.config.decision_log_size)
+        )
+        self._log_file = (
+            _JsonlWriter(self.config.log_path) if self.config.log_path else None
+        )
+        self.update_profiles(profiles)
+
+    @classmethod
+    def from_models_config(
+        cls,
+        models_config: Dict[str, Any],
+        is_available: Optional[Callable[[str], bool]] = None,
+    ) -> "ModelRouter":
+        """Router a partir de models.json (``router`` + ``available_models``)"""
+        blackbox = (models_config or {}).get("models", {}).get("blackbox", {})
+        return cls(
+            RouterConfig.from_dict(blackbox.get("router")),
+            profiles_from_config(models_config),
+            is_available,
+        )
+
+    def update_profiles(self, profiles: Iterable[ModelProfile]) -> None:
+        with self._lock:
+            for profile in profiles:
+                if profile.model:
+                    self._profiles[profile.model] = profile
+
+    def profile(self, model: str) -> ModelProfile:
+        with self._lock:
+            return self._profiles.get(model) or ModelProfile(model)
+
+    def _model_stats(self, model: str) -> ModelStats:
+        with self._lock:
+            stats = self._stats.get(model)
+            if stats is None:
+                stats = self._stats[model] = ModelStats(
+                    self.config.window, self.config.window_seconds
+                )
+            return stats
+
+    def record(self, model: str, latency: float, ok: bool, tokens: int = 0) -> None:
+        """Resultado de una llamada real al upstream"""
+        self._model_stats(model).record(latency, ok, tokens)
+
+    def latencies(self, model: str) -> List[float]:
+        """Latencias recientes correctas de ``model`` (ordenadas)"""
+        return self._model_stats(model).latencies()
+
+    def choose(
+        self,
+        candidates: Iterable[str],
+        strategy: Optional[str] = None,
+        input_tokens: int = 0,
+        output_tokens: Optional[int] = None,
+        policy: Optional[str] = None,
+    ) -> RoutingDecision:
+        """Elige entre ``candidates`` y registra la decisión"""
+        cfg = self.config
+        strategy = strategy or "auto"
+        policy = policy if policy in POLICIES else cfg.policy_for(strategy)
+        output_tokens = (
+            cfg.default_output_tokens if output_tokens is None else output_tokens
+        )
+        rows = [
+            self._evaluate(model, strategy, input_tokens, output_tokens)
+            for model in dict.fromkeys(m for m in candidates if m)
+        ]
+        eligible = [r for r in rows if not r["excluded"]]
+        reason = policy
+        if eligible and policy == "cheapest" and cfg.sla_p95 is not None:
+            within = [
+                r for r in eligible if r["p95"] is None or r["p95"] <= cfg.sla_p95
+            ]
+            if within:
+                eligible = within
+            else:
+                reason += " (ningún modelo cumple el SLA)"
+        if eligible and policy == "quality" and cfg.max_cost is not None:
+            within = [
+                r for r in eligible if r["cost"] is None or r["cost"] <= cfg.max_cost
+            ]
+            if within:
+                eligible = within
+            else:
+                reason += " (ningún modelo cabe en el presupuesto)"
+        if not eligible:
+            eligible = rows
+            if rows:
+                reason += " (sin candidatos sanos)"
+        eligible.sort(key=lambda r: _policy_key(policy, r))
+        decision = RoutingDecision(
+            timestamp=time.time(),
+            policy=policy,
+            strategy=strategy,
+            model=eligible[0]["model"] if eligible else None,
+            reason=reason,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            candidates=rows,
+        )
+        self._log(decision)
+        return decision
+
+    def _evaluate(
+        self, model: str, strategy: str, input_tokens: int, output_tokens: int
+    ) -> Dict[str, Any]:
+        profile = self.profile(model)
+        stats = self._model_stats(model).snapshot()
+        trusted = stats["samples"] >= self.config.min_samples
+        excluded = None
+        if self.is_available is not None and not self.is_available(model):
+            excluded = "no disponible"
+        elif trusted and stats["error_rate"] > self.config.max_error_rate:
+            excluded = "tasa de error"
+        elif profile.context and input_tokens + output_tokens > profile.context:
+            excluded = "contexto insuficiente"
+        return {
+            "model": model,
+            "rank": list(heuristic_rank(model, strategy)),
+            "cost": profile.estimate_cost(input_tokens, output_tokens),
+            "p50": stats["p50"] if trusted else None,
+            "p95": stats["p95"] if trusted else None,
+            "error_rate": stats["error_rate"],
+            "samples": stats["samples"],
+            "excluded": excluded,
+        }
+
+    def _log(self, decision: RoutingDecision) -> None:
+        self._decisions.append(decision)
+        logger.debug(
+            f"Router: {decision.model} (política={decision.policy}, "
+            f"estrategia={decision.strategy}, motivo={decision.reason})"
+        )
+        if self._log_file is not None:
+            line = json.dumps(asdict(decision), ensure_ascii=False) + "\n"
+            self._log_file.write(line)
+
+    def flush(self) -> None:
+        """Espera a que el log JSONL de decisiones esté escrito"""
+        if self._log_file is not None:
+            self._log_file.flush()
+
+    def close(self) -> None:
+        """Vacía el log JSONL y detiene su hilo"""
+        if self._log_file is not None:
+            self._log_file.close()
+
+    def decisions(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Últimas decisiones, de la más reciente a la más antigua"""
+        recent = list(self._decisions)[-limit:] if limit > 0 else []
+        return [asdict(d) for d in reversed(recent)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = set(self._stats) | set(self._profiles)
+        return {
+            "config": asdict(self.config),
+            "models": {
+                m: dict(asdict(self.profile(m)), **self._model_stats(m).snapshot())
+                for m in sorted(models)
+            },
+            "decisions": self.decisions(20),
+        }
+
+
+def _policy_key(policy: str, row: Dict[str, Any]) -> tuple:
+    """Orden de candidatos para la política (menor es mejor)"""
+    inf = float("inf")
+    rank = tuple(row["rank"])
+    if policy == "cheapest":
+        cost = row["cost"]
+        return (cost is None, cost if cost is not None else inf, rank)
+    if policy == "fastest":
+        p50 = row["p50"]
+        return (p50 is None, p50 if p50 is not None else inf, rank)
+    return (rank, row["cost"] if row["cost"] is not None else inf)
+
+
+def profiles_from_config(models_config: Dict[str, Any]) -> List[ModelProfile]:
+    """Perfiles de ``available_models`` (importados del CSV)"""
+    entries = (models_config or {}).get("available_models") or []
+    return [
+        ModelProfile.from_entry(e)
+        for e in entries
+        if isinstance(e, dict) and e.get("model")
+    ]
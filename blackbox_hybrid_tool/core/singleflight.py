@@ -0,0 +1,115 @@
+"""
+Coalescencia de solicitudes idénticas en vuelo (single-flight)
+Si varias llamadas con la misma clave canónica coinciden en el tiempo,
+sólo la primera llega al upstream; el resto espera y recibe el mismo
+resultado o la misma excepción. No guarda nada una vez terminada la
+llamada (para eso está la caché de respuestas).
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    """Llamada síncrona en curso compartida por varios hilos"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Ejecuta una sola vez cada clave mientras esté en vuelo
+
+    La ruta síncrona comparte la llamada entre hilos; la asíncrona comparte
+    una ``Task`` por event loop. Cancelar a un solicitante asíncrono no
+    cancela la llamada compartida mientras otros sigan esperando; cuando
+    se cancela el último, la ``Task`` se cancela también.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[Tuple[int, str], "asyncio.Task[Any]"] = {}
+        # Solicitantes asíncronos que aún esperan cada Task
+        self._waiters: Dict["asyncio.Task[Any]", int] = {}
+        self._leaders = 0
+        self._coalesced = 0
+        self._failed = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Ejecuta ``fn`` o espera a la ejecución en curso con la misma clave"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._leaders += 1
+            else:
+                self._coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                if call.error is not None:
+                    self._failed += 1
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Versión asíncrona de :meth:`do` (una ``Task`` por clave y loop)"""
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = loop.create_task(fn())
+                self._tasks[task_key] = task
+                self._leaders += 1
+                task.add_done_callback(lambda t: self._finish(task_key, t))
+            else:
+                self._coalesced += 1
+            self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            with self._lock:
+                left = self._waiters.pop(task) - 1
+                if left:
+                    self._waiters[task] = left
+            if not left and not task.done():
+                # Nadie espera ya el resultado: no seguir ocupando el upstream
+                task.cancel()
+
+    def _finish(self, task_key: Tuple[int, str], task: "asyncio.Task[Any]") -> None:
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+        # Marca la excepción como recuperada aunque todos los solicitantes
+        # se hayan cancelado (evita el aviso "exception was never retrieved")
+        if not task.cancelled() and task.exception() is not None:
+            with self._lock:
+                self._failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Llamadas al upstream, solicitudes coalescidas y llamadas en vuelo"""
+        with self._lock:
+            total = self._leaders + self._coalesced
+            return {
+                "upstream_calls": self._leaders,
+                "coalesced": self._coalesced,
+                "failed": self._failed,
+                "in_flight": len(self._calls) + len(self._tasks),
+                "coalesce_ratio": round(self._coalesced / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,71 @@
+"""
+Utilidades de streaming SSE para chat/completions
+Convierte las líneas ``data: {...}`` de la API (formato OpenAI) en
+fragmentos de texto y da formato a los eventos que emite el servidor.
+"""
+
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, Optional
+
+DONE = "[DONE]"
+
+
+def parse_sse_line(line: Any) -> Optional[Any]:
+    """Parsea una línea SSE y devuelve el JSON de ``data:``
+
+    Devuelve ``DONE`` al final del stream y ``None`` para líneas vacías,
+    comentarios, otros campos o datos que no son JSON.
+    """
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    line = (line or "").strip()
+    if not line.startswith("data:"):
+        return None
+    payload = line[5:].strip()
+    if payload == DONE:
+        return DONE
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def extract_delta(chunk: Dict[str, Any]) -> str:
+    """Texto incremental de un chunk ``chat.completion.chunk``"""
+    try:
+        choice = (chunk.get("choices") or [{}])[0]
+    except (AttributeError, IndexError):
+        return ""
+    delta = choice.get("delta") or choice.get("message") or {}
+    return delta.get("content") or ""
+
+
+def iter_sse_deltas(lines: Iterable[Any]) -> Iterator[str]:
+    """Fragmentos de texto a partir de líneas SSE (ruta síncrona)"""
+    for line in lines:
+        event = parse_sse_line(line)
+        if event == DONE:
+            return
+        if isinstance(event, dict):
+            text = extract_delta(event)
+            if text:
+                yield text
+
+
+async def aiter_sse_deltas(lines: AsyncIterable[Any]) -> AsyncIterator[str]:
+    """Fragmentos de texto a partir de líneas SSE (ruta asíncrona)"""
+    async for line in lines:
+        event = parse_sse_line(line)
+        if event == DONE:
+            return
+        if isinstance(event, dict):
+            text = extract_delta(event)
+            if text:
+                yield text
+
+
+def format_sse(data: Any) -> str:
+    """Serializa un evento SSE para respuestas ``text/event-stream``"""
+    if data == DONE:
+        return f"data: {DONE}\n\n"
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -11,6 +11,7 @@ from typing import List, Dict, Any, Optional
 from pathlib import Path
 import importlib.util
 from .ai_client import AIOrchestrator
+from .batch import run_batch
 
 
 class CodeAnalyzer:
@@ -121,7 +122,7 @@ Por favor genera:
 El test debe ser funcional y seguir las mejores prácticas de testing.
 """
 
-        return self.ai.generate_response(prompt, temperature=0.3)
+        return self.ai.generate_response(prompt, temperature=0.3, cache=True)
 
     def generate_test_for_class(
         self, class_info: Dict[str, Any], context: Dict[str, Any]
@@ -149,12 +150,16 @@ Por favor genera:
 Usa pytest y sigue las mejores prácticas de testing en Python.
 """
 
-        return self.ai.generate_response(prompt, temperature=0.3)
+        return self.ai.generate_response(prompt, temperature=0.3, cache=True)
 
     def generate_tests_for_file(
-        self, file_path: str, language: str = "python"
+        self, file_path: str, language: str = "python", concurrency: int = 4
     ) -> Dict[str, Any]:
-        """Genera tests completos para un archivo"""
+        """Genera tests completos para un archivo
+
+        Las solicitudes por función/clase se lanzan en paralelo (como mucho
+        ``concurrency`` a la vez); los fallos individuales van a ``errors``.
+        """
 
         if language.lower() not in self.supported_languages:
             return {
@@ -167,31 +172,41 @@ Usa pytest y sigue las mejores prácticas de testing en Python.
             if "error" in analysis:
                 return {"error": analysis["error"]}
 
-            tests = []
+            # Funciones públicas y clases
+            jobs = [
+                {"target": func["name"], "kind": "function", "info": func}
+                for func in analysis["functions"]
+                if not func["name"].startswith("_")
+            ] + [
+                {"target": cls["name"], "kind": "class", "info": cls}
+                for cls in analysis["classes"]
+            ]
+
+            def generate(job: Dict[str, Any]) -> str:
+                if job["kind"] == "function":
+                    return self.generate_test_for_function(job["info"], analysis)
+                return self.generate_test_for_class(job["info"], analysis)
 
-            # Generar tests para funciones
-            for func in analysis["functions"]:
-                if not func["name"].startswith("_"):  # Solo funciones públicas
-                    test_code = self.generate_test_for_function(func, analysis)
+            tests = []
+            errors = []
+            results = run_batch(generate, jobs, concurrency, require_prompt=False)
+            for job, result in zip(jobs, results):
+                if result.ok:
                     tests.append(
                         {
-                            "type": "function",
-                            "target": func["name"],
-                            "test_code": test_code,
+                            "type": job["kind"],
+                            "target": job["target"],
+                            "test_code": result.result,
                         }
                     )
-
-            # Generar tests para clases
-            for cls in analysis["classes"]:
-                test_code = self.generate_test_for_class(cls, analysis)
-                tests.append(
-                    {"type": "class", "target": cls["name"], "test_code": test_code}
-                )
+                else:
+                    errors.append({"target": job["target"], "error": result.error})
 
             return {
                 "file_path": file_path,
                 "language": language,
                 "tests": tests,
+                "errors": errors,
                 "total_functions": len(analysis["functions"]),
                 "total_classes": len(analysis["classes"]),
             }
@@ -12,6 +12,59 @@ class ChispartException(Exception):
     pass
 
 
+class BlackboxAPIError(ChispartException):
+    """
+    Raised when a call to the Blackbox API fails (after any retries).
+    Carries the upstream status code, response detail and per-attempt records.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status_code: int = None,
+        detail: str = "",
+        model: str = None,
+        attempts: list = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.detail = detail
+        self.model = model
+        self.attempts = attempts or []
+
+    def __str__(self) -> str:
+        base = super().__str__()
+        return f"{base} | Detalle: {self.detail}" if self.detail else base
+
+
+class BlackboxTimeoutError(BlackboxAPIError):
+    """Raised when the Blackbox API does not answer within the configured timeout."""
+
+    pass
+
+
+class BlackboxRateLimitError(BlackboxAPIError):
+    """
+    Raised by the client-side limiter when a call cannot be admitted within
+    its maximum queue wait. No request is sent upstream.
+    """
+
+    def __init__(self, message: str, retry_after: float = None, **kwargs):
+        super().__init__(message, status_code=429, **kwargs)
+        self.retry_after = retry_after
+
+
+class BlackboxCircuitOpenError(BlackboxAPIError):
+    """
+    Raised when every model in the fallback chain has its circuit breaker
+    open. No request is sent upstream.
+    """
+
+    def __init__(self, message: str, retry_after: float = None, **kwargs):
+        super().__init__(message, status_code=503, **kwargs)
+        self.retry_after = retry_after
+
+
 class ChispartAPIException(HTTPException):
     """
     Common HTTP exception for Chispart AI API.
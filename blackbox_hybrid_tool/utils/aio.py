@@ -0,0 +1,21 @@
+"""
+Utilidades asyncio compatibles con Python 3.8
+``asyncio.to_thread`` llegó en 3.9; :func:`to_thread` hace lo mismo sobre
+``run_in_executor``: ejecuta la función en el executor por defecto del
+loop conservando los ``contextvars`` (spans de tracing) del llamador.
+"""
+
+import asyncio
+import contextvars
+import functools
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+async def to_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Ejecuta ``func(*args, **kwargs)`` en un hilo sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(None, call)
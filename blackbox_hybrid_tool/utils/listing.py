@@ -0,0 +1,219 @@
+"""
+Listado de directorios para ``GET /files``
+Usa ``os.scandir``: el tipo de cada entrada viene de ``d_type`` y el
+``stat`` se hace una sola vez por entrada (``DirEntry`` lo cachea). El
+listado ordenado se guarda en una caché corta con clave (ruta, mtime del
+directorio), de modo que los refrescos repetidos de la interfaz no vuelven
+a tocar el disco; el TTL acota lo desactualizado cuando cambia un archivo
+sin que cambie el mtime del directorio. La paginación es por cursor sobre
+la clave de orden, estable aunque se creen o borren entradas entre páginas.
+"""
+
+import base64
+import bisect
+import fnmatch
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+SORT_FIELDS = ("name", "mtime", "size")
+
+
+class Entry(NamedTuple):
+    name: str
+    is_dir: bool
+    size: Optional[int]
+    modified: Optional[float]
+
+
+@dataclass
+class ListingPage:
+    """Una página del listado"""
+
+    entries: List[Entry]
+    total: int
+    next_cursor: Optional[str] = None
+    cached: bool = False
+
+
+def scan_directory(path: str, show_hidden: bool = False) -> List[Entry]:
+    """Entradas de ``path`` con un ``stat`` por entrada como máximo"""
+    entries: List[Entry] = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if not show_hidden and entry.name.startswith("."):
+                continue
+            try:
+                is_dir = entry.is_dir()
+                st = entry.stat()
+            except OSError:
+                # Enlaces rotos o entradas sin permiso: se omiten
+                continue
+            entries.append(
+                Entry(entry.name, is_dir, None if is_dir else st.st_size, st.st_mtime)
+            )
+    return entries
+
+
+def _sort_key(sort: str, dirs_first: bool):
+    def key(entry: Entry) -> Tuple[Any, ...]:
+        group = (0 if entry.is_dir else 1,) if dirs_first else ()
+        if sort == "mtime":
+            value: Tuple[Any, ...] = (entry.modified or 0.0,)
+        elif sort == "size":
+            value = (-1 if entry.size is None else entry.size,)
+        else:
+            value = (entry.name.lower(),)
+        return group + value + (entry.name,)
+
+    return key
+
+
+def encode_cursor(key: Tuple[Any, ...]) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ...]:
+    """Clave de orden codificada en ``cursor``; ``ValueError`` si no es válida"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+    if not isinstance(key, list) or not key:
+        raise ValueError(f"Cursor inválido: {cursor}")
+    return tuple(key)
+
+
+@dataclass
+class _Listing:
+    entries: List[Entry]
+    mtime_ns: int
+    loaded_at: float
+    # Vistas ordenadas/filtradas: (sort, dirs_first, glob) -> (claves, entradas)
+    views: Dict[Tuple[str, bool, Optional[str]], Tuple[list, List[Entry]]] = field(
+        default_factory=dict
+    )
+
+
+class DirectoryListingCache:
+    """Caché LRU de listados con clave (ruta, mtime) y TTL corto"""
+
+    MAX_VIEWS = 16
+
+    def __init__(self, ttl: float = 2.0, max_entries: int = 64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Tuple[str, bool], _Listing]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "DirectoryListingCache":
+        return cls(
+            ttl=float(os.getenv("CHISPART_FILES_CACHE_TTL", "2.0")),
+            max_entries=int(os.getenv("CHISPART_FILES_CACHE_ENTRIES", "64")),
+        )
+
+    def _listing(self, path: str, show_hidden: bool) -> Tuple[_Listing, bool]:
+        mtime_ns = os.stat(path).st_mtime_ns
+        key = (path, show_hidden)
+        now = time.monotonic()
+        with self._lock:
+            listing = self._items.get(key)
+            if (
+                listing is not None
+                and listing.mtime_ns == mtime_ns
+                and now - listing.loaded_at < self.ttl
+            ):
+                self._items.move_to_end(key)
+                self.hits += 1
+                return listing, True
+            self.misses += 1
+        listing = _Listing(scan_directory(path, show_hidden), mtime_ns, now)
+        if self.ttl > 0:
+            with self._lock:
+                self._items[key] = listing
+                self._items.move_to_end(key)
+                while len(self._items) > self.max_entries:
+                    self._items.popitem(last=False)
+        return listing, False
+
+    def _view(
+        self, listing: _Listing, sort: str, dirs_first: bool, glob: Optional[str]
+    ) -> Tuple[list, List[Entry]]:
+        view_key = (sort, dirs_first, glob)
+        with self._lock:
+            view = listing.views.get(view_key)
+        if view is not None:
+            return view
+        entries = listing.entries
+        if glob:
+            entries = [e for e in entries if fnmatch.fnmatchcase(e.name, glob)]
+        key = _sort_key(sort, dirs_first)
+        ordered = sorted(entries, key=key)
+        view = ([key(e) for e in ordered], ordered)
+        with self._lock:
+            if len(listing.views) >= self.MAX_VIEWS:
+                listing.views.pop(next(iter(listing.views)))
+            listing.views[view_key] = view
+        return view
+
+    def list(
+        self,
+        path: str,
+        *,
+        sort: str = "name",
+        order: str = "asc",
+        dirs_first: bool = True,
+        glob: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        show_hidden: bool = False,
+    ) -> ListingPage:
+        """Página de ``path`` ordenada, filtrada y a partir de ``cursor``
+
+        Sin ``limit`` se devuelve todo lo que queda tras el cursor.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Orden desconocido: {sort}")
+        listing, cached = self._listing(path, show_hidden)
+        keys, ordered = self._view(listing, sort, dirs_first, glob)
+        after = decode_cursor(cursor) if cursor else None
+        try:
+            if order == "desc":
+                end = len(keys) if after is None else bisect.bisect_left(keys, after)
+                start = 0 if limit is None else max(0, end - limit)
+                page = ordered[start:end][::-1]
+                more = start > 0
+            else:
+                start = 0 if after is None else bisect.bisect_right(keys, after)
+                stop = len(ordered) if limit is None else start + limit
+                page = ordered[start:stop]
+                more = stop < len(ordered)
+        except TypeError as e:
+            # Cursor de otro orden (p.ej. de ``sort=name`` usado con ``size``)
+            raise ValueError(f"Cursor inválido para sort={sort}") from e
+        next_cursor = None
+        if more and page:
+            next_cursor = encode_cursor(_sort_key(sort, dirs_first)(page[-1]))
+        return ListingPage(page, len(ordered), next_cursor, cached)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,341 @@
+"""
+Métricas en formato de exposición de texto de Prometheus
+Registro propio sin dependencias (contadores, gauges e histogramas con
+etiquetas) pensado para quedarse activo en producción: cada observación
+es un ``bisect`` y una suma bajo un lock. Los valores derivados del
+estado (ciclos, caché) se calculan al leer ``/metrics`` mediante
+callbacks, no en el camino caliente.
+"""
+
+import bisect
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Segundos; cubren desde una ruta local hasta una generación de vídeo
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name}: etiquetas {sorted(labels)} != {list(self.labelnames)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """``(sufijo, etiquetas en texto, valor)``"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _ValueMetric(_Metric):
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def _add(self, amount: float, labels: Dict[str, Any]) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("", _labels_text(self.labelnames, k), v) for k, v in items]
+
+
+class Counter(_ValueMetric):
+    """Valor monótono por combinación de etiquetas"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if amount < 0:
+            raise ValueError("Un contador no puede decrecer")
+        self._add(amount, labels)
+
+
+class Gauge(_ValueMetric):
+    """Valor que sube y baja (en vuelo, tamaños)"""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        self._add(amount, labels)
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self._add(-amount, labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    """Distribución acumulada por buckets (``_bucket``, ``_sum``, ``_count``)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        # etiquetas -> [cuentas por bucket (no acumuladas) + desbordes, suma]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[0]) if series else 0
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted(
+                (k, (list(counts), total[0]))
+                for k, (counts, total) in self._series.items()
+            )
+        out: List[Tuple[str, str, float]] = []
+        names = self.labelnames + ("le",)
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = _format_value(bound)
+                out.append(("_bucket", _labels_text(names, key + (le,)), cumulative))
+            labels = _labels_text(self.labelnames, key)
+            out.append(("_sum", labels, total))
+            out.append(("_count", labels, cumulative))
+        return out
+
+
+class CallbackMetric(_Metric):
+    """Valor calculado al exponer: ``fn()`` devuelve un número o un dict
+    ``{tupla de etiquetas: valor}``"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], Any],
+        kind: str = "gauge",
+        labelnames: Tuple[str, ...] = (),
+    ):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        value = self.fn()
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            return [("", "", float(value))]
+        return [
+            ("", _labels_text(self.labelnames, k), float(v))
+            for k, v in sorted(value.items())
+        ]
+
+
+class MetricsRegistry:
+    """Colección de métricas con nombre único"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"La métrica {name} ya existe como {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, help, tuple(labelnames))
+
+    def gauge(self, name: str, help: str, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, tuple(labelnames))
+
+    def histogram(
+        self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(
+            Histogram, name, help, tuple(labelnames), buckets=buckets
+        )
+
+    def callback(
+        self, name: str, help: str, fn: Callable[[], Any], kind="gauge", labelnames=()
+    ) -> CallbackMetric:
+        """Registra (o reemplaza) una métrica calculada al exponer"""
+        metric = CallbackMetric(name, help, fn, kind, tuple(labelnames))
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Formato de exposición de texto 0.0.4"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines: List[str] = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # Un callback roto no debe tumbar el resto de la exposición
+                lines.append(f"# {metric.name} no disponible: {type(e).__name__}")
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "chispart_http_requests_total",
+    "Solicitudes HTTP atendidas",
+    ("method", "route", "status"),
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "chispart_http_request_duration_seconds",
+    "Latencia de las solicitudes HTTP",
+    ("method", "route"),
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "chispart_http_requests_in_flight", "Solicitudes HTTP en curso"
+)
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "chispart_upstream_request_duration_seconds",
+    "Latencia de cada intento contra la API de Blackbox",
+    ("model", "outcome"),
+)
+UPSTREAM_TOKENS = REGISTRY.counter(
+    "chispart_upstream_tokens_total",
+    "Tokens según el campo usage de las completions",
+    ("model", "kind"),
+)
+ERRORS = REGISTRY.counter(
+    "chispart_errors_total", "Errores por origen y tipo", ("source", "type")
+)
+
+
+def observe_upstream(
+    model: str, seconds: float, error: Optional[BaseException] = None
+) -> None:
+    """Un intento HTTP contra el upstream (con su error tipado si falló)"""
+    outcome = "ok" if error is None else type(error).__name__
+    UPSTREAM_LATENCY.observe(seconds, model=model, outcome=outcome)
+    if error is not None:
+        ERRORS.inc(source="upstream", type=outcome)
+
+
+def record_usage(model: str, usage: Any) -> None:
+    """Suma ``prompt_tokens``/``completion_tokens`` de una completion"""
+    if not isinstance(usage, dict):
+        return
+    for kind in ("prompt", "completion"):
+        value = usage.get(f"{kind}_tokens")
+        if isinstance(value, (int, float)) and value > 0:
+            UPSTREAM_TOKENS.inc(value, model=model, kind=kind)
+
+
+def _route_of(scope: Dict[str, Any]) -> str:
+    # Plantilla de la ruta (``/cycles/{cycle_id}``) para acotar la cardinalidad
+    route = scope.get("route")
+    return getattr(route, "path", None) or "other"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: cuenta, cronometra y sigue las solicitudes en vuelo"""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        method = scope.get("method", "GET")
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            ERRORS.inc(source="http", type=type(e).__name__)
+            raise
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = _route_of(scope)
+            HTTP_LATENCY.observe(
+                time.perf_counter() - started, method=method, route=route
+            )
+            HTTP_REQUESTS.inc(method=method, route=route, status=status["code"])
@@ -0,0 +1,457 @@
+"""
+Servidor simulado de la API de Blackbox
+Implementa el contrato ``POST /chat/completions`` que usan
+``BlackboxClient`` y ``multi_agent_workflow/tools.py`` sin red:
+latencias configurables, errores inyectados (429/5xx/timeouts), streaming
+SSE, respuestas con ``tool_calls`` y URLs de imagen servidas en local.
+
+Uso en proceso::
+
+    with MockBlackboxServer(MockConfig(latency=LatencyProfile("fixed", 0.05))) as srv:
+        client = BlackboxClient("k", {"base_url": srv.completions_url})
+
+Como subproceso::
+
+    python -m blackbox_hybrid_tool.utils.mock_server --port 8765 --latency lognormal:0.2:0.1
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# PNG transparente de 1x1 servido en /mock-media/
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+# Fragmentos de identificador que se tratan como modelos de imagen/vídeo
+MEDIA_MODEL_HINTS = (
+    "flux",
+    "stable-diffusion",
+    "openjourney",
+    "dall-e",
+    "image",
+    "veo",
+    "video",
+)
+
+
+@dataclass
+class LatencyProfile:
+    """Distribución de latencia (segundos) de cada respuesta
+
+    ``distribution``: ``fixed`` (``mean``), ``uniform`` (``minimum``..
+    ``maximum``), ``normal``, ``lognormal`` o ``exponential`` (``mean`` y
+    ``stddev``). Con probabilidad ``straggler_rate`` se suma
+    ``straggler_delay`` para simular colas largas.
+    """
+
+    distribution: str = "fixed"
+    mean: float = 0.0
+    stddev: float = 0.0
+    minimum: float = 0.0
+    maximum: Optional[float] = None
+    straggler_rate: float = 0.0
+    straggler_delay: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyProfile":
+        """``"fixed:0.1"``, ``"uniform:0.05:0.3"``, ``"lognormal:0.2:0.1"``..."""
+        kind, *values = spec.split(":")
+        numbers = [float(v) for v in values]
+        if kind == "uniform":
+            low, high = (numbers + [0.0, 0.0])[:2]
+            return cls(kind, minimum=low, maximum=high)
+        mean, stddev = (numbers + [0.0, 0.0])[:2]
+        return cls(kind, mean=mean, stddev=stddev)
+
+    def sample(self, rng: random.Random) -> float:
+        kind = self.distribution
+        if kind == "uniform":
+            value = rng.uniform(self.minimum, self.maximum or self.minimum)
+        elif kind == "normal":
+            value = rng.gauss(self.mean, self.stddev)
+        elif kind == "lognormal" and self.mean > 0:
+            # Parámetros de la normal subyacente a partir de media/desviación
+            sigma2 = math.log(1 + (self.stddev / self.mean) ** 2)
+            mu = math.log(self.mean) - sigma2 / 2
+            value = rng.lognormvariate(mu, math.sqrt(sigma2))
+        elif kind == "exponential" and self.mean > 0:
+            value = rng.expovariate(1.0 / self.mean)
+        else:
+            value = self.mean
+        if self.straggler_rate and rng.random() < self.straggler_rate:
+            value += self.straggler_delay
+        value = max(self.minimum, value)
+        if self.maximum is not None and kind != "uniform":
+            value = min(self.maximum, value)
+        return value
+
+
+@dataclass
+class MockConfig:
+    """Comportamiento del servidor simulado"""
+
+    latency: LatencyProfile = field(default_factory=LatencyProfile)
+    # Fracción de solicitudes que fallan con uno de ``error_statuses``
+    error_rate: float = 0.0
+    error_statuses: Tuple[int, ...] = (429, 500, 502, 503)
+    retry_after: Optional[float] = 1.0
+    # Fracción de solicitudes que no responden hasta ``timeout_seconds``
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 600.0
+    # Texto fijo de respuesta; None = eco del último mensaje de usuario
+    content: Optional[str] = None
+    # Respuestas con tool_calls si la solicitud trae ``tools``
+    tool_calls: bool = True
+    stream_chunk_words: int = 3
+    stream_chunk_delay: float = 0.0
+    require_auth: bool = False
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "MockConfig":
+        """Construye la configuración ignorando claves desconocidas"""
+        if not isinstance(data, dict):
+            return cls()
+        known = {f.name for f in fields(cls)}
+        values = {k: v for k, v in data.items() if k in known}
+        latency = values.get("latency")
+        if isinstance(latency, str):
+            values["latency"] = LatencyProfile.parse(latency)
+        elif isinstance(latency, dict):
+            values["latency"] = LatencyProfile(**latency)
+        if "error_statuses" in values:
+            values["error_statuses"] = tuple(values["error_statuses"])
+        return cls(**values)
+
+
+def _last_user_text(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages or []):
+        if isinstance(message, dict) and message.get("role") == "user":
+            content = message.get("content")
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+
+def _is_media_model(model: str) -> bool:
+    lowered = str(model).lower()
+    return any(hint in lowered for hint in MEDIA_MODEL_HINTS)
+
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    """Aplicación ASGI del servidor simulado (usable con TestClient/httpx)"""
+    app = FastAPI(title="Mock Blackbox API")
+    state = {"config": config or MockConfig()}
+    rng = random.Random(state["config"].seed)
+    rng_lock = threading.Lock()
+    stats: Counter = Counter()
+
+    def draw() -> Tuple[float, float]:
+        cfg = state["config"]
+        with rng_lock:
+            return cfg.latency.sample(rng), rng.random()
+
+    def choose_status() -> int:
+        with rng_lock:
+            return rng.choice(list(state["config"].error_statuses) or [500])
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        cfg = state["config"]
+        stats["requests"] += 1
+        if cfg.require_auth and not (
+            request.headers.get("authorization") or request.headers.get("x-api-key")
+        ):
+            stats["status_401"] += 1
+            return JSONResponse({"error": "missing api key"}, status_code=401)
+        try:
+            payload = await request.json()
+        except ValueError:
+            stats["status_400"] += 1
+            return JSONResponse({"error": "invalid json"}, status_code=400)
+
+        latency, roll = draw()
+        if roll < cfg.timeout_rate:
+            stats["timeouts"] += 1
+            await asyncio.sleep(cfg.timeout_seconds)
+        elif roll < cfg.timeout_rate + cfg.error_rate:
+            await asyncio.sleep(latency)
+            status = choose_status()
+            stats[f"status_{status}"] += 1
+            headers = {}
+            if status == 429 and cfg.retry_after is not None:
+                headers["Retry-After"] = str(cfg.retry_after)
+            return JSONResponse(
+                {"error": {"message": "injected error", "code": status}},
+                status_code=status,
+                headers=headers,
+            )
+
+        model = payload.get("model", "mock-model")
+        messages = payload.get("messages") or []
+        prompt = _last_user_text(messages)
+        if _is_media_model(model):
+            base = str(request.base_url).rstrip("/")
+            content = f"{base}/mock-media/{uuid.uuid4().hex}.png"
+        else:
+            content = cfg.content if cfg.content is not None else f"mock: {prompt}"
+        message: Dict[str, Any] = {"role": "assistant", "content": content}
+        tools = payload.get("tools") or []
+        if cfg.tool_calls and tools and payload.get("tool_choice") != "none":
+            function = (tools[0] or {}).get("function", {})
+            required = (function.get("parameters") or {}).get("required") or ["input"]
+            message["content"] = ""
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {
+                        "name": function.get("name", "tool"),
+                        "arguments": json.dumps({required[0]: prompt}),
+                    },
+                }
+            ]
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", ""))) for m in messages) // 4,
+            "completion_tokens": len(message["content"]) // 4,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        stats["status_200"] += 1
+
+        if payload.get("stream"):
+            return StreamingResponse(
+                _sse(completion_id, model, message, latency, cfg),
+                media_type="text/event-stream",
+            )
+        await asyncio.sleep(latency)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    @app.get("/mock-media/{name}")
+    async def media(name: str):
+        return Response(PIXEL_PNG, media_type="image/png")
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return dict(stats)
+
+    @app.post("/mock/config")
+    async def update_config(request: Request):
+        """Sustituye la configuración (los campos omitidos toman su valor por defecto)"""
+        state["config"] = MockConfig.from_dict(await request.json())
+        return _config_dict(state["config"])
+
+    @app.delete("/mock/stats")
+    async def reset_stats():
+        stats.clear()
+        return {"reset": True}
+
+    app.state.mock = state
+    app.state.stats = stats
+    return app
+
+
+def _config_dict(config: MockConfig) -> Dict[str, Any]:
+    data = asdict(config)
+    data["error_statuses"] = list(config.error_statuses)
+    return data
+
+
+async def _sse(completion_id, model, message, latency, cfg: MockConfig):
+    """Eventos ``chat.completion.chunk``: primer byte tras ``latency``"""
+    await asyncio.sleep(latency)
+
+    def chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+        event = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    yield chunk({"role": "assistant"})
+    words = (message.get("content") or "").split(" ")
+    size = max(1, cfg.stream_chunk_words)
+    for i in range(0, len(words), size):
+        piece = " ".join(words[i : i + size])
+        yield chunk({"content": piece if i == 0 else " " + piece})
+        if cfg.stream_chunk_delay:
+            await asyncio.sleep(cfg.stream_chunk_delay)
+    if message.get("tool_calls"):
+        # En los deltas cada llamada lleva su posición (``index``)
+        calls = [dict(call, index=i) for i, call in enumerate(message["tool_calls"])]
+        yield chunk({"tool_calls": calls})
+    yield chunk({}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+def _free_port(host: str) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class MockBlackboxServer:
+    """Servidor simulado en un hilo (en proceso) o en un subproceso"""
+
+    def __init__(
+        self,
+        config: Optional[MockConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port or _free_port(host)
+        self.app = create_app(self.config)
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def completions_url(self) -> str:
+        """Valor para ``models.blackbox.base_url``/``BLACKBOX_API_BASE``"""
+        return f"{self.base_url}/chat/completions"
+
+    def configure(self, config: MockConfig) -> None:
+        """Cambia el comportamiento en caliente (sólo en proceso; ver /mock/config)"""
+        self.config = config
+        self.app.state.mock["config"] = config
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.app.state.stats)
+
+    def start(self, timeout: float = 10.0) -> "MockBlackboxServer":
+        """Arranca uvicorn en un hilo daemon y espera a que acepte conexiones"""
+        import uvicorn
+
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                self.app, host=self.host, port=self.port, log_level="warning"
+            )
+        )
+        self._thread = threading.Thread(
+            target=self._server.run, name="mock-blackbox", daemon=True
+        )
+        self._thread.start()
+        self._wait_ready(timeout)
+        return self
+
+    def spawn(self, timeout: float = 15.0, extra_args: Tuple[str, ...] = ()):
+        """Arranca el servidor como subproceso con la configuración actual"""
+        args = [
+            sys.executable,
+            "-m",
+            "blackbox_hybrid_tool.utils.mock_server",
+            "--host",
+            self.host,
+            "--port",
+            str(self.port),
+            "--config-json",
+            json.dumps(_config_dict(self.config)),
+            *extra_args,
+        ]
+        self._process = subprocess.Popen(args)
+        self._wait_ready(timeout)
+        return self
+
+    def _wait_ready(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process is not None and self._process.poll() is not None:
+                raise RuntimeError("El servidor simulado terminó al arrancar")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=0.2):
+                    return
+            except OSError:
+                time.sleep(0.05)
+        self.stop()
+        raise TimeoutError(f"El servidor simulado no arrancó en {self.base_url}")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            if self._thread is not None:
+                self._thread.join(timeout=5)
+            self._server = None
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+
+    def __enter__(self) -> "MockBlackboxServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Servidor simulado de Blackbox")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency",
+        default=None,
+        help="Distribución: fixed:S, uniform:MIN:MAX, normal|lognormal:MEDIA:DESV, exponential:MEDIA",
+    )
+    parser.add_argument("--error-rate", type=float, default=None)
+    parser.add_argument("--timeout-rate", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--config-json", default=None, help="MockConfig como JSON")
+    args = parser.parse_args(argv)
+
+    data: Dict[str, Any] = json.loads(args.config_json) if args.config_json else {}
+    for key, value in (
+        ("latency", args.latency),
+        ("error_rate", args.error_rate),
+        ("timeout_rate", args.timeout_rate),
+        ("seed", args.seed),
+    ):
+        if value is not None:
+            data[key] = value
+
+    import uvicorn
+
+    uvicorn.run(
+        create_app(MockConfig.from_dict(data)),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,8 @@ Supports common cases:
 Limitations:
 - Applies hunks at the specified line numbers; no fuzzy matching
 - Does not support file renames/copies or mode changes
+- Targets must stay inside the root directory (absolute and ``..`` paths
+  are rejected)
 """
 
 from __future__ import annotations
@@ -115,6 +117,37 @@ def apply_patch_to_text(original: List[str], hunks: List[Hunk]) -> List[str]:
     return content
 
 
+def _norm(path: str) -> str:
+    # Normalize paths (remove a/ and b/ prefixes if present)
+    path = path.split()[-1]
+    if path.startswith("a/") or path.startswith("b/"):
+        return path[2:]
+    return path
+
+
+def _contained(root: Path, rel: str) -> Path:
+    """Resolve ``rel`` under ``root``; raise ValueError if it escapes it."""
+    target = (root / rel).resolve()
+    if target != root and root not in target.parents:
+        raise ValueError(f"Path escapes root directory: {rel}")
+    return target
+
+
+def escaping_paths(diff_text: str, root_dir: str | Path = ".") -> List[str]:
+    """Return the patch targets that would land outside ``root_dir``."""
+    root = Path(root_dir).resolve()
+    bad: List[str] = []
+    for p in parse_unified_diff(diff_text):
+        for path in (_norm(p.src), _norm(p.dst)):
+            if path == "/dev/null" or path in bad:
+                continue
+            try:
+                _contained(root, path)
+            except ValueError:
+                bad.append(path)
+    return bad
+
+
 def apply_unified_diff(diff_text: str, root_dir: str | Path = ".") -> Dict[str, Any]:
     root = Path(root_dir).resolve()
     patches = parse_unified_diff(diff_text)
@@ -126,16 +159,8 @@ def apply_unified_diff(diff_text: str, root_dir: str | Path = ".") -> Dict[str,
     }
 
     for p in patches:
-        src = p.src.split()[-1]
-        dst = p.dst.split()[-1]
-        # Normalize paths (remove a/ and b/ prefixes if present)
-        def norm(path: str) -> str:
-            if path.startswith("a/") or path.startswith("b/"):
-                return path[2:]
-            return path
-
-        src_path = norm(src)
-        dst_path = norm(dst)
+        src_path = _norm(p.src)
+        dst_path = _norm(p.dst)
 
         # Handle creations and deletions
         if src_path == "/dev/null":
@@ -146,7 +171,7 @@ def apply_unified_diff(diff_text: str, root_dir: str | Path = ".") -> Dict[str,
                     for op, text in h.lines:
                         if op in (" ", "+"):
                             lines.append(text)
-                out_path = root / dst_path
+                out_path = _contained(root, dst_path)
                 out_path.parent.mkdir(parents=True, exist_ok=True)
                 out_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
                 results["created"].append(str(out_path))
@@ -156,7 +181,7 @@ def apply_unified_diff(diff_text: str, root_dir: str | Path = ".") -> Dict[str,
         if dst_path == "/dev/null":
             # Delete existing file
             try:
-                del_path = root / src_path
+                del_path = _contained(root, src_path)
                 if del_path.exists():
                     del_path.unlink()
                 results["deleted"].append(str(del_path))
@@ -166,10 +191,10 @@ def apply_unified_diff(diff_text: str, root_dir: str | Path = ".") -> Dict[str,
 
         # Modify existing file
         try:
-            target = root / src_path
+            target = _contained(root, src_path)
             if not target.exists():
                 # If src doesn't exist, try dst as fallback
-                target = root / dst_path
+                target = _contained(root, dst_path)
             original_text = target.read_text(encoding="utf-8").splitlines()
             new_text = apply_patch_to_text(original_text, p.hunks)
             target.write_text("\n".join(new_text) + "\n", encoding="utf-8")
@@ -0,0 +1,365 @@
+"""
+Limitación de tasa entrante para el servidor FastAPI
+Middleware ASGI que limita solicitudes por ventana y solicitudes
+simultáneas por cliente. Siempre se cobra a la IP; el token de
+``Authorization``/``X-API-Key`` (sin verificar) sólo añade un ámbito
+extra, nunca un cubo nuevo que esquive el de la IP.
+El estado vive en memoria del proceso o en Redis (``settings.redis_url``)
+para compartir límites entre réplicas.
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import math
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class InboundLimitConfig:
+    """Límites por cliente del servidor"""
+
+    enabled: bool = True
+    # Solicitudes admitidas por ventana (AppSettings.inbound_rate_limit_requests)
+    requests_per_window: int = 100
+    window_seconds: float = 60.0
+    # Solicitudes simultáneas por cliente (0 = sin límite)
+    max_concurrency: int = 10
+    # Prefijos limitados; el resto (UI estática, /health, /admin) no cuenta
+    paths: Tuple[str, ...] = ("/chat", "/cycles", "/files", "/patch")
+    # Usar el primer salto de X-Forwarded-For (sólo detrás de un proxy propio)
+    trust_forwarded: bool = False
+    key_prefix: str = "chispart:rl"
+
+    @classmethod
+    def from_settings(cls) -> "InboundLimitConfig":
+        """Valores de ``AppSettings`` si pydantic-settings está disponible"""
+        try:
+            from ..config.settings import settings
+        except ImportError:
+            return cls()
+        values: Dict[str, Any] = {}
+        for name, attr in (
+            ("requests_per_window", "inbound_rate_limit_requests"),
+            ("window_seconds", "rate_limit_window"),
+            ("max_concurrency", "rate_limit_concurrency"),
+        ):
+            value = getattr(settings, attr, None)
+            if value is not None:
+                values[name] = value
+        if not values.get("requests_per_window"):
+            values["enabled"] = False
+        return cls(**values)
+
+    def applies_to(self, path: str) -> bool:
+        return self.enabled and any(
+            path == p or path.startswith(p + "/") for p in self.paths
+        )
+
+
+class MemoryBackend:
+    """Contadores en memoria del proceso (ventana deslizante aproximada)"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # identidad -> (índice de ventana, cuenta actual, cuenta anterior)
+        self._windows: Dict[str, Tuple[int, int, int]] = {}
+        self._active: Dict[str, int] = {}
+        self._hits = 0
+
+    async def hit(self, identity: str, window: float, now: float) -> float:
+        """Registra la solicitud y devuelve la cuenta ponderada de la ventana"""
+        index = int(now // window)
+        with self._lock:
+            current_index, current, previous = self._windows.get(
+                identity, (index, 0, 0)
+            )
+            if index != current_index:
+                previous = current if index == current_index + 1 else 0
+                current = 0
+            current += 1
+            self._windows[identity] = (index, current, previous)
+            self._hits += 1
+            if self._hits % 1024 == 0:
+                self._prune(index)
+        return _weighted(current, previous, now, window)
+
+    def _prune(self, index: int) -> None:
+        stale = [k for k, (i, _, _) in self._windows.items() if i < index - 1]
+        for key in stale:
+            del self._windows[key]
+
+    async def enter(self, identity: str, limit: int) -> bool:
+        with self._lock:
+            active = self._active.get(identity, 0)
+            if active >= limit:
+                return False
+            self._active[identity] = active + 1
+            return True
+
+    async def leave(self, identity: str) -> None:
+        with self._lock:
+            active = self._active.get(identity, 0) - 1
+            if active > 0:
+                self._active[identity] = active
+            else:
+                self._active.pop(identity, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked_clients": len(self._windows),
+                "in_flight": sum(self._active.values()),
+            }
+
+
+class RedisBackend:
+    """Contadores compartidos en Redis
+
+    Acepta un cliente con la interfaz de ``redis.asyncio.Redis`` (o la
+    síncrona de ``redis.Redis``): ``incr``, ``decr``, ``get`` y ``expire``.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: Any, key_prefix: str = "chispart:rl"):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    @classmethod
+    def from_url(cls, url: str, key_prefix: str = "chispart:rl") -> "RedisBackend":
+        import redis.asyncio as redis_asyncio
+
+        return cls(redis_asyncio.from_url(url), key_prefix)
+
+    async def _call(self, method: str, *args: Any) -> Any:
+        result = getattr(self.client, method)(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def hit(self, identity: str, window: float, now: float) -> float:
+        index = int(now // window)
+        key = f"{self.key_prefix}:req:{identity}:{index}"
+        current = int(await self._call("incr", key))
+        if current == 1:
+            # Dos ventanas: la actual y la que se usa como "anterior"
+            await self._call("expire", key, int(math.ceil(window * 2)))
+        previous = await self._call(
+            "get", f"{self.key_prefix}:req:{identity}:{index - 1}"
+        )
+        return _weighted(current, int(previous or 0), now, window)
+
+    async def enter(self, identity: str, limit: int) -> bool:
+        key = f"{self.key_prefix}:conc:{identity}"
+        active = int(await self._call("incr", key))
+        # Red de seguridad si un proceso muere sin liberar su plaza
+        await self._call("expire", key, 300)
+        if active > limit:
+            await self._call("decr", key)
+            return False
+        return True
+
+    async def leave(self, identity: str) -> None:
+        await self._call("decr", f"{self.key_prefix}:conc:{identity}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {}
+
+
+def _weighted(current: int, previous: int, now: float, window: float) -> float:
+    """Ventana deslizante: la ventana anterior pesa lo que aún se solapa"""
+    elapsed = (now % window) / window
+    return current + previous * (1.0 - elapsed)
+
+
+def build_backend(config: InboundLimitConfig, redis_url: Optional[str] = None):
+    """Backend Redis si hay URL y cliente instalado; si no, en memoria"""
+    if redis_url:
+        try:
+            return RedisBackend.from_url(redis_url, config.key_prefix)
+        except ImportError:
+            logger.warning(
+                "redis_url configurada pero el paquete redis no está instalado"
+            )
+    return MemoryBackend()
+
+
+def _redis_url_from_settings() -> Optional[str]:
+    try:
+        from ..config.settings import settings
+    except ImportError:
+        return None
+    return getattr(settings, "redis_url", None)
+
+
+class InboundRateLimiter:
+    """Decisiones de admisión y contadores del middleware"""
+
+    def __init__(
+        self, config: Optional[InboundLimitConfig] = None, backend: Any = None
+    ):
+        self.config = config or InboundLimitConfig()
+        self.backend = backend or MemoryBackend()
+        self._lock = threading.Lock()
+        self._counters = {
+            "allowed": 0,
+            "rejected_rate": 0,
+            "rejected_concurrency": 0,
+            "backend_errors": 0,
+        }
+
+    @classmethod
+    def from_settings(cls) -> "InboundRateLimiter":
+        config = InboundLimitConfig.from_settings()
+        return cls(config, build_backend(config, _redis_url_from_settings()))
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def identities(self, scope: Dict[str, Any]) -> Tuple[str, ...]:
+        """Cubos a cobrar: siempre la IP y, si hay token, también el token
+
+        El token no está verificado: inventar uno por solicitud no esquiva
+        el cubo de la IP, que sigue limitando.
+        """
+        headers = {
+            k.decode("latin-1").lower(): v.decode("latin-1")
+            for k, v in scope.get("headers") or []
+        }
+        if self.config.trust_forwarded and headers.get("x-forwarded-for"):
+            ip = "ip:" + headers["x-forwarded-for"].split(",")[0].strip()
+        else:
+            client = scope.get("client") or ("unknown", 0)
+            ip = f"ip:{client[0]}"
+        token = headers.get("x-api-key") or ""
+        auth = headers.get("authorization", "")
+        if auth.lower().startswith("bearer "):
+            token = auth[7:].strip() or token
+        if not token:
+            return (ip,)
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+        return ip, f"token:{digest}"
+
+    async def admit(
+        self, identities: Tuple[str, ...]
+    ) -> Tuple[Optional[str], float, int]:
+        """``(motivo de rechazo o None, retry_after, restantes)``
+
+        Se cobra a todos los cubos; basta con que uno se agote para rechazar.
+        """
+        cfg = self.config
+        now = time.time()
+        entered = []
+        try:
+            used = max(
+                [await self.backend.hit(i, cfg.window_seconds, now) for i in identities]
+            )
+            if used > cfg.requests_per_window:
+                self._count("rejected_rate")
+                retry_after = cfg.window_seconds - (now % cfg.window_seconds)
+                return "rate", retry_after, 0
+            if cfg.max_concurrency:
+                for identity in identities:
+                    if not await self.backend.enter(identity, cfg.max_concurrency):
+                        for other in entered:
+                            await self.backend.leave(other)
+                        self._count("rejected_concurrency")
+                        return "concurrency", 1.0, 0
+                    entered.append(identity)
+        except Exception as e:
+            # Fallo del backend (p.ej. Redis caído): no bloquear el servicio
+            logger.warning(f"Backend de rate limit no disponible: {e}")
+            self._count("backend_errors")
+            return None, 0.0, -1
+        self._count("allowed")
+        return None, 0.0, max(0, int(cfg.requests_per_window - used))
+
+    async def release(self, identities: Tuple[str, ...]) -> None:
+        if not self.config.max_concurrency:
+            return
+        for identity in identities:
+            try:
+                await self.backend.leave(identity)
+            except Exception:
+                self._count("backend_errors")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data: Dict[str, Any] = dict(self._counters)
+        data["backend"] = self.backend.name
+        data["config"] = asdict(self.config)
+        data.update(self.backend.snapshot())
+        return data
+
+
+class InboundRateLimitMiddleware:
+    """Middleware ASGI: 429 con ``Retry-After`` al superar los límites"""
+
+    def __init__(self, app: Any, limiter: Optional[InboundRateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or InboundRateLimiter()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.limiter.config.applies_to(
+            scope.get("path", "")
+        ):
+            await self.app(scope, receive, send)
+            return
+        identities = self.limiter.identities(scope)
+        reason, retry_after, remaining = await self.limiter.admit(identities)
+        if reason is not None:
+            await self._reject(send, reason, retry_after)
+            return
+        if remaining < 0:
+            # Backend caído: se deja pasar sin contabilizar concurrencia
+            await self.app(scope, receive, send)
+            return
+        limit = str(self.limiter.config.requests_per_window).encode()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers") or [])
+                headers.append((b"x-ratelimit-limit", limit))
+                headers.append((b"x-ratelimit-remaining", str(remaining).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            await self.limiter.release(identities)
+
+    async def _reject(self, send, reason: str, retry_after: float) -> None:
+        detail = (
+            "Rate limit exceeded"
+            if reason == "rate"
+            else "Too many concurrent requests"
+        )
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                    (
+                        b"x-ratelimit-limit",
+                        str(self.limiter.config.requests_per_window).encode(),
+                    ),
+                    (b"x-ratelimit-remaining", b"0"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,257 @@
+"""
+Registro de sesiones del REPL en JSONL de solo anexado
+Cada mensaje es una línea (``{"op": "msg", ...}``); los cambios de modelo
+y los ``/reset`` son registros propios. Guardar un turno cuesta O(1) y la
+compactación (reescritura atómica con solo el estado vivo) se amortiza:
+ocurre cuando los registros superan ``compact_ratio`` veces los mensajes
+vivos. La reanudación puede leer solo los últimos N mensajes desde el
+final del archivo.
+
+Políticas de ``fsync``: ``always`` (cada registro), ``turn`` (al cerrar
+cada turno), ``interval`` (como mucho cada ``fsync_interval`` segundos)
+y ``never`` (solo ``flush``; el sistema operativo decide).
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+FSYNC_POLICIES = ("always", "turn", "interval", "never")
+
+# Bloque de lectura hacia atrás para la reanudación por cola
+_TAIL_CHUNK = 64 * 1024
+
+
+@dataclass
+class SessionState:
+    """Estado reconstruido de una sesión"""
+
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    model: Optional[str] = None
+    # True si se leyó solo la cola y hay mensajes anteriores sin cargar
+    truncated: bool = False
+
+
+def _dumps(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _iter_lines_reversed(path: Path):
+    """Líneas completas del archivo, de la última a la primera"""
+    with open(path, "rb") as fh:
+        fh.seek(0, os.SEEK_END)
+        position = fh.tell()
+        rest = b""
+        while position > 0:
+            size = min(_TAIL_CHUNK, position)
+            position -= size
+            fh.seek(position)
+            block = fh.read(size) + rest
+            lines = block.split(b"\n")
+            # La primera puede estar partida: se completa en la vuelta siguiente
+            rest = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if rest.strip():
+            yield rest
+
+
+def _parse(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        record = json.loads(line)
+    except (ValueError, UnicodeDecodeError):
+        # Última línea a medio escribir tras un corte: se ignora
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def read_session(path: Path, tail: Optional[int] = None) -> SessionState:
+    """Estado de la sesión; con ``tail`` solo los últimos ``tail`` mensajes"""
+    state = SessionState()
+    if not path.exists():
+        return state
+    if tail is None:
+        with open(path, "rb") as fh:
+            for line in fh:
+                record = _parse(line)
+                if record is None:
+                    continue
+                op = record.get("op")
+                if op == "msg":
+                    state.messages.append(_message(record))
+                elif op == "reset":
+                    state.messages.clear()
+                elif op == "meta" and "model" in record:
+                    state.model = record["model"]
+        return state
+
+    # Hacia atrás hasta tener la cola y el último modelo; un /reset cierra
+    # la cola, pero el modelo vigente puede estar antes
+    messages: List[Dict[str, Any]] = []
+    collecting, model_seen = True, False
+    for line in _iter_lines_reversed(path):
+        done = not collecting or len(messages) >= tail
+        if done and model_seen:
+            break
+        # Con la cola cerrada solo interesan meta y reset: no parsear el resto
+        if done and b'"meta"' not in line and b'"reset"' not in line:
+            if collecting and b'"msg"' in line:
+                state.truncated = True
+            continue
+        record = _parse(line)
+        if record is None:
+            continue
+        op = record.get("op")
+        if op == "reset":
+            collecting = False
+        elif op == "meta" and "model" in record and not model_seen:
+            state.model, model_seen = record["model"], True
+        elif op == "msg" and not done:
+            messages.append(_message(record))
+        elif op == "msg" and collecting:
+            state.truncated = True
+    state.messages = messages[::-1]
+    return state
+
+
+def _message(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in record.items() if k != "op"}
+
+
+class SessionLog:
+    """Archivo de sesión abierto en modo anexado"""
+
+    def __init__(
+        self,
+        path: Path,
+        fsync: str = "turn",
+        fsync_interval: float = 1.0,
+        compact_ratio: float = 2.0,
+        compact_min: int = 256,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync desconocida: {fsync}")
+        self.path = Path(path)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self.records = 0
+        self.live = 0
+        self.compactions = 0
+        self._last_sync = time.monotonic()
+        self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = None
+
+    @classmethod
+    def open(
+        cls, path: Path, tail: Optional[int] = None, **options: Any
+    ) -> Tuple["SessionLog", SessionState]:
+        """Abre (o crea) la sesión y devuelve el log y el estado cargado
+
+        Una sesión ``.json`` antigua junto a ``path`` se migra al formato
+        JSONL la primera vez.
+        """
+        log = cls(path, **options)
+        legacy = log.path.with_suffix(".json")
+        if not log.path.exists() and legacy.exists():
+            data = json.loads(legacy.read_text(encoding="utf-8"))
+            log._rewrite(data.get("messages", []), data.get("model"))
+            legacy.rename(legacy.with_suffix(".json.migrated"))
+        state = read_session(log.path, tail)
+        if log.path.exists():
+            with open(log.path, "rb") as fh:
+                log.records = sum(1 for _ in fh)
+        # Con solo la cola no se conoce el total vivo: suponer que no hay
+        # registros muertos hasta el próximo /reset
+        log.live = log.records if state.truncated else len(state.messages)
+        return log, state
+
+    def _handle(self):
+        if self._fh is None:
+            self._fh = open(self.path, "a", encoding="utf-8")
+        return self._fh
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        fh = self._handle()
+        fh.write(_dumps(record))
+        fh.flush()
+        self.records += 1
+        self._dirty = True
+        if self.fsync == "always":
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._fh is not None and self._dirty:
+            os.fsync(self._fh.fileno())
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def append(self, message: Dict[str, Any]) -> None:
+        """Añade un mensaje (O(1))"""
+        self._write({"op": "msg", **message})
+        self.live += 1
+
+    def set_model(self, model: Optional[str]) -> None:
+        self._write({"op": "meta", "model": model, "ts": time.time()})
+
+    def reset(self) -> None:
+        self._write({"op": "reset", "ts": time.time()})
+        self.live = 0
+
+    def commit(self) -> None:
+        """Fin de turno: aplica la política de ``fsync``"""
+        if self.fsync == "turn":
+            self._sync()
+        elif self.fsync == "interval":
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def needs_compaction(self) -> bool:
+        return self.records > max(self.compact_min, self.compact_ratio * self.live)
+
+    def compact(self) -> None:
+        """Reescribe el archivo con solo el estado vivo (atómico)
+
+        El estado se lee del propio archivo, así que funciona aunque el
+        llamador solo tenga la cola de la sesión en memoria.
+        """
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        state = read_session(self.path)
+        self._rewrite(state.messages, state.model)
+        self.compactions += 1
+
+    def _rewrite(self, messages: List[Dict[str, Any]], model: Optional[str]) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(_dumps({"op": "meta", "model": model, "ts": time.time()}))
+            for message in messages:
+                fh.write(_dumps({"op": "msg", **message}))
+            fh.flush()
+            if self.fsync != "never":
+                os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+        self.records = len(messages) + 1
+        self.live = len(messages)
+        self._dirty = False
+
+    def maybe_compact(self) -> bool:
+        """Compacta si los registros muertos dominan (coste amortizado)"""
+        if not self.needs_compaction():
+            return False
+        self.compact()
+        return True
+
+    def close(self) -> None:
+        if self._fh is not None:
+            if self.fsync != "never":
+                self._sync()
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,403 @@
+"""
+Trazas ligeras de solicitudes (servidor -> orquestador -> upstream)
+Los spans viajan en ``contextvars`` (válido en hilos y tareas asyncio) y
+entre procesos con la cabecera W3C ``traceparent``. El muestreo es de
+cabeza: se decide en el span raíz (o se hereda del ``traceparent``
+entrante) y los spans no muestreados sólo propagan identificadores, sin
+atributos ni exportación. Exportadores: líneas JSON en el log y un
+archivo OTLP/JSON (una ``ExportTraceServiceRequest`` por línea).
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+span_logger = logging.getLogger("chispart.trace")
+
+SERVER, CLIENT, INTERNAL = "server", "client", "internal"
+# Valores de ``SpanKind`` en OTLP
+_OTLP_KIND = {INTERNAL: 1, SERVER: 2, CLIENT: 3}
+
+
+@dataclass
+class TraceConfig:
+    """Muestreo y exportadores (``AppSettings.trace_*``)"""
+
+    enabled: bool = True
+    # Fracción de trazas raíz que se registran (0 = sólo propagar ids)
+    sample_rate: float = 0.0
+    # Respetar el flag ``sampled`` del ``traceparent`` entrante
+    parent_based: bool = True
+    # "log", "otlp" o ambos separados por comas; "none" no exporta
+    exporters: Tuple[str, ...] = ("log",)
+    otlp_path: str = "logs/traces.otlp.jsonl"
+    service_name: str = "chispart"
+    # Rutas sin span de servidor (estáticos, sondas, scrapes)
+    exclude_paths: Tuple[str, ...] = ("/health", "/metrics", "/static", "/frontend")
+
+    @classmethod
+    def from_settings(cls) -> "TraceConfig":
+        """Valores de ``AppSettings`` si pydantic-settings está disponible"""
+        try:
+            from ..config.settings import settings
+        except ImportError:
+            return cls()
+        config = cls()
+        rate = getattr(settings, "trace_sample_rate", None)
+        if rate is not None:
+            config.sample_rate = min(1.0, max(0.0, float(rate)))
+        exporters = getattr(settings, "trace_exporter", None)
+        if exporters:
+            config.exporters = tuple(
+                e.strip() for e in str(exporters).split(",") if e.strip()
+            )
+        config.otlp_path = getattr(settings, "trace_file", None) or config.otlp_path
+        config.enabled = bool(getattr(settings, "trace_enabled", True))
+        return config
+
+
+def _new_id(nbytes: int) -> str:
+    return "%0*x" % (nbytes * 2, random.getrandbits(nbytes * 8))
+
+
+@dataclass
+class Span:
+    """Operación cronometrada dentro de una traza"""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    kind: str = INTERNAL
+    sampled: bool = False
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> None:
+        if self.sampled:
+            self.attributes.update(attributes)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """``(trace_id, span_id padre, sampled)`` o ``None`` si no es válido"""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1].lower(), parts[2].lower(), bool(flags & 1)
+
+
+class LogExporter:
+    """Un span por línea JSON en el logger ``chispart.trace``"""
+
+    def export(self, span: Span) -> None:
+        span_logger.info(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+
+    def close(self) -> None:
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPFileExporter:
+    """``ExportTraceServiceRequest`` en JSON, una por línea (receptor
+    ``otlpjsonfile`` del OpenTelemetry Collector)"""
+
+    def __init__(self, path: str, service_name: str = "chispart"):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _record(self, span: Span) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": _OTLP_KIND.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            record["parentSpanId"] = span.parent_id
+        return record
+
+    def export(self, span: Span) -> None:
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": self.service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": "chispart"}, "spans": [self._record(span)]}
+                    ],
+                }
+            ]
+        }
+        line = json.dumps(request, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class MemoryExporter:
+    """Guarda los spans terminados (pruebas y depuración)"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def close(self) -> None:
+        pass
+
+    def by_name(self, name: str) -> List[Span]:
+        return [s for s in self.spans if s.name == name]
+
+
+def build_exporters(config: TraceConfig) -> List[Any]:
+    exporters: List[Any] = []
+    for name in config.exporters:
+        if name == "log":
+            exporters.append(LogExporter())
+        elif name == "otlp":
+            exporters.append(OTLPFileExporter(config.otlp_path, config.service_name))
+        elif name != "none":
+            logger.warning(f"Exportador de trazas desconocido: {name}")
+    return exporters
+
+
+_current: "ContextVar[Optional[Span]]" = ContextVar("chispart_span", default=None)
+
+
+class Tracer:
+    """Crea spans, decide el muestreo y entrega los terminados a los exportadores"""
+
+    def __init__(
+        self, config: Optional[TraceConfig] = None, exporters: Optional[list] = None
+    ):
+        self.config = config or TraceConfig()
+        self.exporters = (
+            exporters if exporters is not None else build_exporters(self.config)
+        )
+
+    def configure(self, config: TraceConfig, exporters: Optional[list] = None) -> None:
+        """Reemplaza configuración y exportadores (cerrando los anteriores)"""
+        for exporter in self.exporters:
+            exporter.close()
+        self.config = config
+        self.exporters = exporters if exporters is not None else build_exporters(config)
+
+    def _new_span(
+        self,
+        name: str,
+        kind: str,
+        parent: Optional[Span],
+        remote: Optional[Tuple[str, str, bool]],
+    ) -> Span:
+        if parent is not None:
+            trace_id, parent_id, sampled = (
+                parent.trace_id,
+                parent.span_id,
+                parent.sampled,
+            )
+        elif remote is not None:
+            trace_id, parent_id, sampled = remote
+            if not self.config.parent_based:
+                sampled = random.random() < self.config.sample_rate
+        else:
+            trace_id, parent_id = _new_id(16), None
+            sampled = random.random() < self.config.sample_rate
+        return Span(name, trace_id, _new_id(8), parent_id, kind, sampled)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: str = INTERNAL,
+        traceparent: Optional[str] = None,
+        **attributes: Any,
+    ) -> Iterator[Optional[Span]]:
+        """Span hijo del actual (o raíz, continuando ``traceparent`` si llega)
+
+        Produce ``None`` con el trazado desactivado.
+        """
+        if not self.config.enabled:
+            yield None
+            return
+        parent = _current.get()
+        remote = parse_traceparent(traceparent) if parent is None else None
+        span = self._new_span(name, kind, parent, remote)
+        span.set(**attributes)
+        token = _current.set(span)
+        span.start_ns = time.time_ns()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current.reset(token)
+            self._finish(span)
+
+    def record(
+        self, name: str, start_ns: int, end_ns: int, **attributes: Any
+    ) -> Optional[Span]:
+        """Span ya medido (p.ej. una etapa deducida de marcas de tiempo)"""
+        parent = _current.get()
+        if not self.config.enabled or parent is None or not parent.sampled:
+            return None
+        span = Span(name, parent.trace_id, _new_id(8), parent.span_id, INTERNAL, True)
+        span.start_ns, span.end_ns = start_ns, end_ns
+        span.set(**attributes)
+        self._finish(span)
+        return span
+
+    def _finish(self, span: Span) -> None:
+        if not span.sampled:
+            return
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"No se pudo exportar el span {span.name}: {e}")
+
+    def close(self) -> None:
+        for exporter in self.exporters:
+            exporter.close()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def inject(headers: Dict[str, str]) -> Dict[str, str]:
+    """Añade ``traceparent`` del span actual a ``headers`` (in situ)"""
+    span = _current.get()
+    if span is not None:
+        headers["traceparent"] = span.traceparent()
+    return headers
+
+
+tracer = Tracer(TraceConfig.from_settings())
+
+
+def _header(scope: Mapping[str, Any], name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers") or []:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+class TracingMiddleware:
+    """Middleware ASGI: span de servidor por solicitud y ``traceparent``/
+    ``X-Trace-Id`` en la respuesta"""
+
+    def __init__(self, app: Any, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send) -> None:
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or not self.tracer.config.enabled
+            or any(
+                path == p or path.startswith(p + "/")
+                for p in self.tracer.config.exclude_paths
+            )
+        ):
+            await self.app(scope, receive, send)
+            return
+        method = scope.get("method", "GET")
+        with self.tracer.span(
+            f"{method} {path}",
+            SERVER,
+            traceparent=_header(scope, b"traceparent"),
+            **{"http.method": method, "http.target": path},
+        ) as span:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    span.set(**{"http.status_code": message["status"]})
+                    headers = list(message.get("headers") or [])
+                    headers.append((b"traceparent", span.traceparent().encode()))
+                    headers.append((b"x-trace-id", span.trace_id.encode()))
+                    message = dict(message, headers=headers)
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                # Nombre por plantilla para agrupar (``POST /cycles/{cycle_id}/messages``)
+                span.name = f"{method} {route}"
+                span.set(**{"http.route": route})
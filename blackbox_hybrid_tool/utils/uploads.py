@@ -0,0 +1,104 @@
+"""
+Escritura atómica y subidas reanudables
+Los datos se escriben en un temporal del mismo directorio que el destino
+y se publican con ``os.replace`` (o ``os.link`` si no se permite
+sobrescribir), de modo que un corte nunca deja un archivo a medias. Las
+subidas en streaming usan un temporal con nombre fijo por destino
+(``.<nombre>.upload``) cuyo tamaño es el offset desde el que reanudar.
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+# Bloque de lectura/escritura: memoria constante sea cual sea el tamaño
+CHUNK_SIZE = 1024 * 1024
+PARTIAL_SUFFIX = ".upload"
+
+
+def partial_path(target: str) -> str:
+    """Temporal de la subida en curso hacia ``target``"""
+    directory, name = os.path.split(target)
+    return os.path.join(directory, f".{name}{PARTIAL_SUFFIX}")
+
+
+def partial_size(target: str) -> int:
+    """Bytes ya recibidos para ``target`` (0 si no hay subida pendiente)"""
+    try:
+        return os.path.getsize(partial_path(target))
+    except FileNotFoundError:
+        return 0
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fsync_dir(directory: str) -> None:
+    # Persiste la entrada de directorio tras el rename (no existe en Windows)
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def commit(tmp: str, target: str, overwrite: bool = True) -> None:
+    """Publica ``tmp`` como ``target`` de forma atómica
+
+    Sin ``overwrite`` se usa ``os.link``, que falla con ``FileExistsError``
+    si el destino apareció entretanto; el temporal se elimina igualmente.
+    """
+    with open(tmp, "rb+") as fh:
+        os.fsync(fh.fileno())
+    if overwrite:
+        os.replace(tmp, target)
+    else:
+        try:
+            os.link(tmp, target)
+        finally:
+            os.unlink(tmp)
+    _fsync_dir(os.path.dirname(target) or ".")
+
+
+def atomic_write(target: str, data: bytes, overwrite: bool = True) -> None:
+    """Escribe ``data`` en ``target`` sin dejar nunca un archivo truncado"""
+    directory = os.path.dirname(target) or "."
+    fd, tmp = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(target)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        commit(tmp, target, overwrite)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def discard(target: str) -> bool:
+    """Abandona la subida pendiente hacia ``target``"""
+    try:
+        os.unlink(partial_path(target))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def verify(tmp: str, expected: Optional[str], actual: Optional[str] = None) -> str:
+    """SHA-256 de ``tmp`` (o ``actual`` si ya se calculó al vuelo)
+
+    Lanza ``ValueError`` si no coincide con ``expected``.
+    """
+    digest = actual or file_sha256(tmp)
+    if expected and digest != expected.lower():
+        raise ValueError(f"Checksum mismatch: expected {expected}, got {digest}")
+    return digest
@@ -6,26 +6,70 @@ Servidor FastAPI para la plataforma de creación con múltiples agentes IA
 
 import os
 import json
+import asyncio
+import base64
+import functools
+import hashlib
 import logging
+import math
 import shutil
+import stat
+import time
+from contextvars import ContextVar
+from email.utils import formatdate, parsedate_to_datetime
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, Response
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
+from starlette.requests import ClientDisconnect
 import uuid
 from multi_agent_workflow.models import (
     DevelopmentCycle,
     ChatMessage,
+    CyclePage,
+    CycleSummary,
     GitHubLink,
 )
 from multi_agent_workflow.state import app_state
 from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
-from blackbox_hybrid_tool.utils.patcher import apply_unified_diff
+from blackbox_hybrid_tool.core.context import count_tokens
+from blackbox_hybrid_tool.core.directory_analysis import (
+    AnalysisConfig,
+    DirectoryAnalyzer,
+)
+from blackbox_hybrid_tool.core.streaming import DONE, format_sse
+from blackbox_hybrid_tool.exceptions import (
+    BlackboxAPIError,
+    BlackboxCircuitOpenError,
+    BlackboxRateLimitError,
+    BlackboxTimeoutError,
+)
+from blackbox_hybrid_tool.utils.listing import DirectoryListingCache
+from blackbox_hybrid_tool.utils.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    REGISTRY as metrics_registry,
+    MetricsMiddleware,
+)
+from blackbox_hybrid_tool.utils.patcher import apply_unified_diff, escaping_paths
+from blackbox_hybrid_tool.utils.rate_limit_middleware import (
+    InboundRateLimiter,
+    InboundRateLimitMiddleware,
+)
+from blackbox_hybrid_tool.utils import uploads
+from blackbox_hybrid_tool.utils.aio import to_thread
 from blackbox_hybrid_tool.utils.self_repo import ensure_embedded_snapshot
+from blackbox_hybrid_tool.utils.tracing import TracingMiddleware, tracer
 
 # Configurar logging
 logging.basicConfig(
@@ -104,12 +148,28 @@ APP_VERSION = os.getenv("APP_VERSION", "1.0.0")
 
 # Instancia global del orquestador
 orchestrator = None
+# Resúmenes por archivo cacheados entre solicitudes de analyze_directory
+directory_analyzer = DirectoryAnalyzer()
+
+
+def upstream_http_error(error: BlackboxAPIError) -> HTTPException:
+    """Traduce un fallo de la API de Blackbox a un error de gateway."""
+    if isinstance(error, (BlackboxRateLimitError, BlackboxCircuitOpenError)):
+        # Rechazo local (limitador o breaker): el cliente puede reintentar más tarde
+        headers = None
+        if error.retry_after is not None:
+            headers = {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+        return HTTPException(
+            status_code=error.status_code, detail=str(error), headers=headers
+        )
+    status_code = 504 if isinstance(error, BlackboxTimeoutError) else 502
+    return HTTPException(status_code=status_code, detail=str(error))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan event handler for startup and shutdown"""
-    global orchestrator
+    global orchestrator, directory_analyzer
     try:
         config_file = os.getenv("CONFIG_FILE")
         if not config_file or not os.path.exists(config_file):
@@ -121,6 +181,13 @@ async def lifespan(app: FastAPI):
                     "blackbox_hybrid_tool", "config", "models.json"
                 )
         orchestrator = AIOrchestrator(config_file)
+        directory_analyzer = DirectoryAnalyzer(
+            AnalysisConfig.from_dict(
+                orchestrator.models_config.get("models", {})
+                .get("blackbox", {})
+                .get("analysis")
+            )
+        )
         if os.getenv("AUTO_SNAPSHOT", "true").lower() in ("1", "true", "yes"):
             try:
                 changed, meta = ensure_embedded_snapshot(Path(".").resolve())
@@ -151,8 +218,67 @@ async def lifespan(app: FastAPI):
     
     yield
     
-    # Shutdown logic (if needed)
+    # Shutdown: liberar conexiones del pool HTTP compartido
     logger.info("Shutting down application")
+    if orchestrator is not None:
+        await orchestrator.aclose()
+    tracer.close()
+
+
+# Marcas de tiempo del handler en curso (ver TracedRoute)
+_stage_marks: "ContextVar[Optional[Dict[str, int]]]" = ContextVar(
+    "stage_marks", default=None
+)
+
+
+def _traced_endpoint(endpoint):
+    """Envuelve un endpoint async en un span y marca su inicio y fin."""
+    if not asyncio.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def traced(*args, **kwargs):
+        marks = _stage_marks.get()
+        if marks is not None:
+            marks["start"] = time.time_ns()
+        try:
+            with tracer.span(f"handler.{endpoint.__name__}"):
+                return await endpoint(*args, **kwargs)
+        finally:
+            if marks is not None:
+                marks["end"] = time.time_ns()
+
+    return traced
+
+
+class TracedRoute(APIRoute):
+    """APIRoute con spans por etapa.
+
+    Lo que pasa antes del endpoint (lectura del cuerpo y validación de
+    pydantic) y después (serialización de la respuesta) se registra como
+    ``request.validate`` y ``response.serialize``.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _traced_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def traced_handler(request: Request) -> Response:
+            marks: Dict[str, int] = {}
+            token = _stage_marks.set(marks)
+            started = time.time_ns()
+            try:
+                return await handler(request)
+            finally:
+                finished = time.time_ns()
+                _stage_marks.reset(token)
+                tracer.record("request.validate", started, marks.get("start", finished))
+                if "end" in marks:
+                    tracer.record("response.serialize", marks["end"], finished)
+
+        return traced_handler
 
 
 # Crear aplicación FastAPI con branding configurable y lifespan
@@ -162,14 +288,25 @@ app = FastAPI(
     version=APP_VERSION,
     lifespan=lifespan,
 )
-
-# Configurar CORS
+app.router.route_class = TracedRoute
+
+# Per-client request/concurrency limits (in-process or Redis via settings.redis_url)
+inbound_limiter = InboundRateLimiter.from_settings()
+app.add_middleware(InboundRateLimitMiddleware, limiter=inbound_limiter)
+# Server span per request; trace ids travel in traceparent / X-Trace-Id
+app.add_middleware(TracingMiddleware)
+# Counts every request, including the ones rejected above
+app.add_middleware(MetricsMiddleware)
+
+# Configurar CORS: el último añadido es el más externo, así también las
+# respuestas 429 del limitador llevan las cabeceras CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 logger.info("Middleware CORS configurado con allow_origins=['*']")
 
@@ -200,6 +337,8 @@ class ChatResponse(BaseModel):
     response: str
     model_used: str
     status: str = "success"
+    # Estadísticas del análisis si se pidió analyze_directory
+    analysis: Optional[Dict[str, Any]] = None
 
 
 class SwitchModelRequest(BaseModel):
@@ -255,35 +394,48 @@ class FilesResponse(BaseModel):
     files: List[FileItem]
     path: str
     error: Optional[str] = None
+    # Entradas totales (tras el filtro) y cursor de la página siguiente
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 # ===================================
 # File System API
 # ===================================
 
+# Listados recientes por (ruta, mtime); CHISPART_FILES_CACHE_TTL=0 la desactiva
+listing_cache = DirectoryListingCache.from_env()
+
+
+def _sandboxed_path(path: str, default_root: Optional[str] = None) -> str:
+    """Resolve ``path`` under WRITE_ROOT (symlinks included) or raise 403."""
+    root_dir = os.path.realpath(os.getenv("WRITE_ROOT", default_root or os.getcwd()))
+    if path in ("", "."):
+        return root_dir
+    full_path = os.path.realpath(os.path.join(root_dir, path.lstrip("/")))
+    if os.path.commonpath([root_dir, full_path]) != root_dir:
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied: path outside allowed directory"
+        )
+    return full_path
+
 
 @app.get("/files", response_model=FilesResponse)
-async def list_files(path: str = Query(default=".")):
-    """List files and directories in the specified path."""
+async def list_files(
+    path: str = Query(default="."),
+    # Sin limit se lista todo (como antes de la paginación); es opt-in
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = Query(None),
+    sort: str = Query("name", pattern="^(name|mtime|size)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    glob: Optional[str] = Query(None, description="Filtro fnmatch sobre el nombre"),
+    show_hidden: bool = Query(False),
+    dirs_first: bool = Query(True),
+):
+    """List files and directories in the specified path (paginated by cursor)."""
     try:
-        # Get the root directory for file operations
-        root_dir = os.getenv("WRITE_ROOT", os.getcwd())
-        
-        # Construct the full path
-        if path == ".":
-            full_path = root_dir
-        else:
-            full_path = os.path.join(root_dir, path.lstrip("/"))
-        
-        # Normalize and validate the path
-        full_path = os.path.abspath(full_path)
-        
-        # Security check: ensure path is within root directory
-        if not full_path.startswith(os.path.abspath(root_dir)):
-            raise HTTPException(
-                status_code=403,
-                detail="Access denied: path outside allowed directory"
-            )
+        full_path = _sandboxed_path(path)
         
         # Check if path exists
         if not os.path.exists(full_path):
@@ -301,29 +453,21 @@ async def list_files(path: str = Query(default=".")):
                 error=f"Path is not a directory: {path}"
             )
         
-        # List directory contents
-        files = []
+        # scandir + caché (ruta, mtime): fuera del event loop para directorios grandes
         try:
-            for entry in os.listdir(full_path):
-                # Skip hidden files starting with .
-                if entry.startswith('.'):
-                    continue
-                
-                entry_path = os.path.join(full_path, entry)
-                
-                try:
-                    stat_info = os.stat(entry_path)
-                    is_dir = os.path.isdir(entry_path)
-                    
-                    files.append(FileItem(
-                        name=entry,
-                        type="directory" if is_dir else "file",
-                        size=stat_info.st_size if not is_dir else None,
-                        modified=stat_info.st_mtime
-                    ))
-                except (OSError, PermissionError):
-                    # Skip files we can't access
-                    continue
+            page = await to_thread(
+                listing_cache.list,
+                full_path,
+                sort=sort,
+                order=order,
+                dirs_first=dirs_first,
+                glob=glob,
+                limit=limit,
+                cursor=cursor,
+                show_hidden=show_hidden,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except PermissionError:
             return FilesResponse(
                 files=[],
@@ -331,7 +475,18 @@ async def list_files(path: str = Query(default=".")):
                 error="Permission denied"
             )
         
-        return FilesResponse(files=files, path=path)
+        files = [
+            FileItem(
+                name=entry.name,
+                type="directory" if entry.is_dir else "file",
+                size=entry.size,
+                modified=entry.modified,
+            )
+            for entry in page.entries
+        ]
+        return FilesResponse(
+            files=files, path=path, total=page.total, next_cursor=page.next_cursor
+        )
     
     except HTTPException:
         raise
@@ -344,6 +499,104 @@ async def list_files(path: str = Query(default=".")):
         )
 
 
+def _file_validators(st: os.stat_result) -> Dict[str, str]:
+    """Strong ETag and Last-Modified for a file version (mtime + size)."""
+    return {
+        "ETag": f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+    }
+
+
+def _file_not_modified(request: Request, st: os.stat_result, etag: str) -> bool:
+    """Conditional GET: If-None-Match wins over If-Modified-Since (RFC 9110)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: W/"x" matches "x"
+        tags = {t.strip() for t in if_none_match.split(",")}
+        tags = {t[2:] if t.startswith("W/") else t for t in tags}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(st.st_mtime) <= since
+    return False
+
+
+@app.get("/files/content")
+async def read_file_content(
+    request: Request,
+    path: str = Query(...),
+    preview: bool = Query(False, description="JSON preview of the first max_bytes"),
+    max_bytes: int = Query(64 * 1024, ge=1, le=1024 * 1024),
+    download: bool = Query(False),
+):
+    """Stream a file under WRITE_ROOT.
+
+    Full reads go through ``FileResponse`` (chunked, ``http.response.pathsend``
+    when the server supports it, single and multi-part ``Range``); ``preview``
+    returns at most ``max_bytes`` decoded as text. Both honour
+    If-None-Match / If-Modified-Since.
+    """
+    full_path = _sandboxed_path(path)
+    try:
+        st = await to_thread(os.stat, full_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"File not found: {path}")
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if not stat.S_ISREG(st.st_mode):
+        raise HTTPException(status_code=400, detail=f"Path is not a file: {path}")
+
+    validators = _file_validators(st)
+    etag = validators["ETag"]
+    if preview:
+        # One representation per (version, max_bytes)
+        etag = f'"{etag.strip(chr(34))}-p{max_bytes:x}"'
+        validators["ETag"] = etag
+    if _file_not_modified(request, st, etag):
+        return Response(status_code=304, headers=validators)
+
+    if preview:
+        def read_head() -> bytes:
+            with open(full_path, "rb") as fh:
+                return fh.read(max_bytes)
+
+        try:
+            head = await to_thread(read_head)
+        except PermissionError:
+            raise HTTPException(status_code=403, detail="Permission denied")
+        binary = b"\x00" in head[:8192]
+        return Response(
+            content=json.dumps(
+                {
+                    "path": path,
+                    "size": st.st_size,
+                    "modified": st.st_mtime,
+                    "truncated": st.st_size > len(head),
+                    "binary": binary,
+                    # A multi-byte character cut at max_bytes is dropped
+                    "content": None if binary else head.decode("utf-8", "ignore"),
+                },
+                ensure_ascii=False,
+            ),
+            media_type="application/json",
+            headers={**validators, "Cache-Control": "no-cache"},
+        )
+
+    if not os.access(full_path, os.R_OK):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return FileResponse(
+        full_path,
+        stat_result=st,
+        filename=os.path.basename(full_path),
+        content_disposition_type="attachment" if download else "inline",
+        headers={**validators, "Cache-Control": "no-cache"},
+    )
+
+
 @app.get("/tools")
 async def get_tools():
     """Get available tools and commands."""
@@ -416,10 +669,59 @@ class AddMessageRequest(BaseModel):
     temperature: Optional[float] = 0.7
 
 
-@app.get("/cycles", response_model=List[DevelopmentCycle])
-async def get_all_cycles():
-    """Get all active development cycles."""
-    return app_state.get_all_cycles()
+def _etag(*parts: Any) -> str:
+    """Weak ETag over a JSON-serializable description of the response."""
+    raw = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return f'W/"{hashlib.sha1(raw).hexdigest()[:20]}"'
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response when If-None-Match already names ``etag``."""
+    header = request.headers.get("if-none-match", "")
+    tags = {t.strip() for t in header.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def _encode_cursor(summary: CycleSummary) -> str:
+    raw = json.dumps([summary.created_at, summary.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, cycle_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(created_at), str(cycle_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@app.get("/cycles", response_model=CyclePage)
+async def get_all_cycles(
+    request: Request,
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = None,
+):
+    """List development cycles as summaries (no messages), oldest first.
+
+    Pass ``next_cursor`` back as ``?cursor=`` for the following page.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    # Uno de más para saber si hay otra página sin contar la tabla
+    items = await to_thread(app_state.list_summaries, limit + 1, after)
+    page = CyclePage(
+        items=items[:limit],
+        next_cursor=_encode_cursor(items[limit - 1]) if len(items) > limit else None,
+    )
+    etag = _etag(page.model_dump(mode="json"))
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    response.headers["ETag"] = etag
+    return page
 
 
 @app.post("/cycles", response_model=DevelopmentCycle)
@@ -436,63 +738,168 @@ async def create_cycle(request: CreateCycleRequest):
         user_message = ChatMessage(sender="user", text=request.initial_prompt)
         new_cycle.messages.append(user_message)
         if orchestrator and blackbox_agent:
-            response_data = orchestrator.generate_response(
-                prompt=request.initial_prompt, model_type=blackbox_agent.model
-            )
+            try:
+                response_data = await orchestrator.agenerate_response(
+                    prompt=request.initial_prompt, model_type=blackbox_agent.model
+                )
+            except BlackboxAPIError as e:
+                raise upstream_http_error(e)
             if isinstance(response_data, dict):
                 response_text = response_data.get("content", "")
             else:
                 response_text = str(response_data)
             bot_message = ChatMessage(sender=blackbox_agent.id, text=response_text)
             new_cycle.messages.append(bot_message)
-    app_state.add_cycle(new_cycle)
+    await to_thread(app_state.add_cycle, new_cycle)
     return new_cycle
 
 
 @app.get("/cycles/{cycle_id}", response_model=DevelopmentCycle)
-async def get_cycle(cycle_id: str):
-    """Get a specific development cycle by its ID."""
-    cycle = app_state.get_cycle(cycle_id)
+async def get_cycle(cycle_id: str, request: Request, response: Response):
+    """Get a specific development cycle by its ID, with its full history."""
+    summary = await to_thread(app_state.get_summary, cycle_id)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Development cycle not found")
+    # El resumen cambia con cada mensaje o enlace: basta para validar
+    etag = _etag("cycle", summary.model_dump(mode="json"))
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    cycle = await to_thread(app_state.get_cycle, cycle_id)
     if not cycle:
         raise HTTPException(status_code=404, detail="Development cycle not found")
+    response.headers["ETag"] = etag
     return cycle
 
 
+@app.get("/cycles/{cycle_id}/messages", response_model=List[ChatMessage])
+async def get_cycle_messages(
+    cycle_id: str,
+    request: Request,
+    response: Response,
+    since_id: Optional[int] = Query(default=None, ge=0),
+    since_ts: Optional[float] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+):
+    """Messages of a cycle, optionally only the newer ones.
+
+    ``since_id`` is the ``id`` of the last message the client has and
+    ``since_ts`` a Unix timestamp (``1760000000`` or ``1760000000.5``);
+    both may be combined. Polling with ``If-None-Match`` returns 304 until
+    the cycle changes.
+    """
+    summary = await to_thread(app_state.get_summary, cycle_id)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Cycle not found")
+    etag = _etag(
+        "messages", summary.model_dump(mode="json"), since_id, since_ts, limit
+    )
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    response.headers["ETag"] = etag
+    return await to_thread(
+        app_state.get_messages, cycle_id, since_id, since_ts, limit
+    )
+
+
+def _cycle_context(
+    cycle_id: str, model: Optional[str], max_tokens: Optional[int]
+) -> List[Dict[str, Any]]:
+    """Historial reciente del ciclo como mensajes de chat, dentro del
+    presupuesto de contexto del modelo."""
+    recent = app_state.recent_messages(
+        cycle_id, orchestrator.context.config.max_messages
+    )
+    roles = {"user": "user", "system": "system"}
+    messages = [
+        {"role": roles.get(m.sender, "assistant"), "content": m.text} for m in recent
+    ]
+    window = orchestrator.fit_context(messages, model=model, max_tokens=max_tokens)
+    if window.dropped:
+        logger.info(
+            f"Contexto del ciclo {cycle_id}: {window.dropped} mensajes fuera "
+            f"({window.original_tokens} -> {window.tokens} tokens)"
+        )
+    return window.messages
+
+
 @app.post("/cycles/{cycle_id}/messages", response_model=ChatMessage)
-async def add_message_to_cycle(cycle_id: str, request: AddMessageRequest):
-    """Add a message to a cycle and get a response from an agent."""
-    cycle = app_state.get_cycle(cycle_id)
+async def add_message_to_cycle(
+    cycle_id: str, request: AddMessageRequest, stream: bool = Query(default=False)
+):
+    """Add a message to a cycle and get a response from an agent.
+
+    With ``?stream=true`` the reply is sent as server-sent events and the
+    final message is appended to the cycle once the stream completes.
+    """
+    # Solo metadatos: el historial se lee acotado para el contexto
+    cycle = await to_thread(
+        app_state.get_cycle, cycle_id, with_messages=False
+    )
     if not cycle:
         raise HTTPException(status_code=404, detail="Cycle not found")
     user_message = ChatMessage(sender="user", text=request.prompt)
-    cycle.messages.append(user_message)
+    await to_thread(app_state.add_message, cycle_id, user_message)
     if not cycle.active_agents:
         raise HTTPException(status_code=500, detail="No active agents in cycle.")
     primary_agent = cycle.active_agents[0]
     if not orchestrator:
         raise HTTPException(status_code=500, detail="Orchestrator not initialized")
-    response_data = orchestrator.generate_response(
-        prompt=request.prompt,
-        model_type=request.model_type or primary_agent.model,
-        max_tokens=request.max_tokens,
-        temperature=request.temperature,
+    model = request.model_type or primary_agent.model
+    context = await to_thread(
+        _cycle_context, cycle_id, model, request.max_tokens
     )
+    if stream:
+
+        async def events():
+            parts = []
+            try:
+                async for delta in orchestrator.astream_response(
+                    prompt=request.prompt,
+                    model_type=model,
+                    messages=context,
+                    max_tokens=request.max_tokens,
+                    temperature=request.temperature,
+                ):
+                    parts.append(delta)
+                    yield format_sse({"delta": delta})
+            except Exception as e:
+                logger.error(f"Error in cycle stream: {str(e)}")
+                yield format_sse({"error": str(e)})
+                yield format_sse(DONE)
+                return
+            bot_message = ChatMessage(sender=primary_agent.id, text="".join(parts))
+            await to_thread(app_state.add_message, cycle_id, bot_message)
+            yield format_sse({"done": True, "message": bot_message.model_dump()})
+            yield format_sse(DONE)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+    try:
+        response_data = await orchestrator.agenerate_response(
+            prompt=request.prompt,
+            model_type=model,
+            messages=context,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature,
+        )
+    except BlackboxAPIError as e:
+        raise upstream_http_error(e)
     if isinstance(response_data, dict):
         response_text = response_data.get("content", "")
     else:
         response_text = str(response_data)
     bot_message = ChatMessage(sender=primary_agent.id, text=response_text)
-    cycle.messages.append(bot_message)
+    await to_thread(app_state.add_message, cycle_id, bot_message)
     return bot_message
 
 
 @app.post("/cycles/{cycle_id}/github")
 async def link_github_to_cycle(cycle_id: str, link: GitHubLink):
     """Link a GitHub issue/PR to a development cycle."""
-    cycle = app_state.get_cycle(cycle_id)
-    if not cycle:
+    if not await to_thread(app_state.set_github_link, cycle_id, link):
         raise HTTPException(status_code=404, detail="Cycle not found")
-    cycle.github_link = link
+    cycle = await to_thread(app_state.get_cycle, cycle_id)
     return {"status": "success", "cycle": cycle}
 
 
@@ -517,6 +924,167 @@ async def health_check():
         return {"status": "unhealthy", "error": str(e)}
 
 
+def _cache_counters():
+    """Contadores numéricos de la caché de respuestas para /metrics."""
+    if orchestrator is None:
+        return None
+    stats = orchestrator.cache_stats()
+    return {
+        (name,): value
+        for name, value in stats.items()
+        if isinstance(value, int) and not isinstance(value, bool)
+    }
+
+
+def _cycle_store_events():
+    """Desalojos, recargas y mensajes recortados del almacén de ciclos."""
+    stats = app_state.stats()
+    events = ("evictions", "reloads", "trimmed_messages")
+    return {(name,): stats[name] for name in events if name in stats}
+
+
+metrics_registry.callback(
+    "chispart_cycles",
+    "Ciclos de desarrollo en AppState",
+    lambda: app_state.stats()["cycles"],
+)
+metrics_registry.callback(
+    "chispart_cycle_messages",
+    "Mensajes en todos los ciclos de AppState",
+    lambda: app_state.stats()["messages"],
+)
+metrics_registry.callback(
+    "chispart_cycle_store_events_total",
+    "Eventos del almacén de ciclos en memoria (evictions, reloads, ...)",
+    _cycle_store_events,
+    kind="counter",
+    labelnames=("event",),
+)
+metrics_registry.callback(
+    "chispart_cycle_store_resident_bytes",
+    "Estimación de bytes de ciclos residentes en memoria",
+    lambda: app_state.stats().get("resident_bytes"),
+)
+metrics_registry.callback(
+    "chispart_response_cache_events_total",
+    "Eventos de la caché de respuestas (hits, misses, ...)",
+    _cache_counters,
+    kind="counter",
+    labelnames=("event",),
+)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de texto de Prometheus."""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/admin/pool")
+async def pool_stats():
+    """Estadísticas del pool de conexiones hacia Blackbox."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    return orchestrator.pool_stats()
+
+
+@app.get("/admin/retries")
+async def retry_stats():
+    """Métricas de reintentos hacia Blackbox por cliente."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    return orchestrator.retry_stats()
+
+
+@app.get("/admin/inbound-limits")
+async def inbound_limit_stats():
+    """Solicitudes admitidas y rechazadas por el limitador entrante."""
+    return inbound_limiter.stats()
+
+
+@app.get("/admin/hedging")
+async def hedge_stats():
+    """Duplicados lanzados, ganados y latencia de cola ahorrada."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    return orchestrator.hedge_stats()
+
+
+@app.get("/admin/router")
+async def router_stats():
+    """Latencia, errores y costes por modelo y últimas decisiones del router."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    return orchestrator.router_stats()
+
+
+@app.get("/admin/breakers")
+async def breaker_stats():
+    """Estado de los circuit breakers por modelo."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    return orchestrator.breaker_stats()
+
+
+@app.post("/admin/breakers/reset")
+async def reset_breakers(model: Optional[str] = Query(None)):
+    """Cierra manualmente el breaker de un modelo (o de todos)."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    return {"reset": orchestrator.reset_breakers(model)}
+
+
+@app.get("/admin/ratelimit")
+async def rate_limit_stats():
+    """Colas y tiempos de espera del limitador hacia Blackbox."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    return orchestrator.rate_limit_stats()
+
+
+@app.get("/admin/coalescing")
+async def coalescing_stats():
+    """Solicitudes idénticas coalescidas en una sola llamada a Blackbox."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    return orchestrator.coalesce_stats()
+
+
+@app.get("/admin/cycles")
+async def cycle_store_stats():
+    """Tamaño del almacén de ciclos y desalojos/recargas a disco."""
+    return await to_thread(app_state.stats)
+
+
+@app.get("/admin/analysis")
+async def analysis_stats():
+    """Resúmenes de archivos cacheados para analyze_directory."""
+    return directory_analyzer.stats()
+
+
+@app.get("/admin/files")
+async def files_cache_stats():
+    """Aciertos/fallos de la caché de listados de /files."""
+    return listing_cache.stats()
+
+
+@app.get("/admin/cache")
+async def cache_stats():
+    """Aciertos/fallos de la caché de respuestas."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    return orchestrator.cache_stats()
+
+
+@app.delete("/admin/cache")
+async def clear_cache():
+    """Vacía la caché de respuestas (memoria y disco)."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+    orchestrator.cache.clear()
+    return {"status": "cleared"}
+
+
 @app.get("/models")
 async def get_models():
     """Obtener lista de modelos disponibles."""
@@ -576,6 +1144,39 @@ async def switch_model(request: SwitchModelRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _analyze_directory(request: ChatRequest):
+    """Contexto del directorio pedido como mensajes de chat, o ``None``."""
+    if not request.analyze_directory:
+        return None, None
+    root = _sandboxed_path(request.analyze_directory)
+    if not os.path.isdir(root):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Path is not a directory: {request.analyze_directory}",
+        )
+    budget = directory_analyzer.config.token_budget
+    context = getattr(orchestrator, "context", None)
+    if context is not None:
+        # El análisis comparte la ventana del modelo con el prompt
+        room = context.budget(request.model_type, request.max_tokens)
+        budget = max(0, min(budget, room - count_tokens(request.prompt)))
+    result = await to_thread(
+        directory_analyzer.analyze, root, request.prompt, budget
+    )
+    logger.info(
+        f"Directory analysis: {result.files_seen} files, "
+        f"{len(result.files_included)} packed, {result.tokens}/{budget} tokens, "
+        f"cache {result.cache_hits} hits / {result.cache_misses} misses"
+    )
+    if not result.context:
+        return None, result.stats()
+    messages = [
+        {"role": "system", "content": result.context},
+        {"role": "user", "content": request.prompt},
+    ]
+    return messages, result.stats()
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Endpoint principal de chat con IA."""
@@ -585,49 +1186,209 @@ async def chat(request: ChatRequest):
         
         logger.info(f"Chat request: prompt='{request.prompt[:50]}...', model={request.model_type}")
         
+        messages, analysis = await _analyze_directory(request)
+        extra = {"messages": messages} if messages else {}
+        
         # Generar respuesta usando el orquestador
-        response_data = orchestrator.generate_response(
+        used: List[str] = []
+        response_data = await orchestrator.agenerate_response(
             prompt=request.prompt,
             model_type=request.model_type,
             max_tokens=request.max_tokens,
-            temperature=request.temperature
+            temperature=request.temperature,
+            on_model=used.append,
+            **extra,
         )
         
         # Extraer contenido de la respuesta
         if isinstance(response_data, dict):
             response_text = response_data.get("content", str(response_data))
-            model_used = response_data.get("model", request.model_type or "auto")
         else:
             response_text = str(response_data)
-            model_used = request.model_type or "auto"
+        model_used = used[0] if used else request.model_type or "auto"
         
         return ChatResponse(
             response=response_text,
             model_used=model_used,
-            status="success"
+            status="success",
+            analysis=analysis
         )
+    except HTTPException:
+        raise
+    except BlackboxAPIError as e:
+        logger.error(f"Upstream error in chat endpoint: {str(e)}")
+        raise upstream_http_error(e)
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Límites de POST /chat/batch
+BATCH_MAX_ITEMS = 1000
+BATCH_MAX_CONCURRENCY = 32
+
+
+def _batch_line(index: int, item_id: Any, result) -> bytes:
+    """Línea JSONL de resultado de /chat/batch.
+
+    ``model_used`` es el modelo que respondió (tras router y fallback); se
+    omite si el orquestador no lo conoce."""
+    line: Dict[str, Any] = {"index": index, "id": item_id}
+    if result.ok:
+        value = result.result
+        if isinstance(value, dict):
+            line["response"] = value.get("content", str(value))
+        else:
+            line["response"] = str(value)
+        if result.model:
+            line["model_used"] = result.model
+        line["status"] = "success"
+    else:
+        line["status"] = "error"
+        line["error"] = result.error
+        line["status_code"] = result.status_code
+    line["latency"] = round(result.latency, 4)
+    return (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+@app.post("/chat/batch")
+async def chat_batch(
+    request: Request,
+    concurrency: int = Query(8, ge=1, le=BATCH_MAX_CONCURRENCY),
+    ordered: bool = Query(False),
+):
+    """Completions en lote: cuerpo JSONL (un ChatRequest por línea, ``id``
+    opcional) y respuesta JSONL en streaming. Cada línea de salida lleva el
+    ``index`` de su línea de entrada; con ``ordered=true`` se emiten en
+    orden de entrada en lugar de según van terminando."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+
+    body = (await request.body()).decode("utf-8", errors="replace")
+    lines = [line for line in body.splitlines() if line.strip()]
+    if not lines:
+        raise HTTPException(status_code=400, detail="Empty batch")
+    if len(lines) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)",
+        )
+
+    # Líneas válidas -> solicitudes del lote; inválidas -> error inmediato
+    jobs: List[Dict[str, Any]] = []
+    positions: List[int] = []
+    invalid: Dict[int, bytes] = {}
+    for index, line in enumerate(lines):
+        item_id = None
+        try:
+            data = json.loads(line)
+            if isinstance(data, dict):
+                item_id = data.get("id")
+            item = ChatRequest.model_validate(data)
+        except (ValueError, ValidationError) as e:
+            invalid[index] = (
+                json.dumps(
+                    {
+                        "index": index,
+                        "id": item_id,
+                        "status": "error",
+                        "error": f"Invalid request: {e}",
+                        "status_code": 400,
+                    },
+                    ensure_ascii=False,
+                )
+                + "\n"
+            ).encode("utf-8")
+            continue
+        jobs.append(
+            {
+                "id": item_id,
+                "prompt": item.prompt,
+                "model_type": item.model_type,
+                "max_tokens": item.max_tokens,
+                "temperature": item.temperature,
+            }
+        )
+        positions.append(index)
+
+    logger.info(
+        f"Chat batch: {len(jobs)} solicitudes ({len(invalid)} inválidas), "
+        f"concurrency={concurrency}"
+    )
+
+    async def results():
+        pending: Dict[int, bytes] = dict(invalid)
+        next_index = 0
+        if not ordered:
+            for line in invalid.values():
+                yield line
+        async for result in orchestrator.aiter_batch(jobs, concurrency=concurrency):
+            position = positions[result.index]
+            line = _batch_line(position, result.id, result)
+            if not ordered:
+                yield line
+                continue
+            pending[position] = line
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+        while next_index in pending:
+            yield pending.pop(next_index)
+            next_index += 1
+
+    return StreamingResponse(
+        results(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Chat con IA enviando los tokens como server-sent events."""
+    if orchestrator is None:
+        raise HTTPException(status_code=500, detail="Orchestrator not initialized")
+
+    logger.info(
+        f"Chat stream request: prompt='{request.prompt[:50]}...', model={request.model_type}"
+    )
+    messages, analysis = await _analyze_directory(request)
+    extra = {"messages": messages} if messages else {}
+
+    async def events():
+        if analysis:
+            yield format_sse({"analysis": analysis})
+        # El orquestador informa del modelo elegido por el router
+        used: List[str] = []
+        try:
+            async for delta in orchestrator.astream_response(
+                prompt=request.prompt,
+                model_type=request.model_type,
+                max_tokens=request.max_tokens,
+                temperature=request.temperature,
+                on_model=used.append,
+                **extra,
+            ):
+                yield format_sse({"delta": delta})
+        except Exception as e:
+            logger.error(f"Error in chat stream: {str(e)}")
+            yield format_sse({"error": str(e)})
+        model_used = used[0] if used else request.model_type or "auto"
+        yield format_sse({"done": True, "model_used": model_used})
+        yield format_sse(DONE)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/files/write")
 async def write_file_endpoint(request: WriteFileRequest):
-    """Crear o escribir un archivo de texto."""
+    """Crear o escribir un archivo de texto (escritura atómica)."""
     try:
-        # Obtener el directorio raíz permitido
-        write_root = os.getenv("WRITE_ROOT", "/app")
-        
-        # Construir ruta absoluta
-        target_path = os.path.join(write_root, request.path.lstrip("/"))
-        target_path = os.path.abspath(target_path)
-        
-        # Verificar que la ruta esté dentro del directorio permitido
-        if not target_path.startswith(os.path.abspath(write_root)):
-            raise HTTPException(
-                status_code=403,
-                detail="Access denied: path outside allowed directory"
-            )
+        target_path = _sandboxed_path(request.path, default_root="/app")
         
         # Verificar si el archivo existe
         if os.path.exists(target_path) and not request.overwrite:
@@ -639,9 +1400,19 @@ async def write_file_endpoint(request: WriteFileRequest):
         # Crear directorios intermedios si no existen
         os.makedirs(os.path.dirname(target_path), exist_ok=True)
         
-        # Escribir el archivo
-        with open(target_path, "w", encoding="utf-8") as f:
-            f.write(request.content)
+        # Temporal en el mismo directorio + os.replace: nunca queda truncado
+        try:
+            await to_thread(
+                uploads.atomic_write,
+                target_path,
+                request.content.encode("utf-8"),
+                request.overwrite,
+            )
+        except FileExistsError:
+            raise HTTPException(
+                status_code=409,
+                detail="File already exists. Use overwrite=true to replace."
+            )
         
         return {
             "status": "success",
@@ -656,26 +1427,179 @@ async def write_file_endpoint(request: WriteFileRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Destinos con una subida en curso (una a la vez por archivo)
+_active_uploads: set = set()
+UPLOAD_MAX_BYTES = int(os.getenv("CHISPART_UPLOAD_MAX_BYTES", str(1024 ** 3)))
+
+
+def _upload_target(path: str) -> str:
+    target_path = _sandboxed_path(path, default_root="/app")
+    if os.path.isdir(target_path):
+        raise HTTPException(status_code=400, detail=f"Path is a directory: {path}")
+    return target_path
+
+
+def _offset_conflict(current: int, detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail={"error": detail, "offset": current},
+        headers={"Upload-Offset": str(current)},
+    )
+
+
+@app.put("/files/upload")
+async def upload_file(
+    request: Request,
+    path: str = Query(...),
+    offset: int = Query(0, ge=0, description="Bytes ya enviados (reanudación)"),
+    complete: bool = Query(True, description="Último fragmento: publicar el archivo"),
+    overwrite: bool = Query(False),
+    sha256: Optional[str] = Query(None, pattern="^[0-9a-fA-F]{64}$"),
+):
+    """Subida en streaming del cuerpo crudo (octet-stream o chunked).
+
+    Los bytes van a ``.<nombre>.upload`` en el directorio destino en bloques
+    de 1 MiB, con memoria constante. Con ``complete=false`` la subida queda
+    pendiente y se reanuda enviando el resto con ``offset`` = bytes ya
+    recibidos (``GET /files/upload`` lo devuelve). Al completar se verifica
+    ``sha256`` si se indicó y el archivo se publica con ``os.replace``.
+    """
+    target_path = _upload_target(path)
+    if not overwrite and os.path.exists(target_path):
+        raise HTTPException(
+            status_code=409,
+            detail="File already exists. Use overwrite=true to replace."
+        )
+    if target_path in _active_uploads:
+        raise HTTPException(status_code=409, detail="Upload already in progress")
+    _active_uploads.add(target_path)
+    try:
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        tmp = uploads.partial_path(target_path)
+        current = uploads.partial_size(target_path)
+        # offset=0 reinicia; cualquier otro valor debe continuar donde se quedó
+        if offset and offset != current:
+            raise _offset_conflict(current, "Offset does not match received bytes")
+
+        # El hash al vuelo solo es posible si la subida empieza aquí
+        digest = hashlib.sha256() if offset == 0 else None
+        received = offset
+        buffer = bytearray()
+        with open(tmp, "r+b" if offset else "wb") as fh:
+            fh.seek(offset)
+
+            async def flush() -> None:
+                if buffer:
+                    await to_thread(fh.write, bytes(buffer))
+                    if digest is not None:
+                        digest.update(buffer)
+                    buffer.clear()
+
+            try:
+                async for chunk in request.stream():
+                    received += len(chunk)
+                    if received > UPLOAD_MAX_BYTES:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"Upload exceeds {UPLOAD_MAX_BYTES} bytes"
+                        )
+                    buffer += chunk
+                    if len(buffer) >= uploads.CHUNK_SIZE:
+                        await flush()
+            except ClientDisconnect:
+                # Lo recibido queda en el temporal: el cliente puede reanudar
+                await flush()
+                logger.info(f"Upload interrupted at {received} bytes: {path}")
+                return Response(status_code=499)
+            except HTTPException:
+                fh.close()
+                uploads.discard(target_path)
+                raise
+            await flush()
+
+        if not complete:
+            return {"status": "partial", "path": target_path, "offset": received}
+
+        try:
+            checksum = await to_thread(
+                uploads.verify, tmp, sha256, digest.hexdigest() if digest else None
+            )
+        except ValueError as e:
+            uploads.discard(target_path)
+            raise HTTPException(status_code=422, detail=str(e))
+        try:
+            await to_thread(uploads.commit, tmp, target_path, overwrite)
+        except FileExistsError:
+            raise HTTPException(
+                status_code=409,
+                detail="File already exists. Use overwrite=true to replace."
+            )
+        return {
+            "status": "success",
+            "path": target_path,
+            "size": received,
+            "sha256": checksum,
+            "message": "File uploaded successfully",
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading file: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _active_uploads.discard(target_path)
+
+
+@app.get("/files/upload")
+async def upload_status(path: str = Query(...)):
+    """Offset desde el que reanudar una subida pendiente."""
+    target_path = _upload_target(path)
+    offset = uploads.partial_size(target_path)
+    return JSONResponse(
+        {
+            "path": target_path,
+            "offset": offset,
+            "active": target_path in _active_uploads,
+        },
+        headers={"Upload-Offset": str(offset)},
+    )
+
+
+@app.delete("/files/upload")
+async def cancel_upload(path: str = Query(...)):
+    """Descarta una subida pendiente."""
+    target_path = _upload_target(path)
+    if target_path in _active_uploads:
+        raise HTTPException(status_code=409, detail="Upload already in progress")
+    if not uploads.discard(target_path):
+        raise HTTPException(status_code=404, detail="No pending upload")
+    return {"status": "cancelled", "path": target_path}
+
+
 @app.post("/patch/apply")
 async def apply_patch_endpoint(request: ApplyPatchRequest):
     """Aplicar un parche unified diff."""
     try:
-        # Obtener el directorio raíz
-        root_dir = request.root or os.getenv("WRITE_ROOT", "/app")
-        root_path = Path(root_dir).resolve()
-        
+        # El directorio raíz se resuelve dentro de WRITE_ROOT, igual que /files
+        root_path = Path(_sandboxed_path(request.root or ".", default_root="/app"))
+        # Ningún destino del parche puede salir de esa raíz (absolutos, "..")
+        escaping = escaping_paths(request.patch, root_path)
+        if escaping:
+            raise HTTPException(
+                status_code=403,
+                detail={"error": "Patch target outside allowed directory", "files": escaping},
+            )
+
         # Aplicar el parche
-        result = apply_unified_diff(
-            patch_content=request.patch,
-            root_dir=root_path,
-            dry_run=False
-        )
+        result = apply_unified_diff(request.patch, root_path)
         
         return {
             "status": "success",
             "result": result,
             "message": "Patch applied successfully"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error applying patch: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
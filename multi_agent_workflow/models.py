@@ -34,6 +34,10 @@ class GitHubLink(BaseModel):
 class ChatMessage(BaseModel):
     """Represents a single message in a chat thread."""
 
+    id: Optional[int] = Field(
+        None,
+        description="Store-assigned sequence number, increasing within a cycle.",
+    )
     sender: str = Field(description="Who sent the message ('user' or agent's id).")
     text: str = Field(description="The content of the message.")
     timestamp: float = Field(
@@ -60,3 +64,29 @@ class DevelopmentCycle(BaseModel):
         None, description="An optional link to a related GitHub issue/PR."
     )
     created_at: float = Field(default_factory=time.time)
+
+
+class CycleSummary(BaseModel):
+    """A development cycle without its messages, as listed by ``GET /cycles``."""
+
+    id: str
+    title: str
+    active_agents: List[Agent] = Field(default_factory=list)
+    github_link: Optional[GitHubLink] = None
+    created_at: float
+    message_count: int = Field(0, description="Number of messages in the cycle.")
+    last_message_id: Optional[int] = Field(
+        None, description="Id of the newest message, usable as ``?since_id=``."
+    )
+    last_message_at: Optional[float] = Field(
+        None, description="Timestamp of the newest message."
+    )
+
+
+class CyclePage(BaseModel):
+    """One page of cycle summaries, oldest first."""
+
+    items: List[CycleSummary]
+    next_cursor: Optional[str] = Field(
+        None, description="Opaque cursor for the next page; null on the last one."
+    )
@@ -1,11 +1,16 @@
-from typing import Dict, List
-from .models import DevelopmentCycle, Agent
+from typing import Any, Dict, List, Optional
+from .models import DevelopmentCycle, Agent, ChatMessage, CycleSummary, GitHubLink
+from .storage import CycleKey, CycleStore, store_from_env
 
 
 class AppState:
     """
-    A singleton class to hold the in-memory state of the application.
+    A singleton class to hold the state of the application.
     This includes all development cycles and available agents.
+
+    Cycles live in a pluggable ``CycleStore``: in memory by default, or in
+    SQLite when ``CHISPART_CYCLES_DB`` is set. Messages and GitHub links are
+    written through the store, so callers must not mutate returned cycles.
     """
 
     _instance = None
@@ -13,7 +18,7 @@ class AppState:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(AppState, cls).__new__(cls)
-            cls._instance.cycles: Dict[str, DevelopmentCycle] = {}
+            cls._instance.store: CycleStore = store_from_env()
             cls._instance.available_agents: Dict[str, Agent] = {
                 "blackbox": Agent(
                     id="blackbox",
@@ -36,14 +41,50 @@ class AppState:
             }
         return cls._instance
 
-    def get_cycle(self, cycle_id: str) -> DevelopmentCycle:
-        return self.cycles.get(cycle_id)
+    def use_store(self, store: CycleStore) -> CycleStore:
+        """Swap the cycle store, returning the previous one."""
+        previous, self.store = self.store, store
+        return previous
+
+    def get_cycle(
+        self, cycle_id: str, with_messages: bool = True
+    ) -> Optional[DevelopmentCycle]:
+        return self.store.get_cycle(cycle_id, with_messages=with_messages)
 
     def add_cycle(self, cycle: DevelopmentCycle):
-        self.cycles[cycle.id] = cycle
+        self.store.add_cycle(cycle)
+
+    def get_all_cycles(self, with_messages: bool = True) -> List[DevelopmentCycle]:
+        return self.store.list_cycles(with_messages=with_messages)
+
+    def add_message(self, cycle_id: str, message: ChatMessage) -> bool:
+        return self.store.add_message(cycle_id, message)
+
+    def list_summaries(
+        self, limit: int, after: Optional[CycleKey] = None
+    ) -> List[CycleSummary]:
+        return self.store.list_summaries(limit, after)
+
+    def get_summary(self, cycle_id: str) -> Optional[CycleSummary]:
+        return self.store.get_summary(cycle_id)
+
+    def get_messages(
+        self,
+        cycle_id: str,
+        since_id: Optional[int] = None,
+        since_timestamp: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[ChatMessage]:
+        return self.store.get_messages(cycle_id, since_id, since_timestamp, limit)
+
+    def recent_messages(self, cycle_id: str, count: int) -> List[ChatMessage]:
+        return self.store.recent_messages(cycle_id, count)
+
+    def set_github_link(self, cycle_id: str, link: GitHubLink) -> bool:
+        return self.store.set_github_link(cycle_id, link)
 
-    def get_all_cycles(self) -> List[DevelopmentCycle]:
-        return list(self.cycles.values())
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
 
     def get_available_agents(self) -> List[Agent]:
         return list(self.available_agents.values())
@@ -0,0 +1,719 @@
+"""
+Storage backends for development cycles.
+
+``MemoryCycleStore`` keeps cycles in process memory, optionally bounded:
+cold cycles and old messages spill to compressed files and come back on
+access. ``SQLiteCycleStore`` persists cycles and messages in
+separate, indexed tables: several uvicorn workers share the same data, it
+survives restarts, and messages are only read when a caller asks for them.
+
+Every stored message gets an integer ``id`` that increases within its
+cycle, so clients can page and poll with ``since_id``. Cycles are ordered by
+``(created_at, id)``, which is also the pagination key.
+"""
+
+import atexit
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .models import Agent, ChatMessage, CycleSummary, DevelopmentCycle, GitHubLink
+
+# (created_at, id) of the last cycle already returned
+CycleKey = Tuple[float, str]
+
+
+class CycleStore(ABC):
+    """Interface shared by every cycle storage backend."""
+
+    name = "abstract"
+
+    @abstractmethod
+    def add_cycle(self, cycle: DevelopmentCycle) -> None:
+        """Store a new cycle together with the messages it already has."""
+
+    @abstractmethod
+    def get_cycle(
+        self, cycle_id: str, with_messages: bool = True
+    ) -> Optional[DevelopmentCycle]:
+        """Return the cycle, or None. Without messages the list is empty."""
+
+    @abstractmethod
+    def list_cycles(self, with_messages: bool = True) -> List[DevelopmentCycle]:
+        """All cycles, oldest first."""
+
+    @abstractmethod
+    def list_summaries(
+        self, limit: int, after: Optional[CycleKey] = None
+    ) -> List[CycleSummary]:
+        """Up to ``limit`` cycle summaries ordered after the ``after`` key."""
+
+    @abstractmethod
+    def get_summary(self, cycle_id: str) -> Optional[CycleSummary]:
+        """Metadata and message counters of one cycle, or None."""
+
+    @abstractmethod
+    def add_message(self, cycle_id: str, message: ChatMessage) -> bool:
+        """Append a message and set its ``id``; False if the cycle does not exist."""
+
+    @abstractmethod
+    def get_messages(
+        self,
+        cycle_id: str,
+        since_id: Optional[int] = None,
+        since_timestamp: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[ChatMessage]:
+        """Messages of a cycle in insertion order, newer than the given id
+        and/or timestamp when those are set."""
+
+    @abstractmethod
+    def recent_messages(self, cycle_id: str, count: int) -> List[ChatMessage]:
+        """The last ``count`` messages of a cycle, oldest first."""
+
+    @abstractmethod
+    def set_github_link(self, cycle_id: str, link: GitHubLink) -> bool:
+        """Attach a GitHub link; False if the cycle does not exist."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Counts of cycles and messages plus backend details."""
+
+    def close(self) -> None:
+        pass
+
+
+@dataclass
+class MemoryLimits:
+    """Caps for ``MemoryCycleStore``; 0 disables a cap.
+
+    Cycles over ``max_cycles`` or ``max_bytes`` (a rough estimate of the
+    resident text) are evicted least-recently-used first, and messages over
+    ``max_messages_per_cycle`` leave memory oldest first. Both go to a
+    gzip-compressed JSONL file per cycle under ``spill_dir`` (a fresh
+    temporary directory by default) and are read back on access.
+    """
+
+    max_cycles: int = 1000
+    max_messages_per_cycle: int = 1000
+    max_bytes: int = 64 * 1024 * 1024
+    spill_dir: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "MemoryLimits":
+        """Read the ``CHISPART_CYCLES_MAX_*`` / ``CHISPART_CYCLES_SPILL_DIR`` vars."""
+        defaults = cls()
+        return cls(
+            max_cycles=_env_int("CHISPART_CYCLES_MAX_RESIDENT", defaults.max_cycles),
+            max_messages_per_cycle=_env_int(
+                "CHISPART_CYCLES_MAX_MESSAGES", defaults.max_messages_per_cycle
+            ),
+            max_bytes=_env_int("CHISPART_CYCLES_MAX_BYTES", defaults.max_bytes),
+            spill_dir=os.getenv("CHISPART_CYCLES_SPILL_DIR") or None,
+        )
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def _message_bytes(message: ChatMessage) -> int:
+    # Text plus a flat allowance for the pydantic object and its fields
+    return len(message.text) + len(message.sender) + 96
+
+
+def _filter_messages(
+    messages: List[ChatMessage],
+    since_id: Optional[int],
+    since_timestamp: Optional[float],
+    limit: Optional[int],
+) -> List[ChatMessage]:
+    if since_id is not None:
+        # Ids grow with the list: walk back only over the new tail
+        start = len(messages)
+        while start > 0 and (messages[start - 1].id or 0) > since_id:
+            start -= 1
+        messages = messages[start:]
+    if since_timestamp is not None:
+        messages = [m for m in messages if m.timestamp > since_timestamp]
+    return list(messages[:limit] if limit is not None else messages)
+
+
+class MemoryCycleStore(CycleStore):
+    """Cycles in process memory, optionally bounded by ``MemoryLimits``.
+
+    Summaries of every cycle stay in memory (they are small and serve
+    listings); full cycles are kept in an LRU. Without limits nothing is
+    ever spilled and returned cycles are the stored objects.
+    """
+
+    name = "memory"
+
+    def __init__(self, limits: Optional[MemoryLimits] = None):
+        self.limits = limits or MemoryLimits(0, 0, 0)
+        # Resident cycles, least recently used first
+        self.cycles: "OrderedDict[str, DevelopmentCycle]" = OrderedDict()
+        self._summaries: Dict[str, CycleSummary] = {}
+        self._sizes: Dict[str, int] = {}
+        # Per cycle: id of the last message already written to its spill file
+        self._spilled_upto: Dict[str, int] = {}
+        self._spill_sizes: Dict[str, int] = {}
+        self._spill_root: Optional[str] = None
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._messages = 0
+        self.evictions = 0
+        self.reloads = 0
+        self.trimmed = 0
+
+    # -- spill files -------------------------------------------------------
+
+    def _spill_path(self, cycle_id: str) -> str:
+        if self._spill_root is None:
+            if self.limits.spill_dir:
+                os.makedirs(self.limits.spill_dir, exist_ok=True)
+            self._spill_root = tempfile.mkdtemp(
+                prefix="chispart-cycles-", dir=self.limits.spill_dir
+            )
+            # Scratch space owned by this process: gone when it exits
+            atexit.register(self.close)
+        digest = hashlib.sha1(cycle_id.encode("utf-8")).hexdigest()
+        return os.path.join(self._spill_root, f"{digest}.jsonl.gz")
+
+    def _spill(self, cycle_id: str, messages: List[ChatMessage]) -> None:
+        """Append messages not yet on disk to the cycle's file."""
+        upto = self._spilled_upto.get(cycle_id, 0)
+        pending = [m for m in messages if (m.id or 0) > upto]
+        if not pending:
+            return
+        path = self._spill_path(cycle_id)
+        # Append mode adds a gzip member; readers see one continuous stream
+        with gzip.open(path, "at", encoding="utf-8", compresslevel=6) as fh:
+            for message in pending:
+                fh.write(message.model_dump_json() + "\n")
+        self._spilled_upto[cycle_id] = pending[-1].id or upto
+        self._spill_sizes[cycle_id] = os.path.getsize(path)
+
+    def _read_spill(self, cycle_id: str) -> List[ChatMessage]:
+        if not self._spilled_upto.get(cycle_id):
+            return []
+        with gzip.open(self._spill_path(cycle_id), "rt", encoding="utf-8") as fh:
+            return [ChatMessage.model_validate_json(line) for line in fh]
+
+    def _drop_spill(self, cycle_id: str) -> None:
+        if self._spilled_upto.pop(cycle_id, None):
+            self._spill_sizes.pop(cycle_id, None)
+            try:
+                os.remove(self._spill_path(cycle_id))
+            except OSError:
+                pass
+
+    # -- residency -----------------------------------------------------------
+
+    def _set_size(self, cycle_id: str, size: int) -> None:
+        self._bytes += size - self._sizes.get(cycle_id, 0)
+        self._sizes[cycle_id] = size
+
+    def _cycle_bytes(self, cycle: DevelopmentCycle) -> int:
+        return 256 + len(cycle.title) + sum(_message_bytes(m) for m in cycle.messages)
+
+    def _is_complete(self, cycle_id: str, cycle: DevelopmentCycle) -> bool:
+        return len(cycle.messages) == self._summaries[cycle_id].message_count
+
+    def _resident(self, cycle_id: str) -> Optional[DevelopmentCycle]:
+        """The cycle in memory, reloading it from its spill file if evicted."""
+        cycle = self.cycles.get(cycle_id)
+        if cycle is not None:
+            self.cycles.move_to_end(cycle_id)
+            return cycle
+        summary = self._summaries.get(cycle_id)
+        if summary is None:
+            return None
+        messages = self._read_spill(cycle_id)
+        cap = self.limits.max_messages_per_cycle
+        if cap and len(messages) > cap:
+            messages = messages[-cap:]
+        cycle = self._from_summary(summary, messages)
+        self.cycles[cycle_id] = cycle
+        self._set_size(cycle_id, self._cycle_bytes(cycle))
+        self.reloads += 1
+        self._enforce(keep=cycle_id)
+        return cycle
+
+    def _trim(self, cycle_id: str) -> None:
+        cap = self.limits.max_messages_per_cycle
+        cycle = self.cycles[cycle_id]
+        excess = len(cycle.messages) - cap
+        if not cap or excess <= 0:
+            return
+        old = cycle.messages[:excess]
+        self._spill(cycle_id, old)
+        del cycle.messages[:excess]
+        self.trimmed += excess
+        self._set_size(cycle_id, self._sizes[cycle_id] - sum(map(_message_bytes, old)))
+
+    def _evict(self, cycle_id: str) -> None:
+        cycle = self.cycles.pop(cycle_id)
+        self._spill(cycle_id, cycle.messages)
+        self._bytes -= self._sizes.pop(cycle_id, 0)
+        self.evictions += 1
+
+    def _enforce(self, keep: str) -> None:
+        """Evict LRU cycles (never ``keep``) until every cap holds."""
+        max_cycles, max_bytes = self.limits.max_cycles, self.limits.max_bytes
+        while (max_cycles and len(self.cycles) > max_cycles) or (
+            max_bytes and self._bytes > max_bytes
+        ):
+            victim = next((c for c in self.cycles if c != keep), None)
+            if victim is None:
+                break
+            self._evict(victim)
+
+    @staticmethod
+    def _from_summary(
+        summary: CycleSummary, messages: List[ChatMessage]
+    ) -> DevelopmentCycle:
+        return DevelopmentCycle(
+            id=summary.id,
+            title=summary.title,
+            created_at=summary.created_at,
+            active_agents=list(summary.active_agents),
+            github_link=summary.github_link,
+            messages=messages,
+        )
+
+    def _all_messages(self, cycle_id: str) -> List[ChatMessage]:
+        """Full history without changing residency (disk part + memory tail)."""
+        cycle = self.cycles.get(cycle_id)
+        if cycle is not None and self._is_complete(cycle_id, cycle):
+            return list(cycle.messages)
+        messages = self._read_spill(cycle_id)
+        last = messages[-1].id if messages else 0
+        if cycle is not None:
+            messages.extend(m for m in cycle.messages if (m.id or 0) > last)
+        return messages
+
+    # -- CycleStore ----------------------------------------------------------
+
+    def add_cycle(self, cycle: DevelopmentCycle) -> None:
+        with self._lock:
+            if cycle.id in self._summaries:
+                self._messages -= self._summaries[cycle.id].message_count
+                self._drop_spill(cycle.id)
+            for message in cycle.messages:
+                message.id = next(self._ids)
+            self._summaries[cycle.id] = summarize(cycle)
+            self._messages += len(cycle.messages)
+            self.cycles[cycle.id] = cycle
+            self.cycles.move_to_end(cycle.id)
+            self._set_size(cycle.id, self._cycle_bytes(cycle))
+            self._trim(cycle.id)
+            self._enforce(keep=cycle.id)
+
+    def get_cycle(
+        self, cycle_id: str, with_messages: bool = True
+    ) -> Optional[DevelopmentCycle]:
+        with self._lock:
+            summary = self._summaries.get(cycle_id)
+            if summary is None:
+                return None
+            if not with_messages:
+                return self._from_summary(summary, [])
+            cycle = self._resident(cycle_id)
+            if self._is_complete(cycle_id, cycle):
+                return cycle
+            return cycle.model_copy(update={"messages": self._all_messages(cycle_id)})
+
+    def list_cycles(self, with_messages: bool = True) -> List[DevelopmentCycle]:
+        with self._lock:
+            summaries = sorted(
+                self._summaries.values(), key=lambda c: (c.created_at, c.id)
+            )
+            return [
+                self._from_summary(s, self._all_messages(s.id) if with_messages else [])
+                for s in summaries
+            ]
+
+    def list_summaries(
+        self, limit: int, after: Optional[CycleKey] = None
+    ) -> List[CycleSummary]:
+        with self._lock:
+            summaries = sorted(
+                self._summaries.values(), key=lambda c: (c.created_at, c.id)
+            )
+        if after is not None:
+            summaries = [s for s in summaries if (s.created_at, s.id) > after]
+        return [s.model_copy() for s in summaries[:limit]]
+
+    def get_summary(self, cycle_id: str) -> Optional[CycleSummary]:
+        with self._lock:
+            summary = self._summaries.get(cycle_id)
+            return summary.model_copy() if summary else None
+
+    def add_message(self, cycle_id: str, message: ChatMessage) -> bool:
+        with self._lock:
+            cycle = self._resident(cycle_id)
+            if cycle is None:
+                return False
+            message.id = next(self._ids)
+            cycle.messages.append(message)
+            summary = self._summaries[cycle_id]
+            summary.message_count += 1
+            summary.last_message_id = message.id
+            summary.last_message_at = message.timestamp
+            self._messages += 1
+            self._set_size(cycle_id, self._sizes[cycle_id] + _message_bytes(message))
+            self._trim(cycle_id)
+            self._enforce(keep=cycle_id)
+            return True
+
+    def get_messages(
+        self,
+        cycle_id: str,
+        since_id: Optional[int] = None,
+        since_timestamp: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[ChatMessage]:
+        with self._lock:
+            cycle = self._resident(cycle_id)
+            if cycle is None:
+                return []
+            messages = cycle.messages
+            # Polling past the start of the memory tail never touches disk
+            in_tail = since_id is not None and messages and since_id >= messages[0].id
+            if not (in_tail or self._is_complete(cycle_id, cycle)):
+                messages = self._all_messages(cycle_id)
+            return _filter_messages(messages, since_id, since_timestamp, limit)
+
+    def recent_messages(self, cycle_id: str, count: int) -> List[ChatMessage]:
+        with self._lock:
+            cycle = self._resident(cycle_id)
+            if cycle is None or count <= 0:
+                return []
+            if len(cycle.messages) < count and not self._is_complete(cycle_id, cycle):
+                return self._all_messages(cycle_id)[-count:]
+            return cycle.messages[-count:]
+
+    def set_github_link(self, cycle_id: str, link: GitHubLink) -> bool:
+        with self._lock:
+            summary = self._summaries.get(cycle_id)
+            if summary is None:
+                return False
+            summary.github_link = link
+            cycle = self.cycles.get(cycle_id)
+            if cycle is not None:
+                cycle.github_link = link
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "cycles": len(self._summaries),
+                "messages": self._messages,
+                "resident_cycles": len(self.cycles),
+                "resident_messages": sum(len(c.messages) for c in self.cycles.values()),
+                "resident_bytes": self._bytes,
+                "spilled_cycles": len(self._summaries) - len(self.cycles),
+                "spill_bytes": sum(self._spill_sizes.values()),
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+                "trimmed_messages": self.trimmed,
+                "limits": asdict(self.limits),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._spill_root:
+                shutil.rmtree(self._spill_root, ignore_errors=True)
+                self._spill_root = None
+                self._spilled_upto.clear()
+                self._spill_sizes.clear()
+
+
+def summarize(cycle: DevelopmentCycle) -> CycleSummary:
+    """Summary of a fully loaded cycle."""
+    last = cycle.messages[-1] if cycle.messages else None
+    return CycleSummary(
+        id=cycle.id,
+        title=cycle.title,
+        active_agents=cycle.active_agents,
+        github_link=cycle.github_link,
+        created_at=cycle.created_at,
+        message_count=len(cycle.messages),
+        last_message_id=last.id if last else None,
+        last_message_at=last.timestamp if last else None,
+    )
+
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cycles ("
+    "id TEXT PRIMARY KEY, title TEXT NOT NULL, created_at REAL NOT NULL, "
+    "active_agents TEXT NOT NULL DEFAULT '[]', github_link TEXT, "
+    "message_count INTEGER NOT NULL DEFAULT 0, last_seq INTEGER, "
+    "last_message_at REAL)",
+    "CREATE INDEX IF NOT EXISTS idx_cycles_created ON cycles (created_at, id)",
+    "CREATE TABLE IF NOT EXISTS messages ("
+    "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "cycle_id TEXT NOT NULL REFERENCES cycles (id) ON DELETE CASCADE, "
+    "sender TEXT NOT NULL, text TEXT NOT NULL, timestamp REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_cycle ON messages (cycle_id, seq)",
+)
+
+# Summary columns kept on ``cycles`` (added to databases created before them)
+_SUMMARY_COLUMNS = (
+    ("message_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("last_seq", "INTEGER"),
+    ("last_message_at", "REAL"),
+)
+
+
+class SQLiteCycleStore(CycleStore):
+    """Cycles and messages in SQLite (WAL, safe across worker processes).
+
+    Returned cycles are snapshots: changes go through ``add_message`` and
+    ``set_github_link``, never by mutating the objects.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: durable on commit except for a power loss
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        """Add the summary columns to an older database and backfill them."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cycles)")}
+        missing = [(n, t) for n, t in _SUMMARY_COLUMNS if n not in columns]
+        if not missing:
+            return
+        for name, declaration in missing:
+            self._conn.execute(f"ALTER TABLE cycles ADD COLUMN {name} {declaration}")
+        per_cycle = "FROM messages m WHERE m.cycle_id = cycles.id"
+        self._conn.execute(
+            f"UPDATE cycles SET message_count = (SELECT COUNT(*) {per_cycle}), "
+            f"last_seq = (SELECT MAX(seq) {per_cycle}), "
+            f"last_message_at = (SELECT MAX(timestamp) {per_cycle})"
+        )
+
+    @staticmethod
+    def _cycle_fields(row) -> Dict[str, Any]:
+        cycle_id, title, created_at, agents, github = row[:5]
+        return dict(
+            id=cycle_id,
+            title=title,
+            created_at=created_at,
+            active_agents=[Agent(**a) for a in json.loads(agents)],
+            github_link=GitHubLink(**json.loads(github)) if github else None,
+        )
+
+    def _cycle_from_row(self, row, messages: List[ChatMessage]) -> DevelopmentCycle:
+        return DevelopmentCycle(messages=messages, **self._cycle_fields(row))
+
+    def _summary_from_row(self, row) -> CycleSummary:
+        count, last_id, last_at = row[5:]
+        return CycleSummary(
+            message_count=count,
+            last_message_id=last_id,
+            last_message_at=last_at,
+            **self._cycle_fields(row),
+        )
+
+    @staticmethod
+    def _message_row(cycle_id: str, message: ChatMessage):
+        return (cycle_id, message.sender, message.text, message.timestamp)
+
+    def add_cycle(self, cycle: DevelopmentCycle) -> None:
+        agents = json.dumps([a.model_dump() for a in cycle.active_agents])
+        github = cycle.github_link.model_dump_json() if cycle.github_link else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cycles "
+                "(id, title, created_at, active_agents, github_link) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (cycle.id, cycle.title, cycle.created_at, agents, github),
+            )
+            for message in cycle.messages:
+                message.id = self._insert_message(cycle.id, message)
+
+    def _insert_message(self, cycle_id: str, message: ChatMessage) -> int:
+        """Insert the message and bump the cycle's summary columns."""
+        cursor = self._conn.execute(
+            "INSERT INTO messages (cycle_id, sender, text, timestamp) "
+            "VALUES (?, ?, ?, ?)",
+            self._message_row(cycle_id, message),
+        )
+        self._conn.execute(
+            "UPDATE cycles SET message_count = message_count + 1, last_seq = ?, "
+            "last_message_at = MAX(COALESCE(last_message_at, ?), ?) WHERE id = ?",
+            (cursor.lastrowid, message.timestamp, message.timestamp, cycle_id),
+        )
+        return cursor.lastrowid
+
+    def _select_messages(
+        self,
+        cycle_id: str,
+        since_id: Optional[int] = None,
+        since_timestamp: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[ChatMessage]:
+        sql = "SELECT seq, sender, text, timestamp FROM messages WHERE cycle_id = ?"
+        params: List[Any] = [cycle_id]
+        if since_id is not None:
+            sql += " AND seq > ?"
+            params.append(since_id)
+        if since_timestamp is not None:
+            sql += " AND timestamp > ?"
+            params.append(since_timestamp)
+        sql += " ORDER BY seq LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        return [
+            ChatMessage(id=seq, sender=s, text=t, timestamp=ts)
+            for seq, s, t, ts in self._conn.execute(sql, params)
+        ]
+
+    def get_cycle(
+        self, cycle_id: str, with_messages: bool = True
+    ) -> Optional[DevelopmentCycle]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, title, created_at, active_agents, github_link "
+                "FROM cycles WHERE id = ?",
+                (cycle_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            messages = self._select_messages(cycle_id) if with_messages else []
+        return self._cycle_from_row(row, messages)
+
+    def list_cycles(self, with_messages: bool = True) -> List[DevelopmentCycle]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, title, created_at, active_agents, github_link "
+                "FROM cycles ORDER BY created_at, id"
+            ).fetchall()
+            grouped: Dict[str, List[ChatMessage]] = {}
+            if with_messages:
+                for seq, cycle_id, sender, text, ts in self._conn.execute(
+                    "SELECT seq, cycle_id, sender, text, timestamp FROM messages "
+                    "ORDER BY seq"
+                ):
+                    grouped.setdefault(cycle_id, []).append(
+                        ChatMessage(id=seq, sender=sender, text=text, timestamp=ts)
+                    )
+        return [self._cycle_from_row(row, grouped.get(row[0], [])) for row in rows]
+
+    # Counters live on ``cycles``: no scan of ``messages`` per page or poll
+    _SUMMARY_SQL = (
+        "SELECT c.id, c.title, c.created_at, c.active_agents, c.github_link, "
+        "c.message_count, c.last_seq, c.last_message_at FROM cycles c "
+    )
+
+    def list_summaries(
+        self, limit: int, after: Optional[CycleKey] = None
+    ) -> List[CycleSummary]:
+        where, params = "", []
+        if after is not None:
+            where = "WHERE (c.created_at, c.id) > (?, ?) "
+            params = list(after)
+        with self._lock:
+            rows = self._conn.execute(
+                self._SUMMARY_SQL + where + "ORDER BY c.created_at, c.id LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        return [self._summary_from_row(row) for row in rows]
+
+    def get_summary(self, cycle_id: str) -> Optional[CycleSummary]:
+        with self._lock:
+            row = self._conn.execute(
+                self._SUMMARY_SQL + "WHERE c.id = ?", (cycle_id,)
+            ).fetchone()
+        return self._summary_from_row(row) if row else None
+
+    def add_message(self, cycle_id: str, message: ChatMessage) -> bool:
+        with self._lock, self._conn:
+            try:
+                message.id = self._insert_message(cycle_id, message)
+            except sqlite3.IntegrityError:
+                # Foreign key: the cycle does not exist
+                return False
+        return True
+
+    def get_messages(
+        self,
+        cycle_id: str,
+        since_id: Optional[int] = None,
+        since_timestamp: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[ChatMessage]:
+        with self._lock:
+            return self._select_messages(cycle_id, since_id, since_timestamp, limit)
+
+    def recent_messages(self, cycle_id: str, count: int) -> List[ChatMessage]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, sender, text, timestamp FROM messages "
+                "WHERE cycle_id = ? ORDER BY seq DESC LIMIT ?",
+                (cycle_id, max(0, count)),
+            ).fetchall()
+        return [
+            ChatMessage(id=seq, sender=s, text=t, timestamp=ts)
+            for seq, s, t, ts in reversed(rows)
+        ]
+
+    def set_github_link(self, cycle_id: str, link: GitHubLink) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE cycles SET github_link = ? WHERE id = ?",
+                (link.model_dump_json(), cycle_id),
+            )
+        return cursor.rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cycles = self._conn.execute("SELECT COUNT(*) FROM cycles").fetchone()[0]
+            messages = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "cycles": cycles,
+            "messages": messages,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def store_from_env() -> CycleStore:
+    """SQLite when ``CHISPART_CYCLES_DB`` names a database file, else a
+    bounded memory store configured by ``MemoryLimits.from_env``."""
+    path = os.getenv("CHISPART_CYCLES_DB")
+    if path:
+        return SQLiteCycleStore(path)
+    return MemoryCycleStore(MemoryLimits.from_env())
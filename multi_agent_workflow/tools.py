@@ -5,9 +5,12 @@ from typing import List, Dict, Any
 
 
 class BlackboxClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: str = None):
         self.api_key = api_key
-        self.base_url = "https://api.blackbox.ai"
+        # BLACKBOX_API_BASE permite apuntar al servidor simulado local
+        self.base_url = (
+            base_url or os.getenv("BLACKBOX_API_BASE") or "https://api.blackbox.ai"
+        ).rstrip("/")
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -36,6 +36,7 @@ setup(
     python_requires=">=3.8",
     install_requires=[
         "requests>=2.25.0",
+        "httpx>=0.24.0",
         "pytest>=7.0.0",
         "pytest-cov>=4.0.0",
         "click>=8.0.0",
@@ -57,6 +58,9 @@ setup(
             "pytest-cov>=4.0.0",
             "pytest-mock>=3.6.0",
         ],
+        "redis": [
+            "redis>=4.2.0",
+        ],
     },
     entry_points={
         "console_scripts": [
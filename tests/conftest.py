@@ -0,0 +1,21 @@
+"""
+Fixtures compartidas por los tests
+"""
+
+import sys
+
+import pytest
+
+from blackbox_hybrid_tool.utils.rate_limit_middleware import MemoryBackend
+
+
+@pytest.fixture(autouse=True)
+def _fresh_inbound_limiter(monkeypatch):
+    """Contadores propios por test: no consumen el límite entrante del resto
+
+    Sólo si ``main`` ya está importado; la primera importación ya parte de
+    un limitador vacío.
+    """
+    main = sys.modules.get("main")
+    if main is not None:
+        monkeypatch.setattr(main.inbound_limiter, "backend", MemoryBackend())
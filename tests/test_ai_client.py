@@ -9,6 +9,7 @@ from blackbox_hybrid_tool.core.ai_client import (
     BlackboxClient,
     AIModelFactory,
 )
+from blackbox_hybrid_tool.exceptions import BlackboxAPIError
 
 
 class TestBlackboxClient:
@@ -26,7 +27,7 @@ class TestBlackboxClient:
         assert self.client.api_key == "test_api_key"
         assert self.client.model_config == {"model": "blackboxai/openai/o1"}
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_generate_response_success(self, mock_post):
         """Test generación exitosa de respuesta"""
         # Configurar mock
@@ -44,7 +45,7 @@ class TestBlackboxClient:
         assert result == "Test response"
         mock_post.assert_called_once()
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_generate_response_failure(self, mock_post):
         """Test consulta fallida"""
         # Configurar mock para error de requests
@@ -52,11 +53,9 @@ class TestBlackboxClient:
 
         mock_post.side_effect = requests.RequestException("Connection error")
 
-        # Ejecutar consulta
-        result = self.client.generate_response("Test query")
-
-        # Verificar que retorna mensaje de error
-        assert "Error en la API de Blackbox" in result
+        # Ejecutar consulta: el fallo se reporta con un error tipado
+        with pytest.raises(BlackboxAPIError, match="Error en la API de Blackbox"):
+            self.client.generate_response("Test query")
 
 
 ## Se elimina TestGeminiClient ya que la lógica de Gemini fue retirada
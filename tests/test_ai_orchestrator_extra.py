@@ -123,7 +123,7 @@ def test_blackbox_client_debug_and_error(monkeypatch):
             return {"choices": [{"message": {"content": "ok"}}]}
 
     monkeypatch.setattr(
-        "blackbox_hybrid_tool.core.ai_client.requests.post", lambda *a, **k: R()
+        "blackbox_hybrid_tool.core.ai_client.requests.Session.post", lambda *a, **k: R()
     )
     assert bc.generate_response("p", debug=True) == "ok"
     # error path with RequestException and detail
@@ -141,9 +141,14 @@ def test_blackbox_client_debug_and_error(monkeypatch):
         ex.response = RB()  # type: ignore
         raise ex
 
-    monkeypatch.setattr("blackbox_hybrid_tool.core.ai_client.requests.post", boom)
-    out = bc.generate_response("p", debug=True)
-    assert "Error en la API" in out
+    monkeypatch.setattr(
+        "blackbox_hybrid_tool.core.ai_client.requests.Session.post", boom
+    )
+    from blackbox_hybrid_tool.exceptions import BlackboxAPIError
+
+    with pytest.raises(BlackboxAPIError, match="Error en la API") as exc_info:
+        bc.generate_response("p", debug=True)
+    assert exc_info.value.detail == "detail"
 
 
 def test_blackbox_client_debug_json_dump_fallback(monkeypatch):
@@ -166,7 +171,7 @@ def test_blackbox_client_debug_json_dump_fallback(monkeypatch):
 
     bc = BlackboxClient("sk", {"model": "blackbox"})
     monkeypatch.setattr(
-        "blackbox_hybrid_tool.core.ai_client.requests.post", lambda *a, **k: R()
+        "blackbox_hybrid_tool.core.ai_client.requests.Session.post", lambda *a, **k: R()
     )
     assert bc.generate_response("p", debug=True) == "ok"
 
@@ -0,0 +1,24 @@
+"""
+Tests para las utilidades asyncio compatibles con Python 3.8
+"""
+
+import asyncio
+import threading
+from contextvars import ContextVar
+
+from blackbox_hybrid_tool.utils.aio import to_thread
+
+_var: "ContextVar[str]" = ContextVar("test_aio", default="")
+
+
+def test_to_thread_runs_off_loop_with_caller_context():
+    def work(prefix, suffix=""):
+        return prefix + _var.get() + suffix, threading.get_ident()
+
+    async def run():
+        _var.set("ctx")
+        return await to_thread(work, "<", suffix=">")
+
+    value, ident = asyncio.run(run())
+    assert value == "<ctx>"
+    assert ident != threading.get_ident()
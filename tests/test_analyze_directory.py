@@ -0,0 +1,121 @@
+"""
+Tests para la canalización de análisis de directorios (analyze_directory)
+"""
+
+import os
+
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.core.context import ContextManager, count_tokens
+from blackbox_hybrid_tool.core.directory_analysis import (
+    AnalysisConfig,
+    DirectoryAnalyzer,
+    terms,
+)
+
+LOGIN = '''"""Autenticación de usuarios"""
+import hashlib
+
+
+class LoginManager:
+    def verify_password(self, user, password):
+        return hashlib.sha256(password.encode()).hexdigest() == user.hash
+'''
+
+
+def _repo(root):
+    (root / "pkg" / "auth").mkdir(parents=True)
+    (root / "pkg" / "auth" / "login.py").write_text(LOGIN)
+    (root / "pkg" / "utils.py").write_text("def slugify(text):\n    return text\n")
+    (root / "pkg" / "roto.py").write_text("def (:\n")
+    (root / "README.md").write_text("# Proyecto\nServicio de ejemplo.\n")
+    (root / "config.yaml").write_text("debug: true\n")
+    (root / "logo.png").write_bytes(b"\x89PNG" + b"\x00" * 64)
+    (root / "node_modules" / "lib").mkdir(parents=True)
+    (root / "node_modules" / "lib" / "login.js").write_text("login()")
+    (root / ".git").mkdir()
+    (root / ".git" / "config").write_text("[core]")
+
+
+def test_terms_split_identifiers():
+    assert terms("LoginManager.verify_password in auth-v2") == [
+        "login",
+        "manager",
+        "verify",
+        "password",
+        "auth",
+    ]
+
+
+def test_pipeline_ranks_packs_and_caches(tmp_path):
+    _repo(tmp_path)
+    analyzer = DirectoryAnalyzer(AnalysisConfig(top_k=3))
+    result = analyzer.analyze(str(tmp_path), "revisa el login y el password")
+    # node_modules y .git se podan sin recorrerlos
+    assert result.files_seen == 6 and result.by_kind["other"] == 1
+    assert result.skipped == 1 and result.cache_misses == 5
+    assert result.files_included[0] == "pkg/auth/login.py"
+    assert len(result.files_included) == 3
+    assert "clases: LoginManager" in result.context
+    assert "verify_password" in result.context
+    assert result.tokens == count_tokens(result.context) <= result.budget
+
+    again = analyzer.analyze(str(tmp_path), "utilidades slugify")
+    assert again.cache_hits == 5 and again.cache_misses == 0
+    assert again.files_included[0] == "pkg/utils.py"
+
+    # Solo se reprocesa lo que cambió (mtime/tamaño)
+    (tmp_path / "pkg" / "utils.py").write_text("def slugify(text, sep='-'):\n    ...\n")
+    os.utime(tmp_path / "pkg" / "utils.py", ns=(1, 1))
+    third = analyzer.analyze(str(tmp_path), "slugify")
+    assert (third.cache_hits, third.cache_misses) == (4, 1)
+    assert "error:" in analyzer.analyze(str(tmp_path), "roto").context
+
+    # Presupuesto mínimo: solo entran cabeceras
+    tight = analyzer.analyze(str(tmp_path), "login", budget=40)
+    assert tight.tokens <= 40 and "```" not in tight.context
+    assert tight.files_included[0] == "pkg/auth/login.py"
+    assert analyzer.analyze(str(tmp_path), "login", budget=2).context == ""
+
+    capped = DirectoryAnalyzer(AnalysisConfig(max_files=2))
+    assert capped.analyze(str(tmp_path)).truncated
+
+
+class _CapturingOrchestrator:
+    context = ContextManager()
+
+    def __init__(self):
+        self.calls = []
+
+    async def agenerate_response(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return {"content": "ok", "model": "m"}
+
+
+def test_chat_sends_directory_context(tmp_path, monkeypatch):
+    import main
+
+    _repo(tmp_path)
+    fake = _CapturingOrchestrator()
+    monkeypatch.setenv("WRITE_ROOT", str(tmp_path))
+    monkeypatch.setattr(main, "orchestrator", fake)
+    monkeypatch.setattr(main, "directory_analyzer", DirectoryAnalyzer())
+    client = TestClient(main.app)
+
+    r = client.post(
+        "/chat", json={"prompt": "¿Cómo funciona el login?", "analyze_directory": "."}
+    )
+    body = r.json()
+    assert r.status_code == 200 and body["response"] == "ok"
+    assert body["analysis"]["files_included"][0] == "pkg/auth/login.py"
+    system, user = fake.calls[0]["messages"]
+    assert system["role"] == "system" and "LoginManager" in system["content"]
+    assert user == {"role": "user", "content": "¿Cómo funciona el login?"}
+
+    plain = client.post("/chat", json={"prompt": "hola"}).json()
+    assert plain["analysis"] is None and "messages" not in fake.calls[-1]
+    bad = client.post("/chat", json={"prompt": "x", "analyze_directory": "README.md"})
+    assert bad.status_code == 400
+    out = client.post("/chat", json={"prompt": "x", "analyze_directory": "../"})
+    assert out.status_code == 403
+    assert client.get("/admin/analysis").json()["cached_summaries"] == 5
@@ -0,0 +1,113 @@
+"""
+Tests para la ruta asíncrona (httpx) del cliente y del servidor
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator, BlackboxClient
+from blackbox_hybrid_tool.core.http_pool import ConnectionPool, PoolConfig
+from blackbox_hybrid_tool.exceptions import BlackboxAPIError
+
+
+def _completion(content):
+    return {"choices": [{"message": {"content": content}}]}
+
+
+def _client_with(handler):
+    pool = ConnectionPool(PoolConfig(), async_transport=httpx.MockTransport(handler))
+    return BlackboxClient("sk", {"model": "blackboxai/openai/o1"}, pool=pool)
+
+
+def test_agenerate_response_success_and_payload():
+    seen = {}
+
+    def handler(request):
+        seen["body"] = json.loads(request.content)
+        seen["auth"] = request.headers["Authorization"]
+        return httpx.Response(200, json=_completion("hola"))
+
+    client = _client_with(handler)
+    out = asyncio.run(client.agenerate_response("p", temperature=0.1))
+    assert out == "hola"
+    assert seen["body"]["temperature"] == 0.1
+    assert seen["body"]["messages"] == [{"role": "user", "content": "p"}]
+    assert seen["auth"] == "Bearer sk"
+
+
+def test_agenerate_response_http_error_raises_typed_error():
+    client = _client_with(lambda request: httpx.Response(400, text="bad"))
+    with pytest.raises(BlackboxAPIError) as exc_info:
+        asyncio.run(client.agenerate_response("p"))
+    assert exc_info.value.status_code == 400 and exc_info.value.detail == "bad"
+
+
+def test_many_completions_in_flight_concurrently():
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=_completion("ok"))
+
+    client = _client_with(handler)
+
+    async def run():
+        return await asyncio.gather(
+            *(client.agenerate_response(f"p{i}") for i in range(100))
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    assert results == ["ok"] * 100
+    # En serie serían ~5s
+    assert elapsed < 2.0
+    assert client.pool.stats()["async"]["peak_in_flight"] > 1
+
+
+def test_orchestrator_agenerate_passes_model_override(tmp_path):
+    cfg_path = tmp_path / "models.json"
+    cfg_path.write_text(
+        json.dumps(
+            {
+                "default_model": "auto",
+                "models": {
+                    "blackbox": {"api_key": "k", "model": "x/y", "enabled": True}
+                },
+            }
+        ),
+        encoding="utf-8",
+    )
+    o = AIOrchestrator(config_file=str(cfg_path))
+
+    class Fake:
+        async def agenerate_response(self, prompt, **kw):
+            return kw
+
+    o.get_client = lambda mt=None: Fake()  # type: ignore
+    kw = asyncio.run(o.agenerate_response("p", model_type="blackboxai/openai/o1"))
+    assert kw["model"] == "blackboxai/openai/o1"
+    asyncio.run(o.aclose())
+    assert o.pool.stats()["closed"] is True
+
+
+def test_chat_endpoint_uses_async_path(monkeypatch):
+    import main
+
+    class FakeOrchestrator:
+        models_config = {"models": {}}
+
+        def generate_response(self, *a, **k):  # pragma: no cover - no debe usarse
+            raise AssertionError("ruta síncrona usada en el servidor")
+
+        async def agenerate_response(self, prompt, model_type=None, **kw):
+            return f"eco:{prompt}"
+
+    monkeypatch.setattr(main, "orchestrator", FakeOrchestrator())
+    client = TestClient(main.app)
+    r = client.post("/chat", json={"prompt": "hola"})
+    assert r.status_code == 200
+    assert r.json()["response"] == "eco:hola"
@@ -0,0 +1,137 @@
+"""
+Tests para la API de completions en lote
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.core.batch import CANCELLED, run_batch
+from blackbox_hybrid_tool.exceptions import BlackboxAPIError
+
+
+def _slow_echo(request):
+    time.sleep(0.05)
+    if request["prompt"] == "boom":
+        raise BlackboxAPIError("falló", status_code=502)
+    return request["prompt"].upper()
+
+
+def test_run_batch_preserves_order_and_reports_errors():
+    progress = []
+    items = ["a", {"id": "x", "prompt": "b"}, "boom", {"no": "prompt"}, "c"]
+    started = time.monotonic()
+    results = run_batch(
+        _slow_echo, items, concurrency=5, on_progress=lambda *a: progress.append(a)
+    )
+    assert time.monotonic() - started < 0.2  # en paralelo, no 5 x 0.05
+    assert [r.index for r in results] == [0, 1, 2, 3, 4]
+    assert [r.result for r in results if r.ok] == ["A", "B", "C"]
+    assert results[1].id == "x"
+    assert results[2].status_code == 502 and not results[2].ok
+    assert "prompt" in results[3].error
+    assert [p[0] for p in progress] == [1, 2, 3, 4, 5]
+    assert all(p[1] == 5 for p in progress)
+
+
+def test_run_batch_without_prompt_for_non_completion_jobs():
+    jobs = [{"id": 1, "target": "f"}, {"target": "g"}, 42]
+    results = run_batch(lambda job: job["target"], jobs, require_prompt=False)
+    assert [r.result for r in results[:2]] == ["f", "g"] and results[0].id == 1
+    assert not results[2].ok
+
+
+def test_run_batch_cancel_skips_pending_items():
+    cancel = threading.Event()
+
+    def fn(request):
+        cancel.set()
+        return request["prompt"]
+
+    results = run_batch(fn, ["a", "b", "c", "d"], concurrency=1, cancel=cancel)
+    assert results[0].ok
+    assert [r.error for r in results[1:]] == [CANCELLED] * 3
+
+
+@pytest.fixture()
+def orchestrator(tmp_path, monkeypatch):
+    cfg_path = tmp_path / "models.json"
+    cfg_path.write_text(
+        json.dumps(
+            {"models": {"blackbox": {"api_key": "k", "model": "m", "enabled": True}}}
+        ),
+        encoding="utf-8",
+    )
+    o = AIOrchestrator(config_file=str(cfg_path))
+    client = o.get_client()
+    in_flight = {"now": 0, "max": 0}
+
+    async def fake(prompt, **kw):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            in_flight["now"] -= 1
+        if prompt == "boom":
+            raise BlackboxAPIError("falló", status_code=503)
+        return {"content": f"{prompt}:{kw.get('temperature')}"}
+
+    monkeypatch.setattr(client, "agenerate_response", fake)
+    monkeypatch.setattr(
+        client, "generate_response", lambda prompt, **kw: _slow_echo({"prompt": prompt})
+    )
+    o.in_flight = in_flight
+    yield o
+    o.close()
+
+
+def test_orchestrator_batches(orchestrator):
+    sync = orchestrator.generate_batch(["x", "y"], concurrency=2)
+    assert [r.result for r in sync] == ["X", "Y"]
+    assert [r.model for r in sync] == ["m", "m"]
+
+    prompts = [f"p{i}" for i in range(20)]
+    started = time.monotonic()
+    results = asyncio.run(
+        orchestrator.agenerate_batch(prompts, concurrency=5, temperature=0.1)
+    )
+    elapsed = time.monotonic() - started
+    assert orchestrator.in_flight["max"] == 5
+    assert elapsed < 0.6  # 4 rondas de 0.05s, no 20
+    assert [r.result["content"] for r in results] == [f"{p}:0.1" for p in prompts]
+
+
+def test_chat_batch_endpoint_streams_jsonl(orchestrator, monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "orchestrator", orchestrator)
+    body = "\n".join(
+        [
+            json.dumps({"id": "a", "prompt": "hola", "temperature": 0.2}),
+            "no es json",
+            json.dumps({"id": "b", "prompt": "boom"}),
+            "",
+            json.dumps({"prompt": "adiós", "model_type": "otro/modelo"}),
+        ]
+    )
+    client = TestClient(main.app)
+    r = client.post("/chat/batch?ordered=true&concurrency=2", content=body)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2, 3]
+    assert lines[0]["response"] == "hola:0.2" and lines[0]["id"] == "a"
+    assert lines[0]["model_used"] == "m"  # el modelo que respondió, no "auto"
+    assert lines[1]["status"] == "error" and lines[1]["status_code"] == 400
+    assert lines[2]["status_code"] == 503 and lines[2]["id"] == "b"
+    assert lines[3]["model_used"] == "otro/modelo"
+
+    unordered = client.post("/chat/batch", content=body).text.splitlines()
+    assert json.loads(unordered[0])["index"] == 1  # los inválidos salen primero
+    assert client.post("/chat/batch", content="\n").status_code == 400
@@ -0,0 +1,89 @@
+"""
+Tests para la suite de benchmarks (comparación y generadores de carga)
+"""
+
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.harness import compare, flatten, summarize
+from benchmarks.run import main as bench_main
+from benchmarks import suites
+from benchmarks.suites import _make_patch_tree, make_diff
+
+
+def _doc(p95, rps, count=10):
+    return {
+        "results": {"chat": {"c4": {"p95": p95, "throughput_rps": rps, "count": count}}}
+    }
+
+
+def test_summarize_and_flatten():
+    stats = summarize([0.1 * i for i in range(1, 101)])
+    assert stats["count"] == 100
+    assert stats["p50"] == 5.0 and round(stats["p99"], 6) == 9.9
+    assert summarize([]) == {"count": 0}
+    assert flatten(_doc(0.2, 50)["results"])["chat.c4.p95"] == 0.2
+
+
+def test_compare_respects_metric_direction():
+    report = compare(_doc(0.30, 40, count=99), _doc(0.20, 50), threshold=0.1)
+    assert {e["metric"] for e in report["regressions"]} == {
+        "chat.c4.p95",
+        "chat.c4.throughput_rps",
+    }
+    # Los contadores describen la carga y no se comparan
+    assert not report["unchanged"] and not report["improvements"]
+
+    report = compare(_doc(0.10, 80), _doc(0.20, 50), threshold=0.1)
+    assert len(report["improvements"]) == 2 and not report["regressions"]
+    assert compare(_doc(0.21, 50), _doc(0.20, 50))["unchanged"]
+
+
+def test_compare_mode_exit_code(tmp_path):
+    base, slow = tmp_path / "base.json", tmp_path / "slow.json"
+    base.write_text(json.dumps(_doc(0.20, 50)), encoding="utf-8")
+    slow.write_text(json.dumps(_doc(0.40, 50)), encoding="utf-8")
+    assert bench_main(["--compare", str(base), "--baseline", str(base)]) == 0
+    assert bench_main(["--compare", str(slow), "--baseline", str(base)]) == 1
+    loose = ["--compare", str(slow), "--baseline", str(base), "--threshold", "2"]
+    assert bench_main(loose) == 0
+
+
+def test_cli_suite_fails_on_nonzero_exit(monkeypatch):
+    ctx = SimpleNamespace(sizes=SimpleNamespace(cli_repeat=1))
+    ok = {"ok": [sys.executable, "-c", "pass"]}
+    monkeypatch.setattr(suites, "CLI_COMMANDS", ok)
+    assert suites.bench_cli(ctx)["ok"]["count"] == 1
+    bad = {"bad": [sys.executable, "-c", "import sys; sys.exit(2)"]}
+    monkeypatch.setattr(suites, "CLI_COMMANDS", bad)
+    with pytest.raises(RuntimeError, match="salió con 2"):
+        suites.bench_cli(ctx)
+
+
+def test_large_diff_round_trip_through_patch_endpoint(tmp_path, monkeypatch):
+    import main
+
+    _make_patch_tree(tmp_path / "tree", files=3, lines=40)
+    monkeypatch.setenv("WRITE_ROOT", str(tmp_path))
+    client = TestClient(main.app)
+    for reverse, expected in ((False, "v2"), (True, "v1")):
+        diff = make_diff(3, 40, 10, reverse=reverse)
+        r = client.post("/patch/apply", json={"patch": diff, "root": "tree"})
+        assert r.status_code == 200
+        result = r.json()["result"]
+        assert not result["errors"] and len(result["applied"]) == 3
+        lines = (tmp_path / "tree" / "src" / "module_0002.py").read_text().splitlines()
+        assert lines[10] == f"value_11 = '{expected}'"
+        assert lines[11] == "value_12 = 'v1'"
+
+    # La raíz y los destinos del parche no pueden salir de WRITE_ROOT
+    outside = client.post("/patch/apply", json={"patch": diff, "root": "../"})
+    assert outside.status_code == 403
+    escape = "--- /dev/null\n+++ b/../fuera.txt\n@@ -0,0 +1,1 @@\n+x\n"
+    r = client.post("/patch/apply", json={"patch": escape, "root": "tree"})
+    assert r.status_code == 403 and r.json()["detail"]["files"] == ["../fuera.txt"]
+    assert not (tmp_path / "fuera.txt").exists()
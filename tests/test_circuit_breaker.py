@@ -0,0 +1,184 @@
+"""
+Tests para el circuit breaker por modelo y las cadenas de fallback
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.core.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BreakerConfig,
+    CircuitBreaker,
+)
+from blackbox_hybrid_tool.exceptions import BlackboxAPIError, BlackboxCircuitOpenError
+
+
+def _breaker(**kw):
+    cfg = dict(min_calls=2, error_rate=0.5, open_seconds=0.05)
+    cfg.update(kw)
+    return CircuitBreaker("m", BreakerConfig(**cfg))
+
+
+def test_opens_on_error_rate_and_recovers_via_half_open():
+    b = _breaker()
+    b.record(True, 0.1)
+    assert b.state == CLOSED
+    b.record(False, 0.1, "HTTP 503")
+    assert b.state == OPEN and not b.allow()
+    assert b.snapshot()["rejected"] == 1
+    time.sleep(0.06)
+    assert b.state == HALF_OPEN
+    assert b.allow() and not b.allow()  # una sola llamada de prueba
+    b.record(True, 0.1)
+    assert b.state == CLOSED and b.allow()
+
+
+def test_half_open_failure_reopens_and_neutral_releases_trial():
+    b = _breaker(open_seconds=0)
+    b.record(False, 0.1)
+    b.record(False, 0.1)
+    assert b.allow()
+    b.record(None, 0.0)  # error del cliente: no cuenta
+    assert b.allow()
+    b.record(False, 0.1)
+    assert b.snapshot()["state"] in (OPEN, HALF_OPEN)
+    assert b.snapshot()["transitions"] >= 3
+
+
+def test_opens_on_slow_calls():
+    b = _breaker(slow_call_seconds=1.0, slow_call_rate=0.5, min_calls=2)
+    b.record(True, 0.2)
+    b.record(True, 5.0)
+    assert b.state == OPEN
+
+
+def test_disabled_breaker_always_allows():
+    b = _breaker(enabled=False)
+    for _ in range(5):
+        b.record(False, 0.1)
+    assert b.allow()
+
+
+FALLBACK = {
+    "chain": ["reasoning", "code", "fast"],
+    "tiers": {"reasoning": ["r1", "r2"], "code": ["c1"], "fast": ["f1"]},
+    "max_models": 4,
+}
+
+
+@pytest.fixture()
+def orchestrator(tmp_path):
+    cfg_path = tmp_path / "models.json"
+    cfg_path.write_text(
+        json.dumps(
+            {
+                "default_model": "auto",
+                "models": {
+                    "blackbox": {
+                        "api_key": "k",
+                        "model": "r1",
+                        "enabled": True,
+                        "fallback": FALLBACK,
+                        "breaker": {"min_calls": 1, "error_rate": 0.5},
+                        "model_overrides": {"c1": {"breaker": {"min_calls": 10}}},
+                    }
+                },
+            }
+        ),
+        encoding="utf-8",
+    )
+    o = AIOrchestrator(config_file=str(cfg_path))
+    yield o
+    o.close()
+
+
+def _script(monkeypatch, client, failing):
+    calls = []
+
+    def fake(prompt, **kw):
+        calls.append(kw["model"])
+        if kw["model"] in failing:
+            raise BlackboxAPIError("caído", status_code=failing[kw["model"]])
+        return f"ok:{kw['model']}"
+
+    async def afake(prompt, **kw):
+        return fake(prompt, **kw)
+
+    monkeypatch.setattr(client, "generate_response", fake)
+    monkeypatch.setattr(client, "agenerate_response", afake)
+    return calls
+
+
+def test_fallback_chain_follows_tiers(orchestrator):
+    assert orchestrator.fallback_chain("r2") == ["r2", "r1", "c1", "f1"]
+    assert orchestrator.fallback_chain("c1") == ["c1", "f1"]
+    # Fuera de los tiers (imagen, modelo explícito) no se cambia de modelo
+    assert orchestrator.fallback_chain("other") == ["other"]
+    orchestrator.models_config["models"]["blackbox"]["fallback"] = dict(
+        FALLBACK, out_of_tier=True
+    )
+    assert orchestrator.fallback_chain("other") == ["other", "r1", "r2", "c1"]
+
+
+def test_fails_over_and_skips_open_breaker(orchestrator, monkeypatch):
+    calls = _script(monkeypatch, orchestrator.get_client(), {"r1": 503})
+    used = []
+    assert orchestrator.generate_response("p", on_model=used.append) == "ok:r2"
+    assert used == ["r2"]
+    assert calls == ["r1", "r2"]
+    # r1 quedó abierto: la siguiente solicitud no lo espera
+    assert orchestrator.generate_response("p2") == "ok:r2"
+    assert calls == ["r1", "r2", "r2"]
+    stats = orchestrator.breaker_stats()
+    assert stats["r1"]["state"] == OPEN and stats["r2"]["state"] == CLOSED
+    assert orchestrator.breakers.get("c1").config.min_calls == 10
+
+
+def test_client_errors_do_not_fail_over(orchestrator, monkeypatch):
+    calls = _script(monkeypatch, orchestrator.get_client(), {"r1": 400})
+    with pytest.raises(BlackboxAPIError) as exc_info:
+        orchestrator.generate_response("p")
+    assert exc_info.value.status_code == 400 and calls == ["r1"]
+    assert orchestrator.breaker_stats()["r1"]["state"] == CLOSED
+
+
+def test_all_open_raises_circuit_open(orchestrator, monkeypatch):
+    failing = {m: 502 for m in ("r1", "r2", "c1", "f1")}
+    _script(monkeypatch, orchestrator.get_client(), failing)
+    with pytest.raises(BlackboxAPIError) as exc_info:
+        orchestrator.generate_response("p")
+    assert exc_info.value.status_code == 502
+    for model in ("r1", "r2", "c1", "f1"):
+        orchestrator.breakers.get(model)._open(time.monotonic())
+    with pytest.raises(BlackboxCircuitOpenError) as exc_info:
+        asyncio.run(orchestrator.agenerate_response("p"))
+    assert exc_info.value.status_code == 503 and exc_info.value.retry_after > 0
+    assert orchestrator.reset_breakers() == 4
+    assert orchestrator.breaker_stats()["r1"]["state"] == CLOSED
+
+
+def test_async_fallback(orchestrator, monkeypatch):
+    calls = _script(monkeypatch, orchestrator.get_client(), {"r1": None})
+    used = []
+    out = asyncio.run(orchestrator.agenerate_response("p", on_model=used.append))
+    assert out == "ok:r2" and calls == ["r1", "r2"] and used == ["r2"]
+
+
+def test_admin_breakers_endpoint(monkeypatch, orchestrator):
+    import main
+    from fastapi.testclient import TestClient
+
+    _script(monkeypatch, orchestrator.get_client(), {"r1": 503})
+    orchestrator.generate_response("p")
+    monkeypatch.setattr(main, "orchestrator", orchestrator)
+    client = TestClient(main.app)
+    assert client.get("/admin/breakers").json()["r1"]["state"] == OPEN
+    r = client.post("/admin/breakers/reset", params={"model": "r1"})
+    assert r.json() == {"reset": 1}
+    assert client.get("/admin/breakers").json()["r1"]["state"] == CLOSED
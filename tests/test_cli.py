@@ -92,6 +92,16 @@ def test_run_ai_query(cli, capsys):
     cli.ai_orchestrator.generate_response.assert_called_once()
 
 
+def test_run_ai_query_cache_uses_cacheable_temperature(cli):
+    args = SimpleNamespace(query="hola", model=None, debug=False, cache=True)
+    assert cli.run_ai_query(args) == 0
+    kwargs = cli.ai_orchestrator.generate_response.call_args.kwargs
+    assert kwargs["cache"] is True and kwargs["temperature"] == 0.0
+    args.temperature = 0.2
+    cli.run_ai_query(args)
+    assert cli.ai_orchestrator.generate_response.call_args.kwargs["temperature"] == 0.2
+
+
 def test_run_generate_tests_invokes_create_and_tests(cli):
     # Mock internal run_tests to avoid spawning pytest
     cli.run_tests = Mock(return_value=0)
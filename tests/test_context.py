@@ -0,0 +1,154 @@
+"""
+Tests para la ventana de contexto con presupuesto de tokens
+"""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.core.context import (
+    ContextConfig,
+    ContextManager,
+    count_tokens,
+    message_tokens,
+)
+
+
+def _turns(n, words=20):
+    out = []
+    for i in range(n):
+        role = "user" if i % 2 == 0 else "assistant"
+        out.append({"role": role, "content": f"turno {i} " + "palabra " * words})
+    return out
+
+
+def test_token_estimate():
+    assert count_tokens("") == 0
+    assert count_tokens("hola, mundo!") == 4
+    # Las palabras largas cuentan varios tokens
+    assert count_tokens("internacionalización") == 4
+    assert count_tokens("x" * 400_000) == 100_000
+    assert message_tokens({"role": "user", "content": None}) == 4
+
+
+def test_sliding_window_pins_system_and_summarizes():
+    manager = ContextManager(ContextConfig(summary_max_tokens=60))
+    system = {"role": "system", "content": "Eres un asistente."}
+    history = [system] + _turns(30)
+    assert manager.fit(history, budget=10_000).messages == history
+
+    window = manager.fit(history, budget=300)
+    assert window.messages[0] is system
+    assert window.summarized and window.dropped > 0
+    summary = window.messages[1]
+    assert summary["role"] == "system"
+    assert summary["content"].startswith(f"Resumen de {window.dropped} mensajes")
+    # Los turnos conservados son los más recientes, en orden
+    kept = window.messages[2:]
+    assert kept == history[-len(kept) :] and len(kept) >= 2
+    assert window.tokens <= 300 < window.original_tokens
+    assert history[0] is system and len(history) == 31  # no se modifica
+
+    no_summary = ContextManager(ContextConfig(summarize=False))
+    window = no_summary.fit(history, budget=300)
+    assert not window.summarized and window.messages[1]["role"] == "user"
+
+    # Un último turno enorme se envía igualmente, marcado como excedido
+    huge = [system, {"role": "user", "content": "dato " * 1000}]
+    window = manager.fit(huge, budget=100)
+    assert window.messages == huge and window.over_budget
+
+
+def test_orchestrator_budget_uses_available_models_context(tmp_path):
+    cfg = {
+        "models": {
+            "blackbox": {
+                "api_key": "k",
+                "model": "big/model",
+                "enabled": True,
+                "context": {"target_ratio": 0.5},
+            }
+        },
+        "available_models": [
+            {"model": "big/model", "context": "128k"},
+            {"model": "small/model", "context": "4k"},
+        ],
+    }
+    path = tmp_path / "models.json"
+    path.write_text(json.dumps(cfg), encoding="utf-8")
+    o = AIOrchestrator(config_file=str(path))
+    try:
+        assert o.context.budget("big/model", 1000) == 64_000
+        assert o.context.budget("small/model", 1000) == 2_000
+        assert o.context.budget("unknown/model", 1000) == 4096  # default 8192
+        history = _turns(400)
+        assert o.fit_context(history).dropped == 0  # modelo por defecto
+        window = o.fit_context(history, model="small/model", max_tokens=1000)
+        assert window.dropped > 0 and window.tokens <= 2_000
+    finally:
+        o.close()
+
+
+class _RecordingOrchestrator:
+    def __init__(self):
+        self.context = ContextManager(
+            ContextConfig(default_context=700, default_output_tokens=100)
+        )
+        self.calls = []
+
+    def fit_context(self, messages, model=None, max_tokens=None):
+        return self.context.fit(messages, model=model, max_tokens=max_tokens)
+
+    async def agenerate_response(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return {"content": "respuesta " * 30}
+
+
+def test_cycle_endpoint_and_repl_send_bounded_context(monkeypatch):
+    import main
+    from multi_agent_workflow.state import app_state
+    from multi_agent_workflow.storage import MemoryCycleStore
+
+    fake = _RecordingOrchestrator()
+    previous = app_state.use_store(MemoryCycleStore())
+    try:
+        monkeypatch.setattr(main, "orchestrator", fake)
+        client = TestClient(main.app)
+        cycle_id = client.post("/cycles", json={"title": "ctx"}).json()["id"]
+        for i in range(8):
+            prompt = f"pregunta {i} " + "detalle " * 30
+            r = client.post(
+                f"/cycles/{cycle_id}/messages",
+                json={"prompt": prompt, "max_tokens": 100},
+            )
+            assert r.status_code == 200
+    finally:
+        app_state.use_store(previous)
+
+    first, last = fake.calls[0]["messages"], fake.calls[-1]["messages"]
+    assert first == [{"role": "user", "content": "pregunta 0 " + "detalle " * 30}]
+    assert last[-1]["content"].startswith("pregunta 7")
+    assert last[0]["content"].startswith("Resumen de")
+    assert sum(message_tokens(m) for m in last) <= fake.context.budget(None, 100)
+
+    import importlib
+
+    cli_module = importlib.import_module("blackbox_hybrid_tool.cli.main")
+    cli = cli_module.CLI()
+    cli.ai_orchestrator = Mock()
+    cli.ai_orchestrator.models_config = {"models": {"blackbox": {"model": "m"}}}
+    cli.ai_orchestrator.fit_context = lambda history, model=None: SimpleNamespace(
+        messages=history[-1:], dropped=len(history) - 1, tokens=1, budget=1
+    )
+    cli.ai_orchestrator.generate_response = Mock(return_value="ok")
+    inputs = iter(["uno", "dos", "/exit"])
+    monkeypatch.setattr("builtins.input", lambda *_: next(inputs))
+    args = SimpleNamespace(
+        debug=False, model=None, session=None, transcript=None, no_stream=True
+    )
+    assert cli.run_repl(args) == 0
+    sent = cli.ai_orchestrator.generate_response.call_args.kwargs["messages"]
+    assert sent == [{"role": "user", "content": "dos"}]
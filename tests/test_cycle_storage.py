@@ -0,0 +1,310 @@
+"""
+Tests para el almacenamiento de ciclos (memoria y SQLite)
+"""
+
+import sqlite3
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.core.context import ContextManager
+from multi_agent_workflow.models import (
+    Agent,
+    ChatMessage,
+    DevelopmentCycle,
+    GitHubLink,
+)
+from multi_agent_workflow.state import app_state
+from multi_agent_workflow.storage import (
+    MemoryCycleStore,
+    MemoryLimits,
+    SQLiteCycleStore,
+)
+
+AGENT = Agent(id="blackbox", name="B", role="r", model="x/y")
+
+
+def _cycle(cycle_id, created_at, *texts):
+    return DevelopmentCycle(
+        id=cycle_id,
+        title=f"ciclo {cycle_id}",
+        created_at=created_at,
+        active_agents=[AGENT],
+        messages=[ChatMessage(sender="user", text=t) for t in texts],
+    )
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_contract(backend, tmp_path):
+    if backend == "memory":
+        store = MemoryCycleStore()
+    else:
+        store = SQLiteCycleStore(str(tmp_path / "cycles.db"))
+    store.add_cycle(_cycle("b", 2.0, "uno"))
+    store.add_cycle(_cycle("a", 1.0))
+    assert [c.id for c in store.list_cycles()] == ["a", "b"]
+    assert store.get_cycle("missing") is None
+
+    assert store.add_message("b", ChatMessage(sender="blackbox", text="dos"))
+    assert not store.add_message("missing", ChatMessage(sender="user", text="x"))
+    assert [m.text for m in store.get_messages("b")] == ["uno", "dos"]
+    assert store.get_cycle("b").active_agents == [AGENT]
+
+    link = GitHubLink(issue_url="https://github.com/o/r/issues/1")
+    assert store.set_github_link("a", link)
+    assert not store.set_github_link("missing", link)
+    assert store.get_cycle("a").github_link == link
+    stats = store.stats()
+    assert (stats["backend"], stats["cycles"], stats["messages"]) == (backend, 2, 2)
+    store.close()
+
+
+def test_sqlite_is_lazy_durable_and_shared(tmp_path):
+    path = str(tmp_path / "data" / "cycles.db")
+    writer = SQLiteCycleStore(path)
+    reader = SQLiteCycleStore(path)  # otro worker sobre el mismo fichero
+    assert writer._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    writer.add_cycle(_cycle("c", 1.0, "hola"))
+
+    # Los mensajes solo se leen cuando se piden
+    assert reader.get_cycle("c", with_messages=False).messages == []
+    assert [c.messages for c in reader.list_cycles(with_messages=False)] == [[]]
+
+    def append(store, sender):
+        for i in range(25):
+            store.add_message("c", ChatMessage(sender=sender, text=str(i)))
+
+    threads = [
+        threading.Thread(target=append, args=(store, name))
+        for store, name in ((writer, "w"), (reader, "r"), (writer, "w2"))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.close()
+    reader.close()
+
+    # Reinicio: un proceso nuevo ve todo lo escrito
+    restarted = SQLiteCycleStore(path)
+    assert restarted.stats()["messages"] == 76
+    messages = restarted.get_messages("c")
+    assert messages[0].text == "hola"
+    assert [m.text for m in messages if m.sender == "r"] == [str(i) for i in range(25)]
+    indexes = {
+        row[1] for row in sqlite3.connect(path).execute("PRAGMA index_list('messages')")
+    }
+    assert "idx_messages_cycle" in indexes
+    # Los contadores del resumen se mantienen en la fila del ciclo
+    summary = restarted.get_summary("c")
+    assert summary.message_count == 76 and summary.last_message_id == messages[-1].id
+    assert summary.last_message_at == max(m.timestamp for m in messages)
+    restarted.close()
+
+
+def test_sqlite_backfills_summary_columns_of_old_databases(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE cycles (id TEXT PRIMARY KEY, title TEXT NOT NULL, "
+        "created_at REAL NOT NULL, active_agents TEXT NOT NULL DEFAULT '[]', "
+        "github_link TEXT)"
+    )
+    conn.execute(
+        "CREATE TABLE messages (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "cycle_id TEXT NOT NULL, sender TEXT NOT NULL, text TEXT NOT NULL, "
+        "timestamp REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO cycles VALUES ('a', 'A', 1.0, '[]', NULL)")
+    conn.execute("INSERT INTO cycles VALUES ('b', 'B', 2.0, '[]', NULL)")
+    conn.executemany(
+        "INSERT INTO messages (cycle_id, sender, text, timestamp) VALUES (?,?,?,?)",
+        [("a", "user", "x", 5.0), ("a", "bot", "y", 6.0)],
+    )
+    conn.commit()
+    conn.close()
+
+    store = SQLiteCycleStore(path)
+    a, b = store.list_summaries(10)
+    assert (a.message_count, a.last_message_id, a.last_message_at) == (2, 2, 6.0)
+    assert (b.message_count, b.last_message_id) == (0, None)
+    store.add_message("b", ChatMessage(sender="user", text="z"))
+    assert store.get_summary("b").message_count == 1
+    store.close()
+
+
+class _EchoOrchestrator:
+    context = ContextManager()
+
+    def fit_context(self, messages, model=None, max_tokens=None):
+        return self.context.fit(messages, model=model, max_tokens=max_tokens)
+
+    async def agenerate_response(self, prompt, **kwargs):
+        return {"content": prompt.upper()}
+
+
+def test_cycle_endpoints_write_through_sqlite(tmp_path, monkeypatch):
+    import main
+
+    store = SQLiteCycleStore(str(tmp_path / "cycles.db"))
+    previous = app_state.use_store(store)
+    try:
+        monkeypatch.setattr(main, "orchestrator", _EchoOrchestrator())
+        client = TestClient(main.app)
+        created = client.post(
+            "/cycles", json={"title": "persistente", "initial_prompt": "hola"}
+        ).json()
+        cycle_id = created["id"]
+        r = client.post(f"/cycles/{cycle_id}/messages", json={"prompt": "otra"})
+        assert r.json()["text"] == "OTRA"
+        link = {"pr_url": "https://github.com/o/r/pull/2"}
+        r = client.post(f"/cycles/{cycle_id}/github", json=link)
+        assert r.json()["cycle"]["github_link"]["pr_url"] == link["pr_url"]
+        assert client.post("/cycles/nope/github", json=link).status_code == 404
+    finally:
+        app_state.use_store(previous)
+        store.close()
+
+    reopened = SQLiteCycleStore(str(tmp_path / "cycles.db"))
+    cycle = reopened.get_cycle(cycle_id)
+    assert [m.text for m in cycle.messages] == ["hola", "HOLA", "otra", "OTRA"]
+    assert cycle.github_link.pr_url == link["pr_url"]
+    reopened.close()
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_summaries_and_incremental_messages(backend, tmp_path):
+    if backend == "memory":
+        store = MemoryCycleStore()
+    else:
+        store = SQLiteCycleStore(str(tmp_path / "cycles.db"))
+    for i in range(5):
+        store.add_cycle(_cycle(f"c{i}", float(i), "a", "b"))
+    first = store.list_summaries(2)
+    assert [s.id for s in first] == ["c0", "c1"]
+    after = (first[-1].created_at, first[-1].id)
+    assert [s.id for s in store.list_summaries(10, after)] == ["c2", "c3", "c4"]
+
+    summary = store.get_summary("c3")
+    assert summary.message_count == 2 and summary.active_agents == [AGENT]
+    last_id = summary.last_message_id
+    message = ChatMessage(sender="user", text="c", timestamp=4e9)
+    store.add_message("c3", message)
+    assert message.id > last_id
+    assert store.get_messages("c3", since_id=last_id) == [message]
+    assert [m.text for m in store.get_messages("c3", since_timestamp=3.9e9)] == ["c"]
+    assert [m.text for m in store.get_messages("c3", limit=2)] == ["a", "b"]
+    assert store.get_summary("c3").last_message_id == message.id
+    assert store.get_summary("missing") is None
+    store.close()
+
+
+def test_cycle_pagination_since_and_etag(monkeypatch):
+    import main
+
+    previous = app_state.use_store(MemoryCycleStore())
+    try:
+        monkeypatch.setattr(main, "orchestrator", _EchoOrchestrator())
+        client = TestClient(main.app)
+        ids = [
+            client.post(
+                "/cycles", json={"title": f"t{i}", "initial_prompt": "hola"}
+            ).json()["id"]
+            for i in range(3)
+        ]
+        page = client.get("/cycles?limit=2")
+        body = page.json()
+        assert [c["id"] for c in body["items"]] == ids[:2]
+        assert "messages" not in body["items"][0]
+        assert body["items"][0]["message_count"] == 2
+        rest = client.get(f"/cycles?limit=2&cursor={body['next_cursor']}").json()
+        assert [c["id"] for c in rest["items"]] == ids[2:]
+        assert rest["next_cursor"] is None
+        assert client.get("/cycles?cursor=!!").status_code == 400
+
+        etag = page.headers["etag"]
+        same = client.get("/cycles?limit=2", headers={"If-None-Match": etag})
+        assert same.status_code == 304 and same.content == b""
+
+        url = f"/cycles/{ids[0]}/messages"
+        full = client.get(url)
+        last_id = full.json()[-1]["id"]
+        assert [m["text"] for m in full.json()] == ["hola", "HOLA"]
+        polled = client.get(f"{url}?since_id={last_id}")
+        assert polled.json() == []
+        tag = {"If-None-Match": polled.headers["etag"]}
+        assert client.get(f"{url}?since_id={last_id}", headers=tag).status_code == 304
+
+        client.post(url, json={"prompt": "más"})
+        delta = client.get(f"{url}?since_id={last_id}", headers=tag)
+        assert [m["text"] for m in delta.json()] == ["más", "MÁS"]
+        ts = full.json()[0]["timestamp"]
+        assert len(client.get(f"{url}?since_ts={ts}").json()) == 3
+        # Un timestamp de segundos enteros no se confunde con un id
+        assert len(client.get(f"{url}?since_ts={int(ts) - 1}").json()) == 4
+        assert client.get(f"{url}?since_ts={int(ts) + 3600}").json() == []
+        assert client.get(f"{url}?since_id=ayer").status_code == 422
+
+        cycle = client.get(f"/cycles/{ids[0]}")
+        assert len(cycle.json()["messages"]) == 4
+        tag = {"If-None-Match": cycle.headers["etag"]}
+        assert client.get(f"/cycles/{ids[0]}", headers=tag).status_code == 304
+        assert client.get("/cycles/nope/messages").status_code == 404
+    finally:
+        app_state.use_store(previous)
+
+
+def test_bounded_memory_store_spills_and_reloads(tmp_path):
+    limits = MemoryLimits(
+        max_cycles=2, max_messages_per_cycle=3, max_bytes=0, spill_dir=str(tmp_path)
+    )
+    store = MemoryCycleStore(limits)
+    for i in range(4):
+        store.add_cycle(_cycle(f"c{i}", float(i), *[f"m{j}" for j in range(5)]))
+    stats = store.stats()
+    assert (stats["resident_cycles"], stats["spilled_cycles"]) == (2, 2)
+    assert stats["evictions"] == 2 and stats["trimmed_messages"] == 8
+    assert stats["messages"] == 20 and stats["resident_messages"] == 6
+    assert stats["spill_bytes"] > 0
+    assert list(tmp_path.glob("chispart-cycles-*/*.jsonl.gz"))
+
+    # Recarga transparente del más frío, con el historial completo
+    cycle = store.get_cycle("c0")
+    assert [m.text for m in cycle.messages] == [f"m{j}" for j in range(5)]
+    assert store.stats()["reloads"] == 1 and "c0" in store.cycles
+    assert "c2" not in store.cycles  # LRU: c2 sale para dejar sitio
+    assert store.get_summary("c2").message_count == 5
+    assert [c.id for c in store.list_cycles(with_messages=False)] == [
+        "c0",
+        "c1",
+        "c2",
+        "c3",
+    ]
+
+    # Sondeo sobre la cola en memoria y lectura completa desde disco
+    since = store.cycles["c0"].messages[-2].id  # m3
+    store.add_message("c0", ChatMessage(sender="user", text="nuevo"))
+    assert [m.text for m in store.get_messages("c0", since_id=since)] == [
+        "m4",
+        "nuevo",
+    ]
+    assert len(store.get_messages("c0")) == 6
+    assert [m.text for m in store.get_messages("c0", limit=2)] == ["m0", "m1"]
+    store.set_github_link("c1", GitHubLink(branch_name="feat"))
+    assert store.get_cycle("c1").github_link.branch_name == "feat"
+    assert [len(c.messages) for c in store.list_cycles()] == [6, 5, 5, 5]
+
+    store.close()
+    assert not list(tmp_path.glob("chispart-cycles-*"))
+
+
+def test_byte_cap_keeps_the_active_cycle():
+    store = MemoryCycleStore(MemoryLimits(0, 0, max_bytes=4000))
+    store.add_cycle(_cycle("old", 1.0, "x" * 2000))
+    store.add_cycle(_cycle("new", 2.0, "y" * 3000))
+    assert list(store.cycles) == ["new"]
+    assert store.stats()["evictions"] == 1
+    assert store.get_messages("old")[0].text == "x" * 2000
+    assert list(store.cycles) == ["old"]
+    store.close()
@@ -0,0 +1,76 @@
+"""
+Tests para la lectura en streaming de GET /files/content
+"""
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import main
+
+    root = tmp_path / "root"
+    (root / "docs").mkdir(parents=True)
+    (root / "docs" / "big.txt").write_bytes(
+        b"".join(b"%06d\n" % i for i in range(50000))
+    )
+    (root / "docs" / "blob.bin").write_bytes(b"\x00\x01\x02" * 10)
+    (root / "acentos.txt").write_text("añoñ" * 3, encoding="utf-8")
+    (tmp_path / "secreto.txt").write_text("fuera")
+    os.symlink(tmp_path / "secreto.txt", root / "enlace.txt")
+    monkeypatch.setenv("WRITE_ROOT", str(root))
+    return TestClient(main.app)
+
+
+def test_full_read_ranges_and_conditional_get(client):
+    url = "/files/content?path=docs/big.txt"
+    r = client.get(url)
+    assert r.status_code == 200 and len(r.content) == 350000
+    assert r.content.startswith(b"000000\n000001\n")
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["content-disposition"].startswith("inline")
+    etag, modified = r.headers["etag"], r.headers["last-modified"]
+
+    part = client.get(url, headers={"Range": "bytes=7-13"})
+    assert part.status_code == 206 and part.content == b"000001\n"
+    assert part.headers["content-range"] == "bytes 7-13/350000"
+    tail = client.get(url, headers={"Range": "bytes=-7"})
+    assert tail.content == b"049999\n"
+    assert client.get(url, headers={"Range": "bytes=999999-"}).status_code == 416
+
+    same = client.get(url, headers={"If-None-Match": etag})
+    assert same.status_code == 304 and same.content == b""
+    assert same.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": modified}).status_code == 304
+    old = "Mon, 01 Jan 2001 00:00:00 GMT"
+    assert client.get(url, headers={"If-Modified-Since": old}).status_code == 200
+    download = client.get(url + "&download=true")
+    assert download.headers["content-disposition"].startswith("attachment")
+
+
+def test_preview_and_sandbox(client):
+    r = client.get("/files/content?path=docs/big.txt&preview=true&max_bytes=14")
+    body = r.json()
+    assert body["content"] == "000000\n000001\n"
+    assert body["truncated"] and body["size"] == 350000
+    tag = {"If-None-Match": r.headers["etag"]}
+    url = "/files/content?path=docs/big.txt&preview=true&max_bytes=14"
+    assert client.get(url, headers=tag).status_code == 304
+    # Otro tamaño de vista previa es otra representación
+    other = "/files/content?path=docs/big.txt&preview=true&max_bytes=7"
+    assert client.get(other, headers=tag).status_code == 200
+
+    # Un carácter multibyte cortado por max_bytes se descarta
+    cut = client.get("/files/content?path=acentos.txt&preview=true&max_bytes=5").json()
+    assert cut["content"] == "año"
+    blob = client.get("/files/content?path=docs/blob.bin&preview=true").json()
+    assert blob["binary"] and blob["content"] is None and not blob["truncated"]
+
+    assert client.get("/files/content?path=../secreto.txt").status_code == 403
+    assert client.get("/files/content?path=enlace.txt").status_code == 403
+    assert client.get("/files/content?path=docs").status_code == 400
+    assert client.get("/files/content?path=nada.txt").status_code == 404
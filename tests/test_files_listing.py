@@ -0,0 +1,92 @@
+"""
+Tests para el listado paginado y cacheado de GET /files
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.utils.listing import DirectoryListingCache
+
+
+def _tree(root, files=25):
+    (root / "sub").mkdir()
+    (root / ".oculto").write_text("x")
+    for i in range(files):
+        (root / f"f{i:02d}.{'py' if i % 2 else 'txt'}").write_bytes(b"x" * i)
+
+
+def test_cache_pages_sorts_and_invalidates_on_mtime(tmp_path):
+    _tree(tmp_path)
+    cache = DirectoryListingCache(ttl=60)
+    first = cache.list(str(tmp_path), limit=10)
+    assert not first.cached and first.total == 26
+    assert first.entries[0].name == "sub" and first.entries[0].size is None
+    names = [e.name for e in first.entries]
+    cursor = first.next_cursor
+    while cursor:
+        page = cache.list(str(tmp_path), limit=10, cursor=cursor)
+        assert page.cached
+        names += [e.name for e in page.entries]
+        cursor = page.next_cursor
+    assert names == ["sub"] + [
+        f"f{i:02d}.{'py' if i % 2 else 'txt'}" for i in range(25)
+    ]
+
+    big = cache.list(
+        str(tmp_path), sort="size", order="desc", dirs_first=False, limit=3
+    )
+    assert [e.size for e in big.entries] == [24, 23, 22]
+    rest = cache.list(
+        str(tmp_path),
+        sort="size",
+        order="desc",
+        dirs_first=False,
+        cursor=big.next_cursor,
+    )
+    assert rest.entries[0].size == 21 and rest.entries[-1].name == "sub"
+    py = cache.list(str(tmp_path), glob="*.py", show_hidden=True)
+    assert py.total == 12 and all(e.name.endswith(".py") for e in py.entries)
+
+    # Una entrada nueva cambia el mtime del directorio: la caché se descarta
+    (tmp_path / "nuevo.txt").write_text("n")
+    fresh = cache.list(str(tmp_path), limit=100)
+    assert not fresh.cached and fresh.total == 27
+    assert cache.stats()["hits"] >= 3
+
+    with pytest.raises(ValueError):
+        cache.list(str(tmp_path), cursor="%%%")
+    with pytest.raises(ValueError):
+        cache.list(str(tmp_path), sort="size", cursor=first.next_cursor)
+
+
+def test_files_endpoint_paginates_inside_write_root(tmp_path, monkeypatch):
+    import main
+
+    (tmp_path / "data").mkdir()
+    _tree(tmp_path / "data")
+    monkeypatch.setenv("WRITE_ROOT", str(tmp_path))
+    monkeypatch.setattr(main, "listing_cache", DirectoryListingCache(ttl=60))
+    client = TestClient(main.app)
+
+    r = client.get("/files", params={"path": "data", "limit": 20})
+    body = r.json()
+    assert r.status_code == 200 and body["total"] == 26
+    assert len(body["files"]) == 20 and body["files"][0]["type"] == "directory"
+    assert ".oculto" not in [f["name"] for f in body["files"]]
+    nxt = client.get(
+        "/files", params={"path": "data", "limit": 20, "cursor": body["next_cursor"]}
+    ).json()
+    assert len(nxt["files"]) == 6 and nxt["next_cursor"] is None
+
+    # Sin limit no se trunca: los clientes antiguos no siguen next_cursor
+    full = client.get("/files", params={"path": "data"}).json()
+    assert len(full["files"]) == 26 and full["next_cursor"] is None
+    txt = client.get("/files", params={"path": "data", "glob": "*.txt"}).json()
+    assert txt["total"] == 13
+    assert (
+        client.get("/files", params={"path": "data", "cursor": "!!"}).status_code == 400
+    )
+    assert client.get("/files", params={"sort": "color"}).status_code == 422
+    assert client.get("/files", params={"path": "../.."}).status_code == 403
+    assert client.get("/files", params={"path": "nada"}).json()["error"]
+    assert client.get("/admin/files").json()["hits"] >= 1
@@ -0,0 +1,159 @@
+"""
+Tests para las solicitudes con cobertura (hedging)
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.core.hedging import (
+    HedgeBudget,
+    HedgeConfig,
+    Hedger,
+    estimate_saved,
+    percentile,
+)
+from blackbox_hybrid_tool.exceptions import BlackboxAPIError
+
+FAST = [0.02] * 19 + [0.5]
+
+
+def _hedger(latencies=FAST, budget_ratio=1.0, **cfg):
+    config = HedgeConfig(enabled=True, min_samples=5, min_delay=0.01, **cfg)
+    return Hedger(
+        lambda model: config,
+        lambda model: list(latencies),
+        HedgeBudget(budget_ratio, 60.0),
+    )
+
+
+class Script:
+    """Llamadas simuladas: cada entrada es (segundos, error o None)"""
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = []
+        self.cancelled = []
+
+    async def __call__(self, model):
+        index = len(self.calls)
+        self.calls.append(model)
+        seconds, error = self.steps[index]
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        if error:
+            raise error
+        return f"r{index}:{model}"
+
+
+def test_percentile_and_saved_estimate():
+    assert percentile(FAST, 0.95) == 0.02 and percentile(FAST, 0.99) == 0.5
+    assert percentile([], 0.5) is None
+    assert estimate_saved([0.1, 1.0, 3.0], 0.5) == pytest.approx(1.5)
+    assert estimate_saved([0.1], 0.5) == 0.0
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = _hedger()
+    script = Script((0.0, None))
+    result, used, _ = asyncio.run(hedger.run("m", script))
+    assert (result, used) == ("r0:m", "m") and script.calls == ["m"]
+    assert hedger.stats.snapshot()["hedged"] == 0
+
+
+def test_straggler_is_hedged_and_cancelled():
+    hedger = _hedger(latencies=[0.02] * 19 + [2.0])
+    script = Script((1.0, None), (0.0, None))
+    result, used, latency = asyncio.run(hedger.run("m", script, "backup"))
+    assert (result, used) == ("r1:backup", "backup")
+    assert script.calls == ["m", "backup"] and script.cancelled == [0]
+    assert latency < 0.5
+    stats = hedger.stats.snapshot()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    # La única latencia reciente mayor que la espera es 2.0
+    assert 1.8 < stats["saved_seconds"] < 2.0
+
+
+def test_primary_can_still_win_and_errors_wait_for_other_leg():
+    hedger = _hedger()
+    script = Script((0.1, None), (1.0, None))
+    assert asyncio.run(hedger.run("m", script))[0] == "r0:m"
+    assert script.cancelled == [1]
+    assert hedger.stats.snapshot()["primary_wins"] == 1
+
+    script = Script((0.05, BlackboxAPIError("x", 503)), (0.1, None))
+    assert asyncio.run(hedger.run("m", script))[0] == "r1:m"
+
+    script = Script((0.05, BlackboxAPIError("a", 503)), (0.0, BlackboxAPIError("b")))
+    with pytest.raises(BlackboxAPIError, match="a"):
+        asyncio.run(hedger.run("m", script))
+
+
+def test_budget_and_missing_samples_disable_hedging():
+    hedger = _hedger(budget_ratio=0.05)
+    script = Script((0.1, None))
+    assert asyncio.run(hedger.run("m", script))[0] == "r0:m"
+    assert script.calls == ["m"]
+    assert hedger.stats.snapshot()["budget_denied"] == 1
+
+    budget = HedgeBudget(0.05, 60.0)
+    for _ in range(19):
+        budget.record_request()
+    assert not budget.try_acquire()
+    budget.record_request()
+    assert budget.try_acquire() and not budget.try_acquire()
+
+    hedger = _hedger(latencies=[0.02])
+    asyncio.run(hedger.run("m", Script((0.0, None))))
+    assert hedger.stats.snapshot()["no_estimate"] == 1
+
+
+def test_orchestrator_hedges_async_calls(tmp_path, monkeypatch):
+    cfg_path = tmp_path / "models.json"
+    cfg_path.write_text(
+        json.dumps(
+            {
+                "models": {
+                    "blackbox": {
+                        "api_key": "k",
+                        "model": "m1",
+                        "enabled": True,
+                        "hedge": {
+                            "enabled": True,
+                            "min_samples": 5,
+                            "min_delay": 0.01,
+                            "budget_ratio": 1.0,
+                            "target": "secondary",
+                        },
+                        "fallback": {"tiers": {"a": ["m1", "m2"]}},
+                    }
+                }
+            }
+        ),
+        encoding="utf-8",
+    )
+    o = AIOrchestrator(config_file=str(cfg_path))
+    for _ in range(5):
+        o.router.record("m1", 0.02, True)
+    script = Script((1.0, None), (0.0, None))
+
+    async def fake(prompt, **kw):
+        return await script(kw["model"])
+
+    monkeypatch.setattr(o.get_client(), "agenerate_response", fake)
+    assert asyncio.run(o.agenerate_response("hola", model="m1")) == "r1:m2"
+    assert script.cancelled == [0]
+    assert o.hedge_stats()["hedge_wins"] == 1
+    assert o.breaker_stats()["m1"]["state"] == "closed"
+
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "orchestrator", o)
+    assert TestClient(main.app).get("/admin/hedging").json()["hedged"] == 1
+    o.close()
@@ -0,0 +1,82 @@
+"""
+Tests para el pool de conexiones HTTP compartido
+"""
+
+import json
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator, BlackboxClient
+from blackbox_hybrid_tool.core.http_pool import ConnectionPool, PoolConfig
+
+
+def _write_cfg(tmp_path, pool=None):
+    bb = {"api_key": "k", "model": "blackboxai/openai/o1", "enabled": True}
+    if pool is not None:
+        bb["pool"] = pool
+    cfg_path = tmp_path / "models.json"
+    cfg_path.write_text(
+        json.dumps({"default_model": "auto", "models": {"blackbox": bb}}),
+        encoding="utf-8",
+    )
+    return str(cfg_path)
+
+
+def test_pool_config_from_dict_ignores_unknown_keys():
+    cfg = PoolConfig.from_dict({"pool_maxsize": 5, "bogus": 1})
+    assert cfg.pool_maxsize == 5
+    assert PoolConfig.from_dict(None) == PoolConfig()
+
+
+def test_session_is_reused_and_adapter_configured():
+    pool = ConnectionPool(PoolConfig(pool_connections=3, pool_maxsize=7))
+    s1 = pool.session
+    assert s1 is pool.session
+    adapter = s1.get_adapter("https://api.blackbox.ai")
+    assert adapter._pool_connections == 3 and adapter._pool_maxsize == 7
+    stats = pool.stats()
+    assert stats["requests"] == 0 and stats["config"]["pool_maxsize"] == 7
+    pool.close()
+    assert pool.stats()["closed"] is True
+
+
+def test_keep_alive_disabled_sets_connection_close():
+    pool = ConnectionPool(PoolConfig(keep_alive=False))
+    assert pool.session.headers["Connection"] == "close"
+
+
+def test_orchestrator_clients_share_pool(tmp_path, monkeypatch):
+    o = AIOrchestrator(config_file=_write_cfg(tmp_path, pool={"pool_maxsize": 4}))
+    assert o.pool.config.pool_maxsize == 4
+    c1 = o.get_client("blackbox")
+    c2 = o.get_client("other")
+    assert c1 is not c2 and c1.pool is o.pool and c2.pool is o.pool
+
+    class R:
+        status_code = 200
+
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            return {"choices": [{"message": {"content": "ok"}}]}
+
+    calls = []
+    monkeypatch.setattr(
+        "requests.Session.post", lambda self, url, **kw: calls.append(self) or R()
+    )
+    assert c1.generate_response("a") == "ok"
+    assert c2.generate_response("b") == "ok"
+    assert calls[0] is calls[1]
+    assert o.pool_stats()["requests"] == 2
+
+    # Un cliente con pool compartido no lo cierra; el orquestador sí
+    c1.close()
+    assert o.pool.stats()["closed"] is False
+    with o:
+        pass
+    assert o.pool.stats()["closed"] is True and o.clients == {}
+
+
+def test_standalone_client_owns_its_pool():
+    with BlackboxClient("k", {"pool": {"pool_maxsize": 2}}) as client:
+        assert client.pool.config.pool_maxsize == 2
+    assert client.pool.stats()["closed"] is True
@@ -0,0 +1,106 @@
+"""
+Tests para el registro de métricas y el endpoint /metrics
+"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.utils import metrics
+from blackbox_hybrid_tool.utils.metrics import MetricsRegistry
+from blackbox_hybrid_tool.utils.mock_server import (
+    LatencyProfile,
+    MockBlackboxServer,
+    MockConfig,
+)
+
+
+def test_text_exposition_format():
+    registry = MetricsRegistry()
+    hits = registry.counter("hits_total", "Aciertos", ("path",))
+    hits.inc(path='/a"b')
+    hits.inc(2, path='/a"b')
+    assert registry.counter("hits_total", "otra ayuda", ("path",)) is hits
+    with pytest.raises(ValueError):
+        hits.inc(-1, path="/")
+    with pytest.raises(ValueError):
+        registry.gauge("hits_total", "x")
+
+    latency = registry.histogram("lat_seconds", "Latencia", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value)
+    registry.gauge("in_flight", "En curso").set(3)
+    registry.callback(
+        "state", "Tamaños", lambda: {("a",): 1, ("b",): 2.5}, labelnames=("k",)
+    )
+    registry.callback("broken", "Roto", lambda: 1 / 0)
+
+    text = registry.render()
+    assert "# TYPE hits_total counter" in text
+    assert 'hits_total{path="/a\\"b"} 3' in text
+    assert 'lat_seconds_bucket{le="0.1"} 2' in text
+    assert 'lat_seconds_bucket{le="1"} 3' in text
+    assert 'lat_seconds_bucket{le="+Inf"} 4' in text
+    assert "lat_seconds_sum 3.65" in text and "lat_seconds_count 4" in text
+    assert "in_flight 3" in text and 'state{k="b"} 2.5' in text
+    assert "# broken no disponible: ZeroDivisionError" in text
+
+
+@pytest.fixture()
+def orchestrator(tmp_path):
+    config = MockConfig(latency=LatencyProfile("fixed", 0.0))
+    with MockBlackboxServer(config) as server:
+        cfg_path = tmp_path / "models.json"
+        cfg_path.write_text(
+            json.dumps(
+                {
+                    "models": {
+                        "blackbox": {
+                            "api_key": "k",
+                            "model": "mock/metrics",
+                            "enabled": True,
+                            "base_url": server.completions_url,
+                            "retry": {"max_attempts": 1},
+                        }
+                    }
+                }
+            ),
+            encoding="utf-8",
+        )
+        o = AIOrchestrator(config_file=str(cfg_path))
+        yield o, server
+        o.close()
+
+
+def test_metrics_endpoint_covers_routes_upstream_and_state(orchestrator, monkeypatch):
+    import main
+
+    o, server = orchestrator
+    monkeypatch.setattr(main, "orchestrator", o)
+    client = TestClient(main.app)
+    ok = dict(method="POST", route="/chat", status="200")
+    before = metrics.HTTP_REQUESTS.value(**ok)
+    upstream_ok = metrics.UPSTREAM_LATENCY.count(model="mock/metrics", outcome="ok")
+
+    assert client.post("/chat", json={"prompt": "hola métricas"}).status_code == 200
+    assert metrics.HTTP_REQUESTS.value(**ok) == before + 1
+    assert metrics.UPSTREAM_LATENCY.count(model="mock/metrics", outcome="ok") == (
+        upstream_ok + 1
+    )
+    assert metrics.UPSTREAM_TOKENS.value(model="mock/metrics", kind="completion") > 0
+
+    server.configure(MockConfig(error_rate=1.0, error_statuses=(500,)))
+    errors = metrics.ERRORS.value(source="upstream", type="BlackboxAPIError")
+    assert client.post("/chat", json={"prompt": "falla"}).status_code == 502
+    assert metrics.ERRORS.value(source="upstream", type="BlackboxAPIError") == (
+        errors + 1
+    )
+
+    r = client.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'route="/chat",status="502"' in r.text
+    assert "chispart_http_requests_in_flight 1" in r.text  # el propio /metrics
+    assert "chispart_cycles " in r.text
+    assert 'chispart_response_cache_events_total{event="misses"}' in r.text
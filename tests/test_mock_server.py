@@ -0,0 +1,138 @@
+"""
+Tests para el servidor simulado de la API de Blackbox
+"""
+
+import asyncio
+import json
+import random
+import statistics
+
+import pytest
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.core.ai_client import BlackboxClient
+from blackbox_hybrid_tool.core.streaming import iter_sse_deltas
+from blackbox_hybrid_tool.exceptions import BlackboxAPIError
+from blackbox_hybrid_tool.utils.mock_server import (
+    LatencyProfile,
+    MockBlackboxServer,
+    MockConfig,
+    create_app,
+)
+
+CHAT = {"model": "mock/gpt", "messages": [{"role": "user", "content": "hola mundo"}]}
+
+
+def test_latency_profiles():
+    rng = random.Random(7)
+    assert LatencyProfile.parse("fixed:0.2").sample(rng) == 0.2
+    uniform = LatencyProfile.parse("uniform:0.1:0.3")
+    assert all(0.1 <= uniform.sample(rng) <= 0.3 for _ in range(50))
+    lognormal = LatencyProfile.parse("lognormal:0.2:0.1")
+    samples = [lognormal.sample(rng) for _ in range(4000)]
+    assert statistics.mean(samples) == pytest.approx(0.2, rel=0.1)
+    stragglers = LatencyProfile("fixed", 0.01, straggler_rate=1.0, straggler_delay=1)
+    assert stragglers.sample(rng) == pytest.approx(1.01)
+    assert LatencyProfile("normal", 0.0, 1.0, maximum=0.5).sample(rng) <= 0.5
+
+
+def test_completion_tool_calls_and_media():
+    client = TestClient(create_app())
+    body = client.post("/chat/completions", json=CHAT).json()
+    assert body["choices"][0]["message"]["content"] == "mock: hola mundo"
+    assert body["usage"]["total_tokens"] > 0
+
+    tools = [
+        {
+            "type": "function",
+            "function": {
+                "name": "search_web",
+                "parameters": {"required": ["query"]},
+            },
+        }
+    ]
+    msg = client.post("/chat/completions", json=dict(CHAT, tools=tools)).json()[
+        "choices"
+    ][0]["message"]
+    call = msg["tool_calls"][0]["function"]
+    assert call["name"] == "search_web" and "hola mundo" in call["arguments"]
+    stream = dict(CHAT, tools=tools, stream=True)
+    with client.stream("POST", "/chat/completions", json=stream) as r:
+        events = [
+            json.loads(line[6:])
+            for line in r.iter_lines()
+            if line.startswith("data: {")
+        ]
+    deltas = [e["choices"][0]["delta"] for e in events]
+    streamed = [d["tool_calls"] for d in deltas if "tool_calls" in d][0]
+    assert streamed[0]["index"] == 0 and streamed[0]["function"] == call
+
+    image = dict(CHAT, model="blackboxai/black-forest-labs/flux-schnell")
+    url = client.post("/chat/completions", json=image).json()["choices"][0]["message"][
+        "content"
+    ]
+    assert url.endswith(".png")
+    media = client.get(url.replace("http://testserver", ""))
+    assert media.headers["content-type"] == "image/png"
+    assert media.content.startswith(b"\x89PNG")
+
+
+def test_sse_stream_and_error_injection():
+    app = create_app(MockConfig(content="uno dos tres cuatro", stream_chunk_words=2))
+    client = TestClient(app)
+    with client.stream("POST", "/chat/completions", json=dict(CHAT, stream=True)) as r:
+        assert r.headers["content-type"].startswith("text/event-stream")
+        assert "".join(iter_sse_deltas(r.iter_lines())) == "uno dos tres cuatro"
+
+    app.state.mock["config"] = MockConfig(error_rate=1.0, error_statuses=(429,))
+    r = client.post("/chat/completions", json=CHAT)
+    assert r.status_code == 429 and r.headers["Retry-After"] == "1.0"
+    client.post("/mock/config", json={"require_auth": True})
+    assert client.post("/chat/completions", json=CHAT).status_code == 401
+    stats = client.get("/mock/stats").json()
+    assert stats["requests"] == 3 and stats["status_429"] == 1
+
+
+def test_in_process_server_with_blackbox_client():
+    config = MockConfig(latency=LatencyProfile("fixed", 0.01), seed=1)
+    with MockBlackboxServer(config) as server:
+        client = BlackboxClient(
+            "k",
+            {
+                "base_url": server.completions_url,
+                "model": "mock/gpt",
+                "retry": {"max_attempts": 1},
+            },
+        )
+        assert client.generate_response("hola") == "mock: hola"
+        assert "".join(client.stream_response("uno dos")) == "mock: uno dos"
+        assert asyncio.run(client.agenerate_response("async")) == "mock: async"
+
+        server.configure(MockConfig(error_rate=1.0, error_statuses=(503,)))
+        with pytest.raises(BlackboxAPIError) as exc_info:
+            client.generate_response("hola")
+        assert exc_info.value.status_code == 503
+        assert server.stats()["status_503"] == 1
+        client.close()
+
+
+def test_multi_agent_tools_client_uses_api_base(monkeypatch):
+    from multi_agent_workflow.tools import BlackboxClient as ToolsClient
+
+    with MockBlackboxServer() as server:
+        monkeypatch.setenv("BLACKBOX_API_BASE", server.base_url + "/")
+        client = ToolsClient("k")
+        result = asyncio.run(
+            client.chat_completions("mock/gpt", CHAT["messages"], tools=None)
+        )
+        assert result["choices"][0]["message"]["content"] == "mock: hola mundo"
+
+
+def test_subprocess_server():
+    server = MockBlackboxServer(MockConfig(content="desde subproceso")).spawn()
+    try:
+        client = BlackboxClient("k", {"base_url": server.completions_url})
+        assert client.generate_response("x") == "desde subproceso"
+        client.close()
+    finally:
+        server.stop()
@@ -0,0 +1,189 @@
+"""
+Tests para el limitador de tasa y concurrencia del cliente
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from blackbox_hybrid_tool.core.ai_client import BlackboxClient
+from blackbox_hybrid_tool.core.http_pool import ConnectionPool, PoolConfig
+from blackbox_hybrid_tool.core.rate_limit import (
+    ConcurrencyGate,
+    RateLimitConfig,
+    RateLimiter,
+    TokenBucket,
+    estimate_tokens,
+)
+from blackbox_hybrid_tool.exceptions import BlackboxRateLimitError
+
+
+def _limiter(key=None, model=None):
+    key_cfg = RateLimitConfig.from_dict(key)
+    return RateLimiter(key_cfg, lambda m: RateLimitConfig.from_dict(model))
+
+
+def test_estimate_tokens_counts_prompt_and_completion():
+    payload = {"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 50}
+    assert estimate_tokens(payload) == 150
+
+
+def test_token_bucket_refill_and_debt():
+    bucket = TokenBucket(per_minute=60, burst_seconds=2)  # 1/s, capacidad 2
+    now = bucket.updated
+    assert bucket.wait_time(1, now) == 0
+    bucket.consume(2, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1) == 0
+    # Más grande que la capacidad: entra con el bucket lleno y deja deuda
+    bucket.consume(5, now + 3)
+    assert bucket.wait_time(1, now + 3) == pytest.approx(4.0)
+
+
+def test_requests_per_minute_queues_then_admits(monkeypatch):
+    limiter = _limiter(model={"requests_per_minute": 600, "burst_seconds": 0.1})
+    start = time.monotonic()
+    for _ in range(3):
+        with limiter.acquire("m"):
+            pass
+    # Capacidad 1 a 10/s: la 2ª y 3ª esperan ~0.1s cada una
+    assert time.monotonic() - start >= 0.15
+    stats = limiter.stats()["models"]["m"]
+    assert stats["admitted"] == 3 and stats["max_wait"] > 0
+    assert stats["queue_depth"] == 0 and stats["max_queue_depth"] == 1
+
+
+def test_rejects_when_wait_exceeds_max_queue_wait():
+    limiter = _limiter(
+        model={"tokens_per_minute": 60, "burst_seconds": 10, "max_queue_wait": 0.5}
+    )
+    with limiter.acquire("m", tokens=10):
+        pass
+    with pytest.raises(BlackboxRateLimitError) as exc_info:
+        with limiter.acquire("m", tokens=10):
+            pass
+    err = exc_info.value
+    assert err.status_code == 429 and err.retry_after == pytest.approx(10, abs=0.5)
+    assert limiter.stats()["models"]["m"]["rejected"] == 1
+
+
+def test_key_scope_is_shared_across_models():
+    limiter = _limiter(
+        key={"requests_per_minute": 60, "burst_seconds": 2, "max_queue_wait": 0}
+    )
+    with limiter.acquire("a"):
+        pass
+    with limiter.acquire("b"):
+        pass
+    with pytest.raises(BlackboxRateLimitError):
+        with limiter.acquire("c"):
+            pass
+    assert limiter.stats()["key"]["admitted"] == 2
+
+
+def test_concurrency_gate_is_fifo_and_bounded():
+    limiter = _limiter(model={"max_concurrency": 2})
+    active, peak, order = [0], [0], []
+    lock = threading.Lock()
+
+    def work(i):
+        with limiter.acquire("m"):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+                order.append(i)
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+        time.sleep(0.002)
+    for t in threads:
+        t.join()
+    assert peak[0] == 2 and sorted(order) == list(range(8))
+    assert limiter.stats()["models"]["m"]["in_flight"] == 0
+
+
+def test_concurrency_timeout_releases_queue_slot():
+    gate = ConcurrencyGate(1)
+    assert gate.acquire(0)
+    assert not gate.acquire(0.01)
+    assert gate.waiting == 0
+    gate.release()
+    assert gate.acquire(0)
+
+
+def test_async_concurrency_and_cancellation():
+    limiter = _limiter(model={"max_concurrency": 1, "max_queue_wait": 5})
+
+    async def hold(delay):
+        async with limiter.aacquire("m"):
+            await asyncio.sleep(delay)
+
+    async def run():
+        first = asyncio.ensure_future(hold(0.05))
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(hold(0))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.gather(first, hold(0), return_exceptions=True)
+        # La plaza del cancelado no se pierde
+        await asyncio.wait_for(hold(0), 1)
+
+    asyncio.run(run())
+    assert limiter.stats()["models"]["m"]["in_flight"] == 0
+
+
+def test_client_limits_async_upstream_concurrency():
+    active, peak = [0], [0]
+
+    async def handler(request):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        active[0] -= 1
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    pool = ConnectionPool(PoolConfig(), async_transport=httpx.MockTransport(handler))
+    cfg = {"model": "m", "rate_limit": {"max_concurrency": 3}}
+    client = BlackboxClient("k", cfg, pool=pool)
+
+    async def run():
+        return await asyncio.gather(
+            *(client.agenerate_response("p") for _ in range(12))
+        )
+
+    assert asyncio.run(run()) == ["ok"] * 12
+    assert peak[0] == 3
+    assert client.limiter.stats()["models"]["m"]["admitted"] == 12
+
+
+def test_client_uses_settings_rate_limit_for_api_key(monkeypatch):
+    monkeypatch.setattr(
+        "blackbox_hybrid_tool.core.ai_client.default_requests_per_minute", lambda: 42.0
+    )
+    client = BlackboxClient("k", {"model": "m"})
+    assert client.limiter.stats()["key"]["config"]["requests_per_minute"] == 42.0
+    cfg = {"model": "m", "rate_limit": {"per_key": {"requests_per_minute": 7}}}
+    client = BlackboxClient("k", cfg)
+    assert client.limiter.stats()["key"]["config"]["requests_per_minute"] == 7
+
+
+def test_local_rejection_maps_to_429(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    class Limited:
+        models_config = {"models": {}}
+
+        async def agenerate_response(self, prompt, model_type=None, **kw):
+            raise BlackboxRateLimitError("lleno", retry_after=2.3, model="m")
+
+    monkeypatch.setattr(main, "orchestrator", Limited())
+    r = TestClient(main.app).post("/chat", json={"prompt": "p"})
+    assert r.status_code == 429 and r.headers["Retry-After"] == "3"
@@ -0,0 +1,166 @@
+"""
+Tests para el middleware de limitación de tasa entrante
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.utils.rate_limit_middleware import (
+    InboundLimitConfig,
+    InboundRateLimiter,
+    InboundRateLimitMiddleware,
+    MemoryBackend,
+    RedisBackend,
+)
+
+
+class FakeRedis:
+    """Subconjunto asíncrono de redis.asyncio.Redis usado por el backend"""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    async def decr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) - 1
+        return self.data[key]
+
+    async def get(self, key):
+        value = self.data.get(key)
+        return None if value is None else str(value).encode()
+
+    async def expire(self, key, seconds):
+        self.expiry[key] = seconds
+        return True
+
+
+class BrokenRedis(FakeRedis):
+    async def incr(self, key):
+        raise ConnectionError("redis caído")
+
+
+def _app(limiter):
+    app = FastAPI()
+    app.add_middleware(InboundRateLimitMiddleware, limiter=limiter)
+
+    @app.post("/chat")
+    async def chat():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    @app.get("/chat/slow")
+    async def slow():
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    return app
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryBackend()
+    return RedisBackend(FakeRedis())
+
+
+def test_rejects_over_limit_with_retry_after(backend):
+    limiter = InboundRateLimiter(InboundLimitConfig(requests_per_window=3), backend)
+    client = TestClient(_app(limiter))
+    codes = [client.post("/chat").status_code for _ in range(5)]
+    assert codes == [200, 200, 200, 429, 429]
+    r = client.post("/chat")
+    assert 1 <= int(r.headers["Retry-After"]) <= 60
+    assert r.json()["detail"] == "Rate limit exceeded"
+    # Rutas no limitadas no cuentan ni se bloquean
+    assert client.get("/health").status_code == 200
+    stats = limiter.stats()
+    assert stats["allowed"] == 3 and stats["rejected_rate"] == 3
+    assert stats["backend"] == backend.name
+
+
+def test_ip_is_always_charged_and_token_only_narrows():
+    limiter = InboundRateLimiter(InboundLimitConfig(requests_per_window=2))
+    client = TestClient(_app(limiter))
+    auth = {"Authorization": "Bearer user-a"}
+    assert client.post("/chat", headers=auth).status_code == 200
+    r = client.post("/chat", headers={"X-API-Key": "user-b"})
+    assert r.status_code == 200 and r.headers["X-RateLimit-Remaining"] == "0"
+    # Un token inventado por solicitud no abre un cubo nuevo
+    assert client.post("/chat", headers={"X-API-Key": "random"}).status_code == 429
+    assert client.post("/chat").status_code == 429
+
+    # Otra IP tiene su propio cubo, pero el token también limita allí
+    other = TestClient(_app(limiter), client=("10.0.0.2", 1))
+    assert other.post("/chat", headers=auth).status_code == 200
+    assert other.post("/chat", headers=auth).status_code == 429
+
+
+def test_concurrency_limit():
+    limiter = InboundRateLimiter(
+        InboundLimitConfig(requests_per_window=100, max_concurrency=2)
+    )
+    app = _app(limiter)
+
+    async def run():
+        import httpx
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await asyncio.gather(*(client.get("/chat/slow") for _ in range(5)))
+
+    codes = sorted(r.status_code for r in asyncio.run(run()))
+    assert codes == [200, 200, 429, 429, 429]
+    assert limiter.stats()["rejected_concurrency"] == 3
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_backend_failure_fails_open():
+    limiter = InboundRateLimiter(
+        InboundLimitConfig(requests_per_window=1), RedisBackend(BrokenRedis())
+    )
+    client = TestClient(_app(limiter))
+    assert [client.post("/chat").status_code for _ in range(3)] == [200] * 3
+    assert limiter.stats()["backend_errors"] == 3
+
+
+def test_redis_backend_sets_expiry_and_releases_slots():
+    fake = FakeRedis()
+    limiter = InboundRateLimiter(InboundLimitConfig(), RedisBackend(fake))
+    client = TestClient(_app(limiter))
+    assert client.post("/chat").status_code == 200
+    conc = [k for k in fake.data if ":conc:" in k]
+    assert conc and fake.data[conc[0]] == 0
+    assert all(fake.expiry[k] for k in fake.data)
+
+
+def test_main_app_exposes_inbound_counters():
+    import main
+
+    body = TestClient(main.app).get("/admin/inbound-limits").json()
+    assert {"allowed", "rejected_rate", "rejected_concurrency"} <= set(body)
+
+
+def test_main_app_rejections_carry_cors_headers(monkeypatch):
+    import main
+
+    config = InboundLimitConfig(requests_per_window=1)
+    monkeypatch.setattr(main.inbound_limiter, "config", config)
+    client = TestClient(main.app)
+    origin = {"Origin": "http://ui.example"}
+    client.get("/files", params={"path": "nope"}, headers=origin)
+    r = client.get("/files", params={"path": "nope"}, headers=origin)
+    assert r.status_code == 429
+    assert r.headers["access-control-allow-origin"]
+    assert "retry-after" in r.headers["access-control-expose-headers"].lower()
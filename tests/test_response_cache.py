@@ -0,0 +1,178 @@
+"""
+Tests para la caché de respuestas del orquestador
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.core.response_cache import (
+    CacheConfig,
+    ResponseCache,
+    cache_key,
+)
+
+
+def _payload(**kw):
+    data = {
+        "model": "m",
+        "messages": [{"role": "user", "content": "hola"}],
+        "max_tokens": 100,
+        "temperature": 0.0,
+    }
+    data.update(kw)
+    return data
+
+
+def test_cache_key_is_canonical():
+    a = _payload()
+    b = dict(reversed(list(_payload().items())))
+    assert cache_key(a) == cache_key(b)
+    assert cache_key(a) != cache_key(_payload(max_tokens=101))
+    assert cache_key(a) != cache_key(_payload(tools=[{"type": "function"}]))
+    # Campos que no afectan a la respuesta no cambian la clave
+    assert cache_key(a) == cache_key(_payload(stream=False))
+
+
+def test_should_cache_opt_in_and_temperature_threshold():
+    cache = ResponseCache(CacheConfig(max_temperature=0.3))
+    assert not cache.should_cache(_payload(), None)
+    assert cache.should_cache(_payload(temperature=0.3), True)
+    assert not cache.should_cache(_payload(temperature=0.7), True)
+    assert cache.stats()["bypassed"] == 1
+    assert ResponseCache(CacheConfig(default=True)).should_cache(_payload(), None)
+    assert not ResponseCache(CacheConfig(enabled=False)).should_cache(_payload(), True)
+
+
+def test_memory_tier_lru_and_byte_bound():
+    value = "x" * 100
+    size = len(json.dumps(value))
+    cache = ResponseCache(CacheConfig(max_entries=10, max_bytes=size * 2))
+    cache.set("a", value)
+    cache.set("b", value)
+    assert cache.get("a") == value  # "a" pasa a ser el más reciente
+    cache.set("c", value)
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["memory"]["bytes"] == size * 2
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(
+        "blackbox_hybrid_tool.core.response_cache.time.time", lambda: now[0]
+    )
+    cache = ResponseCache(CacheConfig(ttl=10))
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    now[0] += 11
+    assert cache.get("k") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_disk_hit_keeps_disk_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(
+        "blackbox_hybrid_tool.core.response_cache.time.time", lambda: now[0]
+    )
+    path = str(tmp_path / "responses.sqlite")
+    first = ResponseCache(CacheConfig(ttl=10, disk_path=path))
+    first.set("k", "v")
+    first.close()
+
+    now[0] += 8
+    second = ResponseCache(CacheConfig(ttl=10, disk_path=path))
+    assert second.get("k") == "v"  # promovida a memoria
+    now[0] += 3
+    # Caduca a los 10 s de guardarse, no 10 s después de la promoción
+    assert second.get("k") is None
+    second.close()
+
+
+def test_disk_tier_persists_and_evicts(tmp_path):
+    path = str(tmp_path / "cache" / "responses.sqlite")
+    first = ResponseCache(CacheConfig(disk_path=path))
+    first.set("k", {"content": "hola"})
+    first.close()
+
+    second = ResponseCache(CacheConfig(disk_path=path))
+    assert second.get("k") == {"content": "hola"}
+    assert second.stats()["disk_hits"] == 1
+    assert second.get("k") == {"content": "hola"}
+    assert second.stats()["memory_hits"] == 1
+    second.close()
+
+    small = ResponseCache(CacheConfig(disk_path=path, disk_max_bytes=30))
+    small.set("a", "x" * 20)
+    small.set("b", "y" * 20)
+    disk = small.stats()["disk"]
+    assert disk["bytes"] <= 30
+    assert small.stats()["evictions"] >= 1
+    small.close()
+
+
+@pytest.fixture()
+def orchestrator(tmp_path):
+    cfg_path = tmp_path / "models.json"
+    cfg_path.write_text(
+        json.dumps(
+            {
+                "default_model": "auto",
+                "models": {"blackbox": {"api_key": "k", "model": "m", "enabled": True}},
+            }
+        ),
+        encoding="utf-8",
+    )
+    o = AIOrchestrator(config_file=str(cfg_path))
+    yield o
+    o.close()
+
+
+def _count_calls(monkeypatch, client):
+    calls = []
+
+    def fake(prompt, **kw):
+        calls.append(kw)
+        return f"r{len(calls)}"
+
+    async def afake(prompt, **kw):
+        return fake(prompt, **kw)
+
+    monkeypatch.setattr(client, "generate_response", fake)
+    monkeypatch.setattr(client, "agenerate_response", afake)
+    return calls
+
+
+def test_orchestrator_caches_only_when_requested(orchestrator, monkeypatch):
+    calls = _count_calls(monkeypatch, orchestrator.get_client())
+    assert orchestrator.generate_response("p", temperature=0.2, cache=True) == "r1"
+    assert orchestrator.generate_response("p", temperature=0.2, cache=True) == "r1"
+    assert orchestrator.generate_response("p", temperature=0.2) == "r2"
+    # Temperatura alta: siempre va al modelo
+    orchestrator.generate_response("p", temperature=0.9, cache=True)
+    orchestrator.generate_response("p", temperature=0.9, cache=True)
+    assert len(calls) == 4
+    assert all("cache" not in kw for kw in calls)
+    stats = orchestrator.cache_stats()
+    assert stats["hits"] == 1 and stats["bypassed"] == 2
+
+
+def test_orchestrator_async_path_shares_cache(orchestrator, monkeypatch):
+    calls = _count_calls(monkeypatch, orchestrator.get_client())
+    orchestrator.generate_response("p", temperature=0.0, cache=True)
+    out = asyncio.run(orchestrator.agenerate_response("p", temperature=0.0, cache=True))
+    assert out == "r1" and len(calls) == 1
+
+
+def test_admin_cache_endpoint(monkeypatch, orchestrator):
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "orchestrator", orchestrator)
+    client = TestClient(main.app)
+    body = client.get("/admin/cache").json()
+    assert body["hits"] == 0 and body["memory"]["entries"] == 0
+    assert client.delete("/admin/cache").json() == {"status": "cleared"}
@@ -0,0 +1,185 @@
+"""
+Tests para la política de reintentos del cliente Blackbox
+"""
+
+import asyncio
+import json
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+import requests
+
+from blackbox_hybrid_tool.core.ai_client import BlackboxClient
+from blackbox_hybrid_tool.core.http_pool import ConnectionPool, PoolConfig
+from blackbox_hybrid_tool.core.retry import RetryBudget, RetryPolicy, parse_retry_after
+from blackbox_hybrid_tool.exceptions import BlackboxAPIError, BlackboxTimeoutError
+
+
+def _resp(status, body=None, headers=None):
+    r = requests.Response()
+    r.status_code = status
+    r.url = "https://api.blackbox.ai/chat/completions"
+    r._content = json.dumps(body or {}).encode()
+    r.headers.update(headers or {})
+    return r
+
+
+def _ok(text="ok"):
+    return _resp(200, {"choices": [{"message": {"content": text}}]})
+
+
+@pytest.fixture()
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "blackbox_hybrid_tool.core.ai_client.time.sleep", lambda d: calls.append(d)
+    )
+    return calls
+
+
+def _scripted(monkeypatch, outcomes):
+    """Parchea Session.post para devolver/lanzar ``outcomes`` en orden"""
+    seen = []
+
+    def fake_post(self, url, **kw):
+        seen.append(kw)
+        item = outcomes.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    monkeypatch.setattr("requests.Session.post", fake_post)
+    return seen
+
+
+def test_policy_from_dict_and_backoff_bounds():
+    p = RetryPolicy.from_dict(
+        {"backoff_base": 1, "backoff_max": 3, "jitter": False, "retry_statuses": [429]}
+    )
+    assert p.retry_statuses == (429,)
+    assert [p.backoff(n) for n in (1, 2, 3, 4)] == [1, 2, 3, 3]
+    assert p.backoff(1, retry_after=10) == 10
+    assert p.backoff(1, retry_after=999) == p.max_retry_after
+    jittered = RetryPolicy(backoff_base=1, backoff_max=4)
+    assert all(0 <= jittered.backoff(3) <= 4 for _ in range(50))
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    future = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 <= parse_retry_after(format_datetime(future, usegmt=True)) <= 30
+
+
+def test_budget_caps_retries():
+    budget = RetryBudget(ratio=0.0, min_retries=2, window=60)
+    assert budget.try_acquire() and budget.try_acquire()
+    assert not budget.try_acquire()
+
+
+def test_retries_transient_status_then_succeeds(monkeypatch, sleeps):
+    seen = _scripted(
+        monkeypatch, [_resp(503), _resp(429, headers={"Retry-After": "2"}), _ok()]
+    )
+    client = BlackboxClient("k", {"model": "m"})
+    assert client.generate_response("p") == "ok"
+    assert len(seen) == 3 and seen[0]["timeout"] == (5.0, 120.0)
+    assert sleeps[1] >= 2
+    stats = client.retry_stats.snapshot()
+    assert stats["attempts"] == 3 and stats["retries"] == 2
+    assert stats["by_status"] == {"503": 1, "429": 1, "200": 1}
+
+
+def test_non_retryable_status_raises_typed_error(monkeypatch, sleeps):
+    seen = _scripted(monkeypatch, [_resp(400, {"error": "bad"})])
+    client = BlackboxClient("k", {"model": "m"})
+    with pytest.raises(BlackboxAPIError) as exc_info:
+        client.generate_response("p")
+    err = exc_info.value
+    assert err.status_code == 400 and "bad" in err.detail and len(err.attempts) == 1
+    assert len(seen) == 1 and sleeps == []
+
+
+def test_gives_up_after_max_attempts(monkeypatch, sleeps):
+    _scripted(monkeypatch, [_resp(502), _resp(502)])
+    client = BlackboxClient("k", {"model": "m", "retry": {"max_attempts": 2}})
+    with pytest.raises(BlackboxAPIError) as exc_info:
+        client.generate_response("p")
+    assert [a.status for a in exc_info.value.attempts] == [502, 502]
+    assert client.retry_stats.snapshot()["failures"] == 1
+
+
+def test_read_timeout_only_retried_when_enabled(monkeypatch, sleeps):
+    _scripted(monkeypatch, [requests.ReadTimeout("slow")])
+    client = BlackboxClient("k", {"model": "m"})
+    with pytest.raises(BlackboxTimeoutError):
+        client.generate_response("p")
+
+    _scripted(monkeypatch, [requests.ReadTimeout("slow"), _ok()])
+    cfg = {"model": "m", "retry": {"retry_read_timeouts": True}}
+    assert BlackboxClient("k", cfg).generate_response("p") == "ok"
+
+
+def test_connection_errors_are_retried(monkeypatch, sleeps):
+    _scripted(monkeypatch, [requests.ConnectionError("refused"), _ok()])
+    assert BlackboxClient("k", {"model": "m"}).generate_response("p") == "ok"
+    assert len(sleeps) == 1
+
+
+def test_budget_exhaustion_stops_retries(monkeypatch, sleeps):
+    _scripted(monkeypatch, [_resp(503)])
+    cfg = {"model": "m", "retry": {"budget": {"ratio": 0, "min_retries": 0}}}
+    client = BlackboxClient("k", cfg)
+    with pytest.raises(BlackboxAPIError):
+        client.generate_response("p")
+    assert client.retry_stats.snapshot()["budget_exhausted"] == 1
+
+
+def test_per_model_overrides():
+    cfg = {
+        "model": "m",
+        "retry": {"read_timeout": 60},
+        "model_overrides": {"slow/model": {"retry": {"read_timeout": 300}}},
+    }
+    client = BlackboxClient("k", cfg)
+    assert client.retry_policy("m").read_timeout == 60
+    assert client.retry_policy("slow/model").read_timeout == 300
+    assert client.retry_policy("slow/model").connect_timeout == 5.0
+
+
+def test_async_retry_honours_statuses():
+    outcomes = [
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]}),
+    ]
+    pool = ConnectionPool(
+        PoolConfig(), async_transport=httpx.MockTransport(lambda r: outcomes.pop(0))
+    )
+    client = BlackboxClient(
+        "k", {"model": "m", "retry": {"backoff_base": 0}}, pool=pool
+    )
+    assert asyncio.run(client.agenerate_response("p")) == "ok"
+    assert client.retry_stats.snapshot()["retries"] == 1
+
+
+def test_chat_endpoint_maps_upstream_errors(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    class Failing:
+        models_config = {"models": {}}
+
+        def __init__(self, error):
+            self.error = error
+
+        async def agenerate_response(self, prompt, model_type=None, **kw):
+            raise self.error
+
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "orchestrator", Failing(BlackboxAPIError("x", 503)))
+    assert client.post("/chat", json={"prompt": "p"}).status_code == 502
+    monkeypatch.setattr(main, "orchestrator", Failing(BlackboxTimeoutError("t")))
+    assert client.post("/chat", json={"prompt": "p"}).status_code == 504
@@ -0,0 +1,159 @@
+"""
+Tests para el router de modelos por latencia y coste
+"""
+
+import json
+
+import pytest
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.core.router import (
+    ModelProfile,
+    ModelRouter,
+    RouterConfig,
+    parse_context,
+    parse_cost,
+)
+
+PROFILES = [
+    ModelProfile("big-o1", context=128_000, input_cost=15.0, output_cost=60.0),
+    ModelProfile("mid-gpt-4o", context=128_000, input_cost=2.5, output_cost=10.0),
+    ModelProfile("small-mini", context=16_000, input_cost=0.15, output_cost=0.6),
+]
+MODELS = [p.model for p in PROFILES]
+
+
+def _router(**cfg):
+    return ModelRouter(RouterConfig(min_samples=2, **cfg), PROFILES)
+
+
+def _feed(router, model, latency, n=3, ok=True):
+    for _ in range(n):
+        router.record(model, latency, ok, tokens=100)
+
+
+def test_parsers():
+    assert parse_cost("$5.00") == 5.0 and parse_cost("0,15") == 0.15
+    assert parse_cost("") is None and parse_cost("n/a") is None
+    assert parse_context("128k") == 128_000 and parse_context("1M") == 1_000_000
+    assert parse_context("200000") == 200_000 and parse_context(None) is None
+
+
+def test_quality_policy_uses_heuristic_and_budget():
+    router = _router()
+    assert router.choose(MODELS).model == "big-o1"
+    # 1000 tokens de entrada + 512 de salida: big-o1 ~0.046 USD
+    capped = _router(max_cost=0.01)
+    decision = capped.choose(MODELS, input_tokens=1000)
+    assert decision.model == "mid-gpt-4o"
+    assert decision.policy == "quality"
+
+
+def test_cheapest_respects_sla():
+    router = _router(policy="cheapest", sla_p95=2.0)
+    assert router.choose(MODELS).model == "small-mini"
+    _feed(router, "small-mini", 5.0)
+    _feed(router, "mid-gpt-4o", 1.0)
+    decision = router.choose(MODELS)
+    assert decision.model == "mid-gpt-4o"
+    row = next(c for c in decision.candidates if c["model"] == "small-mini")
+    assert row["p95"] == 5.0
+
+
+def test_fastest_prefers_measured_latency():
+    router = _router()
+    # Sin datos: prior heurístico de la estrategia
+    assert router.choose(MODELS, strategy="fast").model == "small-mini"
+    _feed(router, "small-mini", 3.0)
+    _feed(router, "big-o1", 0.5)
+    assert router.choose(MODELS, strategy="fast").model == "big-o1"
+
+
+def test_excludes_unhealthy_and_small_context():
+    router = ModelRouter(
+        RouterConfig(min_samples=2), PROFILES, is_available=lambda m: m != "big-o1"
+    )
+    _feed(router, "mid-gpt-4o", 1.0, ok=False)
+    decision = router.choose(MODELS, input_tokens=20_000)
+    # big-o1 no disponible, mid con errores y mini sin contexto suficiente
+    assert {c["model"]: c["excluded"] for c in decision.candidates} == {
+        "big-o1": "no disponible",
+        "mid-gpt-4o": "tasa de error",
+        "small-mini": "contexto insuficiente",
+    }
+    assert decision.model == "big-o1" and "sin candidatos" in decision.reason
+
+
+def test_decisions_are_logged(tmp_path):
+    log_path = tmp_path / "router.jsonl"
+    router = _router(log_path=str(log_path), decision_log_size=2)
+    for strategy in ("auto", "fast", "code"):
+        router.choose(MODELS, strategy=strategy)
+    router.flush()
+    lines = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [d["strategy"] for d in lines] == ["auto", "fast", "code"]
+    assert [d["strategy"] for d in router.decisions()] == ["code", "fast"]
+    stats = router.stats()
+    assert stats["models"]["big-o1"]["input_cost"] == 15.0
+    router.choose(MODELS, strategy="auto")
+    router.close()
+    assert len(log_path.read_text().splitlines()) == 4
+
+
+@pytest.fixture()
+def orchestrator(tmp_path):
+    cfg_path = tmp_path / "models.json"
+    cfg_path.write_text(
+        json.dumps(
+            {
+                "default_model": "auto",
+                "models": {
+                    "blackbox": {
+                        "api_key": "k",
+                        "model": "big-o1",
+                        "enabled": True,
+                        "router": {"min_samples": 2, "policy": "cheapest"},
+                        "fallback": {"enabled": False},
+                    }
+                },
+                "available_models": [
+                    {"model": "big-o1", "input_cost": "15", "output_cost": "60"},
+                    {"model": "small-mini", "input_cost": "0.15"},
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+    o = AIOrchestrator(config_file=str(cfg_path))
+    yield o
+    o.close()
+
+
+def test_orchestrator_routes_per_request_and_records(orchestrator, monkeypatch):
+    # La política por defecto también decide el modelo inicial
+    assert orchestrator.models_config["models"]["blackbox"]["model"] == "small-mini"
+    calls = []
+
+    def fake(prompt, **kw):
+        calls.append(kw.get("model"))
+        return "respuesta"
+
+    monkeypatch.setattr(orchestrator.get_client(), "generate_response", fake)
+    orchestrator.generate_response("hola")
+    orchestrator.generate_response("hola", model_type="fast")
+    orchestrator.generate_response("hola", model="big-o1")
+    orchestrator.generate_response("hola", model_type="blackboxai/x/y")
+    assert calls == ["small-mini", "small-mini", "big-o1", "blackboxai/x/y"]
+    stats = orchestrator.router_stats()
+    assert stats["models"]["small-mini"]["samples"] == 2
+    assert [d["strategy"] for d in stats["decisions"][:2]] == ["fast", "auto"]
+
+
+def test_admin_router_endpoint(monkeypatch, orchestrator):
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "orchestrator", orchestrator)
+    body = TestClient(main.app).get("/admin/router").json()
+    assert body["config"]["policy"] == "cheapest"
+    assert set(body["models"]) == {"big-o1", "small-mini"}
@@ -0,0 +1,143 @@
+"""
+Tests para el log de sesiones del REPL (JSONL de solo anexado)
+"""
+
+import importlib
+import json
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from blackbox_hybrid_tool.utils.session_log import SessionLog, read_session
+
+
+def _msg(i):
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"}
+
+
+def test_append_is_constant_cost_and_survives_torn_line(tmp_path):
+    path = tmp_path / "s.jsonl"
+    log, state = SessionLog.open(path)
+    assert state.messages == [] and state.model is None
+    log.set_model("a/b")
+    sizes = []
+    for i in range(50):
+        log.append(_msg(i))
+        log.commit()
+        sizes.append(path.stat().st_size)
+    # Cada turno añade una línea: el archivo no se reescribe
+    growth = {b - a for a, b in zip(sizes, sizes[1:])}
+    assert max(growth) < 60 and log.records == 51
+    log.close()
+
+    # Corte a mitad de escritura: la última línea incompleta se ignora
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write('{"op":"msg","role":"user","cont')
+    state = read_session(path)
+    assert [m["content"] for m in state.messages] == [f"m{i}" for i in range(50)]
+    assert state.model == "a/b"
+    assert read_session(path, tail=3).messages == [_msg(47), _msg(48), _msg(49)]
+
+    with pytest.raises(ValueError):
+        SessionLog(path, fsync="a veces")
+
+
+def test_tail_resume_reset_and_compaction(tmp_path):
+    path = tmp_path / "s.jsonl"
+    log, _ = SessionLog.open(path, compact_min=10)
+    log.set_model("viejo")
+    for i in range(8):
+        log.append(_msg(i))
+    log.reset()
+    log.set_model("nuevo")
+    for i in range(8, 12):
+        log.append(_msg(i))
+    log.close()
+
+    state = read_session(path, tail=2)
+    assert state.messages == [_msg(10), _msg(11)]
+    assert state.truncated and state.model == "nuevo"
+    # La cola no cruza un /reset, pero el modelo anterior sigue visible
+    short = read_session(path, tail=10)
+    assert short.messages == [_msg(i) for i in range(8, 12)] and not short.truncated
+
+    log, state = SessionLog.open(path, tail=2, compact_min=10)
+    assert log.records == 15 and state.truncated
+    log.append(_msg(12))
+    assert log.needs_compaction() is False  # con la cola no hay muertos conocidos
+    log.compact()
+    # La compactación parte del archivo: no pierde lo que no se cargó
+    assert log.records == 6 and log.live == 5
+    full = read_session(path)
+    assert full.messages == [_msg(i) for i in range(8, 13)]
+    assert full.model == "nuevo"
+    assert not list(tmp_path.glob("*.tmp"))
+
+    log.reset()
+    for i in range(10):
+        log.append(_msg(i))
+        log.reset()
+    assert log.maybe_compact() and log.compactions == 2
+    assert log.records == 1 and read_session(path).messages == []
+    log.close()
+
+
+def test_legacy_json_session_is_migrated(tmp_path):
+    legacy = tmp_path / "s.json"
+    legacy.write_text(
+        json.dumps({"model": "m/x", "messages": [_msg(0), _msg(1)]}), encoding="utf-8"
+    )
+    log, state = SessionLog.open(tmp_path / "s.jsonl", fsync="never")
+    assert state.messages == [_msg(0), _msg(1)] and state.model == "m/x"
+    assert not legacy.exists() and (tmp_path / "s.json.migrated").exists()
+    log.close()
+
+
+def test_repl_appends_turns_to_jsonl_session(tmp_path, monkeypatch):
+    cli_module = importlib.import_module("blackbox_hybrid_tool.cli.main")
+    monkeypatch.setattr(cli_module.Path, "home", lambda: tmp_path)
+
+    def run(inputs, **extra):
+        cli = cli_module.CLI()
+        cli.ai_orchestrator = Mock()
+        cli.ai_orchestrator.models_config = {"models": {"blackbox": {"model": "m"}}}
+        cli.ai_orchestrator.fit_context = lambda history, model=None: (
+            SimpleNamespace(messages=list(history), dropped=0, tokens=1, budget=1)
+        )
+        cli.ai_orchestrator.generate_response = Mock(return_value="ok")
+        feed = iter(inputs)
+        monkeypatch.setattr("builtins.input", lambda *_: next(feed))
+        args = SimpleNamespace(
+            debug=False,
+            model=None,
+            session="demo",
+            transcript=str(tmp_path / "t.txt"),
+            no_stream=True,
+            **extra,
+        )
+        assert cli.run_repl(args) == 0
+        return cli.ai_orchestrator.generate_response.call_args
+
+    run(["hola", "/model otro/modelo", "adiós", "/exit"])
+    path = tmp_path / ".blackbox_hybrid_tool" / "sessions" / "demo.jsonl"
+    state = read_session(path)
+    # El prompt system de herramientas no se guarda: se regenera al cargar
+    assert [m["content"] for m in state.messages] == ["hola", "ok", "adiós", "ok"]
+    assert state.model == "otro/modelo"
+    assert (tmp_path / "t.txt").read_text(encoding="utf-8").count("You: ") == 2
+
+    call = run(["sigo", "/exit"], resume_tail=2, fsync="always")
+    sent = call.kwargs["messages"]
+    assert sent[0]["role"] == "system"
+    assert [m["content"] for m in sent[1:]] == ["adiós", "ok", "sigo"]
+    assert call.kwargs["model_type"] == "otro/modelo"
+    assert len(read_session(path).messages) == 6
+
+    # Un TOOL_RESULT (también "system") al inicio no sustituye al prompt
+    log, _ = SessionLog.open(path, fsync="never")
+    log.append({"role": "system", "content": "TOOL_RESULT web-fetch: {}"})
+    log.close()
+    sent = run(["más", "/exit"], resume_tail=1).kwargs["messages"]
+    assert sent[0]["content"].startswith("Tienes acceso a herramientas.")
+    assert sent[1]["content"].startswith("TOOL_RESULT")
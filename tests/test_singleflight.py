@@ -0,0 +1,152 @@
+"""
+Tests para la coalescencia de solicitudes en vuelo
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.core.http_pool import ConnectionPool, PoolConfig
+from blackbox_hybrid_tool.core.singleflight import SingleFlight
+from blackbox_hybrid_tool.exceptions import BlackboxAPIError
+
+
+def test_sync_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(2)
+        return {"content": "ok"}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("k", work)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    # Dar tiempo a que todos los hilos se unan a la llamada en curso
+    deadline = time.time() + 2
+    while flight.stats()["coalesced"] < 7 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"content": "ok"}] * 8
+    stats = flight.stats()
+    assert stats["upstream_calls"] == 1 and stats["in_flight"] == 0
+
+
+def test_sync_error_is_shared_and_key_released():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert flight.do("k", lambda: "again") == "again"
+    assert flight.stats()["failed"] == 1
+
+
+def test_async_callers_share_result_and_error():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise BlackboxAPIError("upstream", 503)
+
+    async def run():
+        ok = await asyncio.gather(*(flight.ado("a", work) for _ in range(20)))
+        errors = await asyncio.gather(
+            *(flight.ado("b", failing) for _ in range(5)), return_exceptions=True
+        )
+        return ok, errors
+
+    ok, errors = asyncio.run(run())
+    assert ok == ["ok"] * 20 and len(calls) == 1
+    assert all(isinstance(e, BlackboxAPIError) for e in errors)
+    stats = flight.stats()
+    assert stats["upstream_calls"] == 2 and stats["coalesced"] == 23
+    assert stats["failed"] == 1 and stats["in_flight"] == 0
+
+
+def test_async_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        first = asyncio.ensure_future(flight.ado("k", work))
+        second = asyncio.ensure_future(flight.ado("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_async_shared_call_cancelled_with_last_waiter():
+    flight = SingleFlight()
+    started = []
+
+    async def work():
+        started.append(1)
+        await asyncio.sleep(10)
+
+    async def run():
+        waiters = [asyncio.ensure_future(flight.ado("k", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flight.stats()
+
+    stats = asyncio.run(asyncio.wait_for(run(), 1))
+    assert started == [1] and stats["in_flight"] == 0
+
+
+def test_orchestrator_coalesces_identical_async_requests(tmp_path):
+    cfg_path = tmp_path / "models.json"
+    cfg_path.write_text(
+        json.dumps(
+            {
+                "default_model": "auto",
+                "models": {"blackbox": {"api_key": "k", "model": "m", "enabled": True}},
+            }
+        ),
+        encoding="utf-8",
+    )
+    hits = []
+
+    async def handler(request):
+        hits.append(json.loads(request.content)["messages"][0]["content"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "r"}}]})
+
+    o = AIOrchestrator(config_file=str(cfg_path))
+    o.pool = ConnectionPool(PoolConfig(), async_transport=httpx.MockTransport(handler))
+
+    async def run():
+        same = [o.agenerate_response("hola") for _ in range(10)]
+        other = [o.agenerate_response("adiós")]
+        return await asyncio.gather(*same, *other)
+
+    assert asyncio.run(run()) == ["r"] * 11
+    assert sorted(hits) == ["adiós", "hola"]
+    assert o.coalesce_stats()["coalesced"] == 9
+    o.close()
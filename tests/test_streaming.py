@@ -0,0 +1,189 @@
+"""
+Tests para el streaming SSE (cliente, servidor y REPL)
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import httpx
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator, BlackboxClient
+from blackbox_hybrid_tool.core.context import ContextManager
+from blackbox_hybrid_tool.core.http_pool import ConnectionPool, PoolConfig
+from blackbox_hybrid_tool.core.streaming import (
+    DONE,
+    format_sse,
+    iter_sse_deltas,
+    parse_sse_line,
+)
+
+
+def _chunk(text):
+    return "data: " + json.dumps({"choices": [{"delta": {"content": text}}]})
+
+
+SSE_LINES = [
+    ": keep-alive",
+    _chunk("Ho"),
+    "",
+    _chunk("la"),
+    "data: [DONE]",
+    _chunk("x"),
+]
+
+
+def test_parse_sse_line_variants():
+    assert parse_sse_line(b"data: [DONE]") == DONE
+    assert parse_sse_line("event: ping") is None
+    assert parse_sse_line("data: no-json") is None
+    assert parse_sse_line(_chunk("a"))["choices"][0]["delta"]["content"] == "a"
+
+
+def test_iter_sse_deltas_stops_at_done():
+    assert list(iter_sse_deltas(SSE_LINES)) == ["Ho", "la"]
+
+
+def test_format_sse():
+    assert format_sse({"delta": "á"}) == 'data: {"delta": "á"}\n\n'
+    assert format_sse(DONE) == "data: [DONE]\n\n"
+
+
+def test_stream_response_sync(monkeypatch):
+    sent = {}
+
+    class R:
+        headers = {"content-type": "text/event-stream"}
+        closed = False
+
+        def raise_for_status(self):
+            return None
+
+        def iter_lines(self):
+            return iter(SSE_LINES)
+
+        def close(self):
+            R.closed = True
+
+    def fake_post(self, url, **kw):
+        sent.update(kw)
+        return R()
+
+    monkeypatch.setattr("requests.Session.post", fake_post)
+    client = BlackboxClient("sk", {"model": "m"})
+    assert list(client.stream_response("p")) == ["Ho", "la"]
+    assert sent["json"]["stream"] is True and sent["stream"] is True
+    assert R.closed
+
+
+def test_astream_response_and_json_fallback():
+    def sse_handler(request):
+        assert json.loads(request.content)["stream"] is True
+        body = "\n".join(SSE_LINES) + "\n"
+        return httpx.Response(
+            200, text=body, headers={"content-type": "text/event-stream"}
+        )
+
+    def json_handler(request):
+        return httpx.Response(200, json={"choices": [{"message": {"content": "t"}}]})
+
+    async def collect(handler):
+        pool = ConnectionPool(
+            PoolConfig(), async_transport=httpx.MockTransport(handler)
+        )
+        client = BlackboxClient("sk", {"model": "m"}, pool=pool)
+        return [t async for t in client.astream_response("p")]
+
+    assert asyncio.run(collect(sse_handler)) == ["Ho", "la"]
+    assert asyncio.run(collect(json_handler)) == ["t"]
+
+
+def test_orchestrator_stream_reports_model(tmp_path, monkeypatch):
+    cfg_path = tmp_path / "models.json"
+    cfg_path.write_text(
+        json.dumps(
+            {"models": {"blackbox": {"api_key": "k", "model": "m", "enabled": True}}}
+        ),
+        encoding="utf-8",
+    )
+    o = AIOrchestrator(config_file=str(cfg_path))
+    monkeypatch.setattr(
+        o.get_client(), "stream_response", lambda prompt, **kw: iter([prompt])
+    )
+    used = []
+    assert list(o.stream_response("p", on_model=used.append)) == ["p"]
+    o.stream_response("p", model_type="x/y", on_model=used.append)
+    assert used == ["m", "x/y"]
+    o.close()
+
+
+class _StreamingOrchestrator:
+    models_config = {"models": {}}
+    context = ContextManager()
+
+    def fit_context(self, messages, model=None, max_tokens=None):
+        return self.context.fit(messages, model=model, max_tokens=max_tokens)
+
+    async def astream_response(self, prompt, model_type=None, on_model=None, **kw):
+        if on_model is not None:
+            on_model("routed/model")
+        for part in ("Ho", "la"):
+            yield part
+
+
+def _events(text):
+    return [
+        line[len("data: ") :] for line in text.splitlines() if line.startswith("data: ")
+    ]
+
+
+def test_chat_stream_endpoint(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "orchestrator", _StreamingOrchestrator())
+    r = TestClient(main.app).post("/chat/stream", json={"prompt": "hola"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _events(r.text)
+    assert [json.loads(e)["delta"] for e in events[:2]] == ["Ho", "la"]
+    assert json.loads(events[-2])["model_used"] == "routed/model"
+    assert events[-1] == DONE
+
+
+def test_cycle_messages_stream_appends_final_message(monkeypatch):
+    import main
+    from multi_agent_workflow.models import Agent, DevelopmentCycle
+    from multi_agent_workflow.state import app_state
+
+    monkeypatch.setattr(main, "orchestrator", _StreamingOrchestrator())
+    agent = Agent(id="blackbox", name="B", role="r", model="x/y")
+    cycle = DevelopmentCycle(id="stream-test", title="t", active_agents=[agent])
+    app_state.add_cycle(cycle)
+    r = TestClient(main.app).post(
+        "/cycles/stream-test/messages?stream=true", json={"prompt": "hola"}
+    )
+    assert r.status_code == 200
+    final = json.loads(_events(r.text)[-2])
+    assert final["done"] is True and final["message"]["text"] == "Hola"
+    stored = app_state.get_cycle("stream-test")
+    assert [m.text for m in stored.messages][-2:] == ["hola", "Hola"]
+
+
+def test_repl_prints_tokens_as_they_arrive(monkeypatch, capsys):
+    import importlib
+
+    cli_module = importlib.import_module("blackbox_hybrid_tool.cli.main")
+    cli = cli_module.CLI()
+    cli.ai_orchestrator = Mock()
+    cli.ai_orchestrator.models_config = {"models": {"blackbox": {"model": "m"}}}
+    cli.ai_orchestrator.stream_response = Mock(return_value=iter(["Ho", "la"]))
+    inputs = iter(["hola", "/exit"])
+    monkeypatch.setattr("builtins.input", lambda *_: next(inputs))
+    args = SimpleNamespace(
+        debug=False, model=None, session=None, transcript=None, no_stream=False
+    )
+    assert cli.run_repl(args) == 0
+    assert "AI> Hola" in capsys.readouterr().out
+    cli.ai_orchestrator.generate_response.assert_not_called()
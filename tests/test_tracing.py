@@ -0,0 +1,175 @@
+"""
+Tests para las trazas de solicitudes (spans, propagación y exportadores)
+"""
+
+import json
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.core.ai_client import AIOrchestrator
+from blackbox_hybrid_tool.utils.mock_server import MockBlackboxServer
+from blackbox_hybrid_tool.utils.tracing import (
+    LogExporter,
+    MemoryExporter,
+    OTLPFileExporter,
+    TraceConfig,
+    Tracer,
+    current_span,
+    inject,
+    parse_traceparent,
+    tracer,
+)
+
+PARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+@pytest.fixture()
+def spans():
+    saved = tracer.config, tracer.exporters
+    memory = MemoryExporter()
+    tracer.config, tracer.exporters = TraceConfig(sample_rate=1.0), [memory]
+    yield memory
+    tracer.config, tracer.exporters = saved
+
+
+def test_traceparent_parsing_and_injection():
+    assert parse_traceparent(PARENT) == (
+        "0af7651916cd43dd8448eb211c80319c",
+        "b7ad6b7169203331",
+        True,
+    )
+    assert parse_traceparent(PARENT[:-1] + "0")[2] is False
+    for bad in (None, "", "00-abc-def-01", "00-" + "0" * 32 + "-b7ad6b7169203331-01"):
+        assert parse_traceparent(bad) is None
+
+    memory = MemoryExporter()
+    t = Tracer(TraceConfig(sample_rate=1.0), [memory])
+    with t.span("root") as root:
+        headers = inject({})
+        assert headers["traceparent"] == root.traceparent()
+        assert current_span() is root
+    assert current_span() is None and inject({}) == {}
+
+
+def test_nesting_sampling_and_errors():
+    memory = MemoryExporter()
+    t = Tracer(TraceConfig(sample_rate=1.0), [memory])
+    with pytest.raises(ValueError):
+        with t.span("root", user="x") as root:
+            with t.span("child"):
+                t.record("stage", 1, 2, size=3)
+            raise ValueError("boom")
+    stage, child, exported_root = memory.spans
+    assert child.parent_id == root.span_id and stage.parent_id == child.span_id
+    assert {s.trace_id for s in memory.spans} == {root.trace_id}
+    assert exported_root.error == "ValueError: boom"
+    assert exported_root.attributes == {"user": "x"} and stage.attributes == {"size": 3}
+
+    # Sin muestrear: se propagan ids pero no se exporta nada
+    t = Tracer(TraceConfig(sample_rate=0.0), [memory])
+    with t.span("root") as root:
+        assert root.traceparent().endswith("-00")
+        assert t.record("stage", 1, 2) is None
+    # El flag del traceparent entrante manda (parent-based)
+    with t.span("server", traceparent=PARENT) as server:
+        assert server.trace_id == "0af7651916cd43dd8448eb211c80319c"
+        assert server.parent_id == "b7ad6b7169203331"
+    assert len(memory.spans) == 4
+
+    t = Tracer(TraceConfig(enabled=False), [memory])
+    with t.span("off") as span:
+        assert span is None
+
+
+def test_exporters(tmp_path, caplog):
+    path = tmp_path / "traces" / "spans.jsonl"
+    otlp = OTLPFileExporter(str(path), service_name="svc")
+    t = Tracer(TraceConfig(sample_rate=1.0), [otlp, LogExporter()])
+    with caplog.at_level(logging.INFO, logger="chispart.trace"):
+        with t.span("root", kind="server", ok=True, n=2, ratio=0.5):
+            with t.span("child"):
+                pass
+    t.close()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    resource = lines[1]["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "svc"}
+    root = resource["scopeSpans"][0]["spans"][0]
+    assert root["name"] == "root" and root["kind"] == 2 and "parentSpanId" not in root
+    assert root["attributes"] == [
+        {"key": "ok", "value": {"boolValue": True}},
+        {"key": "n", "value": {"intValue": "2"}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+    ]
+    child = lines[0]["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert child["parentSpanId"] == root["spanId"]
+    assert int(root["endTimeUnixNano"]) >= int(child["endTimeUnixNano"])
+
+    logged = [json.loads(r.getMessage()) for r in caplog.records]
+    assert [s["name"] for s in logged] == ["child", "root"]
+
+
+def test_cycle_message_spans_cover_each_stage(spans, tmp_path, monkeypatch):
+    import main
+
+    with MockBlackboxServer() as server:
+        cfg_path = tmp_path / "models.json"
+        cfg_path.write_text(
+            json.dumps(
+                {
+                    "models": {
+                        "blackbox": {
+                            "api_key": "k",
+                            "model": "mock/trace",
+                            "enabled": True,
+                            "base_url": server.completions_url,
+                        }
+                    }
+                }
+            ),
+            encoding="utf-8",
+        )
+        o = AIOrchestrator(config_file=str(cfg_path))
+        monkeypatch.setattr(main, "orchestrator", o)
+        sent = []
+        pool_post = o.pool.apost
+
+        async def capture(url, headers=None, **kw):
+            sent.append(dict(headers))
+            return await pool_post(url, headers=headers, **kw)
+
+        monkeypatch.setattr(o.pool, "apost", capture)
+        client = TestClient(main.app)
+        cycle_id = client.post("/cycles", json={"title": "traza"}).json()["id"]
+        r = client.post(
+            f"/cycles/{cycle_id}/messages",
+            json={"prompt": "hola"},
+            headers={"traceparent": PARENT},
+        )
+        o.close()
+
+    assert r.status_code == 200
+    trace_id = r.headers["x-trace-id"]
+    assert trace_id == "0af7651916cd43dd8448eb211c80319c"
+    trace = {s.name: s for s in spans.spans if s.trace_id == trace_id}
+    server_span = trace["POST /cycles/{cycle_id}/messages"]
+    assert server_span.parent_id == "b7ad6b7169203331"
+    assert server_span.attributes["http.status_code"] == 200
+    for stage in ("request.validate", "handler.add_message_to_cycle"):
+        assert trace[stage].parent_id == server_span.span_id
+    assert trace["response.serialize"].parent_id == server_span.span_id
+    generate = trace["orchestrator.generate"]
+    assert generate.parent_id == trace["handler.add_message_to_cycle"].span_id
+    assert trace["model.select"].parent_id == generate.span_id
+    completion = trace["blackbox.completion"]
+    assert completion.parent_id == generate.span_id
+    assert trace["ratelimit.wait"].parent_id == completion.span_id
+    assert trace["upstream.attempt"].attributes["outcome"] == "ok"
+    # El upstream recibe la traza para continuarla
+    assert parse_traceparent(sent[0]["traceparent"])[:2] == (
+        trace_id,
+        completion.span_id,
+    )
@@ -0,0 +1,114 @@
+"""
+Tests para las subidas en streaming y la escritura atómica
+"""
+
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from blackbox_hybrid_tool.utils import uploads
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setenv("WRITE_ROOT", str(tmp_path))
+    return TestClient(main.app)
+
+
+def _chunks(data, size=300_000):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def test_streamed_upload_with_checksum(client, tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    digest = hashlib.sha256(data).hexdigest()
+    r = client.put(
+        "/files/upload",
+        params={"path": "bin/blob.dat", "sha256": digest},
+        content=_chunks(data),
+    )
+    body = r.json()
+    assert r.status_code == 200 and body["sha256"] == digest
+    assert body["size"] == len(data)
+    assert (tmp_path / "bin" / "blob.dat").read_bytes() == data
+    assert not list((tmp_path / "bin").glob(".*"))  # sin temporales
+
+    again = client.put("/files/upload", params={"path": "bin/blob.dat"}, content=b"x")
+    assert again.status_code == 409
+    wrong = client.put(
+        "/files/upload",
+        params={"path": "bin/blob.dat", "overwrite": True, "sha256": "0" * 64},
+        content=b"otro",
+    )
+    assert wrong.status_code == 422
+    # El destino anterior sigue intacto y el temporal se descarta
+    assert (tmp_path / "bin" / "blob.dat").read_bytes() == data
+    assert (
+        client.get("/files/upload", params={"path": "bin/blob.dat"}).json()["offset"]
+        == 0
+    )
+    outside = client.put("/files/upload", params={"path": "../x"}, content=b"x")
+    assert outside.status_code == 403
+    assert client.put("/files/upload", params={"path": "bin"}).status_code == 400
+
+
+def test_resumable_upload_by_offset(client, tmp_path):
+    data = b"".join(b"%08d" % i for i in range(100_000))
+    digest = hashlib.sha256(data).hexdigest()
+    url, path = "/files/upload", "docs/largo.txt"
+    first = client.put(
+        url, params={"path": path, "complete": False}, content=data[:300_000]
+    )
+    assert first.json() == {
+        "status": "partial",
+        "path": str(tmp_path / "docs" / "largo.txt"),
+        "offset": 300_000,
+    }
+    assert not (tmp_path / "docs" / "largo.txt").exists()
+
+    status = client.get(url, params={"path": path})
+    assert status.headers["upload-offset"] == "300000"
+    bad = client.put(url, params={"path": path, "offset": 10}, content=b"x")
+    assert bad.status_code == 409 and bad.json()["detail"]["offset"] == 300_000
+
+    done = client.put(
+        url,
+        params={"path": path, "offset": 300_000, "sha256": digest},
+        content=_chunks(data[300_000:]),
+    )
+    assert done.json()["sha256"] == digest
+    assert (tmp_path / "docs" / "largo.txt").read_bytes() == data
+
+    client.put(url, params={"path": "tmp.txt", "complete": False}, content=b"abc")
+    assert (
+        client.delete(url, params={"path": "tmp.txt"}).json()["status"] == "cancelled"
+    )
+    assert client.delete(url, params={"path": "tmp.txt"}).status_code == 404
+
+
+def test_write_endpoint_is_atomic(client, tmp_path, monkeypatch):
+    r = client.post("/files/write", json={"path": "a/b.txt", "content": "uno"})
+    assert r.status_code == 200
+    assert (
+        client.post(
+            "/files/write", json={"path": "a/b.txt", "content": "dos"}
+        ).status_code
+        == 409
+    )
+
+    # Un fallo al publicar deja el archivo anterior completo
+    def boom(*args):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(uploads.os, "replace", boom)
+    r = client.post(
+        "/files/write", json={"path": "a/b.txt", "content": "dos", "overwrite": True}
+    )
+    assert r.status_code == 500
+    assert (tmp_path / "a" / "b.txt").read_text() == "uno"
+    assert os.listdir(tmp_path / "a") == ["b.txt"]
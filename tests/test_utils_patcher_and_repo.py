@@ -7,6 +7,7 @@ from blackbox_hybrid_tool.utils.patcher import (
     parse_unified_diff,
     apply_patch_to_text,
     apply_unified_diff,
+    escaping_paths,
 )
 from blackbox_hybrid_tool.utils import self_repo as sr
 
@@ -81,6 +82,35 @@ def test_apply_unified_diff_modify_missing_file_reports_error(tmp_path):
     assert res.get("errors")
 
 
+def test_apply_unified_diff_rejects_paths_outside_root(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    (tmp_path / "victim.txt").write_text("x\n", encoding="utf-8")
+    diff = f"""--- /dev/null
++++ b/../escaped.txt
+@@ -0,0 +1,1 @@
++pwned
+diff --git a/victim.txt b/victim.txt
+--- {tmp_path / "victim.txt"}
++++ /dev/null
+@@ -1,1 +0,0 @@
+-x
+diff --git a/ok.txt b/ok.txt
+--- /dev/null
++++ b/ok.txt
+@@ -0,0 +1,1 @@
++fine
+"""
+    assert escaping_paths(diff, root) == [
+        "../escaped.txt",
+        str(tmp_path / "victim.txt"),
+    ]
+    res = apply_unified_diff(diff, root)
+    assert len(res["errors"]) == 2 and len(res["created"]) == 1
+    assert not (tmp_path / "escaped.txt").exists()
+    assert (tmp_path / "victim.txt").exists() and (root / "ok.txt").exists()
+
+
 def test_self_repo_snapshot_embed_extract_analyze_and_backup(tmp_path, monkeypatch):
     # Work on a small temp project to avoid touching full repo
     proj = tmp_path / "proj"